@@ -0,0 +1,67 @@
+"""Time `apply_blocks` on pages dominated by commented code blocks.
+
+Usage:
+    python scripts/bench_apply_pre.py --blocks 2000 --comments 200
+
+Each ``<pre><code>`` holds ``--comments`` commented lines in a single text node, so apply has to
+splice that many ranged edits into one string. Translations are the uppercased source text; the
+extract and translate phases are not timed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+
+from lxml import html
+
+
+def build_page(blocks: int, comments: int) -> str:
+    code = "\n".join(
+        f"value_{line} = {line}  # step {line} updates the value" for line in range(comments)
+    )
+    sections = "".join(
+        f"<section><p>Intro paragraph {i} for the listing.</p>"
+        f'<pre><code class="language-python">{code}</code></pre></section>'
+        for i in range(blocks)
+    )
+    return f"<html><body><main>{sections}</main></body></html>"
+
+
+def main() -> None:
+    from web2ru.apply.apply_blocks import apply_blocks
+    from web2ru.extract.block_extractor import extract_blocks
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--blocks", type=int, default=2000)
+    parser.add_argument("--comments", type=int, default=200)
+    args = parser.parse_args()
+
+    root = html.fromstring(build_page(args.blocks, args.comments))
+    scope = root.xpath("//main")[0]
+    blocks, _ = extract_blocks(
+        scope, scope_mode="main", translation_unit="block", exclude_selectors=[]
+    )
+    for block in blocks:
+        for part in block.parts:
+            part.translated_core = part.core.upper()
+
+    started = time.perf_counter()
+    applied = apply_blocks(root, blocks)
+    elapsed = time.perf_counter() - started
+    print(
+        json.dumps(
+            {
+                "blocks": len(blocks),
+                "parts": sum(len(block.parts) for block in blocks),
+                "applied": applied,
+                "apply_seconds": round(elapsed, 3),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
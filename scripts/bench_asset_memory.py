@@ -0,0 +1,66 @@
+"""Measure memory held by captured assets until they are written to the output directory.
+
+Usage:
+    python scripts/bench_asset_memory.py --assets 150 --asset-kb 2048
+
+Each synthetic asset is handed to `AssetCache.put` the way the response listener does, then the
+caller drops its bytes. ``retained_mb`` is what the cache still holds after all puts;
+``write_seconds`` times `write_to_output`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+
+def main() -> None:
+    from web2ru.assets.cache import AssetCache
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--assets", type=int, default=150)
+    parser.add_argument("--asset-kb", type=int, default=2048)
+    args = parser.parse_args()
+
+    cache = AssetCache()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for index in range(args.assets):
+        body = os.urandom(args.asset_kb * 1024)
+        cache.put(
+            url=f"https://cdn.example.com/media/{index}.jpg",
+            final_url=f"https://cdn.example.com/media/{index}.jpg",
+            content_type="image/jpeg",
+            data=body,
+            source="network_capture",
+            max_asset_mb=64,
+        )
+        del body
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        cache.write_to_output(Path(tmp))
+        write_seconds = time.perf_counter() - started
+    cache.close()
+    print(
+        json.dumps(
+            {
+                "assets": args.assets,
+                "total_mb": round(args.assets * args.asset_kb / 1024, 1),
+                "retained_mb": round(retained / 1024 / 1024, 1),
+                "write_seconds": round(write_seconds, 3),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
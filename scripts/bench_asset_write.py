@@ -0,0 +1,77 @@
+"""Measure ``AssetCache.write_to_output`` with one writer thread and with a pool.
+
+Usage:
+    python scripts/bench_asset_write.py --assets 20000 --asset-kb 4 --target /mnt/nfs/tmp
+
+Point ``--target`` at the filesystem you care about: on local disks the pool mostly overlaps
+syscalls, on network filesystems it hides the per-file round trips. Each run writes into a
+fresh directory, then a second time into the same one to time the "already there" check.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+
+def main() -> None:
+    from web2ru.assets.cache import AssetCache
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--assets", type=int, default=20000)
+    parser.add_argument("--asset-kb", type=int, default=4)
+    parser.add_argument("--large", type=int, default=10)
+    parser.add_argument("--large-mb", type=int, default=2)
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 8])
+    parser.add_argument("--target", type=Path, default=None)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    source = AssetCache()
+    sizes = [args.asset_kb * 1024] * args.assets + [args.large_mb * 1024 * 1024] * args.large
+    for index, size in enumerate(sizes):
+        url = f"https://example.com/static/{index % 97}/asset{index}.js"
+        source.put(
+            url=url,
+            final_url=url,
+            content_type="text/javascript",
+            data=rng.randbytes(size),
+            source="network_capture",
+            max_asset_mb=64,
+        )
+    for url in source.records:
+        source.ensure_local_mapping(url)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="web2ru-bench-", dir=args.target) as tmp:
+        for workers in args.workers:
+            output_dir = Path(tmp) / f"workers-{workers}"
+            timings = []
+            for _ in range(2):
+                cache = AssetCache(
+                    records=source.records,
+                    url_to_local=source.url_to_local,
+                    write_workers=workers,
+                )
+                started = time.perf_counter()
+                cache.write_to_output(output_dir)
+                timings.append(time.perf_counter() - started)
+            results.append(
+                {
+                    "workers": cache.write_stats.workers,
+                    "write_s": round(timings[0], 3),
+                    "rewrite_existing_s": round(timings[1], 3),
+                }
+            )
+            shutil.rmtree(output_dir)
+    source.close()
+    print(json.dumps({"assets": len(sizes), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
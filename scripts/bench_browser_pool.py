@@ -0,0 +1,70 @@
+"""Compare cold-start renders with renders from a warm browser pool.
+
+Usage:
+    python scripts/bench_browser_pool.py https://example.com/ https://example.org/ --rounds 3
+
+Every URL is rendered ``--rounds`` times, first with a fresh browser per render (what each
+surf click used to cost) and then through one long-lived ``BrowserPool``. Needs Playwright
+with Chromium installed; the online render runs with scrolling and waits turned down so the
+browser start-up dominates.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+
+def main() -> None:
+    from web2ru.assets.cache import AssetCache
+    from web2ru.config import RunConfig
+    from web2ru.pipeline.browser_pool import BrowserPool
+    from web2ru.pipeline.online_render import run_online_render
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("urls", nargs="+")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="web2ru-bench-") as cache_dir:
+
+        def render(url: str, pool: BrowserPool | None) -> float:
+            config = RunConfig(
+                url=url,
+                cache_dir=Path(cache_dir),
+                auto_scroll=False,
+                post_load_wait_ms=0,
+                openai_min_interval_ms=0,
+            )
+            cache = AssetCache()
+            started = time.perf_counter()
+            run_online_render(config, cache, browser_pool=pool)
+            elapsed = time.perf_counter() - started
+            cache.close()
+            return elapsed
+
+        cold = [render(url, None) for _ in range(args.rounds) for url in args.urls]
+        with BrowserPool() as pool:
+            warm = [render(url, pool) for _ in range(args.rounds) for url in args.urls]
+            launches = pool.launches
+
+    print(
+        json.dumps(
+            {
+                "renders": len(cold),
+                "cold_median_s": round(statistics.median(cold), 3),
+                "pooled_median_s": round(statistics.median(warm), 3),
+                "pooled_first_s": round(warm[0], 3),
+                "pooled_launches": launches,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Compare the output formats on a snapshot with many small assets: write, copy and serve time.
+
+Usage:
+    python scripts/bench_bundle.py --assets 20000 --asset-kb 4 --large 20 --large-mb 2
+
+Builds an ``AssetCache`` of random bodies (the large ones spilled to disk like real captures),
+writes it with every ``--output-format``, copies the result the way a sync would, and reads
+every entry back the way the server does: ``read_bytes`` per file for ``dir``, slices of the
+mapped archive for ``zip``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+
+def _tree_size(path: Path) -> tuple[int, int]:
+    files = [item for item in path.rglob("*") if item.is_file()]
+    return len(files), sum(item.stat().st_size for item in files)
+
+
+def main() -> None:
+    from web2ru.assets.cache import AssetCache
+    from web2ru.pipeline.bundle import (
+        OUTPUT_FORMATS,
+        BundleReader,
+        BundleStats,
+        write_output_bundle,
+    )
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--assets", type=int, default=20000)
+    parser.add_argument("--asset-kb", type=int, default=4)
+    parser.add_argument("--large", type=int, default=20)
+    parser.add_argument("--large-mb", type=int, default=2)
+    parser.add_argument("--formats", nargs="+", default=list(OUTPUT_FORMATS))
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    cache = AssetCache()
+    sizes = [args.asset_kb * 1024] * args.assets + [args.large_mb * 1024 * 1024] * args.large
+    for index, size in enumerate(sizes):
+        url = f"https://example.com/static/{index % 97}/asset{index}.png"
+        cache.put(
+            url=url,
+            final_url=url,
+            content_type="image/png",
+            data=rng.randbytes(size),
+            source="network_capture",
+            max_asset_mb=64,
+        )
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="web2ru-bench-") as tmp:
+        for output_format in args.formats:
+            cache.write_stats.files = cache.write_stats.deduplicated = 0
+            output_dir = Path(tmp) / output_format
+            output_dir.mkdir()
+            (output_dir / "index.html").write_text("<html><body>bench</body></html>")
+            started = time.perf_counter()
+            target = write_output_bundle(
+                output_dir, cache, output_format=output_format, stats=BundleStats()
+            )
+            os.sync()
+            write_s = time.perf_counter() - started
+
+            started = time.perf_counter()
+            copied = Path(tmp) / f"{output_format}-copy"
+            shutil.copytree(output_dir, copied)
+            os.sync()
+            copy_s = time.perf_counter() - started
+            files, size = _tree_size(copied)
+
+            read_s = None
+            names = [rel.removeprefix("./") for rel in cache.url_to_local.values()]
+            if output_format == "dir":
+                started = time.perf_counter()
+                for name in names:
+                    (output_dir / name).read_bytes()
+                read_s = time.perf_counter() - started
+            elif output_format == "zip":
+                started = time.perf_counter()
+                reader = BundleReader(target)
+                for name in names:
+                    reader.get(name)
+                read_s = time.perf_counter() - started
+                reader.close()
+            results.append(
+                {
+                    "format": output_format,
+                    "files": files,
+                    "mb": round(size / (1024 * 1024), 1),
+                    "write_s": round(write_s, 3),
+                    "copy_s": round(copy_s, 3),
+                    "read_all_s": None if read_s is None else round(read_s, 3),
+                }
+            )
+    cache.close()
+    print(json.dumps({"assets": len(sizes), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Time the CSS work of one page: scan a stylesheet for URLs, then rewrite them.
+
+Usage:
+    python scripts/bench_css_pipeline.py --rules 20000 --pages 3
+
+The synthetic stylesheet mixes plain rules, ``url()`` backgrounds, ``@font-face`` and
+``@media`` blocks. ``--pages`` repeats scan+rewrite of the same sheet the way surf pages share
+CSS. ``identical`` reports whether a sheet without URLs comes back unchanged.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+
+
+def _stylesheet(rules: int) -> str:
+    chunks: list[str] = []
+    for index in range(rules):
+        if index % 50 == 0:
+            chunks.append(
+                f"@font-face {{ font-family: f{index}; src: url('../fonts/f{index}.woff2') }}\n"
+            )
+        if index % 7 == 0:
+            chunks.append(
+                f"@media (min-width: {index % 1200}px) {{ .m{index} {{ "
+                f"background: url(../img/m{index}.png) no-repeat; }} }}\n"
+            )
+        chunks.append(
+            f".c{index} > a:hover {{ color: #{index % 4096:03x}; margin: 0 {index}px }}\n"
+        )
+    return "".join(chunks)
+
+
+def main() -> None:
+    from web2ru.assets.rewrite_css import rewrite_css_urls
+    from web2ru.assets.scan import scan_css_urls
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rules", type=int, default=20000)
+    parser.add_argument("--pages", type=int, default=3)
+    args = parser.parse_args()
+
+    css = _stylesheet(args.rules)
+    base = "https://example.com/static/css/site.css"
+
+    started = time.perf_counter()
+    found = 0
+    for _ in range(args.pages):
+        found = len(scan_css_urls(css, base))
+        rewrite_css_urls(css, css_base_url=base, map_url=lambda url: "./assets/x.bin")
+    elapsed = time.perf_counter() - started
+
+    plain = "".join(line for line in css.splitlines(keepends=True) if "url(" not in line)
+    identical = rewrite_css_urls(plain, css_base_url=base, map_url=str) == plain
+    print(
+        json.dumps(
+            {
+                "css_kb": len(css) // 1024,
+                "urls": found,
+                "pages": args.pages,
+                "seconds": round(elapsed, 3),
+                "identical": identical,
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Time stylesheet rewriting across runs and across the pages of one run.
+
+Usage:
+    python scripts/bench_css_rewrite_cache.py --rules 20000 --pages 5
+
+``uncached`` rewrites with `rewrite_css_urls` after dropping the in-process parse cache, i.e.
+a fresh process without the on-disk cache. ``cold_run``/``warm_run`` use `CssRewriteCache`
+backed by a temporary SQLite file, first empty, then filled by the previous run (memory layers
+are cleared in between to mimic a new process). ``pages`` is the per-page time of the rest of a
+surf session in the same process.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+
+def _stylesheet(rules: int) -> str:
+    chunks: list[str] = []
+    for index in range(rules):
+        if index % 7 == 0:
+            chunks.append(f".m{index} {{ background: url(../img/m{index}.png) no-repeat }}\n")
+        chunks.append(
+            f".c{index} > a:hover {{ color: #{index % 4096:03x}; margin: 0 {index}px }}\n"
+        )
+    return "".join(chunks)
+
+
+def main() -> None:
+    from web2ru.assets.css_cache import CssRewriteCache, clear_memory_layers
+    from web2ru.assets.rewrite_css import rewrite_css_urls
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rules", type=int, default=20000)
+    parser.add_argument("--pages", type=int, default=5)
+    args = parser.parse_args()
+
+    css = _stylesheet(args.rules)
+    base = "https://example.com/static/css/site.css"
+
+    def map_url(url: str) -> str:
+        return "../img/" + url.rsplit("/", 1)[-1]
+
+    def timed(cache: CssRewriteCache | None) -> float:
+        started = time.perf_counter()
+        if cache is None:
+            rewrite_css_urls(css, css_base_url=base, map_url=map_url)
+        else:
+            cache.rewrite(css, css_base_url=base, map_url=map_url)
+        return time.perf_counter() - started
+
+    clear_memory_layers()
+    uncached = timed(None)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "css_rewrites.sqlite3"
+        clear_memory_layers()
+        cold = CssRewriteCache(db_path)
+        cold_run = timed(cold)
+        cold.close()
+        clear_memory_layers()
+        warm = CssRewriteCache(db_path)
+        warm_run = timed(warm)
+        pages = [timed(warm) for _ in range(args.pages)]
+        warm.close()
+
+    print(
+        json.dumps(
+            {
+                "css_kb": len(css) // 1024,
+                "uncached_seconds": round(uncached, 3),
+                "cold_run_seconds": round(cold_run, 3),
+                "warm_run_seconds": round(warm_run, 3),
+                "per_page_seconds": round(sum(pages) / len(pages), 4),
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Time `fetch_missing_assets` against local HTTP servers that answer with artificial latency.
+
+Usage:
+    python scripts/bench_fetch_missing.py --hosts 4 --assets 400 --latency-ms 40
+
+Each host is a ThreadingHTTPServer on its own port (so it counts as a separate host for the
+per-host limit). Assets are spread evenly over the hosts; every response sleeps ``latency-ms``
+before sending ``asset-kb`` of body. Every run starts from an empty cache.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _make_handler(latency: float, body: bytes) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:  # noqa: N802 - http.server API
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+            return None
+
+    return Handler
+
+
+def main() -> None:
+    from web2ru.assets.cache import AssetCache
+    from web2ru.assets.fetch_missing import fetch_missing_assets
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--hosts", type=int, default=4)
+    parser.add_argument("--assets", type=int, default=400)
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    parser.add_argument("--asset-kb", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    handler = _make_handler(args.latency_ms / 1000, b"x" * (args.asset_kb * 1024))
+    servers = [ThreadingHTTPServer(("127.0.0.1", 0), handler) for _ in range(args.hosts)]
+    for server in servers:
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    urls = {
+        f"http://127.0.0.1:{servers[index % args.hosts].server_port}/asset/{index}.bin"
+        for index in range(args.assets)
+    }
+
+    timings = []
+    missing_total = 0
+    for _ in range(args.repeat):
+        cache = AssetCache()
+        started = time.perf_counter()
+        missing = fetch_missing_assets(
+            needed_urls=urls,
+            asset_cache=cache,
+            final_url="http://127.0.0.1/",
+            user_agent="bench",
+            max_asset_mb=15,
+            enabled=True,
+        )
+        timings.append(time.perf_counter() - started)
+        missing_total += len(missing)
+        cache.close()
+
+    for server in servers:
+        server.shutdown()
+    print(
+        json.dumps(
+            {
+                "hosts": args.hosts,
+                "assets": args.assets,
+                "latency_ms": args.latency_ms,
+                "best_seconds": round(min(timings), 3),
+                "assets_per_second": round(args.assets / min(timings), 1),
+                "missing": missing_total,
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Measure font subsetting on real font files: bytes saved, time and Cyrillic coverage.
+
+Usage:
+    python scripts/bench_font_subset.py /path/to/Font-Regular.woff2 /path/to/Font-Bold.ttf
+
+The fonts are put in an ``AssetCache`` and subset to the characters of a Russian sample text
+(plus printable ASCII, which the stage always keeps), once serially and once with one worker
+per CPU. Needs fontTools.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+_SAMPLE = (
+    "Съешь же ещё этих мягких французских булок, да выпей чаю. "
+    "Широкая электрификация южных губерний даст мощный толчок подъёму сельского хозяйства. "
+    "«Цитата» — тире, № 1, 25 % и 3 000 ₽."
+)
+
+
+def main() -> None:
+    from web2ru.assets.cache import AssetCache
+    from web2ru.assets.fonts import FontSubsetOptions, FontSubsetStats, subset_fonts
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("fonts", nargs="+", type=Path)
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 0])
+    args = parser.parse_args()
+
+    results = []
+    for workers in args.workers:
+        cache = AssetCache()
+        for path in args.fonts:
+            url = f"https://example.com/fonts/{path.name}"
+            cache.put(
+                url=url,
+                final_url=url,
+                content_type=None,
+                data=path.read_bytes(),
+                source="network_capture",
+                max_asset_mb=64,
+            )
+        stats = FontSubsetStats()
+        started = time.perf_counter()
+        subset_fonts(
+            cache,
+            codepoints={ord(char) for char in _SAMPLE},
+            options=FontSubsetOptions(enabled=True, workers=workers),
+            stats=stats,
+        )
+        elapsed = time.perf_counter() - started
+        results.append(
+            {
+                "workers": stats.workers,
+                "fonts": stats.fonts,
+                "subset": stats.subset,
+                "kb_before": round(stats.bytes_before / 1024, 1),
+                "kb_after": round(stats.bytes_after / 1024, 1),
+                "without_cyrillic": len(stats.without_cyrillic),
+                "seconds": round(elapsed, 3),
+            }
+        )
+        cache.close()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
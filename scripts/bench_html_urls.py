@@ -0,0 +1,109 @@
+"""Time finding and rewriting the asset URLs of one HTML page.
+
+Usage:
+    python scripts/bench_html_urls.py --elements 40000
+
+The synthetic page repeats images with srcset, links, anchors, inline styles, media, meta tags
+and SVG sprites, with many URLs shared across elements like real templates. The scan collects
+the URLs to fetch, the rewrite maps them to local paths. ``digest`` hashes the needed URLs and
+the rewritten HTML so two trees can be compared for identical output. The URL memo is cleared
+before each repeat, so every run starts cold.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import time
+
+
+def _page(elements: int) -> str:
+    rows: list[str] = [
+        "<html><head>",
+        '<meta property="og:image" content="https://cdn.example.com/og.png">',
+        '<meta name="viewport" content="width=device-width">',
+        '<link rel="stylesheet" href="/static/site.css"><link rel="canonical" href="/page">',
+        "<style>.hero{background:url(/img/hero.jpg)}</style></head><body>",
+    ]
+    for index in range(elements // 8):
+        shared = index % 40
+        rows.append(
+            f'<div style="background-image:url(/img/bg{shared}.png)">'
+            f'<img src="/img/p{index}.jpg" srcset="/img/p{index}@2x.jpg 2x, /img/s{shared}.jpg 3x"'
+            f' alt="photo {index}">'
+            f'<a href="/articles/{index}">read</a><a href="#top">top</a>'
+            f'<video poster="/img/v{shared}.jpg" src="/media/v{shared}.mp4"></video>'
+            f'<svg><use xlink:href="/icons.svg#i{shared}"></use></svg>'
+            f'<script src="/js/app{shared}.js"></script></div>'
+        )
+    rows.append("</body></html>")
+    return "".join(rows)
+
+
+def main() -> None:
+    from lxml import html
+
+    from web2ru.assets import scan
+    from web2ru.assets.rewrite_html import rewrite_html_urls
+    from web2ru.assets.scan import parse_html, scan_needed_urls
+
+    def map_url(url: str) -> str:
+        return "./assets/" + hashlib.sha1(url.encode()).hexdigest()[:12]
+
+    def map_anchor_href(href: str) -> str:
+        return "/go?" + href
+
+    def scan_then_rewrite(root: html.HtmlElement, final_url: str) -> set[str]:
+        # Trees without the shared traversal: one pass to scan, one to rewrite.
+        needed = scan_needed_urls(root, final_url, {})
+        rewrite_html_urls(
+            root, final_url=final_url, map_url=map_url, map_anchor_href=map_anchor_href
+        )
+        return needed
+
+    def collect_then_patch(root: html.HtmlElement, final_url: str) -> set[str]:
+        from web2ru.assets.rewrite_html import patch_url_sites
+
+        sites = scan.collect_url_sites(root, final_url)
+        patch_url_sites(
+            sites.sites, final_url=final_url, map_url=map_url, map_anchor_href=map_anchor_href
+        )
+        return sites.needed
+
+    run = collect_then_patch if hasattr(scan, "collect_url_sites") else scan_then_rewrite
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--elements", type=int, default=40000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    page = _page(args.elements)
+    final_url = "https://example.com/section/page"
+    best = float("inf")
+    digest = ""
+    for _ in range(args.repeat):
+        root = parse_html(page)
+        cache_clear = getattr(scan.normalize_url, "cache_clear", None)
+        if cache_clear is not None:
+            cache_clear()
+        started = time.perf_counter()
+        needed = run(root, final_url)
+        best = min(best, time.perf_counter() - started)
+        output = html.tostring(root, encoding="unicode")
+        digest = hashlib.sha256(("\n".join(sorted(needed)) + output).encode()).hexdigest()[:16]
+
+    print(
+        json.dumps(
+            {
+                "html_kb": len(page) // 1024,
+                "needed_urls": len(needed),
+                "best_seconds": round(best, 3),
+                "digest": digest,
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
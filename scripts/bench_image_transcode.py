@@ -0,0 +1,92 @@
+"""Measure the image transcoding stage: bytes saved and time per mode and worker count.
+
+Usage:
+    python scripts/bench_image_transcode.py --images 12 --width 2400 --height 1600
+
+Builds PNG "screenshots" (a gradient with sensor-like noise, so they compress like real
+captures) plus the same pictures as high-quality JPEGs, puts them in an ``AssetCache`` and runs
+``transcode_images`` from a fresh cache for every mode/worker combination. Needs Pillow.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import time
+
+
+def _pictures(count: int, width: int, height: int) -> list[tuple[str, bytes, str]]:
+    from PIL import Image, ImageChops
+
+    pictures: list[tuple[str, bytes, str]] = []
+    for index in range(count):
+        gradient = Image.linear_gradient("L").resize((width, height)).rotate(index * 30)
+        noise = Image.effect_noise((width, height), 24 + index)
+        base = Image.merge("RGB", (gradient, ImageChops.add(gradient, noise, 2.0), noise))
+        png = io.BytesIO()
+        base.save(png, format="PNG")
+        jpeg = io.BytesIO()
+        base.save(jpeg, format="JPEG", quality=95)
+        pictures.append((f"https://example.com/shots/{index}.png", png.getvalue(), "image/png"))
+        pictures.append((f"https://example.com/photos/{index}.jpg", jpeg.getvalue(), "image/jpeg"))
+    return pictures
+
+
+def main() -> None:
+    from web2ru.assets.cache import AssetCache
+    from web2ru.assets.transcode import (
+        ImageTranscodeOptions,
+        ImageTranscodeStats,
+        transcode_images,
+    )
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--images", type=int, default=12)
+    parser.add_argument("--width", type=int, default=2400)
+    parser.add_argument("--height", type=int, default=1600)
+    parser.add_argument("--max-dim", type=int, default=1600)
+    parser.add_argument("--modes", nargs="+", default=["original", "webp", "avif"])
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 0])
+    args = parser.parse_args()
+
+    pictures = _pictures(args.images, args.width, args.height)
+    results = []
+    for mode in args.modes:
+        for workers in args.workers:
+            cache = AssetCache()
+            for url, data, content_type in pictures:
+                cache.put(
+                    url=url,
+                    final_url=url,
+                    content_type=content_type,
+                    data=data,
+                    source="network_capture",
+                    max_asset_mb=64,
+                )
+            stats = ImageTranscodeStats()
+            started = time.perf_counter()
+            transcode_images(
+                cache,
+                options=ImageTranscodeOptions(mode=mode, max_dim=args.max_dim, workers=workers),
+                stats=stats,
+            )
+            elapsed = time.perf_counter() - started
+            report = stats.as_report()
+            results.append(
+                {
+                    "mode": mode,
+                    "workers": stats.workers,
+                    "mb_before": round(stats.bytes_before / (1024 * 1024), 2),
+                    "mb_after": round(stats.bytes_after / (1024 * 1024), 2),
+                    "transcoded": stats.transcoded,
+                    "skipped_reason": report["skipped_reason"],
+                    "seconds": round(elapsed, 3),
+                }
+            )
+            cache.close()
+    print(json.dumps({"images": len(pictures), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
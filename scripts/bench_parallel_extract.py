@@ -0,0 +1,90 @@
+"""Find where process-pool block extraction starts beating the serial path.
+
+Usage:
+    python scripts/bench_parallel_extract.py --workers 4
+    python scripts/bench_parallel_extract.py --workers 8 --sections 200,1000,5000,20000
+
+For each page size the serial and parallel paths extract (and token-protect) the same synthetic
+``<main>``; the first size where the parallel wall time wins is reported as the crossover.
+Compare the element counts against ``RunConfig.parallel_extract_min_nodes``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+
+from lxml import html
+
+SECTION_TEMPLATE = """<section id="s{i}"><h2>Section {i}</h2>
+<p>Paragraph {i} explains <b>parallel</b> extraction with <a href="/docs/{i}">a link</a>.</p>
+<p>Another sentence for section {i}, see https://example.com/{i} and run_step_{i}().</p>
+<pre><code class="language-python"># compute value {i}
+value = {i} * 2  # doubled</code></pre>
+<ul><li>First item {i}</li><li>Second item with <em>emphasis</em></li></ul>
+</section>
+"""
+
+
+def build_page(sections: int) -> str:
+    body = "".join(SECTION_TEMPLATE.format(i=i) for i in range(sections))
+    return f"<html><body><main>{body}</main></body></html>"
+
+
+def time_extract(page: str, *, workers: int) -> tuple[float, int, int]:
+    from web2ru.extract.parallel import extract_blocks_parallel
+    from web2ru.translate.token_protector import protect_text
+
+    root = html.fromstring(page)
+    scope = root.xpath("//main")[0]
+    nodes = sum(1 for _ in scope.iter())
+    started = time.perf_counter()
+    blocks, _, _ = extract_blocks_parallel(
+        scope,
+        scope_mode="main",
+        translation_unit="block",
+        exclude_selectors=[],
+        workers=workers,
+        min_nodes=0,
+        token_protect=True,
+    )
+    if workers == 1:
+        # The serial path leaves protection to the Translator; count it here for a fair race.
+        for block in blocks:
+            for part in block.parts:
+                protect_text(part.core)
+    elapsed = time.perf_counter() - started
+    return elapsed, nodes, sum(len(block.parts) for block in blocks)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--sections", default="100,500,2000,5000,10000")
+    args = parser.parse_args()
+
+    crossover: int | None = None
+    for sections in (int(value) for value in args.sections.split(",")):
+        page = build_page(sections)
+        serial_s, nodes, parts = time_extract(page, workers=1)
+        parallel_s, _, _ = time_extract(page, workers=args.workers)
+        if crossover is None and parallel_s < serial_s:
+            crossover = nodes
+        print(
+            json.dumps(
+                {
+                    "sections": sections,
+                    "elements": nodes,
+                    "parts": parts,
+                    "serial_s": round(serial_s, 3),
+                    f"parallel_{args.workers}_s": round(parallel_s, 3),
+                    "speedup": round(serial_s / parallel_s, 2) if parallel_s else None,
+                }
+            )
+        )
+    print(f"crossover: {crossover if crossover is not None else 'not reached'} elements")
+
+
+if __name__ == "__main__":
+    main()
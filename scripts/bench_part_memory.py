@@ -0,0 +1,128 @@
+"""Measure memory held by extracted parts through extract -> translate -> apply.
+
+Usage:
+    python scripts/bench_part_memory.py --parts 100000
+
+The page is synthetic and the LLM client is an in-process echo, so only part bookkeeping is
+measured: ``retained_mb`` is what the block list holds after each phase and ``peak_mb`` is the
+tracemalloc peak during that phase.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any
+
+from lxml import html
+
+SECTION_TEMPLATE = """
+  <section id="s{i}">
+    <h2>Section {i}</h2>
+    <p>Paragraph {i} explains <b>part storage</b> with <a href="/docs/{i}">a link</a> inline.</p>
+    <ul>
+      <li>First item {i}</li>
+      <li>Second item with <em>emphasis</em> and run_step_{i}()</li>
+    </ul>
+  </section>"""
+PARTS_PER_SECTION = 9
+SECTIONS_PER_GROUP = 100
+
+
+class _EchoClient:
+    def translate_payload(self, payload: dict[str, Any]) -> Any:
+        from web2ru.translate.client_openai import OpenAIResponsePayload
+
+        translations = [{"id": item["id"], "text": item["text"]} for item in payload["items"]]
+        return OpenAIResponsePayload(
+            raw_text=json.dumps({"translations": translations}, ensure_ascii=False),
+            status="completed",
+            incomplete_details=None,
+            usage=None,
+        )
+
+
+def build_page(parts: int) -> str:
+    sections = max(1, parts // PARTS_PER_SECTION)
+    groups: list[str] = []
+    for start in range(0, sections, SECTIONS_PER_GROUP):
+        body = "".join(
+            SECTION_TEMPLATE.format(i=i)
+            for i in range(start, min(sections, start + SECTIONS_PER_GROUP))
+        )
+        groups.append(f"<div class='group'>{body}</div>")
+    return f"<html><body><main>{''.join(groups)}</main></body></html>"
+
+
+def _phase(label: str, results: dict[str, Any], fn: Any) -> Any:
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    value = fn()
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    results[label] = {
+        "seconds": round(elapsed, 2),
+        "retained_mb": round((current - before) / 1024 / 1024, 1),
+        "peak_mb": round((peak - before) / 1024 / 1024, 1),
+    }
+    return value
+
+
+def main() -> None:
+    from web2ru.apply.apply_blocks import apply_blocks
+    from web2ru.extract.block_extractor import extract_blocks
+    from web2ru.translate.translator import Translator
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--parts", type=int, default=100_000)
+    args = parser.parse_args()
+
+    root = html.fromstring(build_page(args.parts))
+    scope = root.xpath("//main")[0]
+    results: dict[str, Any] = {}
+
+    tracemalloc.start()
+    blocks, _ = _phase(
+        "extract",
+        results,
+        lambda: extract_blocks(
+            scope, scope_mode="main", translation_unit="block", exclude_selectors=[]
+        ),
+    )
+    results["parts"] = sum(len(block.parts) for block in blocks)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        translator = Translator(
+            api_key="bench",
+            model="bench",
+            reasoning_effort="none",
+            max_output_tokens=2048,
+            batch_chars=4000,
+            max_items_per_batch=40,
+            max_retries=1,
+            allow_empty_parts=True,
+            token_protect=True,
+            token_protect_strict=False,
+            use_cache=False,
+            cache_db_path=str(Path(tmp) / "cache.sqlite3"),
+        )
+        translator._client = _EchoClient()  # type: ignore[assignment]
+        _phase(
+            "translate",
+            results,
+            lambda: translator.translate_blocks_and_attrs(blocks=blocks, attrs=[]),
+        )
+        translator.close()
+
+    _phase("apply", results, lambda: apply_blocks(root, blocks))
+    tracemalloc.stop()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Compare srcset policies on an image-heavy page: assets fetched, output bytes and time.
+
+Usage:
+    python scripts/bench_srcset.py --images 120 --latency-ms 20
+
+Every image has a `src` and a six-candidate `srcset` (320w to 1920w) served by a local HTTP
+server whose bodies grow with the candidate width. Each policy runs the offline asset steps
+from an empty cache: collect URL sites, fetch the needed URLs, patch the HTML and write the
+assets to a temporary output directory.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+_WIDTHS = (320, 480, 640, 960, 1280, 1920)
+_WIDTH_IN_PATH = re.compile(r"-(\d+)\.jpg$")
+
+
+def _make_handler(latency: float) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:  # noqa: N802 - http.server API
+            time.sleep(latency)
+            match = _WIDTH_IN_PATH.search(self.path)
+            width = int(match.group(1)) if match else 640
+            # Roughly a JPEG's size (bytes grow with the pixel count), unique per path so the
+            # output does not deduplicate them.
+            body = self.path.encode() + b"j" * (width * width * 9 // 160)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+            return None
+
+    return Handler
+
+
+def _page(images: int) -> str:
+    rows = ["<html><body>"]
+    for index in range(images):
+        srcset = ", ".join(f"/img/p{index}-{width}.jpg {width}w" for width in _WIDTHS)
+        rows.append(
+            f'<img src="/img/p{index}-640.jpg" srcset="{srcset}" sizes="100vw" alt="{index}">'
+        )
+    rows.append("</body></html>")
+    return "".join(rows)
+
+
+def main() -> None:
+    from web2ru.assets.cache import AssetCache
+    from web2ru.assets.fetch_missing import fetch_missing_assets
+    from web2ru.assets.rewrite_html import patch_url_sites
+    from web2ru.assets.scan import collect_url_sites, parse_html
+    from web2ru.assets.srcset import SrcsetStats, parse_srcset_policy
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--images", type=int, default=120)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--policies", nargs="+", default=["keep-all", "largest", "closest:800"])
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(args.latency_ms / 1000))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    final_url = f"http://127.0.0.1:{server.server_port}/blog/post"
+    page = _page(args.images)
+
+    results = []
+    for raw_policy in args.policies:
+        policy = parse_srcset_policy(raw_policy)
+        stats = SrcsetStats(policy=str(policy))
+        root = parse_html(page)
+        cache = AssetCache()
+        started = time.perf_counter()
+        sites = collect_url_sites(root, final_url, srcset_policy=policy, srcset_stats=stats)
+        fetch_missing_assets(
+            needed_urls=sites.needed,
+            asset_cache=cache,
+            final_url=final_url,
+            user_agent="bench",
+            max_asset_mb=15,
+            enabled=True,
+        )
+        patch_url_sites(sites.sites, final_url=final_url, map_url=cache.ensure_local_mapping)
+        stats.records_dropped = cache.drop_unreferenced(stats.pruned_urls)
+        with tempfile.TemporaryDirectory() as output_dir:
+            cache.write_to_output(Path(output_dir))
+        elapsed = time.perf_counter() - started
+        results.append(
+            {
+                "policy": str(policy),
+                "fetched": len(sites.needed),
+                "output_files": cache.write_stats.files,
+                "output_mb": round(cache.write_stats.bytes / (1024 * 1024), 2),
+                "seconds": round(elapsed, 3),
+            }
+        )
+        cache.close()
+
+    server.shutdown()
+    print(json.dumps({"images": args.images, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
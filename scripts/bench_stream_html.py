@@ -0,0 +1,124 @@
+"""Compare peak RSS and wall time of in-memory vs streaming offline processing.
+
+Usage:
+    python scripts/bench_stream_html.py --size-mb 50 --chunk-kb 1024
+    python scripts/bench_stream_html.py --size-mb 50 --modes on
+
+Each mode runs in a fresh subprocess on the same synthetic page (no network, no LLM), so the
+reported ``ru_maxrss`` is the peak of that mode alone.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SECTION_TEMPLATE = """<section id="s{i}"><h2>Section {i}</h2>
+<p>Paragraph {i} explains <b>streaming</b> extraction with <a href="/docs/{i}">a link</a>.</p>
+<p>Another sentence for section {i}, long enough to look like real documentation prose.</p>
+<pre><code class="language-python"># compute value {i}
+value = {i} * 2  # doubled
+print(value)</code></pre>
+<ul><li>First item {i}</li><li>Second item <img src="/img/{m}.png" alt="Figure {i}"></li></ul>
+</section>
+"""
+
+
+def build_page(size_mb: int) -> str:
+    target = size_mb * 1024 * 1024
+    head = "<html><head><title>Synthetic</title></head><body><div id='app'><main>"
+    tail = "</main></div></body></html>"
+    sections: list[str] = []
+    total = len(head) + len(tail)
+    i = 0
+    while total < target:
+        section = SECTION_TEMPLATE.format(i=i, m=i % 50)
+        sections.append(section)
+        total += len(section)
+        i += 1
+    return head + "".join(sections) + tail
+
+
+def run_mode(page_path: Path, mode: str, chunk_kb: int) -> dict[str, float]:
+    from web2ru.assets.cache import AssetCache
+    from web2ru.config import RunConfig
+    from web2ru.models import OnlineRenderResult, ShadowDomStats
+    from web2ru.pipeline.offline_process import run_offline_process
+
+    html_dump = page_path.read_text(encoding="utf-8")
+    with tempfile.TemporaryDirectory() as tmp:
+        config = RunConfig(
+            url="https://bench.example/page",
+            output_root=Path(tmp),
+            scope="page",
+            fetch_missing_assets=False,
+            api_key=None,
+            stream_html=mode,
+            stream_chunk_kb=chunk_kb,
+        )
+        online = OnlineRenderResult(
+            final_url=config.url,
+            html_dump=html_dump,
+            shadow_dom=ShadowDomStats(enabled=False),
+            scroll_steps=0,
+            height_before=0,
+            height_after=0,
+        )
+        started = time.perf_counter()
+        result = run_offline_process(
+            config=config, online=online, asset_cache=AssetCache(), user_agent="bench"
+        )
+        elapsed = time.perf_counter() - started
+        parts = result.report["stats"]["parts_total"]
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"seconds": round(elapsed, 2), "peak_rss_mb": round(peak_kb / 1024, 1), "parts": parts}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=int, default=50)
+    parser.add_argument("--chunk-kb", type=int, default=1024)
+    parser.add_argument(
+        "--modes",
+        default="off,on",
+        help="Comma-separated stream_html modes to run; the in-memory path is slow on 50 MB pages",
+    )
+    parser.add_argument("--child", nargs=2, metavar=("PAGE", "MODE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        page_path, mode = args.child
+        print(json.dumps(run_mode(Path(page_path), mode, args.chunk_kb)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        page_path = Path(tmp) / "page.html"
+        page_path.write_text(build_page(args.size_mb), encoding="utf-8")
+        print(f"synthetic page: {page_path.stat().st_size / 1024 / 1024:.1f} MB")
+        for mode in args.modes.split(","):
+            out = subprocess.run(
+                [
+                    sys.executable,
+                    __file__,
+                    "--chunk-kb",
+                    str(args.chunk_kb),
+                    "--child",
+                    str(page_path),
+                    mode,
+                ],
+                check=True,
+                capture_output=True,
+                text=True,
+            )
+            label = "in-memory" if mode == "off" else f"streaming ({args.chunk_kb} KB chunks)"
+            print(f"{label:>28}: {out.stdout.strip()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+
+from lxml import etree
+
+from web2ru.apply.xml_sanitize import sanitize_xml_text
+
+_STEP_RE = re.compile(r"^([A-Za-z_][\w.-]*)(?:\[(\d+)\])?$")
+
+
+@dataclass(slots=True)
+class TextEdit:
+    """Replacement for ``[start, end)`` of a text/tail value; no offsets means the whole value."""
+
+    text: str
+    start: int | None = None
+    end: int | None = None
+
+
+@dataclass(slots=True)
+class NodeEdits:
+    whole: TextEdit | None = None
+    ranges: list[TextEdit] = field(default_factory=list)
+    applied: int = 0
+
+
+class EditList:
+    """Edits grouped per ``(xpath, field)`` so every node value is rebuilt and assigned once."""
+
+    def __init__(self) -> None:
+        self._edits: dict[tuple[str, str], NodeEdits] = {}
+
+    def __len__(self) -> int:
+        return len(self._edits)
+
+    def replace(self, xpath: str, field_name: str, text: str) -> None:
+        edits = self._edits.setdefault((xpath, field_name), NodeEdits())
+        # Later whole-value edits win, as sequential assignment would; each still counts.
+        edits.whole = TextEdit(text=sanitize_xml_text(text))
+        edits.applied += 1
+
+    def replace_range(self, xpath: str, field_name: str, start: int, end: int, text: str) -> None:
+        edits = self._edits.setdefault((xpath, field_name), NodeEdits())
+        edits.ranges.append(TextEdit(text=sanitize_xml_text(text), start=start, end=end))
+
+    def apply(self, root: etree._Element) -> int:
+        resolver = PathResolver(root)
+        applied = 0
+        for (xpath, field_name), edits in self._edits.items():
+            node = resolver.resolve(xpath)
+            if node is None:
+                continue
+            if edits.whole is not None:
+                current: str | None = edits.whole.text
+            else:
+                current = node.text if field_name == "text" else node.tail
+            applied += edits.applied
+            if edits.ranges and current is not None:
+                current, spans_applied = _splice(current, edits.ranges)
+                applied += spans_applied
+            elif edits.whole is None:
+                continue
+            if field_name == "text":
+                node.text = current
+            else:
+                node.tail = current
+        return applied
+
+
+def _splice(value: str, ranges: list[TextEdit]) -> tuple[str, int]:
+    # HTML text may hold characters XML forbids (a form feed in a code block), and lxml rejects
+    # the whole assignment then; the result is sanitized, not just the replacements.
+    pieces: list[str] = []
+    cursor = 0
+    applied = 0
+    for edit in sorted(ranges, key=lambda item: item.start or 0):
+        start = edit.start
+        end = edit.end
+        if start is None or end is None:
+            continue
+        if start < cursor or end > len(value) or start >= end:
+            continue
+        pieces.append(value[cursor:start])
+        pieces.append(edit.text)
+        cursor = end
+        applied += 1
+    if not applied:
+        return sanitize_xml_text(value), 0
+    pieces.append(value[cursor:])
+    return sanitize_xml_text("".join(pieces)), applied
+
+
+class PathResolver:
+    """Resolve `getpath`-style xpaths by walking cached child indexes instead of running XPath.
+
+    Paths with steps other than ``tag`` or ``tag[n]`` (namespaces, wildcards) go to lxml.
+    """
+
+    def __init__(self, root: etree._Element) -> None:
+        self._root = root
+        document_root = root.getroottree().getroot()
+        self._nodes: dict[str, etree._Element | None] = {
+            f"/{document_root.tag}": document_root if isinstance(document_root.tag, str) else None
+        }
+        self._children: dict[etree._Element, dict[str, list[etree._Element]]] = {}
+
+    def resolve(self, xpath: str) -> etree._Element | None:
+        if xpath in self._nodes:
+            return self._nodes[xpath]
+        steps: list[str] = []
+        prefix = xpath
+        while prefix not in self._nodes:
+            prefix, slash, step = prefix.rpartition("/")
+            if not slash or not prefix or _STEP_RE.match(step) is None:
+                return self._resolve_with_xpath(xpath)
+            steps.append(step)
+        node = self._nodes[prefix]
+        for step in reversed(steps):
+            prefix = f"{prefix}/{step}"
+            if node is not None:
+                node = self._child(node, step)
+            self._nodes[prefix] = node
+        return node
+
+    def _child(self, parent: etree._Element, step: str) -> etree._Element | None:
+        match = _STEP_RE.match(step)
+        assert match is not None
+        index = self._children.get(parent)
+        if index is None:
+            index = {}
+            for child in parent:
+                if isinstance(child.tag, str):
+                    index.setdefault(child.tag, []).append(child)
+            self._children[parent] = index
+        siblings = index.get(match.group(1), [])
+        position = int(match.group(2) or 1)
+        return siblings[position - 1] if 0 < position <= len(siblings) else None
+
+    def _resolve_with_xpath(self, xpath: str) -> etree._Element | None:
+        nodes = self._root.xpath(xpath)
+        node = nodes[0] if isinstance(nodes, list) and nodes else None
+        resolved = node if isinstance(node, etree._Element) else None
+        self._nodes[xpath] = resolved
+        return resolved
@@ -1,18 +1,42 @@
 from __future__ import annotations
 
+import hashlib
+import os
+import posixpath
+import shutil
+import tempfile
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
 from dataclasses import dataclass, field
 from pathlib import Path
 from urllib.parse import urldefrag
 
-from web2ru.assets.pathing import asset_relative_path
-from web2ru.models import AssetRecord
+from web2ru.assets.css_cache import CssRewriteCache
+from web2ru.assets.pathing import asset_relative_path, scannable_kind
+from web2ru.assets.store import AssetStore, StoredAsset
+from web2ru.models import AssetRecord, AssetWriteStats
 from web2ru.utils import sha256_bytes
 
+# Bodies at or above this size are kept on disk instead of in AssetRecord.inline.
+SPILL_THRESHOLD_BYTES = 256 * 1024
+
 
 @dataclass(slots=True)
 class AssetCache:
     records: dict[str, AssetRecord] = field(default_factory=dict)
     url_to_local: dict[str, str] = field(default_factory=dict)
+    store: AssetStore | None = None
+    css_rewrites: CssRewriteCache = field(default_factory=CssRewriteCache)
+    spill_threshold: int = SPILL_THRESHOLD_BYTES
+    # Shared content-addressed directory (one per surf session); page assets are hard links into it.
+    blob_dir: Path | None = None
+    write_stats: AssetWriteStats = field(default_factory=AssetWriteStats)
+    write_workers: int = 1  # threads for write_to_output; more only pay off on network filesystems
+    _spill_dir: tempfile.TemporaryDirectory[str] | None = field(default=None, repr=False)
+    _rel_by_content: dict[tuple[str, str], str] = field(default_factory=dict, repr=False)
+    # Spill files that are hard links to store blobs: copied into the output, never linked.
+    _store_links: set[Path] = field(default_factory=set, repr=False)
 
     def _normalize_key(self, url: str) -> str:
         no_frag, _ = urldefrag(url)
@@ -33,22 +57,78 @@ class AssetCache:
         data: bytes,
         source: str,
         max_asset_mb: int,
+        http_headers: Mapping[str, str] | None = None,
+        sha256: str | None = None,
     ) -> bool:
+        """Keep ``data`` for this run; with ``http_headers`` it is also written to the store.
+
+        Large bodies are not retained in memory: they point at a spill file that lives until
+        `close`, hard-linked to the store blob when one was written. Callers that hashed the
+        body while streaming it pass ``sha256`` to skip a second pass.
+        """
         if len(data) > max_asset_mb * 1024 * 1024:
             return False
         key = self._normalize_key(url)
-        digest = sha256_bytes(data)
-        self.records[key] = AssetRecord(
+        digest = sha256 or sha256_bytes(data)
+        stored: StoredAsset | None = None
+        if self.store is not None and http_headers is not None:
+            stored = self.store.put(
+                url=key,
+                final_url=self._normalize_key(final_url),
+                content_type=content_type,
+                data=data,
+                headers=http_headers,
+                sha256=digest,
+            )
+        record = AssetRecord(
             url=key,
             final_url=self._normalize_key(final_url),
             content_type=content_type,
             size=len(data),
             sha256=digest,
-            data=data,
             source=source,
         )
+        if len(data) < self.spill_threshold:
+            record.inline = data
+        else:
+            record.path = None
+            if stored is not None:
+                with suppress(OSError):  # evicted already, e.g. by a concurrent page build
+                    record.path = self._adopt(stored)
+            if record.path is None:
+                record.path = self._spill(digest, data)
+        self.records[key] = record
         return True
 
+    def put_stored(self, *, url: str, stored: StoredAsset, max_asset_mb: int) -> bool:
+        """Reference a store blob without reading it."""
+        if stored.size > max_asset_mb * 1024 * 1024:
+            return False
+        try:
+            path = self._adopt(stored)
+        except OSError:
+            return False
+        key = self._normalize_key(url)
+        self.records[key] = AssetRecord(
+            url=key,
+            final_url=self._normalize_key(stored.final_url),
+            content_type=stored.content_type,
+            size=stored.size,
+            sha256=stored.sha256,
+            source="asset_store",
+            path=path,
+        )
+        return True
+
+    def close(self) -> None:
+        if self.store is not None:
+            self.store.close()
+        self.css_rewrites.close()
+        if self._spill_dir is not None:
+            self._spill_dir.cleanup()
+            self._spill_dir = None
+        self._store_links.clear()
+
     def ensure_local_mapping(self, url: str) -> str:
         key = self._normalize_key(url)
         if key in self.url_to_local:
@@ -63,19 +143,174 @@ class AssetCache:
                 content_type=None,
                 size=0,
                 sha256=sha256_bytes(key.encode("utf-8")),
-                data=b"",
                 source="missing",
             )
             rel = asset_relative_path(fake)
             self.url_to_local[key] = rel
             return rel
         rel = asset_relative_path(record)
+        # URLs with identical bytes (query variants, redirects, CDN mirrors) share one output file
+        # as long as the extension, which decides the served content type, agrees. Stylesheets
+        # and SVGs are rewritten relative to their own URL later, so equal bytes now do not mean
+        # equal output.
+        if scannable_kind(record) is None:
+            content_key = (record.sha256, posixpath.splitext(rel)[1])
+            rel = self._rel_by_content.setdefault(content_key, rel)
         self.url_to_local[key] = rel
         return rel
 
+    def drop_unreferenced(self, urls: set[str]) -> int:
+        """Forget records of ``urls`` that nothing mapped to a local path; call before writing."""
+        dropped = 0
+        for url in urls:
+            key = self._normalize_key(url)
+            if key in self.records and key not in self.url_to_local:
+                del self.records[key]
+                dropped += 1
+        return dropped
+
+    def ensure_relative_mapping(self, url: str, *, from_url: str) -> str:
+        """Local path of ``url`` relative to the output file of ``from_url`` (a stylesheet or SVG)."""
+        target = self.ensure_local_mapping(url)
+        origin = self.ensure_local_mapping(from_url)
+        return posixpath.relpath(target, posixpath.dirname(origin))
+
     def write_to_output(self, output_dir: Path) -> None:
+        """Write every record to its local path under ``output_dir``.
+
+        Targets are planned up front and their directories created once. With ``write_workers``
+        above 1 the files are written by a thread pool, which hides per-file latency on network
+        filesystems; on local disks serial writing is faster. A file already present with the
+        record's hash is left alone.
+        """
+        jobs: list[tuple[Path, AssetRecord]] = []
+        seen: set[str] = set()
         for key, record in self.records.items():
             rel = self.ensure_local_mapping(key)
-            target = output_dir / rel.lstrip("./")
-            target.parent.mkdir(parents=True, exist_ok=True)
+            if rel in seen:
+                self.write_stats.deduplicated += 1
+                continue
+            seen.add(rel)
+            jobs.append((output_dir / rel.lstrip("./"), record))
+        for directory in sorted({target.parent for target, _ in jobs}):
+            directory.mkdir(parents=True, exist_ok=True)
+
+        workers = max(1, self.write_workers)
+        if workers == 1 or len(jobs) < 2:
+            workers = 1
+            outcomes = [self._write_file(target, record) for target, record in jobs]
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="asset-write") as pool:
+                outcomes = list(pool.map(lambda job: self._write_file(*job), jobs))
+
+        stats = self.write_stats
+        stats.workers = max(stats.workers, workers)
+        for (_, record), (outcome, blob_reused) in zip(jobs, outcomes, strict=True):
+            if outcome == "existing":
+                stats.existing += 1
+                continue
+            stats.files += 1
+            stats.bytes += record.size
+            if outcome == "linked":
+                stats.linked += 1
+            if blob_reused:
+                stats.blob_reused += 1
+
+    def _write_file(self, target: Path, record: AssetRecord) -> tuple[str, bool]:
+        """Returns ``(existing|linked|copied|written, shared blob reused)``."""
+        if target.exists():
+            if _file_matches(target, record):
+                return "existing", False
+            # Never write through the old file: it may be a hard link to a blob or spill file.
+            target.unlink()
+        if self.blob_dir is not None:
+            blob, reused = self._shared_blob(record)
+            return _link_outcome(_link_or_copy(blob, target, hard_link=True)), reused
+        if record.inline is not None or record.path is None:
             target.write_bytes(record.data)
+            return "written", False
+        linked = _link_or_copy(record.path, target, hard_link=self._owns(record.path))
+        return _link_outcome(linked), False
+
+    def _owns(self, path: Path) -> bool:
+        # Spill files are ours to share; links to store blobs are copied so editing an output
+        # file cannot corrupt the cache.
+        return (
+            self._spill_dir is not None
+            and path.parent == Path(self._spill_dir.name)
+            and path not in self._store_links
+        )
+
+    def _shared_blob(self, record: AssetRecord) -> tuple[Path, bool]:
+        assert self.blob_dir is not None
+        blob = self.blob_dir / record.sha256[:2] / record.sha256
+        if blob.exists():
+            return blob, True
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        # Concurrent page builds may race for the same blob; publish it atomically.
+        fd, tmp_name = tempfile.mkstemp(dir=blob.parent, prefix=".tmp-")
+        os.close(fd)
+        tmp = Path(tmp_name)
+        try:
+            if record.inline is not None or record.path is None:
+                tmp.write_bytes(record.data)
+            else:
+                tmp.unlink()
+                _link_or_copy(record.path, tmp, hard_link=self._owns(record.path))
+            os.replace(tmp, blob)
+        finally:
+            tmp.unlink(missing_ok=True)
+        return blob, False
+
+    def _spill(self, digest: str, data: bytes) -> Path:
+        path = self._spill_path(digest)
+        if not path.exists():
+            path.write_bytes(data)
+        return path
+
+    def _adopt(self, stored: StoredAsset) -> Path:
+        """Spill path holding the blob of ``stored``; raises OSError if the blob is gone.
+
+        The store evicts least-recently-used blobs after every put, from this run or another
+        one sharing the directory, so records never point into it: a hard link (or copy) keeps
+        the bytes until `close`.
+        """
+        path = self._spill_path(stored.sha256)
+        if not path.exists() and _link_or_copy(stored.blob_path, path, hard_link=True):
+            self._store_links.add(path)
+        return path
+
+    def _spill_path(self, digest: str) -> Path:
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.TemporaryDirectory(prefix="web2ru-assets-")
+        return Path(self._spill_dir.name) / digest
+
+
+def _file_matches(path: Path, record: AssetRecord) -> bool:
+    try:
+        if path.stat().st_size != record.size:
+            return False
+        digest = hashlib.sha256()
+        with path.open("rb") as handle:
+            while chunk := handle.read(1024 * 1024):
+                digest.update(chunk)
+    except OSError:
+        return False
+    return digest.hexdigest() == record.sha256
+
+
+def _link_outcome(linked: int) -> str:
+    return "linked" if linked else "copied"
+
+
+def _link_or_copy(source: Path, target: Path, *, hard_link: bool) -> int:
+    """Returns 1 when ``target`` became a hard link, 0 when it was copied."""
+    if hard_link:
+        try:
+            os.link(source, target)
+            return 1
+        except OSError:
+            pass
+    # copyfile uses copy_file_range/sendfile, which reflinks on filesystems that support it.
+    shutil.copyfile(source, target)
+    return 0
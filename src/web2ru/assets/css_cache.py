@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+from web2ru.assets.css_parse import (
+    DEFAULT_PARSE_CACHE,
+    CssUrlRef,
+    ParsedCss,
+    css_content_key,
+    splice_refs,
+)
+from web2ru.assets.scan import normalize_url
+
+# Rewritten sheets kept in memory for the whole process (surf pages share their bundles).
+MEMORY_BUDGET_CHARS = 64 * 1024 * 1024
+# Rows kept in the on-disk cache; the least recently used are dropped past this.
+DISK_MAX_ROWS = 4000
+
+
+@dataclass(slots=True)
+class CssRewriteStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    refs_from_disk: int = 0
+
+    def as_report(self) -> dict[str, int]:
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "refs_from_disk": self.refs_from_disk,
+        }
+
+
+class _MemoryLayer:
+    def __init__(self, budget_chars: int) -> None:
+        self._budget = budget_chars
+        self._used = 0
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: str) -> None:
+        if len(value) > self._budget:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._used -= len(previous)
+            self._entries[key] = value
+            self._used += len(value)
+            while self._used > self._budget:
+                _, dropped = self._entries.popitem(last=False)
+                self._used -= len(dropped)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._used = 0
+
+
+_MEMORY = _MemoryLayer(MEMORY_BUDGET_CHARS)
+
+
+class CssRewriteCache:
+    """Rewritten stylesheets keyed by (content sha256, base URL, digest of the URL mapping).
+
+    The mapping digest covers the local path every reference maps to, so a hit is byte-identical
+    to rewriting again. Results live in a process-wide memory layer; with ``db_path`` they and
+    each sheet's URL offsets are also kept on disk, so later runs skip the tinycss2 parse too.
+    """
+
+    def __init__(self, db_path: Path | None = None, *, max_rows: int = DISK_MAX_ROWS) -> None:
+        self.stats = CssRewriteStats()
+        self._max_rows = max_rows
+        self._conn: sqlite3.Connection | None = None
+        if db_path is not None:
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(db_path, timeout=30.0)
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS css_refs (
+                    content_key TEXT PRIMARY KEY,
+                    refs TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS css_rewrites (
+                    cache_key TEXT PRIMARY KEY,
+                    content_key TEXT NOT NULL,
+                    css BLOB NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS css_rewrites_last_access
+                    ON css_rewrites (last_access);
+                """
+            )
+            self._conn.commit()
+
+    def rewrite(self, css_text: str, *, css_base_url: str, map_url: Callable[[str], str]) -> str:
+        content_key = css_content_key(css_text)
+        refs = self._refs(css_text, content_key)
+        replacements: list[str | None] = []
+        for ref in refs:
+            normalized = normalize_url(css_base_url, ref.value)
+            replacements.append(map_url(normalized) if normalized else None)
+        cache_key = _rewrite_key(content_key, css_base_url, replacements)
+
+        cached = _MEMORY.get(cache_key)
+        if cached is not None:
+            self.stats.memory_hits += 1
+            return cached
+        cached = self._load_rewrite(cache_key)
+        if cached is not None:
+            self.stats.disk_hits += 1
+            _MEMORY.put(cache_key, cached)
+            return cached
+
+        self.stats.misses += 1
+        rewritten = splice_refs(css_text, refs, replacements)
+        _MEMORY.put(cache_key, rewritten)
+        self._store_rewrite(cache_key, content_key, rewritten)
+        return rewritten
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _refs(self, css_text: str, content_key: str) -> tuple[CssUrlRef, ...]:
+        parsed = DEFAULT_PARSE_CACHE.get(content_key)
+        if parsed is not None:
+            return parsed.refs
+        if self._conn is not None:
+            row = self._conn.execute(
+                "SELECT refs FROM css_refs WHERE content_key = ?", (content_key,)
+            ).fetchone()
+            if row is not None:
+                parsed = ParsedCss(refs=tuple(CssUrlRef(*item) for item in json.loads(row[0])))
+                DEFAULT_PARSE_CACHE.remember(content_key, parsed)
+                self.stats.refs_from_disk += 1
+                return parsed.refs
+        parsed = DEFAULT_PARSE_CACHE.parse(css_text, key=content_key)
+        if self._conn is not None:
+            payload = [[ref.start, ref.end, ref.value, ref.kind] for ref in parsed.refs]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO css_refs (content_key, refs) VALUES (?, ?)",
+                (content_key, json.dumps(payload, ensure_ascii=False)),
+            )
+            self._conn.commit()
+        return parsed.refs
+
+    def _load_rewrite(self, cache_key: str) -> str | None:
+        if self._conn is None:
+            return None
+        row = self._conn.execute(
+            "SELECT css FROM css_rewrites WHERE cache_key = ?", (cache_key,)
+        ).fetchone()
+        if row is None:
+            return None
+        self._conn.execute(
+            "UPDATE css_rewrites SET last_access = ? WHERE cache_key = ?", (time.time(), cache_key)
+        )
+        self._conn.commit()
+        return bytes(row[0]).decode("utf-8", errors="surrogatepass")
+
+    def _store_rewrite(self, cache_key: str, content_key: str, rewritten: str) -> None:
+        if self._conn is None:
+            return
+        self._conn.execute(
+            """
+            INSERT OR REPLACE INTO css_rewrites (cache_key, content_key, css, last_access)
+            VALUES (?, ?, ?, ?)
+            """,
+            (
+                cache_key,
+                content_key,
+                rewritten.encode("utf-8", errors="surrogatepass"),
+                time.time(),
+            ),
+        )
+        self._conn.execute(
+            """
+            DELETE FROM css_rewrites WHERE cache_key IN (
+                SELECT cache_key FROM css_rewrites ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self._max_rows,),
+        )
+        self._conn.commit()
+
+
+def open_css_rewrite_cache(*, cache_dir: Path, enabled: bool) -> CssRewriteCache:
+    return CssRewriteCache(cache_dir / "css_rewrites.sqlite3" if enabled else None)
+
+
+def clear_memory_layers() -> None:
+    """Drop the process-wide parse and rewrite memory (benchmarks and tests)."""
+    _MEMORY.clear()
+    DEFAULT_PARSE_CACHE.clear()
+
+
+def _rewrite_key(content_key: str, base_url: str, replacements: list[str | None]) -> str:
+    hasher = hashlib.sha256()
+    hasher.update(content_key.encode("ascii"))
+    hasher.update(b"\0")
+    hasher.update(base_url.encode("utf-8", errors="surrogatepass"))
+    for mapped in replacements:
+        # \1 marks a reference left as is, distinct from any mapped path.
+        encoded = b"\1" if mapped is None else mapped.encode("utf-8", errors="surrogatepass")
+        hasher.update(b"\0" + encoded)
+    return hasher.hexdigest()
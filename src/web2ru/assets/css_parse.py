@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from collections.abc import Callable, Iterator, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+import tinycss2
+
+# Parsed stylesheets kept by content hash; the same sheet is scanned, then rewritten, and
+# surf pages share most of their CSS.
+PARSE_CACHE_ENTRIES = 2048
+
+
+@dataclass(slots=True, frozen=True)
+class CssUrlRef:
+    """One URL reference in a CSS text; ``start``/``end`` index the original string."""
+
+    start: int
+    end: int
+    value: str
+    # "url" for url(...) tokens, "import" for a bare string `@import "x.css"` target.
+    kind: str
+
+
+@dataclass(slots=True, frozen=True)
+class ParsedCss:
+    refs: tuple[CssUrlRef, ...]
+
+
+class CssParseCache:
+    def __init__(self, max_entries: int = PARSE_CACHE_ENTRIES) -> None:
+        self._max_entries = max_entries
+        self._entries: OrderedDict[str, ParsedCss] = OrderedDict()
+        # Surf pages are built on server threads.
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def parse(self, css_text: str, *, key: str | None = None) -> ParsedCss:
+        key = key or css_content_key(css_text)
+        parsed = self.get(key)
+        if parsed is not None:
+            return parsed
+        parsed = ParsedCss(refs=tuple(_find_refs(css_text)))
+        self.remember(key, parsed)
+        return parsed
+
+    def get(self, key: str) -> ParsedCss | None:
+        with self._lock:
+            parsed = self._entries.get(key)
+            if parsed is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return parsed
+
+    def remember(self, key: str, parsed: ParsedCss) -> None:
+        with self._lock:
+            self._entries[key] = parsed
+            if len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+DEFAULT_PARSE_CACHE = CssParseCache()
+
+
+def css_content_key(css_text: str) -> str:
+    return hashlib.sha256(css_text.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+
+def parse_css(css_text: str, *, key: str | None = None) -> ParsedCss:
+    """URL references of a stylesheet, declaration list or inline style, parsed once per content."""
+    return DEFAULT_PARSE_CACHE.parse(css_text, key=key)
+
+
+def splice_css_urls(css_text: str, *, map_url: Callable[[str], str | None]) -> str:
+    """Replace every reference ``map_url`` maps; all other bytes of ``css_text`` stay as they are.
+
+    ``map_url`` receives the raw value and the URL is left alone when it returns None.
+    """
+    refs = parse_css(css_text).refs
+    return splice_refs(css_text, refs, [map_url(ref.value) for ref in refs])
+
+
+def splice_refs(
+    css_text: str, refs: Sequence[CssUrlRef], replacements: Sequence[str | None]
+) -> str:
+    """Write ``replacements[i]`` over ``refs[i]``; None keeps the original reference."""
+    out: list[str] = []
+    last = 0
+    for ref, mapped in zip(refs, replacements, strict=True):
+        if mapped is None:
+            continue
+        out.append(css_text[last : ref.start])
+        out.append(f'url("{mapped}")' if ref.kind == "url" else f'"{mapped}"')
+        last = ref.end
+    if not out:
+        return css_text
+    out.append(css_text[last:])
+    return "".join(out)
+
+
+def _find_refs(css_text: str) -> Iterator[CssUrlRef]:
+    # tinycss2 reports positions in its preprocessed text, where CRLF became LF; every other
+    # substitution keeps the length, so offsets map back through the removed CRs.
+    text = (
+        css_text.replace("\0", "\ufffd")
+        .replace("\r\n", "\n")
+        .replace("\r", "\n")
+        .replace("\f", "\n")
+    )
+    shifts = _crlf_shifts(css_text) if len(text) != len(css_text) else []
+    line_starts = [0]
+    newline = text.find("\n")
+    while newline != -1:
+        line_starts.append(newline + 1)
+        newline = text.find("\n", newline + 1)
+
+    def offset(token: Any) -> int:
+        return line_starts[int(token.source_line) - 1] + int(token.source_column) - 1
+
+    def original(pos: int) -> int:
+        return pos + bisect_left(shifts, pos) if shifts else pos
+
+    tokens = tinycss2.parse_component_value_list(text, skip_comments=True)
+    for start, end, value, kind in _walk(tokens, text, offset):
+        yield CssUrlRef(start=original(start), end=original(end), value=value, kind=kind)
+
+
+def _walk(
+    tokens: Sequence[Any], text: str, offset: Callable[[Any], int]
+) -> Iterator[tuple[int, int, str, str]]:
+    after_import = False
+    for token in tokens:
+        ttype = token.type
+        if ttype == "whitespace":
+            continue
+        if after_import:
+            after_import = False
+            if ttype == "string":
+                start = offset(token)
+                yield start, _string_end(text, start), token.value, "import"
+                continue
+        if ttype == "at-keyword" and token.lower_value == "import":
+            after_import = True
+        elif ttype == "url":
+            start = offset(token)
+            yield start, _url_end(text, text.index("(", start) + 1), token.value, "url"
+        elif ttype == "function":
+            if token.lower_name == "url":
+                raw = _function_url_value(token.arguments)
+                if raw:
+                    start = offset(token)
+                    yield start, _url_end(text, text.index("(", start) + 1), raw, "url"
+            else:
+                yield from _walk(token.arguments, text, offset)
+        elif ttype in {"() block", "[] block", "{} block"}:
+            yield from _walk(token.content, text, offset)
+
+
+def _function_url_value(arguments: Sequence[Any]) -> str:
+    significant = [arg for arg in arguments if arg.type != "whitespace"]
+    if len(significant) == 1 and significant[0].type == "string":
+        return str(significant[0].value)
+    return str(tinycss2.serialize(arguments)).strip().strip("\"'")
+
+
+def _url_end(text: str, pos: int) -> int:
+    """Index just past the ``)`` closing a url( whose argument starts at ``pos``."""
+    length = len(text)
+    while pos < length and text[pos] in " \t\n":
+        pos += 1
+    if pos < length and text[pos] in "\"'":
+        pos = _string_end(text, pos)
+    while pos < length:
+        char = text[pos]
+        if char == "\\":
+            pos += 2
+            continue
+        if char == ")":
+            return pos + 1
+        pos += 1
+    return length
+
+
+def _string_end(text: str, pos: int) -> int:
+    quote = text[pos]
+    pos += 1
+    length = len(text)
+    while pos < length:
+        char = text[pos]
+        if char == "\\":
+            pos += 2
+            continue
+        if char == quote:
+            return pos + 1
+        if char == "\n":
+            return pos
+        pos += 1
+    return length
+
+
+def _crlf_shifts(css_text: str) -> list[int]:
+    """Preprocessed positions of the LFs that were CRLF in the original text."""
+    shifts: list[int] = []
+    removed = 0
+    pos = css_text.find("\r\n")
+    while pos != -1:
+        shifts.append(pos - removed)
+        removed += 1
+        pos = css_text.find("\r\n", pos + 2)
+    return shifts
@@ -1,11 +1,26 @@
 from __future__ import annotations
 
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
+import hashlib
+import importlib.util
+from collections.abc import Coroutine
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from typing import Any, TypeVar
+from urllib.parse import urlsplit
 
 import httpx
 
 from web2ru.assets.cache import AssetCache
+from web2ru.assets.store import StoredAsset
+
+# httpx speaks HTTP/2 only with the optional `h2` package (`pip install web2ru[http2]`).
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+_TRANSIENT_STATUS = frozenset({408, 425, 429, 500, 502, 503, 504})
+_RETRY_BASE_SECONDS = 0.25
+_RETRY_AFTER_CAP_SECONDS = 5.0
+
+_T = TypeVar("_T")
 
 
 @dataclass(slots=True)
@@ -21,6 +36,10 @@ class _FetchOutcome:
     final_url: str | None = None
     content_type: str | None = None
     data: bytes | None = None
+    sha256: str | None = None
+    headers: dict[str, str] | None = None
+    not_modified: bool = False
+    retry_after: float | None = None
 
 
 def fetch_missing_assets(
@@ -32,14 +51,26 @@ def fetch_missing_assets(
     max_asset_mb: int,
     enabled: bool,
     timeout_seconds: float = 20.0,
-    max_workers: int = 6,
+    max_connections: int = 32,
+    per_host_limit: int = 6,
+    max_retries: int = 2,
+    transport: httpx.AsyncBaseTransport | None = None,
 ) -> list[MissingAsset]:
     missing: list[MissingAsset] = []
     to_fetch: list[str] = []
+    stored_by_url: dict[str, StoredAsset] = {}
 
     for url in sorted(needed_urls):
         if asset_cache.has(url):
             continue
+        stored = asset_cache.store.lookup(url) if asset_cache.store is not None else None
+        if stored is not None:
+            # Without network access a stale copy still beats a broken link.
+            if (stored.is_fresh() or not enabled) and asset_cache.put_stored(
+                url=url, stored=stored, max_asset_mb=max_asset_mb
+            ):
+                continue
+            stored_by_url[url] = stored
         if not enabled:
             missing.append(MissingAsset(url=url, reason="disabled"))
             continue
@@ -48,25 +79,33 @@ def fetch_missing_assets(
     if not to_fetch:
         return missing
 
-    with httpx.Client(
-        follow_redirects=True,
-        timeout=timeout_seconds,
-        headers={"User-Agent": user_agent, "Referer": final_url},
-    ) as client:
-        if len(to_fetch) <= 1:
-            outcomes = [_fetch_one(client, to_fetch[0])]
-        else:
-            worker_count = max(1, min(max_workers, len(to_fetch)))
-            outcomes = []
-            with ThreadPoolExecutor(max_workers=worker_count) as executor:
-                futures = [executor.submit(_fetch_one, client, url) for url in to_fetch]
-                for future in as_completed(futures):
-                    outcomes.append(future.result())
+    validators = {url: stored.validator_headers() for url, stored in stored_by_url.items()}
+    outcomes = _run_coroutine(
+        _fetch_all(
+            to_fetch,
+            validators,
+            headers={"User-Agent": user_agent, "Referer": final_url},
+            timeout_seconds=timeout_seconds,
+            limit_bytes=max_asset_mb * 1024 * 1024,
+            max_connections=max_connections,
+            per_host_limit=per_host_limit,
+            max_retries=max_retries,
+            transport=transport,
+        )
+    )
 
     for outcome in sorted(outcomes, key=lambda item: item.url):
         if outcome.reason is not None:
             missing.append(MissingAsset(url=outcome.url, reason=outcome.reason))
             continue
+        stored = stored_by_url.get(outcome.url)
+        if outcome.not_modified and stored is not None and asset_cache.store is not None:
+            asset_cache.store.refresh(stored, outcome.headers or {})
+            if not asset_cache.put_stored(
+                url=outcome.url, stored=stored, max_asset_mb=max_asset_mb
+            ):
+                missing.append(MissingAsset(url=outcome.url, reason="error:store_read"))
+            continue
         if outcome.data is None or outcome.final_url is None:
             missing.append(MissingAsset(url=outcome.url, reason="error:empty_response"))
             continue
@@ -77,6 +116,8 @@ def fetch_missing_assets(
             data=outcome.data,
             source="fetch_missing",
             max_asset_mb=max_asset_mb,
+            http_headers=outcome.headers,
+            sha256=outcome.sha256,
         )
         if not ok:
             missing.append(MissingAsset(url=outcome.url, reason="size_limit"))
@@ -84,19 +125,135 @@ def fetch_missing_assets(
     return missing
 
 
-def _fetch_one(client: httpx.Client, url: str) -> _FetchOutcome:
+def _run_coroutine(coro: Coroutine[Any, Any, _T]) -> _T:
     try:
-        response = client.get(url)
-    except Exception as exc:  # noqa: BLE001 - keep pipeline resilient
-        return _FetchOutcome(url=url, reason=f"error:{type(exc).__name__}")
-
-    if response.status_code >= 400:
-        return _FetchOutcome(url=url, reason=f"http_{response.status_code}")
-
-    return _FetchOutcome(
-        url=url,
-        reason=None,
-        final_url=str(response.url),
-        content_type=response.headers.get("content-type"),
-        data=response.content,
-    )
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    # Called from inside a running loop (embedding); give the fetch its own loop and thread.
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
+async def _fetch_all(
+    urls: list[str],
+    validators: dict[str, dict[str, str]],
+    *,
+    headers: dict[str, str],
+    timeout_seconds: float,
+    limit_bytes: int,
+    max_connections: int,
+    per_host_limit: int,
+    max_retries: int,
+    transport: httpx.AsyncBaseTransport | None,
+) -> list[_FetchOutcome]:
+    host_slots: dict[str, asyncio.Semaphore] = {}
+
+    async with httpx.AsyncClient(
+        follow_redirects=True,
+        timeout=timeout_seconds,
+        headers=headers,
+        http2=HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=max_connections, max_keepalive_connections=max_connections
+        ),
+        transport=transport,
+    ) as client:
+
+        async def fetch(url: str) -> _FetchOutcome:
+            host = urlsplit(url).netloc.lower()
+            slots = host_slots.setdefault(host, asyncio.Semaphore(per_host_limit))
+            async with slots:
+                return await _fetch_with_retries(
+                    client,
+                    url,
+                    validators.get(url, {}),
+                    limit_bytes=limit_bytes,
+                    max_retries=max_retries,
+                )
+
+        return list(await asyncio.gather(*(fetch(url) for url in urls)))
+
+
+async def _fetch_with_retries(
+    client: httpx.AsyncClient,
+    url: str,
+    validators: dict[str, str],
+    *,
+    limit_bytes: int,
+    max_retries: int,
+) -> _FetchOutcome:
+    attempt = 0
+    while True:
+        try:
+            outcome = await _fetch_one(client, url, validators, limit_bytes=limit_bytes)
+        except httpx.TransportError as exc:
+            # Connect/read timeouts, resets and protocol errors are worth another try.
+            outcome = _FetchOutcome(url=url, reason=f"error:{type(exc).__name__}")
+            outcome.retry_after = _RETRY_BASE_SECONDS * (2**attempt)
+        except Exception as exc:  # noqa: BLE001 - keep pipeline resilient
+            return _FetchOutcome(url=url, reason=f"error:{type(exc).__name__}")
+        if outcome.retry_after is None or attempt >= max_retries:
+            return outcome
+        await asyncio.sleep(outcome.retry_after)
+        attempt += 1
+
+
+async def _fetch_one(
+    client: httpx.AsyncClient,
+    url: str,
+    validators: dict[str, str],
+    *,
+    limit_bytes: int,
+) -> _FetchOutcome:
+    async with client.stream("GET", url, headers=validators or None) as response:
+        if response.status_code == 304 and validators:
+            return _FetchOutcome(
+                url=url, reason=None, headers=dict(response.headers), not_modified=True
+            )
+        if response.status_code >= 400:
+            outcome = _FetchOutcome(url=url, reason=f"http_{response.status_code}")
+            if response.status_code in _TRANSIENT_STATUS:
+                outcome.retry_after = _retry_after_seconds(response.headers.get("retry-after"))
+            return outcome
+        if _declared_length(response.headers) > limit_bytes:
+            return _FetchOutcome(url=url, reason="size_limit")
+
+        hasher = hashlib.sha256()
+        chunks: list[bytes] = []
+        received = 0
+        async for chunk in response.aiter_bytes():
+            received += len(chunk)
+            if received > limit_bytes:
+                # Leaving the stream context closes the connection mid-body.
+                return _FetchOutcome(url=url, reason="size_limit")
+            hasher.update(chunk)
+            chunks.append(chunk)
+
+        return _FetchOutcome(
+            url=url,
+            reason=None,
+            final_url=str(response.url),
+            content_type=response.headers.get("content-type"),
+            data=b"".join(chunks),
+            sha256=hasher.hexdigest(),
+            headers=dict(response.headers),
+        )
+
+
+def _declared_length(headers: httpx.Headers) -> int:
+    if headers.get("content-encoding"):
+        # The length is of the encoded body; the decoded size is checked while streaming.
+        return 0
+    try:
+        return int(headers.get("content-length") or 0)
+    except ValueError:
+        return 0
+
+
+def _retry_after_seconds(value: str | None) -> float:
+    try:
+        seconds = float(value) if value else _RETRY_BASE_SECONDS
+    except ValueError:
+        seconds = _RETRY_BASE_SECONDS
+    return min(max(seconds, 0.0), _RETRY_AFTER_CAP_SECONDS)
@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import io
+import logging
+import os
+import re
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from importlib.util import find_spec
+from pathlib import Path, PurePosixPath
+from urllib.parse import urlparse
+
+from lxml import etree
+
+from web2ru.assets.cache import AssetCache
+from web2ru.utils import sha256_bytes
+
+FONTTOOLS_AVAILABLE = find_spec("fontTools") is not None
+# Printable ASCII is always kept: digits and punctuation are cheap and often produced by CSS
+# (counters, list markers) rather than by text in the DOM.
+ALWAYS_KEPT = frozenset(range(0x20, 0x7F))
+# The Russian alphabet; a text font without it renders translated pages in a fallback font.
+RUSSIAN_CODEPOINTS = frozenset([*range(0x0410, 0x0450), 0x0401, 0x0451])
+
+_FONT_TYPES = frozenset(
+    {
+        "font/woff",
+        "font/woff2",
+        "font/ttf",
+        "font/otf",
+        "font/sfnt",
+        "application/font-woff",
+        "application/font-woff2",
+        "application/font-sfnt",
+        "application/x-font-woff",
+        "application/x-font-ttf",
+        "application/x-font-opentype",
+        "application/vnd.ms-opentype",
+    }
+)
+_FONT_SUFFIXES = frozenset({".woff", ".woff2", ".ttf", ".otf"})
+_SKIPPED_TEXT_TAGS = frozenset({"script", "style", "noscript", "template"})
+_CSS_CONTENT_RE = re.compile(r"""content\s*:\s*(?:"((?:[^"\\]|\\.)*)"|'((?:[^'\\]|\\.)*)')""")
+_CSS_ESCAPE_RE = re.compile(r"\\([0-9a-fA-F]{1,6})\s?|\\(.)")
+
+
+@dataclass(slots=True, frozen=True)
+class FontSubsetOptions:
+    enabled: bool = False
+    workers: int = 0  # 1 = serial, 0 = one per CPU
+
+
+@dataclass(slots=True)
+class FontSubsetStats:
+    enabled: bool = False
+    workers: int = 1
+    codepoints: int = 0
+    fonts: int = 0
+    subset: int = 0
+    # Icon fonts (no Latin or Cyrillic letters) map private codepoints and are left whole.
+    icon_fonts: int = 0
+    failed: int = 0
+    bytes_before: int = 0
+    bytes_after: int = 0
+    without_cyrillic: list[str] = field(default_factory=list)
+    skipped_reason: str | None = None
+
+    def as_report(self) -> dict[str, object]:
+        return {
+            "enabled": self.enabled,
+            "workers": self.workers,
+            "codepoints": self.codepoints,
+            "fonts": self.fonts,
+            "subset": self.subset,
+            "icon_fonts": self.icon_fonts,
+            "failed": self.failed,
+            "bytes_before": self.bytes_before,
+            "bytes_after": self.bytes_after,
+            "bytes_saved": self.bytes_before - self.bytes_after,
+            "without_cyrillic": self.without_cyrillic,
+            "skipped_reason": self.skipped_reason,
+        }
+
+
+@dataclass(slots=True)
+class _Job:
+    key: str
+    data: bytes | None
+    path: str | None
+    codepoints: frozenset[int]
+
+
+@dataclass(slots=True)
+class _Result:
+    status: str  # subset|kept|icon|failed
+    data: bytes = b""
+    has_cyrillic: bool = True
+
+
+def document_codepoints(root: etree._Element) -> set[int]:
+    """Characters the page can show: text outside scripts/styles and every attribute value.
+
+    Both cases of every character are kept, since ``text-transform`` and ``small-caps`` render
+    glyphs that are not in the DOM (an uppercase nav label written in lowercase).
+    """
+    chars: set[str] = set()
+    for element in root.iter():
+        if isinstance(element.tag, str):
+            if element.tag.lower() not in _SKIPPED_TEXT_TAGS and element.text:
+                chars.update(element.text)
+            for value in element.attrib.values():
+                chars.update(value)
+        if element.tail:
+            chars.update(element.tail)
+    return _with_case_variants(chars)
+
+
+def css_content_codepoints(css_texts: Iterable[str]) -> set[int]:
+    """Characters of CSS ``content: "..."`` strings (pseudo-element text and icon glyphs)."""
+    codepoints: set[int] = set()
+    for css_text in css_texts:
+        if "content" not in css_text:
+            continue
+        for match in _CSS_CONTENT_RE.finditer(css_text):
+            raw = match.group(1) if match.group(1) is not None else match.group(2)
+            codepoints |= _with_case_variants(_CSS_ESCAPE_RE.sub(_unescape, raw))
+    return codepoints
+
+
+def _with_case_variants(chars: Iterable[str]) -> set[int]:
+    codepoints: set[int] = set()
+    for char in set(chars):
+        # upper() may expand ("ß" -> "SS"); every resulting character is shown.
+        codepoints.update(map(ord, char + char.upper() + char.lower()))
+    return codepoints
+
+
+def subset_fonts(
+    asset_cache: AssetCache,
+    *,
+    codepoints: set[int],
+    options: FontSubsetOptions,
+    stats: FontSubsetStats,
+) -> None:
+    """Cut every captured web font down to ``codepoints`` (plus printable ASCII), in parallel.
+
+    Runs on the final translated text and before fonts are mapped to local paths, because a
+    subset font gets a new hash. Fonts already mapped are only checked for Cyrillic coverage.
+    """
+    stats.enabled = options.enabled
+    if not options.enabled:
+        return
+    if not FONTTOOLS_AVAILABLE:
+        stats.skipped_reason = "fontTools is not installed (pip install 'web2ru[fonts]')"
+        return
+
+    wanted = frozenset(codepoints | ALWAYS_KEPT)
+    stats.codepoints = len(wanted)
+    jobs: list[_Job] = []
+    for key, record in asset_cache.records.items():
+        if not _is_font(record.content_type, record.final_url):
+            continue
+        stats.fonts += 1
+        stats.bytes_before += record.size
+        jobs.append(
+            _Job(
+                key=key,
+                data=record.inline,
+                path=str(record.path) if record.inline is None and record.path else None,
+                # Mapped fonts are referenced already; an empty set only checks coverage.
+                codepoints=frozenset() if key in asset_cache.url_to_local else wanted,
+            )
+        )
+    if not jobs:
+        return
+
+    stats.workers = _resolve_workers(options.workers)
+    if stats.workers <= 1 or len(jobs) < 2:
+        stats.workers = 1
+        results = list(map(_subset_job, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=stats.workers) as executor:
+            results = list(executor.map(_subset_job, jobs))
+
+    for job, result in zip(jobs, results, strict=True):
+        record = asset_cache.records[job.key]
+        if not result.has_cyrillic:
+            stats.without_cyrillic.append(job.key)
+        if result.status != "subset":
+            stats.bytes_after += record.size
+            if result.status == "icon":
+                stats.icon_fonts += 1
+            elif result.status == "failed":
+                stats.failed += 1
+            continue
+        stats.subset += 1
+        stats.bytes_after += len(result.data)
+        record.data = result.data
+        record.sha256 = sha256_bytes(result.data)
+
+
+def cyrillic_warning(stats: FontSubsetStats) -> str | None:
+    if not stats.without_cyrillic:
+        return None
+    return (
+        f"{len(stats.without_cyrillic)} web font(s) have no Cyrillic glyphs; Russian text falls "
+        "back to a system font: " + ", ".join(stats.without_cyrillic)
+    )
+
+
+def _unescape(match: re.Match[str]) -> str:
+    if match.group(1) is not None:
+        codepoint = int(match.group(1), 16)
+        return chr(codepoint) if 0 < codepoint <= 0x10FFFF else "\ufffd"
+    return match.group(2)
+
+
+def _resolve_workers(requested: int) -> int:
+    if requested > 0:
+        return requested
+    return max(1, os.cpu_count() or 1)
+
+
+def _is_font(content_type: str | None, final_url: str) -> bool:
+    if content_type:
+        ctype = content_type.split(";", 1)[0].strip().lower()
+        if ctype in _FONT_TYPES:
+            return True
+    return PurePosixPath(urlparse(final_url).path).suffix.lower() in _FONT_SUFFIXES
+
+
+def _subset_job(job: _Job) -> _Result:
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+
+    # Tables fontTools cannot subset are dropped with a warning per font; that is expected.
+    logging.getLogger("fontTools.subset").setLevel(logging.ERROR)
+    try:
+        data = job.data if job.data is not None else Path(job.path or "").read_bytes()
+        font = TTFont(io.BytesIO(data), lazy=False)
+        cmap = set(font.getBestCmap() or {})
+        has_letters = bool(cmap & (set(range(0x41, 0x5B)) | RUSSIAN_CODEPOINTS))
+        has_cyrillic = cmap >= RUSSIAN_CODEPOINTS
+        if not has_letters:
+            return _Result("icon", has_cyrillic=True)
+        if not job.codepoints:
+            return _Result("kept", has_cyrillic=has_cyrillic)
+
+        options = subset.Options()
+        options.layout_features = ["*"]
+        options.name_IDs = ["*"]
+        options.name_languages = ["*"]
+        options.notdef_outline = True
+        options.ignore_missing_unicodes = True
+        options.flavor = font.flavor
+        subsetter = subset.Subsetter(options=options)
+        subsetter.populate(unicodes=job.codepoints)
+        subsetter.subset(font)
+        out = io.BytesIO()
+        font.flavor = options.flavor
+        font.save(out)
+    except Exception:  # noqa: BLE001 - a broken font must not stop the run
+        return _Result("failed")
+    encoded = out.getvalue()
+    if len(encoded) >= len(data):
+        return _Result("kept", has_cyrillic=has_cyrillic)
+    return _Result("subset", encoded, has_cyrillic)
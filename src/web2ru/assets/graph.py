@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any
+
+from web2ru.assets.cache import AssetCache
+from web2ru.assets.fetch_missing import MissingAsset, fetch_missing_assets
+from web2ru.assets.pathing import scannable_kind
+from web2ru.assets.scan import scan_css_urls, scan_svg_urls
+
+
+@dataclass(slots=True)
+class AssetGraph:
+    """URLs reached while resolving a page's assets.
+
+    ``depth`` is 0 for URLs referenced by the HTML and grows by one per stylesheet or SVG hop;
+    ``edges`` maps every scanned stylesheet/SVG to the URLs it references.
+    """
+
+    depth: dict[str, int] = field(default_factory=dict)
+    edges: dict[str, list[str]] = field(default_factory=dict)
+    svg_sources: set[str] = field(default_factory=set)
+    rounds: int = 0
+    css_scanned: int = 0
+    svg_scanned: int = 0
+    depth_limited: int = 0
+    budget_limited: int = 0
+    scanned_sources: set[str] = field(default_factory=set, repr=False)
+
+    def as_report(self) -> dict[str, Any]:
+        return {
+            "urls_total": len(self.depth),
+            "rounds": self.rounds,
+            "max_depth_reached": max(self.depth.values(), default=0),
+            "css_scanned": self.css_scanned,
+            "svg_scanned": self.svg_scanned,
+            "depth_limited": self.depth_limited,
+            "budget_limited": self.budget_limited,
+            "edges": {source: self.edges[source] for source in sorted(self.edges)},
+        }
+
+
+def resolve_asset_graph(
+    *,
+    seed_urls: set[str],
+    css_by_url: dict[str, str],
+    asset_cache: AssetCache,
+    graph: AssetGraph,
+    final_url: str,
+    user_agent: str,
+    max_asset_mb: int,
+    enabled: bool,
+    max_depth: int,
+    max_urls: int,
+) -> list[MissingAsset]:
+    """Fetch ``seed_urls`` and everything their stylesheets and SVGs reference, level by level.
+
+    Each level is fetched concurrently by `fetch_missing_assets`; the stylesheets and SVGs it
+    brought in are scanned for the next level until nothing new turns up, ``max_depth`` hops
+    are exhausted or ``max_urls`` URLs are known. Newly acquired stylesheets are added to
+    ``css_by_url`` so they get rewritten with the captured ones. ``graph`` may be shared by
+    several calls (streaming chunks); URLs already in it are not fetched or scanned again.
+    """
+    frontier: list[str] = []
+
+    def reach(url: str, depth: int) -> None:
+        if url in graph.depth:
+            return
+        if depth > max_depth:
+            graph.depth_limited += 1
+            return
+        if len(graph.depth) >= max_urls:
+            graph.budget_limited += 1
+            return
+        graph.depth[url] = depth
+        frontier.append(url)
+
+    def link(source_url: str, depth: int, children: set[str]) -> None:
+        graph.edges[source_url] = sorted(children)
+        for child in sorted(children):
+            reach(child, depth + 1)
+
+    # Stylesheets captured during render are already at hand; only their references need a fetch.
+    for source_url, css_text in list(css_by_url.items()):
+        if source_url in graph.scanned_sources:
+            continue
+        graph.scanned_sources.add(source_url)
+        graph.css_scanned += 1
+        depth = graph.depth.setdefault(source_url, 0)
+        link(source_url, depth, scan_css_urls(css_text, source_url))
+    for url in sorted(seed_urls):
+        reach(url, 0)
+
+    missing: list[MissingAsset] = []
+    while frontier:
+        level, frontier = frontier, []
+        graph.rounds += 1
+        missing.extend(
+            fetch_missing_assets(
+                needed_urls=set(level),
+                asset_cache=asset_cache,
+                final_url=final_url,
+                user_agent=user_agent,
+                max_asset_mb=max_asset_mb,
+                enabled=enabled,
+            )
+        )
+        for url in level:
+            record = asset_cache.get(url)
+            if record is None or record.final_url in graph.scanned_sources:
+                continue
+            kind = scannable_kind(record)
+            if kind is None:
+                continue
+            graph.scanned_sources.add(record.final_url)
+            depth = graph.depth[url]
+            if kind == "css":
+                css_text = record.data.decode("utf-8", errors="replace")
+                css_by_url.setdefault(record.final_url, css_text)
+                graph.css_scanned += 1
+                link(url, depth, scan_css_urls(css_text, record.final_url))
+            else:
+                graph.svg_sources.add(url)
+                graph.svg_scanned += 1
+                link(url, depth, scan_svg_urls(record.data, record.final_url))
+    return missing
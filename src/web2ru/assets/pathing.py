@@ -8,6 +8,12 @@ from urllib.parse import urlparse
 from web2ru.models import AssetRecord
 
 _SEGMENT_RE = re.compile(r"[^a-zA-Z0-9._-]+")
+_TRANSCODED_EXTENSIONS = {
+    "image/avif": ".avif",
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+}
 
 
 def _clean_segment(value: str) -> str:
@@ -15,9 +21,18 @@ def _clean_segment(value: str) -> str:
     return cleaned.strip("-") or "asset"
 
 
-def _extension_from_record(record: AssetRecord) -> str:
-    parsed = urlparse(record.final_url)
-    suffix = PurePosixPath(parsed.path).suffix
+def _split_name(name: str) -> tuple[str, str]:
+    # Stem and suffix as PurePosixPath computes them, without building a path object per asset.
+    dot = name.rfind(".")
+    if 0 < dot < len(name) - 1:
+        return name[:dot], name[dot:]
+    return name, ""
+
+
+def _extension_from_record(record: AssetRecord, suffix: str) -> str:
+    if record.transcoded_from is not None and record.content_type in _TRANSCODED_EXTENSIONS:
+        # The URL's extension names the captured format, not the re-encoded body.
+        return _TRANSCODED_EXTENSIONS[record.content_type]
     if suffix:
         return suffix
     if record.content_type:
@@ -31,13 +46,22 @@ def _extension_from_record(record: AssetRecord) -> str:
 def asset_relative_path(record: AssetRecord) -> str:
     parsed = urlparse(record.final_url)
     host = _clean_segment(parsed.hostname or "unknown-host")
-    raw_path = parsed.path or "/index"
-    p = PurePosixPath(raw_path)
-    parent = [seg for seg in p.parts[:-1] if seg not in {"", "/"}]
-    stem = _clean_segment(p.stem or "index")
-    ext = _extension_from_record(record)
-    filename = f"{stem}__{record.sha256[:10]}{ext}"
-    folder = "/".join(_clean_segment(seg) for seg in parent if seg not in {"."})
+    segments = [seg for seg in (parsed.path or "/index").split("/") if seg and seg != "."]
+    stem, suffix = _split_name(segments.pop() if segments else "")
+    ext = _extension_from_record(record, suffix)
+    filename = f"{_clean_segment(stem or 'index')}__{record.sha256[:10]}{ext}"
+    folder = "/".join(_clean_segment(seg) for seg in segments)
     if folder:
         return f"./assets/{host}/{folder}/{filename}"
     return f"./assets/{host}/{filename}"
+
+
+def scannable_kind(record: AssetRecord) -> str | None:
+    """``css`` or ``svg`` for records whose URLs get rewritten to local paths, else None."""
+    content_type = (record.content_type or "").split(";", 1)[0].strip().lower()
+    suffix = PurePosixPath(urlparse(record.final_url).path).suffix.lower()
+    if content_type == "text/css" or suffix == ".css":
+        return "css"
+    if content_type == "image/svg+xml" or suffix == ".svg":
+        return "svg"
+    return None
@@ -1,30 +1,17 @@
 from __future__ import annotations
 
 import re
-from collections.abc import Callable
+from collections.abc import Callable, Iterable
+from functools import partial
 from urllib.parse import urljoin
 
 from lxml import html
 
+from web2ru.assets.css_cache import CssRewriteCache
 from web2ru.assets.rewrite_css import rewrite_css_urls
-from web2ru.assets.scan import normalize_url
+from web2ru.assets.scan import UrlSite, collect_url_sites, normalize_url, url_site_for
 
 _SRCSET_SPLIT_RE = re.compile(r"\s*,\s*")
-_URL_FUNC_RE = re.compile(r"url\(\s*(['\"]?)(.*?)\1\s*\)", re.IGNORECASE)
-_META_URL_CONTENT_KEYS = {
-    "og:image",
-    "og:image:url",
-    "og:image:secure_url",
-    "og:video",
-    "og:video:url",
-    "og:video:secure_url",
-    "og:audio",
-    "og:audio:url",
-    "og:audio:secure_url",
-    "twitter:image",
-    "twitter:image:src",
-    "twitter:player",
-}
 
 
 def _rewrite_srcset(value: str, *, base_url: str, map_url: Callable[[str], str]) -> str:
@@ -44,32 +31,6 @@ def _rewrite_srcset(value: str, *, base_url: str, map_url: Callable[[str], str])
     return ", ".join(parts)
 
 
-def _rewrite_inline_style(value: str, *, base_url: str, map_url: Callable[[str], str]) -> str:
-    def repl(match: re.Match[str]) -> str:
-        raw = match.group(2)
-        normalized = normalize_url(base_url, raw)
-        if not normalized:
-            return match.group(0)
-        return f'url("{map_url(normalized)}")'
-
-    return _URL_FUNC_RE.sub(repl, value)
-
-
-def _should_rewrite_meta_content(element: html.HtmlElement, value: str) -> bool:
-    if element.tag.lower() != "meta":
-        return False
-    raw = value.strip()
-    if not raw:
-        return False
-
-    for key in ("property", "name", "itemprop"):
-        meta_key = (element.get(key) or "").strip().lower()
-        if meta_key in _META_URL_CONTENT_KEYS:
-            return True
-
-    return raw.startswith(("http://", "https://", "//"))
-
-
 def rewrite_html_urls(
     tree: html.HtmlElement,
     *,
@@ -78,72 +39,86 @@ def rewrite_html_urls(
     map_anchor_href: Callable[[str], str | None] | None = None,
     rewrite_style_blocks: bool = True,
 ) -> None:
-    for element in tree.iterdescendants():
-        if not isinstance(element.tag, str):
-            continue
-        tag = element.tag.lower()
-        attrs = dict(element.attrib)
+    patch_url_sites(
+        collect_url_sites(tree, final_url, style_blocks=rewrite_style_blocks).sites,
+        final_url=final_url,
+        map_url=map_url,
+        map_anchor_href=map_anchor_href,
+    )
 
-        for attr_name, value in attrs.items():
-            if attr_name == "srcset":
-                element.set(attr_name, _rewrite_srcset(value, base_url=final_url, map_url=map_url))
-                continue
-            if attr_name == "style":
-                element.set(
-                    attr_name, _rewrite_inline_style(value, base_url=final_url, map_url=map_url)
-                )
-                continue
-
-            if attr_name not in {"src", "href", "poster", "data", "xlink:href", "content"}:
-                continue
-            if attr_name == "content" and not _should_rewrite_meta_content(element, value):
-                continue
 
-            if tag == "a" and attr_name == "href":
-                if value.strip().startswith("#"):
-                    continue
-                if map_anchor_href is None:
-                    continue
-                absolute_href = absolutize_href(final_url, value)
-                mapped_href = map_anchor_href(absolute_href)
-                if mapped_href:
-                    element.set(attr_name, mapped_href)
-                continue
-            if tag == "script" and attr_name == "src":
-                continue
-            if tag == "link":
-                rel = (element.get("rel") or "").lower()
-                keep = {"stylesheet", "preload", "icon", "shortcut icon"}
-                if not any(item in rel for item in keep):
+def patch_url_sites(
+    sites: Iterable[UrlSite],
+    *,
+    final_url: str,
+    map_url: Callable[[str], str],
+    map_anchor_href: Callable[[str], str | None] | None = None,
+) -> None:
+    """Point the sites from :func:`collect_url_sites` at local URLs.
+
+    A site whose value changed since collection (translated attributes) is classified again.
+    """
+    for site in sites:
+        element = site.element
+        current = element.text if site.attr is None else element.get(site.attr)
+        if current is None:
+            continue
+        if current != site.value:
+            if site.attr is None:
+                site = UrlSite(element, None, "css", current)
+            else:
+                refreshed = url_site_for(element, site.attr, current, final_url)
+                if refreshed is None:
                     continue
-
-            normalized = normalize_url(final_url, value)
-            if not normalized:
+                site = refreshed
+        kind = site.kind
+        if kind == "url":
+            assert site.url is not None
+            element.set(site.attr, map_url(site.url))
+        elif kind == "anchor":
+            if map_anchor_href is None or site.url is None:
                 continue
-            element.set(attr_name, map_url(normalized))
-
-        if rewrite_style_blocks and tag == "style" and element.text:
-            element.text = rewrite_css_urls(
-                element.text,
-                css_base_url=final_url,
-                map_url=map_url,
-            )
+            mapped_href = map_anchor_href(site.url)
+            if mapped_href:
+                element.set(site.attr, mapped_href)
+        elif kind == "srcset":
+            value = site.value if site.srcset is None else site.srcset
+            element.set(site.attr, _rewrite_srcset(value, base_url=final_url, map_url=map_url))
+        else:
+            rewritten = rewrite_css_urls(site.value, css_base_url=final_url, map_url=map_url)
+            if site.attr is None:
+                element.text = rewritten
+            elif rewritten != site.value:
+                element.set(site.attr, rewritten)
 
 
 def rewrite_css_asset_records(
     *,
     css_text_by_url: dict[str, str],
-    map_url: Callable[[str], str],
+    map_url_from: Callable[[str, str], str],
+    cache: CssRewriteCache | None = None,
 ) -> dict[str, str]:
+    """Rewrite every stylesheet; ``map_url_from(url, source_url)`` is relative to the sheet.
+
+    With ``cache``, a sheet whose content and URL mapping were rewritten before is served from it.
+    """
     rewritten: dict[str, str] = {}
     for source_url, css_text in css_text_by_url.items():
-        rewritten[source_url] = rewrite_css_urls(
-            css_text,
-            css_base_url=source_url,
-            map_url=map_url,
-        )
+        map_url = partial(_map_from, map_url_from, source_url)
+        if cache is not None:
+            rewritten[source_url] = cache.rewrite(
+                css_text, css_base_url=source_url, map_url=map_url
+            )
+        else:
+            rewritten[source_url] = rewrite_css_urls(
+                css_text, css_base_url=source_url, map_url=map_url
+            )
     return rewritten
 
 
+def _map_from(map_url_from: Callable[[str, str], str], source_url: str, url: str) -> str:
+    return map_url_from(url, source_url)
+
+
 def absolutize_href(base: str, href: str) -> str:
     return urljoin(base, href)
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+from urllib.parse import urldefrag
+
+from lxml import etree
+
+from web2ru.assets.rewrite_css import rewrite_css_urls
+from web2ru.assets.scan import normalize_url, parse_svg, svg_reference_attrs
+
+
+def rewrite_svg_urls(
+    data: bytes,
+    *,
+    svg_base_url: str,
+    map_url: Callable[[str], str],
+) -> bytes | None:
+    """Point `use`/`image` hrefs and CSS ``url()`` values of an SVG at local files.
+
+    Returns None when nothing changed (or the document does not parse), so the original bytes
+    can be kept as they are.
+    """
+    root = parse_svg(data)
+    if root is None:
+        return None
+    changed = False
+    for element in root.iter():
+        if not isinstance(element.tag, str):
+            continue
+        for attr in svg_reference_attrs(element):
+            value = element.get(attr) or ""
+            normalized = normalize_url(svg_base_url, value)
+            if not normalized:
+                continue
+            # Sprite references (`icons.svg#menu`) keep their fragment.
+            _, fragment = urldefrag(value.strip())
+            element.set(attr, map_url(normalized) + (f"#{fragment}" if fragment else ""))
+            changed = True
+        style = element.get("style")
+        if style:
+            rewritten = rewrite_css_urls(style, css_base_url=svg_base_url, map_url=map_url)
+            if rewritten != style:
+                element.set("style", rewritten)
+                changed = True
+        if etree.QName(element).localname == "style" and element.text:
+            rewritten = rewrite_css_urls(element.text, css_base_url=svg_base_url, map_url=map_url)
+            if rewritten != element.text:
+                element.text = rewritten
+                changed = True
+    if not changed:
+        return None
+    return bytes(etree.tostring(root.getroottree(), encoding="utf-8", xml_declaration=True))
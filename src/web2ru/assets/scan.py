@@ -1,12 +1,25 @@
 from __future__ import annotations
 
-import re
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from functools import lru_cache
 from urllib.parse import urldefrag, urljoin, urlparse
 
-import tinycss2
 from lxml import etree, html
 
-_URL_FUNC_RE = re.compile(r"url\(\s*(['\"]?)(.*?)\1\s*\)", re.IGNORECASE)
+from web2ru.assets.css_parse import parse_css
+from web2ru.assets.srcset import (
+    KEEP_ALL,
+    SrcsetPolicy,
+    SrcsetStats,
+    format_srcset,
+    parse_srcset,
+    select_srcset_candidates,
+)
+
+_XLINK_HREF = "{http://www.w3.org/1999/xlink}href"
+# SVG elements whose href pulls in another document (sprites, raster images, filter inputs).
+_SVG_REF_TAGS = frozenset({"use", "image", "feimage"})
 
 
 def _is_ignored_url(url: str) -> bool:
@@ -23,7 +36,9 @@ def _is_ignored_url(url: str) -> bool:
     )
 
 
+@lru_cache(maxsize=65536)
 def normalize_url(base_url: str, value: str) -> str | None:
+    # Memoized: scan and rewrite resolve the same (base, value) pairs, and templates repeat them.
     raw = value.strip()
     if _is_ignored_url(raw):
         return None
@@ -44,103 +59,284 @@ def _extract_srcset_urls(value: str) -> list[str]:
 
 
 def _extract_css_urls(css_text: str) -> list[str]:
-    out: list[str] = []
-    values = tinycss2.parse_component_value_list(css_text)
-    for token in values:
-        if token.type == "url":
-            out.append(token.value)
-        elif token.type == "function" and token.lower_name == "url":
-            raw = tinycss2.serialize(token.arguments).strip().strip("\"'")
-            if raw:
-                out.append(raw)
-    # Fallback for edge cases the parser leaves untouched.
-    for _, candidate in _URL_FUNC_RE.findall(css_text):
-        if candidate:
-            out.append(candidate)
-    return out
+    return [ref.value for ref in parse_css(css_text).refs]
 
 
-def scan_needed_urls(
-    tree: html.HtmlElement, final_url: str, css_by_source_url: dict[str, str]
-) -> set[str]:
+def scan_css_urls(css_text: str, base_url: str) -> set[str]:
+    """Absolute URLs referenced by a stylesheet (``url()`` values and ``@import`` targets)."""
     needed: set[str] = set()
+    for item in _extract_css_urls(css_text):
+        normalized = normalize_url(base_url, item)
+        if normalized:
+            needed.add(normalized)
+    return needed
+
+
+def parse_svg(data: bytes) -> etree._Element | None:
+    parser = etree.XMLParser(resolve_entities=False, no_network=True, recover=True)
+    try:
+        return etree.fromstring(data, parser=parser)
+    except etree.XMLSyntaxError:
+        return None
+
 
-    for el in tree.iterdescendants():
-        if not isinstance(el.tag, str):
+def svg_reference_attrs(element: etree._Element) -> list[str]:
+    """Attributes of ``element`` that reference another document, if it is a referencing tag."""
+    if not isinstance(element.tag, str):
+        return []
+    if etree.QName(element).localname.lower() not in _SVG_REF_TAGS:
+        return []
+    return [attr for attr in ("href", _XLINK_HREF) if element.get(attr)]
+
+
+def scan_svg_urls(data: bytes, base_url: str) -> set[str]:
+    """Absolute URLs an SVG document pulls in: `use`/`image` hrefs and CSS ``url()`` values."""
+    root = parse_svg(data)
+    if root is None:
+        return set()
+    needed: set[str] = set()
+    for element in root.iter():
+        if not isinstance(element.tag, str):
             continue
-        tag = el.tag.lower()
-        for attr, value in el.attrib.items():
-            if attr == "srcset":
-                if tag not in {"img", "source"}:
-                    continue
-                for item in _extract_srcset_urls(value):
-                    normalized = normalize_url(final_url, item)
-                    if normalized:
-                        needed.add(normalized)
-                continue
-            if attr == "style":
-                for item in _extract_css_urls(value):
-                    normalized = normalize_url(final_url, item)
-                    if normalized:
-                        needed.add(normalized)
-                continue
-            if attr == "src":
-                if tag not in {"img", "source", "script", "video", "audio", "iframe", "embed"}:
-                    continue
-                normalized = normalize_url(final_url, value)
-                if normalized:
-                    needed.add(normalized)
-                continue
-            if attr == "href":
-                if tag != "link":
-                    continue
-                normalized = normalize_url(final_url, value)
-                if normalized:
-                    needed.add(normalized)
-                continue
-            if attr == "poster":
-                if tag != "video":
-                    continue
-                normalized = normalize_url(final_url, value)
-                if normalized:
-                    needed.add(normalized)
-                continue
-            if attr == "data":
-                if tag != "object":
-                    continue
-                normalized = normalize_url(final_url, value)
-                if normalized:
-                    needed.add(normalized)
-                continue
-            if attr == "xlink:href":
-                if tag != "use":
-                    continue
-                normalized = normalize_url(final_url, value)
-                if normalized:
-                    needed.add(normalized)
+        for attr in svg_reference_attrs(element):
+            normalized = normalize_url(base_url, element.get(attr) or "")
+            if normalized:
+                needed.add(normalized)
+        style = element.get("style")
+        if style:
+            needed |= scan_css_urls(style, base_url)
+        if etree.QName(element).localname == "style" and element.text:
+            needed |= scan_css_urls(element.text, base_url)
+    return needed
+
+
+@dataclass(slots=True)
+class UrlSite:
+    """An attribute (or ``<style>`` text when ``attr`` is None) that gets rewritten to local URLs.
+
+    ``value`` is the raw value at collection time; ``url`` is the resolved target for the
+    ``url`` and ``anchor`` kinds (``srcset`` and ``css`` values hold several URLs). ``srcset``
+    is the value left after the srcset policy dropped candidates.
+    """
+
+    element: etree._Element
+    attr: str | None
+    kind: str
+    value: str
+    url: str | None = None
+    srcset: str | None = None
+
+
+@dataclass(slots=True)
+class HtmlUrlSites:
+    sites: list[UrlSite] = field(default_factory=list)
+    needed: set[str] = field(default_factory=set)
+
+
+def collect_url_sites(
+    tree: html.HtmlElement,
+    final_url: str,
+    *,
+    style_blocks: bool = True,
+    srcset_policy: SrcsetPolicy = KEEP_ALL,
+    srcset_stats: SrcsetStats | None = None,
+) -> HtmlUrlSites:
+    """One pass over ``tree``: the URLs to fetch and the sites to rewrite once they are local.
+
+    Rewriting covers more tags than fetching on purpose: a URL that is not fetched still gets
+    a local (missing) path so the offline page never reaches the network. ``srcset_policy``
+    drops `img`/`source` candidates before they are fetched; ``srcset_stats`` (shared across
+    streaming chunks) counts them.
+    """
+    collected = HtmlUrlSites()
+    needed = collected.needed
+    scan = _Scan(final_url, needed, srcset_policy, srcset_stats or SrcsetStats())
+    for element in tree.iterdescendants():
+        tag = element.tag
+        if not isinstance(tag, str):
+            continue
+        tag = tag.lower()
+        for attr, value in element.items():
+            handler = _ATTR_HANDLERS.get(attr)
+            if handler is None:
                 continue
-            if attr == "content":
-                if tag != "meta":
-                    continue
-                if not value.strip().startswith(("http://", "https://", "//")):
-                    continue
-                normalized = normalize_url(final_url, value)
-                if normalized:
-                    needed.add(normalized)
-
-        if tag == "style" and el.text:
-            for item in _extract_css_urls(el.text):
-                normalized = normalize_url(final_url, item)
-                if normalized:
-                    needed.add(normalized)
+            site = handler(element, tag, attr, value, scan)
+            if site is not None:
+                collected.sites.append(site)
+        if tag == "style" and element.text:
+            needed |= scan_css_urls(element.text, final_url)
+            if style_blocks:
+                collected.sites.append(UrlSite(element, None, "css", element.text))
+    return collected
+
 
+def url_site_for(element: etree._Element, attr: str, value: str, final_url: str) -> UrlSite | None:
+    """The rewrite site for ``attr`` set to ``value``; used when a value changed after collection."""
+    handler = _ATTR_HANDLERS.get(attr)
+    if handler is None or not isinstance(element.tag, str):
+        return None
+    scan = _Scan(final_url, set(), KEEP_ALL, SrcsetStats())
+    return handler(element, element.tag.lower(), attr, value, scan)
+
+
+def scan_needed_urls(
+    tree: html.HtmlElement, final_url: str, css_by_source_url: dict[str, str]
+) -> set[str]:
+    needed = collect_url_sites(tree, final_url, style_blocks=False).needed
     for css_source_url, css_text in css_by_source_url.items():
-        for item in _extract_css_urls(css_text):
-            normalized = normalize_url(css_source_url, item)
+        needed |= scan_css_urls(css_text, css_source_url)
+    return needed
+
+
+def _should_rewrite_meta_content(element: etree._Element, value: str) -> bool:
+    if not isinstance(element.tag, str) or element.tag.lower() != "meta":
+        return False
+    raw = value.strip()
+    if not raw:
+        return False
+
+    for key in ("property", "name", "itemprop"):
+        meta_key = (element.get(key) or "").strip().lower()
+        if meta_key in _META_URL_CONTENT_KEYS:
+            return True
+
+    return raw.startswith(("http://", "https://", "//"))
+
+
+@dataclass(slots=True)
+class _Scan:
+    final_url: str
+    needed: set[str]
+    srcset_policy: SrcsetPolicy
+    srcset_stats: SrcsetStats
+
+
+_SiteHandler = Callable[[etree._Element, str, str, str, _Scan], UrlSite | None]
+_META_URL_CONTENT_KEYS = frozenset(
+    {
+        "og:image",
+        "og:image:url",
+        "og:image:secure_url",
+        "og:video",
+        "og:video:url",
+        "og:video:secure_url",
+        "og:audio",
+        "og:audio:url",
+        "og:audio:secure_url",
+        "twitter:image",
+        "twitter:image:src",
+        "twitter:player",
+    }
+)
+# Tags whose URL attribute is fetched; the attribute is rewritten on every tag.
+_FETCHED_TAGS = {
+    "src": frozenset({"img", "source", "script", "video", "audio", "iframe", "embed"}),
+    "srcset": frozenset({"img", "source"}),
+    "poster": frozenset({"video"}),
+    "data": frozenset({"object"}),
+    "xlink:href": frozenset({"use"}),
+}
+_REWRITTEN_LINK_RELS = ("stylesheet", "preload", "icon", "shortcut icon")
+
+
+def _url_attr_site(
+    element: etree._Element, tag: str, attr: str, value: str, scan: _Scan
+) -> UrlSite | None:
+    normalized = normalize_url(scan.final_url, value)
+    if normalized is None:
+        return None
+    if tag in _FETCHED_TAGS[attr]:
+        scan.needed.add(normalized)
+    if tag == "script" and attr == "src":
+        # Fetched for completeness, but scripts are frozen rather than served locally.
+        return None
+    return UrlSite(element, attr, "url", value, normalized)
+
+
+def _href_site(
+    element: etree._Element, tag: str, attr: str, value: str, scan: _Scan
+) -> UrlSite | None:
+    if tag == "a":
+        if value.strip().startswith("#"):
+            return None
+        return UrlSite(element, attr, "anchor", value, urljoin(scan.final_url, value))
+    normalized = normalize_url(scan.final_url, value)
+    if normalized is None:
+        return None
+    if tag == "link":
+        scan.needed.add(normalized)
+        rel = (element.get("rel") or "").lower()
+        if not any(item in rel for item in _REWRITTEN_LINK_RELS):
+            return None
+    return UrlSite(element, attr, "url", value, normalized)
+
+
+def _srcset_site(
+    element: etree._Element, tag: str, attr: str, value: str, scan: _Scan
+) -> UrlSite | None:
+    if tag not in _FETCHED_TAGS[attr]:
+        return UrlSite(element, attr, "srcset", value)
+    if scan.srcset_policy.keep_all:
+        for item in _extract_srcset_urls(value):
+            normalized = normalize_url(scan.final_url, item)
             if normalized:
-                needed.add(normalized)
+                scan.needed.add(normalized)
+        return UrlSite(element, attr, "srcset", value)
 
-    return needed
+    candidates = parse_srcset(value)
+    kept = select_srcset_candidates(
+        candidates, scan.srcset_policy, display_width=_int_attr(element, "width")
+    )
+    scan.srcset_stats.candidates += len(candidates)
+    scan.srcset_stats.kept += len(kept)
+    for candidate in candidates:
+        normalized = normalize_url(scan.final_url, candidate.url)
+        if not normalized:
+            continue
+        if candidate in kept:
+            scan.needed.add(normalized)
+        else:
+            scan.srcset_stats.pruned_urls.add(normalized)
+    return UrlSite(element, attr, "srcset", value, srcset=format_srcset(kept))
+
+
+def _int_attr(element: etree._Element, attr: str) -> int | None:
+    raw = (element.get(attr) or "").strip()
+    return int(raw) if raw.isdigit() and int(raw) > 0 else None
+
+
+def _style_site(
+    element: etree._Element, tag: str, attr: str, value: str, scan: _Scan
+) -> UrlSite | None:
+    scan.needed |= scan_css_urls(value, scan.final_url)
+    return UrlSite(element, attr, "css", value)
+
+
+def _content_site(
+    element: etree._Element, tag: str, attr: str, value: str, scan: _Scan
+) -> UrlSite | None:
+    if tag != "meta":
+        return None
+    normalized = normalize_url(scan.final_url, value)
+    if normalized is None:
+        return None
+    if value.strip().startswith(("http://", "https://", "//")):
+        scan.needed.add(normalized)
+    if not _should_rewrite_meta_content(element, value):
+        return None
+    return UrlSite(element, attr, "url", value, normalized)
+
+
+_ATTR_HANDLERS: dict[str, _SiteHandler] = {
+    "src": _url_attr_site,
+    "poster": _url_attr_site,
+    "data": _url_attr_site,
+    "xlink:href": _url_attr_site,
+    "href": _href_site,
+    "srcset": _srcset_site,
+    "style": _style_site,
+    "content": _content_site,
+}
 
 
 def parse_html(html_dump: str) -> html.HtmlElement:
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import re
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+
+SRCSET_POLICY_MODES = ("keep-all", "largest", "closest")
+
+_SRCSET_SPLIT_RE = re.compile(r"\s*,\s*")
+_WIDTH_RE = re.compile(r"^(\d+)w$")
+_DENSITY_RE = re.compile(r"^(\d+(?:\.\d+)?|\.\d+)x$")
+
+
+@dataclass(slots=True, frozen=True)
+class SrcsetPolicy:
+    """Which `srcset` candidates of ``img``/``source`` are fetched and kept in the output."""
+
+    mode: str = "keep-all"
+    # Target CSS width for "closest".
+    width: int = 0
+
+    @property
+    def keep_all(self) -> bool:
+        return self.mode == "keep-all"
+
+    def __str__(self) -> str:
+        return f"closest:{self.width}" if self.mode == "closest" else self.mode
+
+
+KEEP_ALL = SrcsetPolicy()
+
+
+@dataclass(slots=True, frozen=True)
+class SrcsetCandidate:
+    url: str
+    descriptor: str
+    width: int | None
+    density: float | None
+
+
+@dataclass(slots=True)
+class SrcsetStats:
+    policy: str = "keep-all"
+    candidates: int = 0
+    kept: int = 0
+    # Absolute URLs of dropped candidates; their captured bodies are not written unless
+    # something else on the page references them.
+    pruned_urls: set[str] = field(default_factory=set)
+    records_dropped: int = 0
+
+    def as_report(self) -> dict[str, object]:
+        return {
+            "policy": self.policy,
+            "candidates": self.candidates,
+            "kept": self.kept,
+            "pruned": self.candidates - self.kept,
+            "records_dropped": self.records_dropped,
+        }
+
+
+def parse_srcset_policy(value: str) -> SrcsetPolicy:
+    """Parse ``keep-all``, ``largest`` or ``closest:<width>``; raises ValueError otherwise."""
+    raw = value.strip().lower()
+    mode, _, arg = raw.partition(":")
+    if mode in {"keep-all", "largest"} and not arg:
+        return SrcsetPolicy(mode)
+    if mode == "closest" and arg.isdigit() and int(arg) > 0:
+        return SrcsetPolicy("closest", int(arg))
+    raise ValueError(f"srcset policy must be keep-all, largest or closest:<width>, got {value!r}")
+
+
+def parse_srcset(value: str) -> list[SrcsetCandidate]:
+    candidates: list[SrcsetCandidate] = []
+    for entry in _SRCSET_SPLIT_RE.split(value):
+        item = entry.strip()
+        if not item:
+            continue
+        url_and_desc = item.split(maxsplit=1)
+        descriptor = url_and_desc[1].strip() if len(url_and_desc) > 1 else ""
+        width: int | None = None
+        density: float | None = None
+        if not descriptor:
+            density = 1.0
+        elif match := _WIDTH_RE.match(descriptor):
+            width = int(match.group(1))
+        elif match := _DENSITY_RE.match(descriptor):
+            density = float(match.group(1))
+        candidates.append(SrcsetCandidate(url_and_desc[0], descriptor, width, density))
+    return candidates
+
+
+def select_srcset_candidates(
+    candidates: Sequence[SrcsetCandidate],
+    policy: SrcsetPolicy,
+    *,
+    display_width: int | None = None,
+) -> list[SrcsetCandidate]:
+    """The candidates ``policy`` keeps, in their original order.
+
+    Sets mixing `w` and `x` descriptors (or with ones we do not understand) are kept whole;
+    ``display_width`` is the element's `width` attribute, used to turn a target width into a
+    pixel density for `x` descriptors.
+    """
+    if policy.keep_all or len(candidates) < 2:
+        return list(candidates)
+    if all(item.width is not None for item in candidates):
+        sizes = [float(item.width or 0) for item in candidates]
+        target = float(policy.width)
+    elif all(item.density is not None for item in candidates):
+        sizes = [item.density or 0.0 for item in candidates]
+        target = policy.width / display_width if display_width else 1.0
+    else:
+        return list(candidates)
+
+    if policy.mode == "largest":
+        chosen = sizes.index(max(sizes))
+    else:
+        covering = [size for size in sizes if size >= target]
+        chosen = sizes.index(min(covering) if covering else max(sizes))
+    return [candidates[chosen]]
+
+
+def format_srcset(candidates: Sequence[SrcsetCandidate]) -> str:
+    return ", ".join(
+        f"{item.url} {item.descriptor}" if item.descriptor else item.url for item in candidates
+    )
@@ -0,0 +1,327 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import tempfile
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any
+from urllib.parse import urldefrag, urlsplit, urlunsplit
+
+from web2ru.utils import sha256_bytes
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+# RFC 9111 heuristic freshness: a fraction of the time since Last-Modified, capped.
+_HEURISTIC_FRACTION = 0.1
+_HEURISTIC_MAX_SECONDS = 24 * 3600
+
+
+@dataclass(slots=True)
+class StoredAsset:
+    url: str
+    final_url: str
+    content_type: str | None
+    sha256: str
+    size: int
+    etag: str | None
+    last_modified: str | None
+    expires_at: float
+    blob_path: Path
+
+    def is_fresh(self, now: float | None = None) -> bool:
+        return self.expires_at > (time.time() if now is None else now)
+
+    def validator_headers(self) -> dict[str, str]:
+        headers: dict[str, str] = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def read_bytes(self) -> bytes | None:
+        try:
+            return self.blob_path.read_bytes()
+        except OSError:
+            return None
+
+
+@dataclass(slots=True)
+class AssetStoreStats:
+    hits: int = 0
+    revalidated: int = 0
+    stale: int = 0
+    misses: int = 0
+    stored: int = 0
+    evicted_blobs: int = 0
+    evicted_bytes: int = 0
+
+    def as_report(self) -> dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "stale": self.stale,
+            "misses": self.misses,
+            "stored": self.stored,
+            "evicted_blobs": self.evicted_blobs,
+            "evicted_bytes": self.evicted_bytes,
+        }
+
+
+def normalize_store_url(url: str) -> str:
+    """Cache key: no fragment, lowercase scheme and host, default port dropped."""
+    no_frag, _ = urldefrag(url)
+    parts = urlsplit(no_frag)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port is not None and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    if parts.username or parts.password:
+        return no_frag
+    return urlunsplit((scheme, host, parts.path or "/", parts.query, ""))
+
+
+class AssetStore:
+    """Content-addressed asset store shared across runs.
+
+    ``index.sqlite3`` maps normalized URLs to sha256 blobs under ``blobs/<aa>/<sha256>``; several
+    URLs can share one blob. Blobs are evicted least-recently-used once ``max_bytes`` is exceeded.
+    """
+
+    def __init__(self, root: Path, *, max_bytes: int) -> None:
+        self._root = root
+        self._blob_root = root / "blobs"
+        self._blob_root.mkdir(parents=True, exist_ok=True)
+        self._max_bytes = max_bytes
+        self.stats = AssetStoreStats()
+        # Renders run on browser pool threads and hand the cache back afterwards; the
+        # connection is used by one thread at a time, just not always the one that opened it.
+        self._conn = sqlite3.connect(root / "index.sqlite3", timeout=30.0, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS blobs (
+                sha256 TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                final_url TEXT NOT NULL,
+                content_type TEXT,
+                sha256 TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                expires_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_sha256 ON entries (sha256);
+            CREATE INDEX IF NOT EXISTS blobs_last_access ON blobs (last_access);
+            """
+        )
+        self._conn.commit()
+
+    def lookup(self, url: str) -> StoredAsset | None:
+        """Return the entry for ``url`` (fresh or stale) and mark its blob as recently used."""
+        row = self._conn.execute(
+            """
+            SELECT e.url, e.final_url, e.content_type, e.sha256, b.size, e.etag,
+                   e.last_modified, e.expires_at
+            FROM entries AS e JOIN blobs AS b ON b.sha256 = e.sha256
+            WHERE e.url = ?
+            """,
+            (normalize_store_url(url),),
+        ).fetchone()
+        if row is None:
+            self.stats.misses += 1
+            return None
+        asset = self._row_to_asset(row)
+        if not asset.blob_path.is_file():
+            self._forget_blob(asset.sha256)
+            self._conn.commit()
+            self.stats.misses += 1
+            return None
+        self._conn.execute(
+            "UPDATE blobs SET last_access = ? WHERE sha256 = ?", (time.time(), asset.sha256)
+        )
+        self._conn.commit()
+        if asset.is_fresh():
+            self.stats.hits += 1
+        else:
+            self.stats.stale += 1
+        return asset
+
+    def put(
+        self,
+        *,
+        url: str,
+        final_url: str,
+        content_type: str | None,
+        data: bytes,
+        headers: Mapping[str, str],
+        sha256: str | None = None,
+    ) -> StoredAsset | None:
+        lowered = {key.lower(): value for key, value in headers.items()}
+        if "no-store" in lowered.get("cache-control", "").lower():
+            return None
+        if (content_type or "").lower().startswith("text/html"):
+            # Documents always go to the network; the store only serves subresources.
+            return None
+        if len(data) > self._max_bytes:
+            return None
+        digest = sha256 or sha256_bytes(data)
+        blob_path = self._blob_path(digest)
+        if not blob_path.is_file():
+            _write_atomic(blob_path, data)
+        now = time.time()
+        asset = StoredAsset(
+            url=normalize_store_url(url),
+            final_url=final_url,
+            content_type=content_type,
+            sha256=digest,
+            size=len(data),
+            etag=lowered.get("etag"),
+            last_modified=lowered.get("last-modified"),
+            expires_at=freshness_deadline(lowered, now=now),
+            blob_path=blob_path,
+        )
+        self._conn.execute(
+            """
+            INSERT INTO blobs (sha256, size, last_access) VALUES (?, ?, ?)
+            ON CONFLICT(sha256) DO UPDATE SET last_access = excluded.last_access
+            """,
+            (digest, len(data), now),
+        )
+        self._conn.execute(
+            """
+            INSERT OR REPLACE INTO entries
+                (url, final_url, content_type, sha256, etag, last_modified, expires_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                asset.url,
+                asset.final_url,
+                asset.content_type,
+                asset.sha256,
+                asset.etag,
+                asset.last_modified,
+                asset.expires_at,
+            ),
+        )
+        self._conn.commit()
+        self.stats.stored += 1
+        self.evict()
+        return asset
+
+    def refresh(self, asset: StoredAsset, headers: Mapping[str, str]) -> StoredAsset:
+        """Record a ``304 Not Modified``: extend freshness and pick up any new validators."""
+        lowered = {key.lower(): value for key, value in headers.items()}
+        asset.etag = lowered.get("etag") or asset.etag
+        asset.last_modified = lowered.get("last-modified") or asset.last_modified
+        asset.expires_at = freshness_deadline(lowered, now=time.time())
+        self._conn.execute(
+            "UPDATE entries SET etag = ?, last_modified = ?, expires_at = ? WHERE url = ?",
+            (asset.etag, asset.last_modified, asset.expires_at, asset.url),
+        )
+        self._conn.commit()
+        self.stats.revalidated += 1
+        return asset
+
+    def evict(self) -> int:
+        """Drop least-recently-used blobs until the store fits in ``max_bytes``."""
+        total = int(self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0])
+        if total <= self._max_bytes:
+            return 0
+        evicted = 0
+        rows = self._conn.execute("SELECT sha256, size FROM blobs ORDER BY last_access").fetchall()
+        for digest, size in rows:
+            if total <= self._max_bytes:
+                break
+            self._forget_blob(digest)
+            total -= int(size)
+            evicted += 1
+            self.stats.evicted_blobs += 1
+            self.stats.evicted_bytes += int(size)
+        self._conn.commit()
+        return evicted
+
+    def total_bytes(self) -> int:
+        return int(self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0])
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _forget_blob(self, digest: str) -> None:
+        self._conn.execute("DELETE FROM entries WHERE sha256 = ?", (digest,))
+        self._conn.execute("DELETE FROM blobs WHERE sha256 = ?", (digest,))
+        self._blob_path(digest).unlink(missing_ok=True)
+
+    def _blob_path(self, digest: str) -> Path:
+        return self._blob_root / digest[:2] / digest
+
+    def _row_to_asset(self, row: tuple[Any, ...]) -> StoredAsset:
+        url, final_url, content_type, digest, size, etag, last_modified, expires_at = row
+        return StoredAsset(
+            url=url,
+            final_url=final_url,
+            content_type=content_type,
+            sha256=digest,
+            size=int(size),
+            etag=etag,
+            last_modified=last_modified,
+            expires_at=float(expires_at),
+            blob_path=self._blob_path(digest),
+        )
+
+
+def open_asset_store(*, cache_dir: Path, enabled: bool, max_mb: int) -> AssetStore | None:
+    if not enabled:
+        return None
+    return AssetStore(cache_dir / "assets", max_bytes=max_mb * 1024 * 1024)
+
+
+def freshness_deadline(headers: Mapping[str, str], *, now: float) -> float:
+    """Absolute expiry time from lowercase response headers; ``now`` means revalidate first."""
+    cache_control = headers.get("cache-control", "").lower()
+    directives: dict[str, str] = {}
+    for directive in cache_control.split(","):
+        name, _, value = directive.strip().partition("=")
+        if name:
+            directives[name] = value.strip().strip('"')
+    if "no-cache" in directives:
+        return now
+    for name in ("s-maxage", "max-age"):
+        if name in directives:
+            try:
+                return now + max(0, int(directives[name]))
+            except ValueError:
+                return now
+    expires = _parse_http_date(headers.get("expires"))
+    if expires is not None:
+        return expires
+    last_modified = _parse_http_date(headers.get("last-modified"))
+    if last_modified is not None and last_modified < now:
+        return now + min((now - last_modified) * _HEURISTIC_FRACTION, _HEURISTIC_MAX_SECONDS)
+    return now
+
+
+def _parse_http_date(value: str | None) -> float | None:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(data)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from importlib.util import find_spec
+from pathlib import Path, PurePosixPath
+from typing import TYPE_CHECKING
+from urllib.parse import urlparse
+
+from web2ru.assets.cache import AssetCache
+from web2ru.utils import sha256_bytes
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+PILLOW_AVAILABLE = find_spec("PIL") is not None
+IMAGE_TRANSCODE_MODES = ("off", "webp", "avif", "original")
+# Smaller images gain too little to be worth a decode/encode round trip.
+MIN_TRANSCODE_BYTES = 16 * 1024
+
+_RASTER_TYPES = frozenset(
+    {"image/png", "image/jpeg", "image/pjpeg", "image/gif", "image/bmp", "image/tiff", "image/webp"}
+)
+_RASTER_SUFFIXES = frozenset({".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tif", ".tiff", ".webp"})
+# mode -> (Pillow format, content type)
+_TARGETS = {"webp": ("WEBP", "image/webp"), "avif": ("AVIF", "image/avif")}
+
+
+@dataclass(slots=True, frozen=True)
+class ImageTranscodeOptions:
+    mode: str = "off"
+    max_dim: int = 2560
+    quality: int = 80
+    workers: int = 0  # 1 = serial, 0 = one per CPU
+    min_bytes: int = MIN_TRANSCODE_BYTES
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+
+@dataclass(slots=True)
+class ImageTranscodeStats:
+    mode: str = "off"
+    workers: int = 1
+    candidates: int = 0
+    transcoded: int = 0
+    resized: int = 0
+    # Animated, or the re-encoded body was not smaller.
+    kept: int = 0
+    failed: int = 0
+    bytes_before: int = 0
+    bytes_after: int = 0
+    skipped_reason: str | None = None
+    # Records already looked at; streaming chunks call the stage again for new ones only.
+    seen: set[str] = field(default_factory=set)
+
+    def as_report(self) -> dict[str, object]:
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "candidates": self.candidates,
+            "transcoded": self.transcoded,
+            "resized": self.resized,
+            "kept": self.kept,
+            "failed": self.failed,
+            "bytes_before": self.bytes_before,
+            "bytes_after": self.bytes_after,
+            "bytes_saved": self.bytes_before - self.bytes_after,
+            "skipped_reason": self.skipped_reason,
+        }
+
+
+@dataclass(slots=True)
+class _Job:
+    key: str
+    # Inline bodies travel to the worker; spilled and stored ones are read there.
+    data: bytes | None
+    path: str | None
+
+
+@dataclass(slots=True)
+class _Result:
+    status: str  # transcoded|kept|failed
+    data: bytes = b""
+    content_type: str = ""
+    resized: bool = False
+
+
+def transcode_images(
+    asset_cache: AssetCache, *, options: ImageTranscodeOptions, stats: ImageTranscodeStats
+) -> None:
+    """Recompress (and downscale) raster images of ``asset_cache`` in a process pool.
+
+    Must run before any URL is mapped to a local path: a transcoded record gets a new hash,
+    content type and extension. Records already mapped are left alone. A result is kept only
+    when it is smaller than the captured body, so the stage never grows the output.
+    """
+    stats.mode = options.mode
+    if not options.enabled:
+        return
+    if not PILLOW_AVAILABLE:
+        stats.skipped_reason = "Pillow is not installed (pip install 'web2ru[images]')"
+        return
+    if options.mode in _TARGETS and not _encoder_available(options.mode):
+        stats.skipped_reason = f"this Pillow build cannot encode {options.mode}"
+        return
+
+    jobs: list[_Job] = []
+    for key, record in asset_cache.records.items():
+        if key in stats.seen:
+            continue
+        stats.seen.add(key)
+        if key in asset_cache.url_to_local or record.size < options.min_bytes:
+            continue
+        if not _is_raster(record.content_type, record.final_url):
+            continue
+        stats.candidates += 1
+        stats.bytes_before += record.size
+        jobs.append(
+            _Job(
+                key=key,
+                data=record.inline,
+                path=str(record.path) if record.inline is None and record.path else None,
+            )
+        )
+    if not jobs:
+        return
+
+    stats.workers = _resolve_workers(options.workers)
+    params = [options] * len(jobs)
+    if stats.workers <= 1 or len(jobs) < 2:
+        stats.workers = 1
+        results = list(map(_transcode_job, jobs, params))
+    else:
+        with ProcessPoolExecutor(max_workers=stats.workers) as executor:
+            results = list(executor.map(_transcode_job, jobs, params))
+
+    for job, result in zip(jobs, results, strict=True):
+        record = asset_cache.records[job.key]
+        if result.status != "transcoded":
+            stats.bytes_after += record.size
+            if result.status == "kept":
+                stats.kept += 1
+            else:
+                stats.failed += 1
+            continue
+        stats.transcoded += 1
+        stats.resized += int(result.resized)
+        stats.bytes_after += len(result.data)
+        record.transcoded_from = record.content_type or ""
+        record.content_type = result.content_type
+        record.data = result.data
+        record.sha256 = sha256_bytes(result.data)
+
+
+def _resolve_workers(requested: int) -> int:
+    if requested > 0:
+        return requested
+    return max(1, os.cpu_count() or 1)
+
+
+def _encoder_available(mode: str) -> bool:
+    from PIL import features
+
+    return bool(features.check(mode))
+
+
+def _is_raster(content_type: str | None, final_url: str) -> bool:
+    if content_type:
+        ctype = content_type.split(";", 1)[0].strip().lower()
+        if ctype.startswith("image/"):
+            return ctype in _RASTER_TYPES
+    return PurePosixPath(urlparse(final_url).path).suffix.lower() in _RASTER_SUFFIXES
+
+
+def _transcode_job(job: _Job, options: ImageTranscodeOptions) -> _Result:
+    from PIL import Image, ImageOps
+
+    try:
+        data = job.data if job.data is not None else Path(job.path or "").read_bytes()
+        with Image.open(io.BytesIO(data)) as opened:
+            if getattr(opened, "n_frames", 1) > 1:
+                # Animations would lose their frames.
+                return _Result("kept")
+            source_format = opened.format or ""
+            image = ImageOps.exif_transpose(opened)
+            resized = max(image.size) > options.max_dim
+            if resized:
+                image.thumbnail((options.max_dim, options.max_dim), Image.Resampling.LANCZOS)
+            out = io.BytesIO()
+            content_type = _save(image, out, source_format=source_format, options=options)
+    except Exception:  # noqa: BLE001 - a broken or hostile image must not stop the run
+        return _Result("failed")
+    encoded = out.getvalue()
+    if len(encoded) >= len(data):
+        return _Result("kept")
+    return _Result("transcoded", encoded, content_type, resized)
+
+
+def _save(
+    image: Image.Image, out: io.BytesIO, *, source_format: str, options: ImageTranscodeOptions
+) -> str:
+    has_alpha = "A" in image.getbands() or "transparency" in image.info
+    if options.mode in _TARGETS:
+        pillow_format, content_type = _TARGETS[options.mode]
+        image = image.convert("RGBA" if has_alpha else "RGB")
+        image.save(out, format=pillow_format, quality=options.quality)
+        return content_type
+    if source_format == "JPEG":
+        if image.mode not in {"RGB", "L"}:
+            image = image.convert("RGB")
+        image.save(out, format="JPEG", quality=options.quality, optimize=True, progressive=True)
+        return "image/jpeg"
+    if source_format == "WEBP":
+        image.save(out, format="WEBP", quality=options.quality)
+        return "image/webp"
+    # PNG, GIF, BMP and TIFF are re-encoded losslessly.
+    image.save(out, format="PNG", optimize=True)
+    return "image/png"
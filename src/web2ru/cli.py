@@ -4,9 +4,10 @@ import os
 import socketserver
 import sys
 import webbrowser
-from contextlib import suppress
+from collections.abc import Callable
+from contextlib import ExitStack, suppress
 from functools import partial
-from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from http.server import BaseHTTPRequestHandler, SimpleHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 from typing import Any, cast
 
@@ -15,11 +16,23 @@ from click.core import ParameterSource
 from playwright.sync_api import BrowserContext, sync_playwright
 
 from web2ru.assets.cache import AssetCache
-from web2ru.config import RunConfig
+from web2ru.assets.css_cache import open_css_rewrite_cache
+from web2ru.assets.srcset import parse_srcset_policy
+from web2ru.assets.store import open_asset_store
+from web2ru.assets.transcode import IMAGE_TRANSCODE_MODES
+from web2ru.config import STREAM_HTML_MODES, RunConfig
 from web2ru.env import load_env_chain
+from web2ru.pipeline.browser_pool import BrowserPool
+from web2ru.pipeline.bundle import (
+    OUTPUT_FORMATS,
+    ZIP_BUNDLE_NAME,
+    BundleRequestHandler,
+    open_bundle,
+)
 from web2ru.pipeline.offline_process import run_offline_process
 from web2ru.pipeline.online_render import run_online_render
 from web2ru.pipeline.persistent_context import launch_persistent_context_with_lock_recovery
+from web2ru.pipeline.resource_policy import RESOURCE_POLICY_PRESETS
 from web2ru.pipeline.session_policy import (
     build_session_policy,
     load_storage_state,
@@ -99,10 +112,92 @@ def run(
     max_retries: int = typer.Option(6, "--max-retries"),
     cache_dir: str = typer.Option(None, "--cache-dir"),
     no_asset_cache: bool = typer.Option(False, "--no-asset-cache"),
+    asset_cache_max_mb: int = typer.Option(
+        1024,
+        "--asset-cache-max-mb",
+        help="Size cap of the on-disk asset store; least recently used blobs are evicted",
+    ),
     no_translation_cache: bool = typer.Option(False, "--no-translation-cache"),
-    max_asset_mb: int = typer.Option(15, "--max-asset-mb"),
+    incremental: str = typer.Option(
+        "off",
+        "--incremental",
+        help="Reuse translations of unchanged blocks from the previous snapshot of the page",
+    ),
+    max_asset_mb: int = typer.Option(
+        15,
+        "--max-asset-mb",
+        help="Largest asset kept; unless --resource-policy is off, audio and video that "
+        "declare a larger Content-Length (checked with a HEAD request) are aborted",
+    ),
+    resource_policy: str = typer.Option(
+        "default",
+        "--resource-policy",
+        help="Requests aborted during render: default (trackers, beacons), text-only "
+        "(also images, media, fonts) or off; both also abort media over --max-asset-mb",
+    ),
+    block_url: list[str] = typer.Option(
+        None, "--block-url", help="Glob over the full request URL to abort during render"
+    ),
     asset_scan: str = typer.Option("on", "--asset-scan"),
+    asset_graph_depth: int = typer.Option(
+        4,
+        "--asset-graph-depth",
+        help="How many stylesheet/SVG hops (@import, url(), <use>) to follow when fetching assets",
+    ),
+    asset_graph_max_urls: int = typer.Option(5000, "--asset-graph-max-urls"),
     fetch_missing_assets: str = typer.Option("on", "--fetch-missing-assets"),
+    srcset: str = typer.Option(
+        "keep-all",
+        "--srcset",
+        help="Which img/source srcset candidates to fetch and keep: keep-all, largest or "
+        "closest:<width> (the smallest one at least that many CSS pixels wide)",
+    ),
+    image_transcode: str = typer.Option(
+        "off",
+        "--image-transcode",
+        help="Re-encode captured raster images: off, webp, avif or original (same format, "
+        "recompressed); needs the `images` extra",
+    ),
+    image_max_dim: int = typer.Option(
+        2560, "--image-max-dim", help="Downscale transcoded images to this many pixels per side"
+    ),
+    image_quality: int = typer.Option(80, "--image-quality"),
+    image_workers: int = typer.Option(
+        0, "--image-workers", help="Processes for image transcoding (1 = serial, 0 = one per CPU)"
+    ),
+    font_subset: str = typer.Option(
+        "off",
+        "--font-subset",
+        help="Subset captured web fonts to the characters of the translated page and warn about "
+        "fonts without Cyrillic glyphs; needs the `fonts` extra",
+    ),
+    font_workers: int = typer.Option(
+        0, "--font-workers", help="Processes for font subsetting (1 = serial, 0 = one per CPU)"
+    ),
+    output_format: str = typer.Option(
+        "dir",
+        "--output-format",
+        help="dir (index.html plus assets/), zip (one stored archive, served straight from disk) "
+        "or mhtml (one web archive file; single mode only)",
+    ),
+    asset_write_workers: int = typer.Option(
+        1,
+        "--asset-write-workers",
+        help="Threads writing asset files into the output directory (1 = serial); "
+        "raise it on network filesystems, where per-file latency dominates",
+    ),
+    stream_html: str = typer.Option(
+        "off",
+        "--stream-html",
+        help="Process huge HTML dumps in bounded-memory chunks: off, on, or auto "
+        "(only with --scope page and no exclude selectors); streaming ignores --scope",
+    ),
+    stream_chunk_kb: int = typer.Option(1024, "--stream-chunk-kb"),
+    extract_workers: int = typer.Option(
+        1,
+        "--extract-workers",
+        help="Processes for block extraction on very large pages (1 = serial, 0 = one per CPU)",
+    ),
     freeze_js: str = typer.Option("auto", "--freeze-js"),
     drop_noscript: str = typer.Option("auto", "--drop-noscript"),
     block_iframe: str = typer.Option("auto", "--block-iframe"),
@@ -114,6 +209,20 @@ def run(
         help="In surf mode, restrict navigation to same-origin links only",
     ),
     surf_max_pages: int = typer.Option(30, "--surf-max-pages"),
+    browser_pool_size: int = typer.Option(
+        2,
+        "--browser-pool-size",
+        help="In surf mode, how many browsers render pages concurrently; they stay running "
+        "between pages",
+    ),
+    browser_recycle_pages: int = typer.Option(
+        50, "--browser-recycle-pages", help="Relaunch a browser after this many pages (0 = never)"
+    ),
+    browser_recycle_mb: int = typer.Option(
+        2048,
+        "--browser-recycle-mb",
+        help="Relaunch a browser once its processes use more memory than this (0 = never)",
+    ),
     log_level: str = typer.Option("info", "--log-level"),
 ) -> None:
     repo_root = _repo_root()
@@ -137,6 +246,33 @@ def run(
         if _is_default_param_source(ctx, "max_scroll_ms"):
             max_scroll_ms = 10000
 
+    resource_policy_resolved = resource_policy.strip().lower()
+    if resource_policy_resolved not in RESOURCE_POLICY_PRESETS:
+        raise typer.BadParameter(
+            "`--resource-policy` must be one of: " + ", ".join(RESOURCE_POLICY_PRESETS)
+        )
+
+    try:
+        srcset_policy = parse_srcset_policy(srcset)
+    except ValueError as exc:
+        raise typer.BadParameter(str(exc)) from exc
+
+    image_transcode_resolved = image_transcode.strip().lower()
+    if image_transcode_resolved not in IMAGE_TRANSCODE_MODES:
+        raise typer.BadParameter(
+            "`--image-transcode` must be one of: " + ", ".join(IMAGE_TRANSCODE_MODES)
+        )
+
+    stream_html_resolved = stream_html.strip().lower()
+    if stream_html_resolved not in STREAM_HTML_MODES:
+        raise typer.BadParameter("`--stream-html` must be one of: " + ", ".join(STREAM_HTML_MODES))
+
+    output_format_resolved = output_format.strip().lower()
+    if output_format_resolved not in OUTPUT_FORMATS:
+        raise typer.BadParameter("`--output-format` must be one of: " + ", ".join(OUTPUT_FORMATS))
+    if output_format_resolved == "mhtml" and mode_resolved == "surf":
+        raise typer.BadParameter("`--output-format mhtml` is not available in surf mode.")
+
     serve_resolved = _resolve_serve_flag(open_result=open_result, serve=serve)
     if mode_resolved == "surf":
         serve_resolved = True
@@ -169,11 +305,29 @@ def run(
         token_protect_strict=_bool_from_on_off(token_protect_strict),
         cache_dir=Path(cache_dir or _env_or(str(RunConfig(url=url).cache_dir), "WEB2RU_CACHE_DIR")),
         use_asset_cache=not no_asset_cache,
+        asset_cache_max_mb=asset_cache_max_mb,
         use_translation_cache=not no_translation_cache,
+        incremental=_bool_from_on_off(incremental),
         max_asset_mb=max_asset_mb,
+        resource_policy=resource_policy_resolved,
+        block_url_patterns=block_url or [],
         openai_min_interval_ms=_int_env_or(2500, "WEB2RU_OPENAI_RATE_LIMIT_MS"),
         asset_scan=_bool_from_on_off(asset_scan),
+        asset_graph_depth=asset_graph_depth,
+        asset_graph_max_urls=asset_graph_max_urls,
         fetch_missing_assets=_bool_from_on_off(fetch_missing_assets),
+        srcset_policy=str(srcset_policy),
+        image_transcode=image_transcode_resolved,
+        image_max_dim=image_max_dim,
+        image_quality=image_quality,
+        image_workers=image_workers,
+        font_subset=_bool_from_on_off(font_subset),
+        font_workers=font_workers,
+        output_format=output_format_resolved,
+        asset_write_workers=asset_write_workers,
+        stream_html=stream_html_resolved,
+        stream_chunk_kb=stream_chunk_kb,
+        extract_workers=extract_workers,
         freeze_js=freeze_js,
         drop_noscript=drop_noscript,
         block_iframe=block_iframe,
@@ -181,6 +335,9 @@ def run(
         serve=serve_resolved,
         serve_port=serve_port,
         headful=headful,
+        browser_pool_size=browser_pool_size,
+        browser_recycle_pages=browser_recycle_pages,
+        browser_recycle_mb=browser_recycle_mb,
         log_level=log_level,
         exclude_selectors=exclude_selector or [],
         api_key=os.getenv("OPENAI_API_KEY"),
@@ -195,21 +352,39 @@ def run(
         return
 
     typer.echo("Web2RU: online render phase...")
-    asset_cache = AssetCache()
-    online, user_agent = run_online_render(cfg, asset_cache)
-
-    typer.echo("Web2RU: offline processing phase...")
-    offline = run_offline_process(
-        config=cfg,
-        online=online,
-        asset_cache=asset_cache,
-        user_agent=user_agent,
+    asset_cache = AssetCache(
+        store=open_asset_store(
+            cache_dir=cfg.cache_dir, enabled=cfg.use_asset_cache, max_mb=cfg.asset_cache_max_mb
+        ),
+        css_rewrites=open_css_rewrite_cache(cache_dir=cfg.cache_dir, enabled=cfg.use_asset_cache),
+        write_workers=cfg.asset_write_workers,
     )
+    browser_pool = BrowserPool(
+        headful=cfg.headful,
+        recycle_pages=cfg.browser_recycle_pages,
+        recycle_mb=cfg.browser_recycle_mb,
+    )
+    try:
+        online, user_agent = run_online_render(cfg, asset_cache, browser_pool=browser_pool)
+        # One page only: free the browser before the offline phase.
+        browser_pool.close()
+
+        typer.echo("Web2RU: offline processing phase...")
+        offline = run_offline_process(
+            config=cfg,
+            online=online,
+            asset_cache=asset_cache,
+            user_agent=user_agent,
+        )
+    finally:
+        browser_pool.close()
+        asset_cache.close()
     typer.echo(f"Output: {offline.output_dir}")
     typer.echo(f"Report: {offline.report_path}")
 
     if cfg.open_result:
-        if cfg.serve:
+        # Browsers open MHTML only from disk and a zip only through the server.
+        if cfg.output_format == "zip" or (cfg.serve and cfg.output_format == "dir"):
             _serve_and_open(offline.output_dir, cfg.serve_port)
         else:
             webbrowser.open(offline.index_path.resolve().as_uri())
@@ -299,8 +474,15 @@ def _restore_auth_cookies(*, context: BrowserContext, policy_url: str, cache_dir
 
 
 def _serve_and_open(output_dir: Path, port: int) -> None:
-    handler = partial(SimpleHTTPRequestHandler, directory=str(output_dir))
-    with ThreadingHTTPServer(("127.0.0.1", port), handler) as httpd:
+    bundle = output_dir / ZIP_BUNDLE_NAME
+    handler: Callable[..., BaseHTTPRequestHandler]
+    with ExitStack() as stack:
+        if bundle.is_file():
+            reader = stack.enter_context(open_bundle(bundle))
+            handler = partial(BundleRequestHandler, bundle=reader)
+        else:
+            handler = partial(SimpleHTTPRequestHandler, directory=str(output_dir))
+        httpd = stack.enter_context(ThreadingHTTPServer(("127.0.0.1", port), handler))
         selected_port = _extract_server_port(httpd)
         url = f"http://127.0.0.1:{selected_port}/index.html"
         typer.echo(f"Serving at {url}")
@@ -5,6 +5,8 @@ from pathlib import Path
 
 from platformdirs import user_cache_dir
 
+STREAM_HTML_MODES = ("off", "on", "auto")
+
 
 @dataclass(slots=True)
 class RunConfig:
@@ -34,11 +36,31 @@ class RunConfig:
     token_protect_strict: bool = False
     cache_dir: Path = Path(user_cache_dir("web2ru"))
     use_asset_cache: bool = True
+    asset_cache_max_mb: int = 1024
     use_translation_cache: bool = True
+    incremental: bool = False
     max_asset_mb: int = 15
+    resource_policy: str = "default"  # default|text-only|off
+    block_url_patterns: list[str] = None  # type: ignore[assignment]
     openai_min_interval_ms: int = 2500
     asset_scan: bool = True
+    asset_graph_depth: int = 4
+    asset_graph_max_urls: int = 5000
     fetch_missing_assets: bool = True
+    srcset_policy: str = "keep-all"  # keep-all|largest|closest:<width>
+    image_transcode: str = "off"  # off|webp|avif|original
+    image_max_dim: int = 2560
+    image_quality: int = 80
+    image_workers: int = 0  # 1 = serial, 0 = one per CPU
+    font_subset: bool = False
+    font_workers: int = 0  # 1 = serial, 0 = one per CPU
+    output_format: str = "dir"  # dir|zip|mhtml
+    asset_write_workers: int = 1  # 1 = serial; more for network filesystems
+    stream_html: str = "off"  # auto|on|off
+    stream_threshold_mb: int = 16
+    stream_chunk_kb: int = 1024
+    extract_workers: int = 1  # 1 = serial, 0 = one per CPU
+    parallel_extract_min_nodes: int = 50000
     freeze_js: str = "auto"  # auto|on|off
     drop_noscript: str = "auto"  # auto|on|off
     block_iframe: str = "auto"  # auto|on|off
@@ -46,6 +68,9 @@ class RunConfig:
     serve: bool = False
     serve_port: int = 0
     headful: bool = False
+    browser_pool_size: int = 2  # browsers kept running in surf mode
+    browser_recycle_pages: int = 50  # relaunch a browser after this many renders (0 = never)
+    browser_recycle_mb: int = 2048  # relaunch once one browser's processes use more (0 = never)
     log_level: str = "info"
     output_root: Path = Path("output")
     exclude_selectors: list[str] = None  # type: ignore[assignment]
@@ -54,6 +79,8 @@ class RunConfig:
     def __post_init__(self) -> None:
         if self.exclude_selectors is None:
             self.exclude_selectors = []
+        if self.block_url_patterns is None:
+            self.block_url_patterns = []
 
     @property
     def freeze_js_enabled(self) -> bool:
@@ -63,6 +90,15 @@ class RunConfig:
     def shadow_dom_enabled(self) -> bool:
         return self.shadow_dom in {"on", "auto"}
 
+    def should_stream_html(self, html_chars: int) -> bool:
+        if self.stream_html == "on":
+            return True
+        if self.stream_html != "auto" or self.scope != "page" or self.exclude_selectors:
+            # Streaming translates the whole body and matches exclude selectors per chunk, so
+            # "auto" only picks it when that gives the same output as the tree path.
+            return False
+        return html_chars >= self.stream_threshold_mb * 1024 * 1024
+
     @property
     def block_iframe_enabled(self) -> bool:
         return self.block_iframe == "on" or (self.block_iframe == "auto" and self.freeze_js_enabled)
@@ -1,16 +1,21 @@
 from __future__ import annotations
 
 import re
+from collections.abc import Iterable
+from dataclasses import dataclass
 from itertools import count
 
 from lxml import etree
 
+from web2ru.extract.code_comments import CodeScan, looks_like_prose, scan_code_text
 from web2ru.extract.exclude_rules import (
+    RuleMatcher,
     is_template_shadow_root,
-    should_skip_element,
     should_skip_text_content,
 )
 from web2ru.extract.normalize_ws import is_punctuation_or_ws, split_whitespace
+from web2ru.extract.scope import visible_text_lengths
+from web2ru.extract.string_pool import StringPool
 from web2ru.models import AttributeItem, Block, NodeRef, Part
 
 PRIMARY_BLOCK_TAGS = {
@@ -36,76 +41,36 @@ CODE_CONTAINER_TAGS = {"pre", "code"}
 PROSE_PRE_LANGS = {"markdown", "md", "txt", "text", "plaintext", "plain"}
 
 _LANG_TOKEN_RE = re.compile(r"(?:^|\s)(?:language|lang)-([a-z0-9_+-]+)")
-_CODE_SIGNAL_RE = re.compile(
-    r"([{};]|=>|\b(def|class|function|return|import|from|const|let|var|if|for|while|switch|case)\b|^\s*[$>])"
-)
-_PROSE_SIGNAL_RE = re.compile(r"[.!?]|\b(the|and|with|from|that|this|when|where)\b", re.IGNORECASE)
-_BLOCK_COMMENT_RE = re.compile(r"/\*([\s\S]*?)\*/")
-_HTML_COMMENT_RE = re.compile(r"<!--([\s\S]*?)-->")
-_LINE_COMMENT_RE = re.compile(r"^\s*(#|//|--)\s?(.*)$")
 
 # Scope selection already narrows content; default exclusions are empty to avoid dropping article text
 # on sites that semantically overuse `nav`/`header` wrappers.
 DEFAULT_MAIN_EXCLUDES: list[str] = []
 
 
-def _mark_excluded(scope_root: etree._Element, selectors: list[str]) -> set[int]:
-    excluded: set[int] = set()
-    for selector in selectors:
-        try:
-            nodes = scope_root.cssselect(selector)
-        except Exception:
+def _nodes_with_nested_primary(scope_root: etree._Element) -> set[etree._Element]:
+    marked: set[etree._Element] = set()
+    for el in reversed(list(scope_root.iter())):
+        if el is scope_root:
             continue
-        for node in nodes:
-            if not isinstance(node, etree._Element):
-                continue
-            for descendant in node.iter():
-                excluded.add(id(descendant))
-    return excluded
-
-
-def _is_excluded(node: etree._Element, excluded_ids: set[int]) -> bool:
-    current: etree._Element | None = node
-    while current is not None:
-        if id(current) in excluded_ids:
-            return True
-        current = current.getparent()
-    return False
-
-
-def _visible_text_len(node: etree._Element, excluded_ids: set[int]) -> int:
-    total = 0
-    for el in node.iter():
-        if not isinstance(el, etree._Element):
-            continue
-        if _is_excluded(el, excluded_ids):
-            continue
-        if should_skip_element(el):
-            continue
-        if el.text:
-            total += len(el.text.strip())
-    return total
-
-
-def _has_nested_primary(node: etree._Element) -> bool:
-    for el in node.iterdescendants():
-        if isinstance(el.tag, str) and el.tag.lower() in PRIMARY_BLOCK_TAGS:
-            return True
-    return False
+        if el in marked or (isinstance(el.tag, str) and el.tag.lower() in PRIMARY_BLOCK_TAGS):
+            parent = el.getparent()
+            if parent is not None:
+                marked.add(parent)
+    return marked
 
 
 def _iter_text_slots(
     node: etree._Element,
     *,
-    excluded_ids: set[int],
+    rules: RuleMatcher,
     allow_code_blocks: bool = False,
 ) -> list[tuple[etree._Element, str, str]]:
     slots: list[tuple[etree._Element, str, str]] = []
 
     def walk(current: etree._Element) -> None:
-        if _is_excluded(current, excluded_ids):
+        if rules.is_excluded(current):
             return
-        if should_skip_element(
+        if rules.should_skip(
             current, allow_code_blocks=allow_code_blocks
         ) and not is_template_shadow_root(current):
             return
@@ -141,93 +106,6 @@ def _pre_language_hint(pre_node: etree._Element) -> str | None:
     return None
 
 
-def _is_prose_pre_block(
-    pre_node: etree._Element, slots: list[tuple[etree._Element, str, str]]
-) -> bool:
-    lang = _pre_language_hint(pre_node)
-    if lang in PROSE_PRE_LANGS:
-        return True
-    if lang is not None:
-        return False
-
-    lines: list[str] = []
-    for _, _, raw in slots:
-        lines.extend(raw.splitlines())
-    non_empty = [line.strip() for line in lines if line.strip()]
-    if not non_empty:
-        return False
-
-    code_score = sum(1 for line in non_empty if _CODE_SIGNAL_RE.search(line))
-    prose_score = sum(1 for line in non_empty if _PROSE_SIGNAL_RE.search(line))
-    if code_score == 0:
-        return True
-    return not (code_score >= max(2, len(non_empty) // 2) and code_score > prose_score)
-
-
-def _comment_spans(raw: str) -> list[tuple[int, int]]:
-    spans: list[tuple[int, int]] = []
-
-    for pattern in (_BLOCK_COMMENT_RE, _HTML_COMMENT_RE):
-        for match in pattern.finditer(raw):
-            start, end = match.span(1)
-            if start < end:
-                spans.append((start, end))
-
-    cursor = 0
-    for line in raw.splitlines(keepends=True):
-        line_no_nl = line.rstrip("\r\n")
-        line_start = cursor
-        cursor += len(line)
-        line_match = _LINE_COMMENT_RE.match(line_no_nl)
-        if line_match:
-            comment = line_match.group(2)
-            if comment:
-                comment_offset = line_no_nl.find(comment)
-                spans.append(
-                    (
-                        line_start + comment_offset,
-                        line_start + comment_offset + len(comment),
-                    )
-                )
-            continue
-
-        idx = line_no_nl.find("//")
-        if idx > 0 and line_no_nl[idx - 1] != ":":
-            start = line_start + idx + 2
-            end = line_start + len(line_no_nl)
-            if start < end:
-                spans.append((start, end))
-            continue
-
-        idx = line_no_nl.find(" #")
-        if idx >= 0:
-            start = line_start + idx + 2
-            end = line_start + len(line_no_nl)
-            if start < end:
-                spans.append((start, end))
-            continue
-
-        idx = line_no_nl.find(" --")
-        if idx >= 0:
-            start = line_start + idx + 3
-            end = line_start + len(line_no_nl)
-            if start < end:
-                spans.append((start, end))
-
-    spans.sort()
-    merged: list[tuple[int, int]] = []
-    for start, end in spans:
-        if not merged:
-            merged.append((start, end))
-            continue
-        prev_start, prev_end = merged[-1]
-        if start <= prev_end:
-            merged[-1] = (prev_start, max(prev_end, end))
-        else:
-            merged.append((start, end))
-    return merged
-
-
 def _make_full_part(
     *,
     raw: str,
@@ -235,6 +113,7 @@ def _make_full_part(
     field: str,
     root_tree: etree._ElementTree,
     part_counter: count[int],
+    pool: StringPool,
 ) -> Part | None:
     if should_skip_text_content(raw):
         return None
@@ -243,11 +122,10 @@ def _make_full_part(
         return None
     return Part(
         id=f"t_{next(part_counter):06d}",
-        raw=raw,
-        lead_ws=lead,
+        lead_ws=pool.intern(lead),
         core=core,
-        trail_ws=trail,
-        node_ref=NodeRef(xpath=root_tree.getpath(slot_node), field=field),
+        trail_ws=pool.intern(trail),
+        node_ref=NodeRef(xpath=pool.intern(root_tree.getpath(slot_node)), field=field),
         block_id="",
     )
 
@@ -255,13 +133,16 @@ def _make_full_part(
 def _make_comment_parts(
     *,
     raw: str,
+    scan: CodeScan,
     slot_node: etree._Element,
     field: str,
     root_tree: etree._ElementTree,
     part_counter: count[int],
+    pool: StringPool,
 ) -> list[Part]:
     parts: list[Part] = []
-    for start, end in _comment_spans(raw):
+    xpath = pool.intern(root_tree.getpath(slot_node)) if scan.spans else ""
+    for start, end in scan.spans:
         segment = raw[start:end]
         lead, core, trail = split_whitespace(segment)
         if not core or is_punctuation_or_ws(core):
@@ -269,12 +150,11 @@ def _make_comment_parts(
         parts.append(
             Part(
                 id=f"t_{next(part_counter):06d}",
-                raw=segment,
-                lead_ws=lead,
+                lead_ws=pool.intern(lead),
                 core=core,
-                trail_ws=trail,
+                trail_ws=pool.intern(trail),
                 node_ref=NodeRef(
-                    xpath=root_tree.getpath(slot_node),
+                    xpath=xpath,
                     field=field,
                     start_offset=start + len(lead),
                     end_offset=end - len(trail),
@@ -287,28 +167,33 @@ def _make_comment_parts(
 
 def _extract_pre_blocks(
     *,
-    scope_root: etree._Element,
-    excluded_ids: set[int],
+    elements: Iterable[etree._Element],
+    rules: RuleMatcher,
     root_tree: etree._ElementTree,
     part_counter: count[int],
     block_counter: count[int],
+    pool: StringPool,
 ) -> list[Block]:
     blocks: list[Block] = []
-    for pre in scope_root.iterdescendants():
+    for pre in elements:
         if not isinstance(pre.tag, str) or pre.tag.lower() != "pre":
             continue
-        if _is_excluded(pre, excluded_ids):
+        if rules.is_excluded(pre):
             continue
-        if should_skip_element(pre, allow_code_blocks=True):
+        if rules.should_skip(pre, allow_code_blocks=True):
             continue
 
-        slots = _iter_text_slots(pre, excluded_ids=excluded_ids, allow_code_blocks=True)
+        slots = _iter_text_slots(pre, rules=rules, allow_code_blocks=True)
         if not slots:
             continue
 
-        prose_mode = _is_prose_pre_block(pre, slots)
+        lang = _pre_language_hint(pre)
+        scans: list[CodeScan] = []
+        if lang not in PROSE_PRE_LANGS:
+            scans = [scan_code_text(raw, lang=lang) for _, _, raw in slots]
+        prose_mode = not scans or (lang is None and looks_like_prose(scans))
         parts: list[Part] = []
-        for slot_node, field, raw in slots:
+        for index, (slot_node, field, raw) in enumerate(slots):
             if prose_mode:
                 part = _make_full_part(
                     raw=raw,
@@ -316,6 +201,7 @@ def _extract_pre_blocks(
                     field=field,
                     root_tree=root_tree,
                     part_counter=part_counter,
+                    pool=pool,
                 )
                 if part is not None:
                     parts.append(part)
@@ -323,10 +209,12 @@ def _extract_pre_blocks(
                 parts.extend(
                     _make_comment_parts(
                         raw=raw,
+                        scan=scans[index],
                         slot_node=slot_node,
                         field=field,
                         root_tree=root_tree,
                         part_counter=part_counter,
+                        pool=pool,
                     )
                 )
 
@@ -340,66 +228,169 @@ def _extract_pre_blocks(
     return blocks
 
 
+@dataclass(slots=True)
+class SubtreeBlocks:
+    """Blocks of one subtree with subtree-local ids, kept apart so they can be merged in serial order."""
+
+    primary_nodes: int
+    blocks: list[Block]
+    pre_blocks: list[Block]
+
+
+def build_rule_matcher(
+    scope_root: etree._Element, *, scope_mode: str, exclude_selectors: list[str]
+) -> RuleMatcher:
+    selectors = list(exclude_selectors)
+    if scope_mode in {"main", "auto"}:
+        selectors.extend(DEFAULT_MAIN_EXCLUDES)
+    return RuleMatcher(scope_root, selectors)
+
+
 def extract_blocks(
     scope_root: etree._Element,
     *,
     scope_mode: str,
     translation_unit: str,
     exclude_selectors: list[str],
-) -> tuple[list[Block], set[int]]:
-    selectors = list(exclude_selectors)
-    if scope_mode in {"main", "auto"}:
-        selectors.extend(DEFAULT_MAIN_EXCLUDES)
-    excluded_ids = _mark_excluded(scope_root, selectors)
+) -> tuple[list[Block], RuleMatcher]:
+    rules = build_rule_matcher(
+        scope_root, scope_mode=scope_mode, exclude_selectors=exclude_selectors
+    )
 
     if translation_unit == "textnode":
-        return _extract_textnode_blocks(scope_root, excluded_ids), excluded_ids
-    return _extract_block_mode(scope_root, excluded_ids), excluded_ids
+        return _extract_textnode_blocks(scope_root, rules), rules
+    return _extract_block_mode(scope_root, rules), rules
+
+
+def extract_subtree_blocks(
+    root: etree._Element, *, rules: RuleMatcher, translation_unit: str
+) -> SubtreeBlocks:
+    """Extract the blocks of ``root`` and its descendants as if they were part of a larger scope.
+
+    No div fallback is applied here: the caller decides that once every subtree is known.
+    """
+    root_tree = root.getroottree()
+    part_counter = count(1)
+    block_counter = count(1)
+    pool = StringPool()
+    if translation_unit == "textnode":
+        blocks = _textnode_blocks(
+            root.iter(),
+            rules=rules,
+            root_tree=root_tree,
+            part_counter=part_counter,
+            block_counter=block_counter,
+            pool=pool,
+        )
+        return SubtreeBlocks(primary_nodes=0, blocks=blocks, pre_blocks=[])
+
+    block_nodes = _primary_block_nodes(root.iter(), rules)
+    blocks = _blocks_for_nodes(
+        block_nodes,
+        rules=rules,
+        root_tree=root_tree,
+        part_counter=part_counter,
+        block_counter=block_counter,
+        pool=pool,
+    )
+    pre_blocks = _extract_pre_blocks(
+        elements=root.iter(),
+        rules=rules,
+        root_tree=root_tree,
+        part_counter=part_counter,
+        block_counter=block_counter,
+        pool=pool,
+    )
+    return SubtreeBlocks(primary_nodes=len(block_nodes), blocks=blocks, pre_blocks=pre_blocks)
 
 
-def _extract_block_mode(scope_root: etree._Element, excluded_ids: set[int]) -> list[Block]:
+def _primary_block_nodes(
+    elements: Iterable[etree._Element], rules: RuleMatcher
+) -> list[etree._Element]:
     block_nodes: list[etree._Element] = []
-    for element in scope_root.iterdescendants():
+    for element in elements:
         if not isinstance(element.tag, str):
             continue
-        if _is_excluded(element, excluded_ids):
+        if rules.is_excluded(element):
             continue
-        if should_skip_element(element):
+        if rules.should_skip(element):
             continue
         if element.tag.lower() in PRIMARY_BLOCK_TAGS:
             block_nodes.append(element)
+    return block_nodes
+
+
+def _extract_block_mode(scope_root: etree._Element, rules: RuleMatcher) -> list[Block]:
+    block_nodes = _primary_block_nodes(scope_root.iterdescendants(), rules)
 
     if not block_nodes:
+        text_lengths = visible_text_lengths(
+            scope_root,
+            include_tail=False,
+            skip=lambda el: rules.is_excluded(el) or rules.should_skip(el),
+        )
+        with_nested_primary = _nodes_with_nested_primary(scope_root)
         fallback_candidates: list[etree._Element] = []
         for element in scope_root.iterdescendants():
             if not isinstance(element.tag, str):
                 continue
             if element.tag.lower() not in {"div", "section"}:
                 continue
-            if _is_excluded(element, excluded_ids):
+            if rules.is_excluded(element):
                 continue
-            if should_skip_element(element):
+            if rules.should_skip(element):
                 continue
-            if _has_nested_primary(element):
+            if element in with_nested_primary:
                 continue
-            if _visible_text_len(element, excluded_ids) >= 120:
+            if text_lengths.get(element, 0) >= 120:
                 fallback_candidates.append(element)
         block_nodes = fallback_candidates or [scope_root]
 
     part_counter = count(1)
     block_counter = count(1)
+    pool = StringPool()
     root_tree = scope_root.getroottree()
-    blocks: list[Block] = []
+    blocks = _blocks_for_nodes(
+        block_nodes,
+        rules=rules,
+        root_tree=root_tree,
+        part_counter=part_counter,
+        block_counter=block_counter,
+        pool=pool,
+    )
+    blocks.extend(
+        _extract_pre_blocks(
+            elements=scope_root.iterdescendants(),
+            rules=rules,
+            root_tree=root_tree,
+            part_counter=part_counter,
+            block_counter=block_counter,
+            pool=pool,
+        )
+    )
+    return blocks
+
 
+def _blocks_for_nodes(
+    block_nodes: list[etree._Element],
+    *,
+    rules: RuleMatcher,
+    root_tree: etree._ElementTree,
+    part_counter: count[int],
+    block_counter: count[int],
+    pool: StringPool,
+) -> list[Block]:
+    blocks: list[Block] = []
     for block_node in block_nodes:
         parts: list[Part] = []
-        for slot_node, field, raw in _iter_text_slots(block_node, excluded_ids=excluded_ids):
+        for slot_node, field, raw in _iter_text_slots(block_node, rules=rules):
             part = _make_full_part(
                 raw=raw,
                 slot_node=slot_node,
                 field=field,
                 root_tree=root_tree,
                 part_counter=part_counter,
+                pool=pool,
             )
             if part is not None:
                 parts.append(part)
@@ -411,33 +402,38 @@ def _extract_block_mode(scope_root: etree._Element, excluded_ids: set[int]) -> l
         for part in parts:
             part.block_id = block_id
         blocks.append(Block(block_id=block_id, context=context, parts=parts))
+    return blocks
 
-    blocks.extend(
-        _extract_pre_blocks(
-            scope_root=scope_root,
-            excluded_ids=excluded_ids,
-            root_tree=root_tree,
-            part_counter=part_counter,
-            block_counter=block_counter,
-        )
+
+def _extract_textnode_blocks(scope_root: etree._Element, rules: RuleMatcher) -> list[Block]:
+    return _textnode_blocks(
+        scope_root.iterdescendants(),
+        rules=rules,
+        root_tree=scope_root.getroottree(),
+        part_counter=count(1),
+        block_counter=count(1),
+        pool=StringPool(),
     )
-    return blocks
 
 
-def _extract_textnode_blocks(scope_root: etree._Element, excluded_ids: set[int]) -> list[Block]:
-    root_tree = scope_root.getroottree()
-    part_counter = count(1)
-    block_counter = count(1)
+def _textnode_blocks(
+    nodes: Iterable[etree._Element],
+    *,
+    rules: RuleMatcher,
+    root_tree: etree._ElementTree,
+    part_counter: count[int],
+    block_counter: count[int],
+    pool: StringPool,
+) -> list[Block]:
     blocks: list[Block] = []
-
-    for node in scope_root.iterdescendants():
+    for node in nodes:
         if not isinstance(node, etree._Element):
             continue
-        if _is_excluded(node, excluded_ids):
+        if rules.is_excluded(node):
             continue
-        if should_skip_element(node):
+        if rules.should_skip(node):
             continue
-        slots = _iter_text_slots(node, excluded_ids=excluded_ids)
+        slots = _iter_text_slots(node, rules=rules)
         for slot_node, field, raw in slots:
             if should_skip_text_content(raw):
                 continue
@@ -448,11 +444,10 @@ def _extract_textnode_blocks(scope_root: etree._Element, excluded_ids: set[int])
             part_id = f"t_{next(part_counter):06d}"
             part = Part(
                 id=part_id,
-                raw=raw,
-                lead_ws=lead,
+                lead_ws=pool.intern(lead),
                 core=core,
-                trail_ws=trail,
-                node_ref=NodeRef(xpath=root_tree.getpath(slot_node), field=field),
+                trail_ws=pool.intern(trail),
+                node_ref=NodeRef(xpath=pool.intern(root_tree.getpath(slot_node)), field=field),
                 block_id=block_id,
             )
             blocks.append(Block(block_id=block_id, context=core, parts=[part]))
@@ -470,7 +465,7 @@ def extract_attribute_items(
     *,
     translate_attrs: bool,
     translate_alt: str,
-    excluded_ids: set[int],
+    rules: RuleMatcher,
 ) -> list[AttributeItem]:
     if not translate_attrs:
         return []
@@ -482,9 +477,9 @@ def extract_attribute_items(
     for element in scope_root.iterdescendants():
         if not isinstance(element.tag, str):
             continue
-        if _is_excluded(element, excluded_ids):
+        if rules.is_excluded(element):
             continue
-        if should_skip_element(element):
+        if rules.should_skip(element):
             continue
         xpath = root_tree.getpath(element)
 
@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import hashlib
+import re
+from dataclasses import dataclass
+
+_CODE_SIGNAL_RE = re.compile(
+    r"([{};]|=>|\b(def|class|function|return|import|from|const|let|var|if|for|while|switch|case)\b|^\s*[$>])"
+)
+_PROSE_SIGNAL_RE = re.compile(r"[.!?]|\b(the|and|with|from|that|this|when|where)\b", re.IGNORECASE)
+
+_HASH = frozenset({"#"})
+_C_LIKE = frozenset({"//", "/*"})
+_SQL = frozenset({"--", "/*"})
+_MARKUP = frozenset({"<!--"})
+_ALL_MARKERS = frozenset({"#", "//", "--", "/*", "<!--"})
+
+# Comment markers per `_pre_language_hint` value; unknown languages fall back to every marker.
+COMMENT_MARKERS_BY_LANG: dict[str, frozenset[str]] = {
+    **dict.fromkeys(
+        [
+            "python",
+            "py",
+            "ruby",
+            "rb",
+            "bash",
+            "sh",
+            "shell",
+            "zsh",
+            "yaml",
+            "yml",
+            "toml",
+            "perl",
+            "r",
+            "makefile",
+            "dockerfile",
+            "powershell",
+            "ps1",
+            "nix",
+            "elixir",
+            "coffeescript",
+        ],
+        _HASH,
+    ),
+    **dict.fromkeys(
+        [
+            "c",
+            "cpp",
+            "c++",
+            "h",
+            "hpp",
+            "java",
+            "javascript",
+            "js",
+            "jsx",
+            "typescript",
+            "ts",
+            "tsx",
+            "go",
+            "golang",
+            "rust",
+            "rs",
+            "swift",
+            "kotlin",
+            "kt",
+            "csharp",
+            "cs",
+            "scala",
+            "dart",
+            "scss",
+            "less",
+            "jsonc",
+        ],
+        _C_LIKE,
+    ),
+    **dict.fromkeys(
+        ["sql", "mysql", "psql", "plsql", "postgres", "postgresql", "tsql"],
+        _SQL,
+    ),
+    **dict.fromkeys(["lua", "haskell", "hs"], frozenset({"--"})),
+    **dict.fromkeys(["html", "xml", "xhtml", "svg", "vue", "markup"], _MARKUP),
+    "css": frozenset({"/*"}),
+    "php": frozenset({"#", "//", "/*"}),
+    "json": frozenset(),
+}
+
+_BLOCK_CLOSERS = {"/*": "*/", "<!--": "-->"}
+_SCAN_CACHE_MAX = 4096
+
+
+@dataclass(frozen=True, slots=True)
+class CodeScan:
+    spans: tuple[tuple[int, int], ...]
+    non_empty_lines: int = 0
+    code_lines: int = 0
+    prose_lines: int = 0
+
+
+_scan_cache: dict[tuple[bytes, frozenset[str], bool], CodeScan] = {}
+
+
+def markers_for_language(lang: str | None) -> frozenset[str]:
+    if lang is None:
+        return _ALL_MARKERS
+    return COMMENT_MARKERS_BY_LANG.get(lang, _ALL_MARKERS)
+
+
+def scan_code_text(text: str, *, lang: str | None) -> CodeScan:
+    """Comment spans of one code text node, plus prose/code line signals when ``lang`` is unknown.
+
+    Results are cached by content hash, so repeated snippets on large documentation sites are
+    scanned once per process.
+    """
+    markers = markers_for_language(lang)
+    classify = lang is None
+    key = (hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest(), markers, classify)
+    cached = _scan_cache.get(key)
+    if cached is not None:
+        return cached
+    result = _scan(text, markers, classify=classify)
+    if len(_scan_cache) >= _SCAN_CACHE_MAX:
+        _scan_cache.clear()
+    _scan_cache[key] = result
+    return result
+
+
+def looks_like_prose(scans: list[CodeScan]) -> bool:
+    non_empty = sum(scan.non_empty_lines for scan in scans)
+    if not non_empty:
+        return False
+    code_score = sum(scan.code_lines for scan in scans)
+    prose_score = sum(scan.prose_lines for scan in scans)
+    if code_score == 0:
+        return True
+    return not (code_score >= max(2, non_empty // 2) and code_score > prose_score)
+
+
+def _scan(text: str, markers: frozenset[str], *, classify: bool) -> CodeScan:
+    spans: list[tuple[int, int]] = []
+    non_empty = code_lines = prose_lines = 0
+    openers: list[str] = [marker for marker in ("/*", "<!--") if marker in markers]
+    line_markers: list[str] = [marker for marker in ("#", "//", "--") if marker in markers]
+    # An opener with no closer anywhere after it is not a comment, same as the non-greedy regex
+    # scan this replaced; such openers (globs like ``src/*``) are plain text, so the lines after
+    # them keep their line comments. Once one is found, every later one of its kind is too.
+    last_close = {opener: text.rfind(_BLOCK_CLOSERS[opener]) for opener in openers}
+    block_closer: str | None = None
+    block_start = 0
+    cursor = 0
+
+    for line in text.splitlines(keepends=True):
+        line_start = cursor
+        cursor += len(line)
+        body = line.rstrip("\r\n")
+
+        if classify:
+            stripped = body.strip()
+            if stripped:
+                non_empty += 1
+                if _CODE_SIGNAL_RE.search(stripped):
+                    code_lines += 1
+                if _PROSE_SIGNAL_RE.search(stripped):
+                    prose_lines += 1
+
+        col = 0
+        if block_closer is not None:
+            close = body.find(block_closer)
+            if close < 0:
+                continue
+            if block_start < line_start + close:
+                spans.append((block_start, line_start + close))
+            col = close + len(block_closer)
+            block_closer = None
+
+        while True:
+            comment = _line_comment(body, line_markers, col) if line_markers else None
+            # Openers inside a line comment (``// see /*``) are part of the comment.
+            limit = len(body) if comment is None else comment[0]
+            idx = -1
+            opener = ""
+            for candidate in list(openers):
+                pos = body.find(candidate, col, limit)
+                if pos < 0 or (idx >= 0 and pos > idx):
+                    continue
+                if last_close[candidate] < line_start + pos + len(candidate):
+                    openers.remove(candidate)
+                    continue
+                idx, opener = pos, candidate
+            if idx < 0:
+                if comment is not None and comment[1] < len(body):
+                    spans.append((line_start + comment[1], line_start + len(body)))
+                break
+            inner = idx + len(opener)
+            closer = _BLOCK_CLOSERS[opener]
+            close = body.find(closer, inner)
+            if close < 0:
+                block_closer = closer
+                block_start = line_start + inner
+                break
+            if inner < close:
+                spans.append((line_start + inner, line_start + close))
+            col = close + len(closer)
+
+    return CodeScan(
+        spans=tuple(_merge_spans(spans)),
+        non_empty_lines=non_empty,
+        code_lines=code_lines,
+        prose_lines=prose_lines,
+    )
+
+
+def _line_comment(body: str, line_markers: list[str], col: int) -> tuple[int, int] | None:
+    """``(marker offset, text offset)`` of the line comment at or after ``col``, if any."""
+    indent = len(body) - len(body.lstrip())
+    if col <= indent:
+        for marker in line_markers:
+            if body.startswith(marker, indent):
+                start = indent + len(marker)
+                if start < len(body) and body[start].isspace():
+                    start += 1
+                return indent, start
+
+    if "//" in line_markers:
+        idx = body.find("//", col)
+        if idx > 0 and body[idx - 1] != ":":
+            return idx, idx + 2
+    if "#" in line_markers:
+        idx = body.find(" #", col)
+        if idx >= 0:
+            return idx + 1, idx + 2
+    if "--" in line_markers:
+        idx = body.find(" --", col)
+        if idx >= 0:
+            return idx + 1, idx + 3
+    return None
+
+
+def _merge_spans(spans: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    spans.sort()
+    merged: list[tuple[int, int]] = []
+    for start, end in spans:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
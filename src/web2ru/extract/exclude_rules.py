@@ -1,6 +1,10 @@
 from __future__ import annotations
 
+import time
+from functools import lru_cache
+
 from lxml import etree
+from lxml.cssselect import CSSSelector
 
 HARD_SKIP_TAGS = {
     "script",
@@ -16,6 +20,10 @@ HARD_SKIP_TAGS = {
     "math",
 }
 
+_SKIP = 1
+_SKIP_UNLESS_CODE = 2
+_EXCLUDED = 4
+
 
 def is_template_shadow_root(element: etree._Element) -> bool:
     return (
@@ -25,30 +33,90 @@ def is_template_shadow_root(element: etree._Element) -> bool:
     )
 
 
-def should_skip_element(element: etree._Element, *, allow_code_blocks: bool = False) -> bool:
+def _skip_flags(element: etree._Element) -> int:
     if not isinstance(element.tag, str):
-        return True
+        return _SKIP
     tag = element.tag.lower()
-    if tag == "template" and is_template_shadow_root(element):
-        return False
-    hard_skip = HARD_SKIP_TAGS if not allow_code_blocks else (HARD_SKIP_TAGS - {"code", "pre"})
-    if tag in hard_skip or tag == "template":
-        return True
+    if tag == "template":
+        return 0 if element.get("shadowrootmode") is not None else _SKIP
+    if tag in HARD_SKIP_TAGS and tag not in {"code", "pre"}:
+        return _SKIP
 
-    if (element.get("aria-hidden") or "").strip().lower() == "true":
-        return True
-    if element.get("hidden") is not None:
-        return True
-    if (element.get("translate") or "").strip().lower() == "no":
-        return True
-    if element.get("data-no-translate") is not None:
+    hidden = (
+        (element.get("aria-hidden") or "").strip().lower() == "true"
+        or element.get("hidden") is not None
+        or (element.get("translate") or "").strip().lower() == "no"
+        or element.get("data-no-translate") is not None
+        or "notranslate" in (element.get("class") or "").lower()
+    )
+    if hidden:
+        return _SKIP
+    if tag in {"code", "pre"}:
+        return _SKIP_UNLESS_CODE
+    return 0
+
+
+def _skip_from_flags(flags: int, allow_code_blocks: bool) -> bool:
+    if flags & _SKIP:
         return True
+    return bool(flags & _SKIP_UNLESS_CODE) and not allow_code_blocks
 
-    class_name = (element.get("class") or "").lower()
-    return "notranslate" in class_name
+
+def should_skip_element(element: etree._Element, *, allow_code_blocks: bool = False) -> bool:
+    return _skip_from_flags(_skip_flags(element), allow_code_blocks)
 
 
 def should_skip_text_content(value: str) -> bool:
     if not value:
         return True
     return bool(not value.strip())
+
+
+@lru_cache(maxsize=256)
+def compile_selector(selector: str) -> CSSSelector | None:
+    """Translate a CSS selector to XPath once per process; surf pages share the result."""
+    try:
+        return CSSSelector(selector, translator="html")
+    except Exception:
+        return None
+
+
+class RuleMatcher:
+    """Skip and exclude verdicts for every element under a scope root, evaluated in one pass."""
+
+    def __init__(self, scope_root: etree._Element, selectors: list[str]) -> None:
+        started = time.perf_counter()
+        matched: set[etree._Element] = set()
+        self.invalid_selectors: list[str] = []
+        for selector in selectors:
+            compiled = compile_selector(selector)
+            if compiled is None:
+                self.invalid_selectors.append(selector)
+                continue
+            try:
+                nodes = compiled(scope_root)
+            except Exception:
+                continue
+            matched.update(node for node in nodes if isinstance(node, etree._Element))
+
+        self._flags: dict[etree._Element, int] = {}
+        self.excluded_total = 0
+        for element in scope_root.iter():
+            flags = _skip_flags(element)
+            parent = element.getparent()
+            if element in matched or (
+                parent is not None and self._flags.get(parent, 0) & _EXCLUDED
+            ):
+                flags |= _EXCLUDED
+                self.excluded_total += 1
+            self._flags[element] = flags
+        self.match_ms = round((time.perf_counter() - started) * 1000, 3)
+
+    def is_excluded(self, element: etree._Element) -> bool:
+        return bool(self._flags.get(element, 0) & _EXCLUDED)
+
+    def should_skip(self, element: etree._Element, *, allow_code_blocks: bool = False) -> bool:
+        flags = self._flags.get(element)
+        if flags is None:
+            flags = _skip_flags(element)
+        return _skip_from_flags(flags, allow_code_blocks)
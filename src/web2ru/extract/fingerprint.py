@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import hashlib
+import re
+
+from web2ru.models import AttributeItem, Block, Part
+
+_POSITION_RE = re.compile(r"\[\d+\]")
+_WS_RE = re.compile(r"\s+")
+
+
+def tag_path(xpath: str) -> str:
+    """``/html/body/div[3]/p[2]`` -> ``/html/body/div/p``: survives sibling inserts above the node."""
+    return _POSITION_RE.sub("", xpath)
+
+
+def normalize_text(value: str) -> str:
+    return _WS_RE.sub(" ", value).strip()
+
+
+def _digest(*fields: str) -> str:
+    return hashlib.sha256("\x1f".join(fields).encode("utf-8")).hexdigest()[:32]
+
+
+def part_fingerprint(part: Part) -> str:
+    """Position-independent identity of a part: its tag path, node field and normalized text."""
+    return _digest(tag_path(part.node_ref.xpath), part.node_ref.field, normalize_text(part.core))
+
+
+def attr_fingerprint(attr: AttributeItem) -> str:
+    return _digest(tag_path(attr.node_ref.xpath), attr.hint, normalize_text(attr.text))
+
+
+def block_fingerprint(block: Block) -> str:
+    return _digest(*(part_fingerprint(part) for part in block.parts))
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import count
+
+from lxml import etree
+
+from web2ru.extract.block_extractor import (
+    CODE_CONTAINER_TAGS,
+    PRIMARY_BLOCK_TAGS,
+    SubtreeBlocks,
+    build_rule_matcher,
+    extract_blocks,
+    extract_subtree_blocks,
+)
+from web2ru.extract.exclude_rules import RuleMatcher
+from web2ru.extract.string_pool import StringPool
+from web2ru.models import EMPTY_TOKEN_MAP, Block
+from web2ru.translate.token_protector import protect_text
+
+# Marks the top-most excluded elements of a serialized subtree; workers cannot re-run selectors
+# that depend on ancestors outside the subtree.
+EXCLUDED_MARK_ATTR = "data-web2ru-excluded"
+_CHUNKS_PER_WORKER = 4
+
+
+@dataclass(slots=True)
+class ParallelExtractStats:
+    workers: int = 1
+    subtrees: int = 0
+    serial_subtrees: int = 0
+    elapsed_ms: float = 0.0
+
+
+def resolve_extract_workers(requested: int) -> int:
+    if requested > 0:
+        return requested
+    return max(1, os.cpu_count() or 1)
+
+
+def extract_blocks_parallel(
+    scope_root: etree._Element,
+    *,
+    scope_mode: str,
+    translation_unit: str,
+    exclude_selectors: list[str],
+    workers: int,
+    min_nodes: int,
+    token_protect: bool,
+) -> tuple[list[Block], RuleMatcher, ParallelExtractStats]:
+    """Extract blocks from independent top-level subtrees in a process pool.
+
+    Ids and xpaths are assigned at merge time, so the result is identical to `extract_blocks`.
+    Small scopes, single-worker runs and scopes without primary blocks take the serial path.
+    """
+    started = time.perf_counter()
+    stats = ParallelExtractStats(workers=resolve_extract_workers(workers))
+    partition_root = _partition_root(scope_root, translation_unit=translation_unit)
+    subtrees = [child for child in partition_root if isinstance(child.tag, str)]
+    if stats.workers <= 1 or len(subtrees) < 2 or _count_nodes(scope_root) < min_nodes:
+        blocks, rules = extract_blocks(
+            scope_root,
+            scope_mode=scope_mode,
+            translation_unit=translation_unit,
+            exclude_selectors=exclude_selectors,
+        )
+        stats.workers = 1
+        stats.elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
+        return blocks, rules, stats
+
+    rules = build_rule_matcher(
+        scope_root, scope_mode=scope_mode, exclude_selectors=exclude_selectors
+    )
+    payloads = _serialize_subtrees(subtrees, rules)
+    chunks = _contiguous_chunks(payloads, stats.workers * _CHUNKS_PER_WORKER)
+    with ProcessPoolExecutor(max_workers=stats.workers) as executor:
+        chunk_results = list(
+            executor.map(
+                _extract_serialized_subtrees,
+                chunks,
+                [translation_unit] * len(chunks),
+                [token_protect] * len(chunks),
+            )
+        )
+
+    root_tree = scope_root.getroottree()
+    subtree_paths = _child_paths(partition_root, root_tree)
+    pool = StringPool()
+    results: list[SubtreeBlocks] = []
+    for subtree, result in zip(
+        subtrees, (result for chunk in chunk_results for result in chunk), strict=True
+    ):
+        stats.subtrees += 1
+        if result is None:
+            stats.serial_subtrees += 1
+            results.append(
+                extract_subtree_blocks(subtree, rules=rules, translation_unit=translation_unit)
+            )
+            continue
+        prefix = subtree_paths[subtree]
+        for block in (*result.blocks, *result.pre_blocks):
+            for part in block.parts:
+                # Unpickled strings are fresh copies; pool them like serial extraction does.
+                part.node_ref.xpath = pool.intern(prefix + part.node_ref.xpath)
+                part.lead_ws = pool.intern(part.lead_ws)
+                part.trail_ws = pool.intern(part.trail_ws)
+        results.append(result)
+
+    if translation_unit != "textnode" and not any(result.primary_nodes for result in results):
+        # The div fallback looks at the whole scope at once.
+        blocks, _ = extract_blocks(
+            scope_root,
+            scope_mode=scope_mode,
+            translation_unit=translation_unit,
+            exclude_selectors=exclude_selectors,
+        )
+    else:
+        blocks = _merge_subtree_blocks(results)
+    stats.elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
+    return blocks, rules, stats
+
+
+def _partition_root(scope_root: etree._Element, *, translation_unit: str) -> etree._Element:
+    # Descend through single-child wrappers such as `body > div#app`; in block mode they carry no
+    # blocks of their own unless they are block or code tags themselves.
+    node = scope_root
+    if translation_unit == "textnode":
+        return node
+    while True:
+        children = [child for child in node if isinstance(child.tag, str)]
+        if len(children) != 1:
+            return node
+        tag = children[0].tag.lower()
+        if tag in PRIMARY_BLOCK_TAGS or tag in CODE_CONTAINER_TAGS:
+            return node
+        node = children[0]
+
+
+def _count_nodes(root: etree._Element) -> int:
+    return sum(1 for _ in root.iter())
+
+
+def _serialize_subtrees(subtrees: list[etree._Element], rules: RuleMatcher) -> list[bytes]:
+    marked: list[etree._Element] = []
+    for subtree in subtrees:
+        for element in subtree.iter():
+            if not rules.is_excluded(element):
+                continue
+            parent = element.getparent()
+            if parent is None or not rules.is_excluded(parent):
+                element.set(EXCLUDED_MARK_ATTR, "")
+                marked.append(element)
+    try:
+        return [etree.tostring(subtree, method="xml", with_tail=False) for subtree in subtrees]
+    finally:
+        for element in marked:
+            del element.attrib[EXCLUDED_MARK_ATTR]
+
+
+def _contiguous_chunks(payloads: list[bytes], target_chunks: int) -> list[list[bytes]]:
+    budget = max(1, sum(len(payload) for payload in payloads) // max(1, target_chunks))
+    chunks: list[list[bytes]] = [[]]
+    size = 0
+    for payload in payloads:
+        if chunks[-1] and size + len(payload) > budget:
+            chunks.append([])
+            size = 0
+        chunks[-1].append(payload)
+        size += len(payload)
+    return chunks
+
+
+def _extract_serialized_subtrees(
+    payloads: list[bytes], translation_unit: str, token_protect: bool
+) -> list[SubtreeBlocks | None]:
+    """Worker entry point: parse each subtree on its own and return xpaths relative to its root."""
+    parser = etree.XMLParser(huge_tree=True, resolve_entities=False)
+    results: list[SubtreeBlocks | None] = []
+    for payload in payloads:
+        try:
+            root = etree.fromstring(payload, parser)
+        except etree.XMLSyntaxError:
+            # HTML-only constructs (unbound prefixes, `--` in comments) do not survive XML; the
+            # parent process extracts those subtrees in place.
+            results.append(None)
+            continue
+        rules = RuleMatcher(root, [f"[{EXCLUDED_MARK_ATTR}]"])
+        result = extract_subtree_blocks(root, rules=rules, translation_unit=translation_unit)
+        root_path = root.getroottree().getpath(root)
+        for block in (*result.blocks, *result.pre_blocks):
+            for part in block.parts:
+                part.node_ref.xpath = part.node_ref.xpath[len(root_path) :]
+                if token_protect:
+                    protected = protect_text(part.core)
+                    part.protected_core = protected.text
+                    part.token_map = protected.mapping or EMPTY_TOKEN_MAP
+        results.append(result)
+    return results
+
+
+def _child_paths(
+    parent: etree._Element, root_tree: etree._ElementTree
+) -> dict[etree._Element, str]:
+    """Absolute xpaths of element children, built in one pass instead of one `getpath` each."""
+    base = root_tree.getpath(parent)
+    children = [child for child in parent if isinstance(child.tag, str)]
+    totals: dict[str, int] = {}
+    for child in children:
+        totals[child.tag] = totals.get(child.tag, 0) + 1
+    seen: dict[str, int] = {}
+    paths: dict[etree._Element, str] = {}
+    for child in children:
+        tag = child.tag
+        if "{" in tag or ":" in tag:
+            paths[child] = root_tree.getpath(child)
+            continue
+        seen[tag] = seen.get(tag, 0) + 1
+        suffix = f"[{seen[tag]}]" if totals[tag] > 1 else ""
+        paths[child] = f"{base}/{tag}{suffix}"
+    return paths
+
+
+def _merge_subtree_blocks(results: list[SubtreeBlocks]) -> list[Block]:
+    # Serial extraction numbers every primary block before any pre block; keep that order.
+    ordered = [block for result in results for block in result.blocks]
+    ordered.extend(block for result in results for block in result.pre_blocks)
+    part_counter = count(1)
+    block_counter = count(1)
+    for block in ordered:
+        block.block_id = f"b_{next(block_counter):06d}"
+        for part in block.parts:
+            part.id = f"t_{next(part_counter):06d}"
+            part.block_id = block.block_id
+    return ordered
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from collections.abc import Callable
+
 from lxml import etree, html
 
 from web2ru.extract.exclude_rules import should_skip_element
@@ -15,16 +17,33 @@ def _first_xpath(root: html.HtmlElement, expr: str) -> etree._Element | None:
     return None
 
 
-def _visible_text_len(el: etree._Element) -> int:
-    total = 0
-    for descendant in el.iter():
-        if should_skip_element(descendant):
+def visible_text_lengths(
+    root: etree._Element,
+    *,
+    include_tail: bool = True,
+    skip: Callable[[etree._Element], bool] = should_skip_element,
+) -> dict[etree._Element, int]:
+    """Visible text length of every subtree under ``root``, computed in one bottom-up pass.
+
+    Skipped elements contribute no text of their own, but their descendants are still counted.
+    The table keeps the element proxies alive, so lookups stay valid while it is in use.
+    """
+    totals: dict[etree._Element, int] = {}
+    for node in reversed(list(root.iter())):
+        own = 0
+        if not skip(node):
+            if node.text:
+                own += len(node.text.strip())
+            if include_tail and node.tail:
+                own += len(node.tail.strip())
+        total = totals.get(node, 0) + own
+        totals[node] = total
+        if node is root:
             continue
-        if descendant.text:
-            total += len(descendant.text.strip())
-        if descendant.tail:
-            total += len(descendant.tail.strip())
-    return total
+        parent = node.getparent()
+        if parent is not None:
+            totals[parent] = totals.get(parent, 0) + total
+    return totals
 
 
 def select_scope(root: html.HtmlElement, scope: str) -> etree._Element:
@@ -41,13 +60,13 @@ def select_scope(root: html.HtmlElement, scope: str) -> etree._Element:
             if node is not None:
                 return node
 
-        candidates = root.xpath("//section|//div")
+        text_lengths = visible_text_lengths(root)
         best = body
-        best_score = _visible_text_len(best)
-        for candidate in candidates:
+        best_score = text_lengths.get(best, 0)
+        for candidate in root.xpath("//section|//div"):
             if not isinstance(candidate, etree._Element):
                 continue
-            score = _visible_text_len(candidate)
+            score = text_lengths.get(candidate, 0)
             if score > best_score:
                 best = candidate
                 best_score = score
@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+
+class StringPool:
+    """Hands out one shared instance per distinct string value for the lifetime of an extraction.
+
+    Whitespace runs and xpaths repeat heavily on large pages (every comment span of a code slot and
+    every textnode-mode ancestor points at the same node); pooling them keeps one copy each.
+    """
+
+    __slots__ = ("_strings",)
+
+    def __init__(self) -> None:
+        self._strings: dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+    def intern(self, value: str) -> str:
+        return self._strings.setdefault(value, value)
@@ -1,10 +1,36 @@
 from __future__ import annotations
 
+from collections.abc import Iterator, Mapping
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any
 
 
+class _EmptyTokenMap(Mapping[str, str]):
+    __slots__ = ()
+
+    def __getitem__(self, key: str) -> str:
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(())
+
+    def __len__(self) -> int:
+        return 0
+
+    def __reduce__(self) -> str:
+        # Unpickles (e.g. from extraction workers) to the shared singleton below.
+        return "EMPTY_TOKEN_MAP"
+
+
+# Most parts carry no protected tokens; they all share this read-only map instead of one dict each.
+EMPTY_TOKEN_MAP: Mapping[str, str] = _EmptyTokenMap()
+
+
+def _empty_token_map() -> Mapping[str, str]:
+    return EMPTY_TOKEN_MAP
+
+
 @dataclass(slots=True)
 class AssetRecord:
     url: str
@@ -12,8 +38,38 @@ class AssetRecord:
     content_type: str | None
     size: int
     sha256: str
-    data: bytes
     source: str
+    inline: bytes | None = None
+    # Large bodies stay on disk (spill file or asset store blob) and are read on demand.
+    path: Path | None = None
+    # Content type as captured, when the image stage re-encoded the body.
+    transcoded_from: str | None = None
+
+    @property
+    def data(self) -> bytes:
+        if self.inline is not None:
+            return self.inline
+        if self.path is not None:
+            return self.path.read_bytes()
+        return b""
+
+    @data.setter
+    def data(self, value: bytes) -> None:
+        self.inline = value
+        self.path = None
+        self.size = len(value)
+
+
+@dataclass(slots=True)
+class AssetWriteStats:
+    files: int = 0
+    bytes: int = 0
+    deduplicated: int = 0
+    linked: int = 0
+    blob_reused: int = 0
+    # Already present in the output directory with the record's hash, so not rewritten.
+    existing: int = 0
+    workers: int = 1
 
 
 @dataclass(slots=True)
@@ -25,6 +81,34 @@ class ShadowDomStats:
     errors: list[str] = field(default_factory=list)
 
 
+@dataclass(slots=True)
+class AssetRouteStats:
+    enabled: bool = False
+    hits: int = 0
+    misses: int = 0
+    passthrough: int = 0
+    bytes_served: int = 0
+
+
+@dataclass(slots=True)
+class ResourcePolicyStats:
+    preset: str = "off"
+    blocked_total: int = 0
+    blocked_by_reason: dict[str, int] = field(default_factory=dict)
+    skipped_large_bodies: int = 0
+
+
+@dataclass(slots=True)
+class BrowserRenderStats:
+    browser_reused: bool = False
+    warm_context: bool = False
+    launch_ms: float = 0.0
+    # Renders served by this browser so far, and pool-wide totals after this render.
+    slot_pages: int = 0
+    pool_launches: int = 0
+    pool_renders: int = 0
+
+
 @dataclass(slots=True)
 class OnlineRenderResult:
     final_url: str
@@ -33,6 +117,9 @@ class OnlineRenderResult:
     scroll_steps: int
     height_before: int
     height_after: int
+    asset_routes: AssetRouteStats = field(default_factory=AssetRouteStats)
+    resource_policy: ResourcePolicyStats = field(default_factory=ResourcePolicyStats)
+    browser: BrowserRenderStats = field(default_factory=BrowserRenderStats)
 
 
 @dataclass(slots=True)
@@ -47,7 +134,6 @@ class NodeRef:
 @dataclass(slots=True)
 class Part:
     id: str
-    raw: str
     lead_ws: str
     core: str
     trail_ws: str
@@ -55,7 +141,11 @@ class Part:
     block_id: str
     translated_core: str | None = None
     protected_core: str | None = None
-    token_map: dict[str, str] = field(default_factory=dict)
+    token_map: Mapping[str, str] = field(default_factory=_empty_token_map)
+
+    @property
+    def raw(self) -> str:
+        return f"{self.lead_ws}{self.core}{self.trail_ws}"
 
 
 @dataclass(slots=True)
@@ -73,7 +163,7 @@ class AttributeItem:
     node_ref: NodeRef
     translated_text: str | None = None
     protected_text: str | None = None
-    token_map: dict[str, str] = field(default_factory=dict)
+    token_map: Mapping[str, str] = field(default_factory=_empty_token_map)
 
 
 @dataclass(slots=True)
@@ -87,6 +177,7 @@ class TranslationItem:
     context_prev: str = ""
     context_next: str = ""
     section_hint: str = ""
+    fingerprint: str = ""
 
 
 @dataclass(slots=True)
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import time
+from contextlib import suppress
+from typing import Any
+
+from web2ru.assets.cache import AssetCache
+from web2ru.models import AssetRecord, AssetRouteStats, ResourcePolicyStats
+from web2ru.pipeline.resource_policy import ResourcePolicy, declared_size, record_block
+
+# Subresource types worth answering locally; documents, XHR/fetch and websockets always go out.
+CACHEABLE_RESOURCE_TYPES = frozenset({"stylesheet", "image", "font", "script", "media"})
+
+
+class AssetRouter:
+    """`page.route` handler: applies the resource policy, then serves fresh subresources locally."""
+
+    def __init__(
+        self,
+        asset_cache: AssetCache,
+        *,
+        max_asset_mb: int,
+        policy: ResourcePolicy | None = None,
+    ) -> None:
+        self._asset_cache = asset_cache
+        self._max_asset_mb = max_asset_mb
+        self._policy = policy
+        self.stats = AssetRouteStats(enabled=asset_cache.store is not None)
+        self.policy_stats = ResourcePolicyStats(preset=policy.preset if policy else "off")
+        self.served_urls: set[str] = set()
+
+    @property
+    def active(self) -> bool:
+        return self.stats.enabled or (self._policy is not None and self._policy.active)
+
+    def handle(self, route: Any) -> None:
+        # Playwright Route; typed loosely like the response capture in online_render.
+        resolved = False
+        try:
+            request = route.request
+            if self._policy is not None and not _is_main_document(request):
+                reason = self._policy.block_reason(request.url, request.resource_type)
+                if reason is None and self._exceeds_size_limit(route):
+                    reason = "size"
+                if reason is not None:
+                    record_block(self.policy_stats, reason)
+                    route.abort("blockedbyclient")
+                    resolved = True
+                    return
+            if not self._should_lookup(request):
+                self.stats.passthrough += 1
+                route.continue_()
+                resolved = True
+                return
+            record, headers = self._lookup(request)
+            if record is None or record.path is None:
+                self.stats.misses += 1
+                route.continue_()
+                resolved = True
+                return
+            # Playwright streams the file from disk; the body never enters Python memory.
+            route.fulfill(status=200, headers=headers, path=record.path)
+            resolved = True
+            self.stats.hits += 1
+            self.stats.bytes_served += record.size
+            self.served_urls.add(request.url)
+        except Exception:
+            if resolved:
+                # The page is already going away; nothing to recover.
+                return
+            # A lookup or fulfill failure must not leave the request pending until the
+            # navigation timeout: let it go to the network instead, best effort.
+            self.stats.misses += 1
+            with suppress(Exception):
+                route.continue_()
+
+    def _exceeds_size_limit(self, route: Any) -> bool:
+        """HEAD the request and compare its ``Content-Length`` with the asset cap.
+
+        Request headers carry no size, and by the time the response arrives the browser is
+        already downloading it, so this costs one round trip per checked request.
+        """
+        request = route.request
+        if self._policy is None or not self._policy.checks_size(request.resource_type):
+            return False
+        if request.method != "GET" or not str(request.url).startswith(("http://", "https://")):
+            return False
+        headers = {key: value for key, value in request.headers.items() if key.lower() != "range"}
+        try:
+            response = route.fetch(method="HEAD", headers=headers)
+        except Exception:  # noqa: BLE001 - unknown size: let the request through
+            return False
+        try:
+            size = declared_size({key.lower(): value for key, value in response.headers.items()})
+        finally:
+            with suppress(Exception):
+                response.dispose()
+        return size > self._max_asset_mb * 1024 * 1024
+
+    def _should_lookup(self, request: Any) -> bool:
+        if self._asset_cache.store is None or request.method != "GET":
+            return False
+        if request.resource_type not in CACHEABLE_RESOURCE_TYPES:
+            return False
+        return str(request.url).startswith(("http://", "https://"))
+
+    def _lookup(self, request: Any) -> tuple[AssetRecord | None, dict[str, str]]:
+        store = self._asset_cache.store
+        if store is None:
+            return None, {}
+        stored = store.lookup(request.url)
+        if stored is None or not stored.is_fresh():
+            return None, {}
+        if not self._asset_cache.put_stored(
+            url=request.url, stored=stored, max_asset_mb=self._max_asset_mb
+        ):
+            return None, {}
+        # Serve the run's own link to the blob: the store may evict it before the response.
+        record = self._asset_cache.get(request.url)
+        headers = {"cache-control": f"max-age={max(0, int(stored.expires_at - time.time()))}"}
+        if stored.content_type:
+            headers["content-type"] = stored.content_type
+        if stored.etag:
+            headers["etag"] = stored.etag
+        if stored.last_modified:
+            headers["last-modified"] = stored.last_modified
+        origin = request.headers.get("origin")
+        if origin:
+            # Cross-origin fonts and module scripts are fetched in CORS mode.
+            headers["access-control-allow-origin"] = origin
+            headers["access-control-allow-credentials"] = "true"
+            headers["vary"] = "Origin"
+        return record, headers
+
+
+def _is_main_document(request: Any) -> bool:
+    if request.resource_type != "document":
+        return False
+    frame = getattr(request, "frame", None)
+    return frame is None or frame.parent_frame is None
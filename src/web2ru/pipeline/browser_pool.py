@@ -0,0 +1,352 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from pathlib import Path
+from types import TracebackType
+from typing import Any, TypeVar
+
+from playwright.sync_api import Browser, BrowserContext, Playwright, sync_playwright
+
+from web2ru.models import BrowserRenderStats
+from web2ru.pipeline.persistent_context import launch_persistent_context_with_lock_recovery
+
+T = TypeVar("T")
+
+BROWSER_ARGS = ["--disable-blink-features=AutomationControlled"]
+PERSISTENT_BROWSER_ARGS = [
+    *BROWSER_ARGS,
+    "--disable-session-crashed-bubble",
+    "--no-first-run",
+]
+# Spare contexts each browser keeps open for the next render without a storage state.
+WARM_CONTEXTS = 1
+# Held while a slot starts its Playwright driver, so the new child process is attributable.
+_DRIVER_START_LOCK = threading.Lock()
+
+
+class BrowserSlot:
+    """One Chromium process (plus persistent-profile contexts) owned by one thread.
+
+    Playwright's sync API only works on the thread that started it, so every call on a slot
+    runs on its single worker thread; `BrowserPool.run` hands jobs over and waits for them.
+    """
+
+    def __init__(self, pool: BrowserPool, index: int) -> None:
+        self._pool = pool
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"browser-{index}")
+        self._playwright: Playwright | None = None
+        # The slot's Playwright driver process; its browsers run underneath it.
+        self._driver_pid: int | None = None
+        self._browser: Browser | None = None
+        self._warm: list[BrowserContext] = []
+        self._persistent: dict[Path, BrowserContext] = {}
+        self.pages = 0
+        self.render_stats = BrowserRenderStats()
+        # Guarded by the pool lock: whether a job runs here and which profiles it holds or is
+        # about to open.
+        self.busy = False
+        self.profiles: set[Path] = set()
+        # Profiles open after the last job, published by the slot thread.
+        self.open_profiles: frozenset[Path] = frozenset()
+
+    @property
+    def launched(self) -> bool:
+        return self._browser is not None or bool(self._persistent)
+
+    def new_context(self, storage_state: Any = None) -> BrowserContext:
+        if storage_state is None and self._warm:
+            self.render_stats.warm_context = True
+            return self._warm.pop()
+        browser = self._ensure_browser()
+        if storage_state is not None:
+            return browser.new_context(storage_state=storage_state)
+        return browser.new_context()
+
+    def persistent_context(self, profile_dir: Path) -> BrowserContext:
+        """The long-lived context of ``profile_dir``; the caller closes its pages, not it."""
+        context = self._persistent.get(profile_dir)
+        if context is not None:
+            self.render_stats.browser_reused = True
+            return context
+        profile_dir.mkdir(parents=True, exist_ok=True)
+        started = time.perf_counter()
+        context = launch_persistent_context_with_lock_recovery(
+            playwright=self._ensure_playwright(),
+            profile_dir=profile_dir,
+            headless=not self._pool.headful,
+            args=PERSISTENT_BROWSER_ARGS,
+        )
+        self._count_launch(started)
+
+        def forget(_context: BrowserContext) -> None:
+            # A crashed or closed profile browser is relaunched by the next render.
+            self._persistent.pop(profile_dir, None)
+
+        context.on("close", forget)
+        self._persistent[profile_dir] = context
+        return context
+
+    def submit(self, job: Callable[[BrowserSlot], T]) -> T:
+        try:
+            return self._executor.submit(self._run_job, job).result()
+        finally:
+            # Recycling and warming up run after the caller has its result.
+            self._executor.submit(self._after_job)
+
+    def close(self) -> None:
+        self._executor.submit(self._shutdown).result()
+        self._executor.shutdown(wait=True)
+
+    def _run_job(self, job: Callable[[BrowserSlot], T]) -> T:
+        self.render_stats = BrowserRenderStats(browser_reused=self._browser is not None)
+        try:
+            return job(self)
+        finally:
+            self.pages += 1
+            self.open_profiles = frozenset(self._persistent)
+            self._pool.count_render()
+            stats = self.render_stats
+            stats.slot_pages = self.pages
+            stats.pool_launches, stats.pool_renders = self._pool.launches, self._pool.renders
+
+    def _after_job(self) -> None:
+        reason = self._recycle_reason()
+        if reason is not None:
+            self._pool.count_recycle(reason)
+            self._shutdown(stop_playwright=False)
+            return
+        if self._browser is None:
+            return
+        try:
+            while len(self._warm) < WARM_CONTEXTS:
+                self._warm.append(self._browser.new_context())
+        except Exception:  # noqa: BLE001 - a broken browser is relaunched by the next render
+            self._shutdown(stop_playwright=False)
+
+    def _recycle_reason(self) -> str | None:
+        if self.pages >= self._pool.recycle_pages > 0:
+            return "pages"
+        limit = self._pool.recycle_mb * 1024 * 1024
+        if limit > 0 and (self._rss_bytes() or 0) > limit:
+            return "memory"
+        return None
+
+    def _rss_bytes(self) -> int | None:
+        if self._driver_pid is not None:
+            rss = process_tree_rss_bytes(self._driver_pid)
+            if rss is not None:
+                return rss
+        # Driver unknown: share whatever this program's child processes use between the
+        # running browsers, which also counts extract and transcode workers.
+        total = descendant_rss_bytes()
+        return None if total is None else total // self._pool.live_slots()
+
+    def _ensure_playwright(self) -> Playwright:
+        if self._playwright is None:
+            with _DRIVER_START_LOCK:
+                before = child_pids(os.getpid())
+                self._playwright = sync_playwright().start()
+                after = child_pids(os.getpid())
+            started = after - before
+            # Other threads may start worker processes meanwhile; then the driver is unknown.
+            self._driver_pid = started.pop() if len(started) == 1 else None
+        return self._playwright
+
+    def _ensure_browser(self) -> Browser:
+        if self._browser is not None and self._browser.is_connected():
+            return self._browser
+        self._warm.clear()
+        started = time.perf_counter()
+        self._browser = self._ensure_playwright().chromium.launch(
+            headless=not self._pool.headful, args=BROWSER_ARGS
+        )
+        self._count_launch(started)
+        return self._browser
+
+    def _count_launch(self, started: float) -> None:
+        self.pages = 0
+        self.render_stats.browser_reused = False
+        self.render_stats.launch_ms = round((time.perf_counter() - started) * 1000, 3)
+        self._pool.count_launch()
+
+    def _shutdown(self, *, stop_playwright: bool = True) -> None:
+        contexts = [*self._warm, *self._persistent.values()]
+        self._warm.clear()
+        self._persistent.clear()
+        # The browser may be gone already; closing what is left is best effort.
+        for context in contexts:
+            with suppress(Exception):
+                context.close()
+        if self._browser is not None:
+            with suppress(Exception):
+                self._browser.close()
+            self._browser = None
+        self.pages = 0
+        if stop_playwright and self._playwright is not None:
+            self._playwright.stop()
+            self._playwright = None
+            self._driver_pid = None
+
+
+class BrowserPool:
+    """Long-lived browsers shared by renders across pages and threads.
+
+    Up to ``size`` browsers are launched on demand, each owned by a `BrowserSlot` thread and
+    kept with a pre-created context for the next render. A browser is relaunched after
+    ``recycle_pages`` renders, or once its processes (the slot's Playwright driver and
+    everything under it) use more than ``recycle_mb`` of memory (0 disables either limit).
+    """
+
+    def __init__(
+        self,
+        *,
+        headful: bool = False,
+        size: int = 1,
+        recycle_pages: int = 50,
+        recycle_mb: int = 2048,
+    ) -> None:
+        self.headful = headful
+        self.size = max(1, size)
+        self.recycle_pages = recycle_pages
+        self.recycle_mb = recycle_mb
+        self._slots: list[BrowserSlot] = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self.launches = 0
+        self.renders = 0
+        self.recycles: dict[str, int] = {"pages": 0, "memory": 0}
+
+    def __enter__(self) -> BrowserPool:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def run(self, job: Callable[[BrowserSlot], T], *, profile_dir: Path | None = None) -> T:
+        """Run ``job`` on an idle browser slot and return its result.
+
+        Renders of one persistent profile always go to the slot that has it open, because
+        Chromium lets only one process use a profile directory.
+        """
+        slot = self._acquire(profile_dir)
+        try:
+            return slot.submit(job)
+        finally:
+            with self._cond:
+                slot.busy = False
+                slot.profiles = set(slot.open_profiles)
+                self._cond.notify_all()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            while any(slot.busy for slot in self._slots):
+                self._cond.wait()
+            slots, self._slots = self._slots, []
+        for slot in slots:
+            slot.close()
+
+    def live_slots(self) -> int:
+        with self._cond:
+            return max(1, sum(1 for slot in self._slots if slot.launched))
+
+    def count_launch(self) -> None:
+        with self._cond:
+            self.launches += 1
+
+    def count_render(self) -> None:
+        with self._cond:
+            self.renders += 1
+
+    def count_recycle(self, reason: str) -> None:
+        with self._cond:
+            self.recycles[reason] += 1
+
+    def _acquire(self, profile_dir: Path | None) -> BrowserSlot:
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("browser pool is closed")
+                slot = self._pick_slot(profile_dir)
+                if slot is not None:
+                    slot.busy = True
+                    if profile_dir is not None:
+                        slot.profiles.add(profile_dir)
+                    return slot
+                self._cond.wait()
+
+    def _pick_slot(self, profile_dir: Path | None) -> BrowserSlot | None:
+        if profile_dir is not None:
+            for slot in self._slots:
+                if profile_dir in slot.profiles:
+                    return None if slot.busy else slot
+        idle = [slot for slot in self._slots if not slot.busy]
+        # Prefer a running browser; start another one only when all of them are busy.
+        for slot in idle:
+            if slot.launched:
+                return slot
+        if idle:
+            return idle[0]
+        if len(self._slots) < self.size:
+            self._slots.append(BrowserSlot(self, len(self._slots)))
+            return self._slots[-1]
+        return None
+
+
+def descendant_rss_bytes() -> int | None:
+    """Resident memory of this process's descendants (drivers and browsers); Linux only."""
+    return process_tree_rss_bytes(os.getpid(), include_root=False)
+
+
+def process_tree_rss_bytes(pid: int, *, include_root: bool = True) -> int | None:
+    """Resident memory of ``pid`` and its descendants; None without ``/proc`` (Linux only)."""
+    table = _process_table()
+    if table is None:
+        return None
+    children, rss_pages = table
+    total = rss_pages.get(pid, 0) if include_root else 0
+    stack = list(children.get(pid, []))
+    while stack:
+        child = stack.pop()
+        total += rss_pages.get(child, 0)
+        stack.extend(children.get(child, []))
+    return total * os.sysconf("SC_PAGE_SIZE")
+
+
+def child_pids(pid: int) -> set[int]:
+    table = _process_table()
+    return set() if table is None else set(table[0].get(pid, []))
+
+
+def _process_table() -> tuple[dict[int, list[int]], dict[int, int]] | None:
+    """``(children by parent pid, resident pages by pid)`` read from ``/proc``."""
+    try:
+        entries = [entry for entry in os.listdir("/proc") if entry.isdigit()]
+    except OSError:
+        return None
+    children: dict[int, list[int]] = {}
+    rss_pages: dict[int, int] = {}
+    for entry in entries:
+        try:
+            with open(f"/proc/{entry}/stat", encoding="ascii", errors="replace") as handle:
+                stat = handle.read()
+        except OSError:
+            continue
+        # The command name may contain spaces; the fields after it are fixed.
+        fields = stat[stat.rfind(")") + 2 :].split()
+        if len(fields) < 22:
+            continue
+        pid = int(entry)
+        children.setdefault(int(fields[1]), []).append(pid)
+        rss_pages[pid] = int(fields[21])
+    return children, rss_pages
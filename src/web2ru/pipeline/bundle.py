@@ -0,0 +1,358 @@
+from __future__ import annotations
+
+import base64
+import io
+import mimetypes
+import mmap
+import os
+import posixpath
+import quopri
+import struct
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler
+from pathlib import Path
+from typing import Any, BinaryIO
+from urllib.parse import unquote, urlsplit
+
+from web2ru.assets.cache import AssetCache
+from web2ru.models import AssetRecord
+
+OUTPUT_FORMATS = ("dir", "zip", "mhtml")
+INDEX_NAME = "index.html"
+ZIP_BUNDLE_NAME = "snapshot.zip"
+MHTML_BUNDLE_NAME = "snapshot.mhtml"
+# MHTML parts are addressed by absolute URL; the page's relative asset links resolve against it.
+MHTML_BASE_URL = "http://web2ru.local/"
+
+_ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+_ZIP64_LIMIT = (1 << 31) - 1
+# signature, version, flags, method, time, date, crc, sizes, name length, extra length
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+_BASE64_CHUNK = 57 * 1024  # whole 76-character lines
+
+
+@dataclass(slots=True)
+class BundleStats:
+    format: str = "dir"
+    path: str | None = None
+    entries: int = 0
+    bytes: int = 0
+    elapsed_ms: float = 0.0
+
+    def as_report(self) -> dict[str, object]:
+        return {
+            "format": self.format,
+            "path": self.path,
+            "entries": self.entries,
+            "bytes": self.bytes,
+            "elapsed_ms": round(self.elapsed_ms, 3),
+        }
+
+
+def write_output_bundle(
+    output_dir: Path,
+    asset_cache: AssetCache,
+    *,
+    output_format: str,
+    stats: BundleStats,
+) -> Path:
+    """Write the assets next to ``index.html``, or pack both into one archive file.
+
+    ``index.html`` must be written already; the archive formats move it into the archive.
+    Returns the file to open: the index, the zip or the MHTML archive.
+    """
+    stats.format = output_format
+    index_path = output_dir / INDEX_NAME
+    if output_format == "dir":
+        asset_cache.write_to_output(output_dir)
+        return index_path
+    writer: Callable[[BinaryIO, Path, Iterator[tuple[str, AssetRecord]], BundleStats], None]
+    if output_format == "zip":
+        target, writer = output_dir / ZIP_BUNDLE_NAME, _write_zip
+    elif output_format == "mhtml":
+        target, writer = output_dir / MHTML_BUNDLE_NAME, _write_mhtml
+    else:
+        raise ValueError(f"unknown output format: {output_format}")
+
+    started = time.perf_counter()
+    fd, tmp_name = tempfile.mkstemp(dir=output_dir, prefix=".tmp-", suffix=target.suffix)
+    tmp = Path(tmp_name)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            writer(out, index_path, _bundle_entries(asset_cache), stats)
+        os.replace(tmp, target)
+    finally:
+        tmp.unlink(missing_ok=True)
+    index_path.unlink()
+    stats.path = target.name
+    stats.bytes = target.stat().st_size
+    stats.elapsed_ms = (time.perf_counter() - started) * 1000
+    return target
+
+
+def has_index(output_dir: Path) -> bool:
+    return (output_dir / INDEX_NAME).is_file() or (output_dir / ZIP_BUNDLE_NAME).is_file()
+
+
+def read_index_html(output_dir: Path) -> str | None:
+    """The page HTML of an output directory, unpacked or zipped; None when there is none."""
+    index_path = output_dir / INDEX_NAME
+    if index_path.is_file():
+        return index_path.read_text(encoding="utf-8", errors="ignore")
+    zip_path = output_dir / ZIP_BUNDLE_NAME
+    if not zip_path.is_file():
+        return None
+    with open_bundle(zip_path) as reader:
+        data = reader.get(INDEX_NAME)
+        if data is None:
+            return None
+        with data:
+            return bytes(data).decode("utf-8", errors="ignore")
+
+
+class BundleReader:
+    """Random access to the entries of a zip bundle through one read-only memory map.
+
+    Stored entries are returned as slices of the map, so serving them copies nothing into
+    Python objects; compressed entries (archives repacked by other tools) are inflated per read.
+    The reader is reference counted: `retain` adds a holder, `close` (or leaving a ``with``
+    block) drops one, and the map is closed when the last holder is gone. Release the views
+    from `get` before that.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._refs = 1
+        self._refs_lock = threading.Lock()
+        with path.open("rb") as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        self._stored: dict[str, tuple[int, int]] = {}
+        self._compressed: set[str] = set()
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                if info.compress_type != zipfile.ZIP_STORED:
+                    self._compressed.add(info.filename)
+                    continue
+                # The local header may carry a different extra field than the central directory.
+                header = _LOCAL_HEADER.unpack_from(self._map, info.header_offset)
+                start = info.header_offset + _LOCAL_HEADER.size + header[9] + header[10]
+                self._stored[info.filename] = (start, info.file_size)
+
+    def __enter__(self) -> BundleReader:
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        self.close()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._stored or name in self._compressed
+
+    @property
+    def closed(self) -> bool:
+        return self._map.closed
+
+    def retain(self) -> BundleReader:
+        with self._refs_lock:
+            if self._refs <= 0:
+                raise ValueError("bundle reader is closed")
+            self._refs += 1
+        return self
+
+    def get(self, name: str) -> memoryview | None:
+        span = self._stored.get(name)
+        if span is not None:
+            start, size = span
+            return memoryview(self._map)[start : start + size]
+        if name in self._compressed:
+            with zipfile.ZipFile(self.path) as archive:
+                return memoryview(archive.read(name))
+        return None
+
+    def close(self) -> None:
+        with self._refs_lock:
+            self._refs -= 1
+            if self._refs != 0:
+                return
+        self._map.close()
+
+
+# Each open reader holds a file descriptor and a mapping; a surf session serves many pages.
+MAX_OPEN_BUNDLES = 32
+_READERS: OrderedDict[Path, tuple[tuple[int, int], BundleReader]] = OrderedDict()
+_READERS_LOCK = threading.Lock()
+
+
+def open_bundle(path: Path) -> BundleReader:
+    """Shared reader of ``path``, reopened when the archive has been replaced.
+
+    The caller holds a reference and closes it (``with open_bundle(path) as reader``). Up to
+    `MAX_OPEN_BUNDLES` readers stay cached, least recently used first out; a reader that is
+    replaced or evicted is closed once the responses still reading it are done.
+    """
+    stat = path.stat()
+    version = (stat.st_mtime_ns, stat.st_size)
+    dropped: list[BundleReader] = []
+    with _READERS_LOCK:
+        cached = _READERS.get(path)
+        if cached is not None and cached[0] == version:
+            _READERS.move_to_end(path)
+            return cached[1].retain()
+        if cached is not None:
+            dropped.append(cached[1])
+        reader = BundleReader(path)
+        _READERS[path] = (version, reader)
+        _READERS.move_to_end(path)
+        while len(_READERS) > MAX_OPEN_BUNDLES:
+            dropped.append(_READERS.popitem(last=False)[1][1])
+        reader.retain()
+    for old in dropped:
+        old.close()
+    return reader
+
+
+def send_bundle_entry(handler: BaseHTTPRequestHandler, reader: BundleReader, rel_path: str) -> bool:
+    """Answer ``handler`` with one archive entry; False when the bundle has no such file."""
+    name = posixpath.normpath("/" + unquote(rel_path)).lstrip("/") or INDEX_NAME
+    if name not in reader and f"{name}/{INDEX_NAME}" in reader:
+        name = f"{name}/{INDEX_NAME}"
+    data = reader.get(name)
+    if data is None:
+        return False
+    mime, _ = mimetypes.guess_type(name)
+    # The view must be released before the reader's map can be closed.
+    with data:
+        handler.send_response(200)
+        handler.send_header("Content-Type", mime or "application/octet-stream")
+        handler.send_header("Content-Length", str(data.nbytes))
+        handler.end_headers()
+        handler.wfile.write(data)
+    return True
+
+
+class BundleRequestHandler(BaseHTTPRequestHandler):
+    """Serves a zip bundle as if it were the unpacked output directory."""
+
+    def __init__(self, *args: Any, bundle: BundleReader, **kwargs: Any) -> None:
+        self.bundle = bundle
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self) -> None:  # noqa: N802
+        with self.bundle.retain() as reader:
+            found = send_bundle_entry(self, reader, urlsplit(self.path).path)
+        if not found:
+            self.send_error(404, "File not found")
+
+
+def _bundle_entries(asset_cache: AssetCache) -> Iterator[tuple[str, AssetRecord]]:
+    seen: set[str] = set()
+    write_stats = asset_cache.write_stats
+    for key, record in asset_cache.records.items():
+        name = asset_cache.ensure_local_mapping(key).removeprefix("./")
+        if name in seen:
+            write_stats.deduplicated += 1
+            continue
+        seen.add(name)
+        write_stats.files += 1
+        write_stats.bytes += record.size
+        yield name, record
+
+
+def _write_zip(
+    out: BinaryIO,
+    index_path: Path,
+    entries: Iterator[tuple[str, AssetRecord]],
+    stats: BundleStats,
+) -> None:
+    # Entries are stored, not deflated: captured assets are mostly compressed already, and
+    # stored bytes can be served straight out of the mapped archive.
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        _zip_file(archive, INDEX_NAME, index_path)
+        stats.entries += 1
+        for name, record in entries:
+            if record.inline is not None or record.path is None:
+                _zip_bytes(archive, name, record.data)
+            else:
+                _zip_file(archive, name, record.path)
+            stats.entries += 1
+
+
+def _zip_file(archive: zipfile.ZipFile, name: str, source: Path) -> None:
+    with source.open("rb") as handle:
+        if os.fstat(handle.fileno()).st_size == 0:
+            _zip_bytes(archive, name, b"")
+            return
+        # Mapping the source hands the whole body to crc32 and write() without reading it into
+        # Python memory first.
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as body:
+            _zip_bytes(archive, name, body)
+
+
+def _zip_bytes(archive: zipfile.ZipFile, name: str, body: bytes | mmap.mmap) -> None:
+    info = zipfile.ZipInfo(name, date_time=_ZIP_DATE_TIME)
+    info.compress_type = zipfile.ZIP_STORED
+    info.external_attr = 0o644 << 16
+    with archive.open(info, "w", force_zip64=len(body) > _ZIP64_LIMIT) as entry:
+        entry.write(body)
+
+
+def _write_mhtml(
+    out: BinaryIO,
+    index_path: Path,
+    entries: Iterator[tuple[str, AssetRecord]],
+    stats: BundleStats,
+) -> None:
+    boundary = f"----web2ru-{uuid.uuid4().hex}"
+    headers = [
+        "From: <Saved by web2ru>",
+        f"Snapshot-Content-Location: {MHTML_BASE_URL}{INDEX_NAME}",
+        f"Date: {formatdate(localtime=True)}",
+        "MIME-Version: 1.0",
+        f'Content-Type: multipart/related; type="text/html"; boundary="{boundary}"',
+    ]
+    out.write(("\r\n".join(headers) + "\r\n").encode("ascii"))
+
+    _mhtml_part_header(out, boundary, INDEX_NAME, "text/html; charset=utf-8", "quoted-printable")
+    with index_path.open("rb") as html_file:
+        for line in html_file:
+            out.write(quopri.encodestring(line).replace(b"\n", b"\r\n"))
+    stats.entries += 1
+
+    for name, record in entries:
+        content_type = (
+            mimetypes.guess_type(name)[0] or record.content_type or "application/octet-stream"
+        )
+        _mhtml_part_header(out, boundary, name, content_type, "base64")
+        with _open_body(record) as body:
+            while chunk := body.read(_BASE64_CHUNK):
+                out.write(base64.encodebytes(chunk).replace(b"\n", b"\r\n"))
+        stats.entries += 1
+    out.write(f"\r\n--{boundary}--\r\n".encode("ascii"))
+
+
+def _mhtml_part_header(
+    out: BinaryIO, boundary: str, name: str, content_type: str, encoding: str
+) -> None:
+    out.write(
+        (
+            f"\r\n--{boundary}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Transfer-Encoding: {encoding}\r\n"
+            f"Content-Location: {MHTML_BASE_URL}{name}\r\n\r\n"
+        ).encode()
+    )
+
+
+def _open_body(record: AssetRecord) -> BinaryIO:
+    if record.inline is not None or record.path is None:
+        return io.BytesIO(record.data)
+    return record.path.open("rb")
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from collections.abc import Callable
 from dataclasses import asdict
+from functools import partial
 from typing import Any
 
 from lxml import etree, html
@@ -9,15 +10,39 @@ from lxml import etree, html
 from web2ru.apply.apply_attrs import apply_attributes
 from web2ru.apply.apply_blocks import apply_blocks
 from web2ru.assets.cache import AssetCache
-from web2ru.assets.fetch_missing import fetch_missing_assets
-from web2ru.assets.rewrite_html import rewrite_css_asset_records, rewrite_html_urls
-from web2ru.assets.scan import parse_html, scan_needed_urls
+from web2ru.assets.fetch_missing import MissingAsset
+from web2ru.assets.fonts import (
+    FontSubsetOptions,
+    FontSubsetStats,
+    css_content_codepoints,
+    cyrillic_warning,
+    document_codepoints,
+    subset_fonts,
+)
+from web2ru.assets.graph import AssetGraph, resolve_asset_graph
+from web2ru.assets.rewrite_html import patch_url_sites, rewrite_css_asset_records
+from web2ru.assets.rewrite_svg import rewrite_svg_urls
+from web2ru.assets.scan import collect_url_sites, parse_html
+from web2ru.assets.srcset import SrcsetStats, parse_srcset_policy
+from web2ru.assets.transcode import (
+    ImageTranscodeOptions,
+    ImageTranscodeStats,
+    transcode_images,
+)
 from web2ru.config import RunConfig
-from web2ru.extract.block_extractor import extract_attribute_items, extract_blocks
+from web2ru.extract.block_extractor import extract_attribute_items
+from web2ru.extract.parallel import extract_blocks_parallel
 from web2ru.extract.scope import select_scope
 from web2ru.freeze.freeze_js import freeze_html
 from web2ru.models import OfflineResult, OnlineRenderResult
+from web2ru.pipeline.bundle import BundleStats, write_output_bundle
 from web2ru.report.builder import build_base_report, write_report
+from web2ru.translate.incremental import (
+    IncrementalStats,
+    load_previous_plan,
+    reuse_translations,
+    write_translation_plan,
+)
 from web2ru.translate.translator import Translator
 from web2ru.utils import ensure_unique_slug, sha256_bytes, slugify_url
 
@@ -30,12 +55,29 @@ def run_offline_process(
     user_agent: str,
     map_anchor_href: Callable[[str], str | None] | None = None,
 ) -> OfflineResult:
+    if config.should_stream_html(len(online.html_dump)):
+        from web2ru.pipeline.offline_stream import run_offline_process_streaming
+
+        return run_offline_process_streaming(
+            config=config,
+            online=online,
+            asset_cache=asset_cache,
+            user_agent=user_agent,
+            map_anchor_href=map_anchor_href,
+        )
+
     report = build_base_report(
         source_url=config.url,
         final_url=online.final_url,
         run_params=_run_params_for_report(config),
     )
-    slug = ensure_unique_slug(config.output_root, slugify_url(online.final_url), online.final_url)
+    base_slug = slugify_url(online.final_url)
+    previous_plan = (
+        load_previous_plan(config.output_root, base_slug, final_url=online.final_url)
+        if config.incremental
+        else None
+    )
+    slug = ensure_unique_slug(config.output_root, base_slug, online.final_url)
     output_dir = config.output_root / slug
     output_dir.mkdir(parents=True, exist_ok=True)
 
@@ -44,51 +86,67 @@ def run_offline_process(
     _ensure_utf8_charset(root)
 
     css_by_url = _extract_css_from_cache(asset_cache)
-    needed_urls = (
-        scan_needed_urls(root, online.final_url, css_by_url) if config.asset_scan else set()
+    # One traversal finds both the URLs to fetch and the attributes rewritten after translation.
+    srcset_policy = parse_srcset_policy(config.srcset_policy)
+    srcset_stats = SrcsetStats(policy=str(srcset_policy))
+    url_sites = collect_url_sites(
+        root, online.final_url, srcset_policy=srcset_policy, srcset_stats=srcset_stats
     )
-    missing = fetch_missing_assets(
-        needed_urls=needed_urls,
-        asset_cache=asset_cache,
-        final_url=online.final_url,
-        user_agent=user_agent,
-        max_asset_mb=config.max_asset_mb,
-        enabled=config.fetch_missing_assets,
+    asset_graph = AssetGraph()
+    missing = (
+        resolve_asset_graph(
+            seed_urls=url_sites.needed,
+            css_by_url=css_by_url,
+            asset_cache=asset_cache,
+            graph=asset_graph,
+            final_url=online.final_url,
+            user_agent=user_agent,
+            max_asset_mb=config.max_asset_mb,
+            enabled=config.fetch_missing_assets,
+            max_depth=config.asset_graph_depth,
+            max_urls=config.asset_graph_max_urls,
+        )
+        if config.asset_scan
+        else []
     )
 
+    image_stats = ImageTranscodeStats()
+    transcode_images(asset_cache, options=_image_transcode_options(config), stats=image_stats)
+
     scope_root = select_scope(root, config.scope)
-    blocks, excluded_ids = extract_blocks(
+    blocks, rules, parallel_stats = extract_blocks_parallel(
         scope_root,
         scope_mode=config.scope,
         translation_unit=config.translation_unit,
         exclude_selectors=config.exclude_selectors,
+        workers=config.extract_workers,
+        min_nodes=config.parallel_extract_min_nodes,
+        token_protect=config.token_protect,
     )
     attrs = extract_attribute_items(
         scope_root,
         translate_attrs=config.translate_attrs,
         translate_alt=config.translate_alt,
-        excluded_ids=excluded_ids,
+        rules=rules,
     )
 
+    pending_blocks, pending_attrs = blocks, attrs
+    if config.incremental:
+        incremental_stats = IncrementalStats()
+        if previous_plan is not None:
+            pending_blocks, pending_attrs, incremental_stats = reuse_translations(
+                previous_plan, blocks=blocks, attrs=attrs
+            )
+        report["incremental"] = incremental_stats.as_report()
+
     translator_stats: dict[str, Any] = {}
-    if config.api_key:
-        translator = Translator(
-            api_key=config.api_key,
-            model=config.model,
-            reasoning_effort=config.reasoning_effort,
-            max_output_tokens=config.max_output_tokens,
-            batch_chars=config.batch_chars,
-            max_items_per_batch=config.max_items_per_batch,
-            max_retries=config.max_retries,
-            allow_empty_parts=config.allow_empty_parts,
-            token_protect=config.token_protect,
-            token_protect_strict=config.token_protect_strict,
-            use_cache=config.use_translation_cache,
-            cache_db_path=str(config.cache_dir / "translation_cache.sqlite3"),
-        )
+    untranslated: set[str] = set()
+    translator = _build_translator(config)
+    if translator is not None:
         try:
-            translator.translate_blocks_and_attrs(blocks=blocks, attrs=attrs)
+            translator.translate_blocks_and_attrs(blocks=pending_blocks, attrs=pending_attrs)
             translator_stats = asdict(translator.stats)
+            untranslated = translator.stats.fallback_ids()
         finally:
             translator.close()
     else:
@@ -96,18 +154,42 @@ def run_offline_process(
 
     applied_parts = apply_blocks(root, blocks)
     applied_attrs = apply_attributes(root, attrs)
+    write_translation_plan(
+        output_dir,
+        final_url=online.final_url,
+        blocks=blocks,
+        attrs=attrs,
+        untranslated=untranslated,
+    )
+
+    # Fonts are cut to the translated text before anything maps them to a local path.
+    font_stats = FontSubsetStats()
+    subset_fonts(
+        asset_cache,
+        codepoints=_page_codepoints(root, css_by_url),
+        options=FontSubsetOptions(enabled=config.font_subset, workers=config.font_workers),
+        stats=font_stats,
+    )
+    font_warning = cyrillic_warning(font_stats)
+    if font_warning:
+        report["warnings"].append(font_warning)
 
     def map_url(url: str) -> str:
         return asset_cache.ensure_local_mapping(url)
 
-    rewrite_html_urls(
-        root,
+    patch_url_sites(
+        url_sites.sites,
         final_url=online.final_url,
         map_url=map_url,
         map_anchor_href=map_anchor_href,
     )
-    rewritten_css = rewrite_css_asset_records(css_text_by_url=css_by_url, map_url=map_url)
-    _update_css_records(asset_cache, rewritten_css)
+    rewritten_css = rewrite_css_asset_records(
+        css_text_by_url=css_by_url,
+        map_url_from=_relative_mapper(asset_cache),
+        cache=asset_cache.css_rewrites,
+    )
+    _update_css_records(asset_cache, rewritten_css, css_by_url)
+    _update_svg_records(asset_cache, asset_graph.svg_sources)
 
     freeze_counts = freeze_html(
         root,
@@ -116,19 +198,116 @@ def run_offline_process(
         block_iframe_enabled=config.block_iframe_enabled,
     )
 
-    asset_cache.write_to_output(output_dir)
+    srcset_stats.records_dropped = asset_cache.drop_unreferenced(srcset_stats.pruned_urls)
     html_text = html.tostring(root, encoding="unicode", method="html")
-    index_path = output_dir / "index.html"
-    index_path.write_text(html_text, encoding="utf-8")
+    (output_dir / "index.html").write_text(html_text, encoding="utf-8")
+    bundle_stats = BundleStats()
+    index_path = write_output_bundle(
+        output_dir, asset_cache, output_format=config.output_format, stats=bundle_stats
+    )
+
+    _fill_report(
+        report,
+        config=config,
+        online=online,
+        asset_cache=asset_cache,
+        translator_stats=translator_stats,
+        blocks_total=len(blocks),
+        parts_total=sum(len(block.parts) for block in blocks),
+        attrs_total=len(attrs),
+        asset_graph=asset_graph,
+        srcset_stats=srcset_stats,
+        image_stats=image_stats,
+        font_stats=font_stats,
+        bundle_stats=bundle_stats,
+        missing=missing,
+        freeze_counts=freeze_counts,
+        applied_parts=applied_parts,
+        applied_attrs=applied_attrs,
+        rules_report={
+            "rule_match_ms": rules.match_ms,
+            "excluded_elements": rules.excluded_total,
+            "invalid_selectors": rules.invalid_selectors,
+            "workers": parallel_stats.workers,
+            "subtrees": parallel_stats.subtrees,
+            "serial_subtrees": parallel_stats.serial_subtrees,
+            "extract_ms": parallel_stats.elapsed_ms,
+        },
+    )
+
+    report_path = output_dir / "report.json"
+    write_report(report, report_path)
+
+    return OfflineResult(
+        output_dir=output_dir,
+        index_path=index_path,
+        report_path=report_path,
+        report=report,
+    )
+
+
+def _image_transcode_options(config: RunConfig) -> ImageTranscodeOptions:
+    return ImageTranscodeOptions(
+        mode=config.image_transcode,
+        max_dim=config.image_max_dim,
+        quality=config.image_quality,
+        workers=config.image_workers,
+    )
 
+
+def _page_codepoints(root: etree._Element, css_by_url: dict[str, str]) -> set[int]:
+    style_blocks = [element.text for element in root.iter("style") if element.text]
+    return document_codepoints(root) | css_content_codepoints([*css_by_url.values(), *style_blocks])
+
+
+def _build_translator(config: RunConfig) -> Translator | None:
+    if not config.api_key:
+        return None
+    return Translator(
+        api_key=config.api_key,
+        model=config.model,
+        reasoning_effort=config.reasoning_effort,
+        max_output_tokens=config.max_output_tokens,
+        batch_chars=config.batch_chars,
+        max_items_per_batch=config.max_items_per_batch,
+        max_retries=config.max_retries,
+        allow_empty_parts=config.allow_empty_parts,
+        token_protect=config.token_protect,
+        token_protect_strict=config.token_protect_strict,
+        use_cache=config.use_translation_cache,
+        cache_db_path=str(config.cache_dir / "translation_cache.sqlite3"),
+    )
+
+
+def _fill_report(
+    report: dict[str, Any],
+    *,
+    config: RunConfig,
+    online: OnlineRenderResult,
+    asset_cache: AssetCache,
+    translator_stats: dict[str, Any],
+    blocks_total: int,
+    parts_total: int,
+    attrs_total: int,
+    asset_graph: AssetGraph,
+    srcset_stats: SrcsetStats,
+    image_stats: ImageTranscodeStats,
+    font_stats: FontSubsetStats,
+    bundle_stats: BundleStats,
+    missing: list[MissingAsset],
+    freeze_counts: dict[str, int],
+    applied_parts: int,
+    applied_attrs: int,
+    rules_report: dict[str, Any],
+) -> None:
     report["stats"] = {
-        "blocks_total": len(blocks),
-        "parts_total": sum(len(block.parts) for block in blocks),
-        "attrs_total": len(attrs),
+        "blocks_total": blocks_total,
+        "parts_total": parts_total,
+        "attrs_total": attrs_total,
         "translated_parts": translator_stats.get("translated_parts", 0),
         "fallback_parts": translator_stats.get("fallback_parts", 0),
         "skipped_parts": max(
-            sum(len(block.parts) for block in blocks) - translator_stats.get("translated_parts", 0),
+            parts_total - translator_stats.get("translated_parts", 0),
             0,
         ),
         "token_protected_count": translator_stats.get("token_protected_count", 0),
@@ -172,12 +351,52 @@ def run_offline_process(
         "captured_total": sum(
             1 for r in asset_cache.records.values() if r.source == "network_capture"
         ),
-        "scan_found_total": len(needed_urls),
+        "scan_found_total": len(asset_graph.depth),
         "fetched_missing_total": sum(
             1 for r in asset_cache.records.values() if r.source == "fetch_missing"
         ),
+        "store_served_total": sum(
+            1 for r in asset_cache.records.values() if r.source == "asset_store"
+        ),
+        "store": asset_cache.store.stats.as_report() if asset_cache.store is not None else None,
+        "css_rewrite_cache": asset_cache.css_rewrites.stats.as_report(),
+        "output": {
+            "files": asset_cache.write_stats.files,
+            "bytes": asset_cache.write_stats.bytes,
+            "deduplicated": asset_cache.write_stats.deduplicated,
+            "hard_linked": asset_cache.write_stats.linked,
+            "shared_blobs_reused": asset_cache.write_stats.blob_reused,
+            "existing": asset_cache.write_stats.existing,
+            "workers": asset_cache.write_stats.workers,
+        },
+        "browser_routes": {
+            "enabled": online.asset_routes.enabled,
+            "hits": online.asset_routes.hits,
+            "misses": online.asset_routes.misses,
+            "passthrough": online.asset_routes.passthrough,
+            "bytes_served": online.asset_routes.bytes_served,
+        },
+        "graph": asset_graph.as_report(),
+        "srcset": srcset_stats.as_report(),
+        "images": image_stats.as_report(),
+        "fonts": font_stats.as_report(),
         "missing_assets": [{"url": m.url, "reason": m.reason} for m in missing],
     }
+    report["bundle"] = bundle_stats.as_report()
+    report["browser"] = {
+        "browser_reused": online.browser.browser_reused,
+        "warm_context": online.browser.warm_context,
+        "launch_ms": online.browser.launch_ms,
+        "browser_pages": online.browser.slot_pages,
+        "pool_launches": online.browser.pool_launches,
+        "pool_renders": online.browser.pool_renders,
+    }
+    report["resource_policy"] = {
+        "preset": online.resource_policy.preset,
+        "blocked_total": online.resource_policy.blocked_total,
+        "blocked_by_reason": dict(sorted(online.resource_policy.blocked_by_reason.items())),
+        "skipped_large_bodies": online.resource_policy.skipped_large_bodies,
+    }
     report["sanitization"] = freeze_counts
     report["validation"] = {
         "external_requests_detected": None,
@@ -187,19 +406,10 @@ def run_offline_process(
         "applied_parts": applied_parts,
         "applied_attrs": applied_attrs,
     }
+    report["extract"] = rules_report
     if translator_stats.get("failures"):
         report["errors"].extend(translator_stats["failures"])
 
-    report_path = output_dir / "report.json"
-    write_report(report, report_path)
-
-    return OfflineResult(
-        output_dir=output_dir,
-        index_path=index_path,
-        report_path=report_path,
-        report=report,
-    )
-
 
 def _sanitize_base_url(root: html.HtmlElement) -> None:
     for base in list(root.xpath("//base")):
@@ -252,8 +462,13 @@ def _extract_css_from_cache(asset_cache: AssetCache) -> dict[str, str]:
     return out
 
 
-def _update_css_records(asset_cache: AssetCache, rewritten_css: dict[str, str]) -> None:
+def _update_css_records(
+    asset_cache: AssetCache, rewritten_css: dict[str, str], original_css: dict[str, str]
+) -> None:
     for source_url, css_text in rewritten_css.items():
+        if css_text == original_css.get(source_url):
+            # Nothing to rewrite: the record keeps its spilled or stored body as is.
+            continue
         record = asset_cache.get(source_url)
         if record is None:
             continue
@@ -263,12 +478,39 @@ def _update_css_records(asset_cache: AssetCache, rewritten_css: dict[str, str])
         record.sha256 = sha256_bytes(encoded)
 
 
+def _update_svg_records(asset_cache: AssetCache, svg_urls: set[str]) -> None:
+    for url in sorted(svg_urls):
+        record = asset_cache.get(url)
+        if record is None:
+            continue
+        rewritten = rewrite_svg_urls(
+            record.data,
+            svg_base_url=record.final_url,
+            map_url=partial(asset_cache.ensure_relative_mapping, from_url=url),
+        )
+        if rewritten is None:
+            continue
+        record.data = rewritten
+        record.size = len(rewritten)
+        record.sha256 = sha256_bytes(rewritten)
+
+
+def _relative_mapper(asset_cache: AssetCache) -> Callable[[str, str], str]:
+    def map_url_from(url: str, source_url: str) -> str:
+        return asset_cache.ensure_relative_mapping(url, from_url=source_url)
+
+    return map_url_from
+
+
 def _run_params_for_report(config: RunConfig) -> dict[str, Any]:
     return {
         "fast": config.fast,
         "mode": config.mode,
         "surf_same_origin_only": config.surf_same_origin_only,
         "surf_max_pages": config.surf_max_pages,
+        "browser_pool_size": config.browser_pool_size,
+        "browser_recycle_pages": config.browser_recycle_pages,
+        "browser_recycle_mb": config.browser_recycle_mb,
         "model": config.model,
         "reasoning_effort": config.reasoning_effort,
         "timeout_ms": config.timeout_ms,
@@ -287,10 +529,27 @@ def _run_params_for_report(config: RunConfig) -> dict[str, Any]:
         "batch_chars": config.batch_chars,
         "max_items_per_batch": config.max_items_per_batch,
         "max_retries": config.max_retries,
+        "use_asset_cache": config.use_asset_cache,
+        "asset_cache_max_mb": config.asset_cache_max_mb,
         "max_asset_mb": config.max_asset_mb,
+        "resource_policy": config.resource_policy,
+        "block_url_patterns": list(config.block_url_patterns),
         "openai_min_interval_ms": config.openai_min_interval_ms,
         "asset_scan": config.asset_scan,
+        "asset_graph_depth": config.asset_graph_depth,
+        "asset_graph_max_urls": config.asset_graph_max_urls,
+        "srcset_policy": config.srcset_policy,
+        "image_transcode": config.image_transcode,
+        "image_max_dim": config.image_max_dim,
+        "image_quality": config.image_quality,
+        "font_subset": config.font_subset,
         "fetch_missing_assets": config.fetch_missing_assets,
+        "output_format": config.output_format,
+        "asset_write_workers": config.asset_write_workers,
+        "stream_html": config.stream_html,
+        "stream_chunk_kb": config.stream_chunk_kb,
+        "extract_workers": config.extract_workers,
+        "incremental": config.incremental,
         "freeze_js": config.freeze_js,
         "drop_noscript": config.drop_noscript,
         "block_iframe": config.block_iframe,
@@ -0,0 +1,519 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import IO, Any
+from xml.sax.saxutils import escape
+
+from lxml import etree, html
+
+from web2ru.apply.apply_attrs import apply_attributes
+from web2ru.apply.apply_blocks import apply_blocks
+from web2ru.assets.cache import AssetCache
+from web2ru.assets.fetch_missing import MissingAsset
+from web2ru.assets.fonts import (
+    FontSubsetOptions,
+    FontSubsetStats,
+    css_content_codepoints,
+    cyrillic_warning,
+    subset_fonts,
+)
+from web2ru.assets.graph import AssetGraph, resolve_asset_graph
+from web2ru.assets.rewrite_html import patch_url_sites, rewrite_css_asset_records
+from web2ru.assets.scan import collect_url_sites
+from web2ru.assets.srcset import SrcsetStats, parse_srcset_policy
+from web2ru.assets.transcode import ImageTranscodeStats, transcode_images
+from web2ru.config import RunConfig
+from web2ru.extract.block_extractor import extract_attribute_items, extract_blocks
+from web2ru.freeze.freeze_js import freeze_html
+from web2ru.models import OfflineResult, OnlineRenderResult
+from web2ru.pipeline.bundle import BundleStats, write_output_bundle
+from web2ru.pipeline.offline_process import (
+    _build_translator,
+    _ensure_utf8_charset,
+    _extract_css_from_cache,
+    _fill_report,
+    _image_transcode_options,
+    _page_codepoints,
+    _relative_mapper,
+    _run_params_for_report,
+    _sanitize_base_url,
+    _update_css_records,
+    _update_svg_records,
+    run_offline_process,
+)
+from web2ru.report.builder import build_base_report, write_report
+from web2ru.translate.translator import Translator
+from web2ru.utils import ensure_unique_slug, slugify_url
+
+_MARKER_TARGET = "web2ru-stream"
+_CONTAINER_TAGS = {
+    "article",
+    "aside",
+    "div",
+    "dl",
+    "fieldset",
+    "figure",
+    "footer",
+    "form",
+    "header",
+    "main",
+    "nav",
+    "ol",
+    "section",
+    "table",
+    "tbody",
+    "tfoot",
+    "thead",
+    "tr",
+    "ul",
+}
+
+# (kind, payload): "text" carries a str, the other kinds carry the element they describe.
+_Item = tuple[str, Any]
+
+
+@dataclass(slots=True)
+class _StreamTotals:
+    chunks: int = 0
+    blocks: int = 0
+    parts: int = 0
+    attrs: int = 0
+    applied_parts: int = 0
+    applied_attrs: int = 0
+    rule_match_ms: float = 0.0
+    excluded_elements: int = 0
+    invalid_selectors: list[str] = field(default_factory=list)
+    asset_graph: AssetGraph = field(default_factory=AssetGraph)
+    srcset: SrcsetStats = field(default_factory=SrcsetStats)
+    images: ImageTranscodeStats = field(default_factory=ImageTranscodeStats)
+    fonts: FontSubsetStats = field(default_factory=FontSubsetStats)
+    # Characters of every processed chunk, for font subsetting once the document is done.
+    codepoints: set[int] = field(default_factory=set)
+    missing: list[MissingAsset] = field(default_factory=list)
+    freeze_counts: dict[str, int] = field(default_factory=dict)
+
+
+class _NoBodyError(Exception):
+    pass
+
+
+class _StreamProcessor:
+    """Runs the offline pipeline over a document while lxml is still parsing it.
+
+    Completed subtrees under ``<body>`` are moved out of the parse tree into small standalone
+    documents, processed with the regular extract/translate/apply/rewrite/freeze steps and
+    written to ``index.html`` in document order. The last child of every open element is held
+    back until it gets a sibling, because its tail text may still be growing.
+    """
+
+    def __init__(
+        self,
+        *,
+        config: RunConfig,
+        online: OnlineRenderResult,
+        asset_cache: AssetCache,
+        user_agent: str,
+        map_anchor_href: Callable[[str], str | None] | None,
+        translator: Translator | None,
+        css_by_url: dict[str, str],
+    ) -> None:
+        self._config = config
+        self._online = online
+        self._asset_cache = asset_cache
+        self._user_agent = user_agent
+        self._map_anchor_href = map_anchor_href
+        self._translator = translator
+        self._css_by_url = css_by_url
+        self._srcset_policy = parse_srcset_policy(config.srcset_policy)
+        self._image_options = _image_transcode_options(config)
+        self.totals = _StreamTotals(srcset=SrcsetStats(policy=str(self._srcset_policy)))
+        self.output_dir: Path | None = None
+        self.index_path: Path | None = None
+        self._out: IO[str] | None = None
+        self._body: etree._Element | None = None
+        self._body_closed = False
+        self._body_text_done = False
+        self._stack: list[etree._Element] = []
+        self._opened: set[etree._Element] = set()
+        self._shells: set[etree._Element] = set()
+        self._pending: list[_Item] = []
+
+    def run(self) -> None:
+        parser = etree.HTMLPullParser(events=("start", "end"), encoding="utf-8")
+        parser.set_element_class_lookup(html.HtmlElementClassLookup())
+        chunk_chars = max(1, self._config.stream_chunk_kb) * 1024
+        html_dump = self._online.html_dump
+        try:
+            for offset in range(0, len(html_dump), chunk_chars):
+                parser.feed(html_dump[offset : offset + chunk_chars].encode("utf-8"))
+                self._consume(parser)
+            root = parser.close()
+            self._consume(parser)
+            if self._body is None:
+                raise _NoBodyError
+            for node in reversed(list(self._stack)):
+                self._handle("end", node)
+            self._emit(self._pending)
+            self._write("</body>")
+            for sibling in self._body.itersiblings():
+                self._write(html.tostring(sibling, encoding="unicode", method="html"))
+            self._write(f"</{root.tag}>")
+        finally:
+            if self._out is not None:
+                self._out.close()
+
+    def _consume(self, parser: etree.HTMLPullParser) -> None:
+        for event, element in parser.read_events():
+            self._handle(event, element)
+        if self._body is not None:
+            self._collect_flushable()
+            self._emit(self._pending)
+            self._pending = []
+
+    def _handle(self, event: str, element: etree._Element) -> None:
+        if self._body is None:
+            if event == "start" and element.tag == "body":
+                self._start_body(element)
+            return
+        if self._body_closed:
+            return
+        if event == "start":
+            self._stack.append(element)
+            return
+        if not self._stack or self._stack[-1] is not element:
+            return
+        self._stack.pop()
+        if element is self._body:
+            self._body_closed = True
+            self._pending.extend(self._drain(element))
+            return
+        if element in self._opened:
+            self._pending.extend(self._drain(element))
+            self._pending.append(("end", element))
+            self._opened.discard(element)
+            self._shells.add(element)
+
+    def _drain(self, node: etree._Element) -> list[_Item]:
+        items: list[_Item] = []
+        text = node.text
+        if node is self._body and not self._body_text_done:
+            self._body_text_done = True
+            if text:
+                items.append(("text", text))
+        items.extend(self._item_for(child) for child in node)
+        return items
+
+    def _collect_flushable(self) -> None:
+        for depth, node in enumerate(self._stack):
+            if len(node) == 0:
+                break
+            text = node.text
+            if node is self._body:
+                if not self._body_text_done:
+                    self._body_text_done = True
+                    if text:
+                        self._pending.append(("text", text))
+            elif node.tag not in _CONTAINER_TAGS:
+                # Splitting a paragraph or a code block across chunks would break extraction.
+                break
+            elif node not in self._opened:
+                self._opened.add(node)
+                self._pending.append(("start", node))
+            next_open = self._stack[depth + 1] if depth + 1 < len(self._stack) else None
+            for child in node:
+                if child is next_open or child.getnext() is None:
+                    break
+                self._pending.append(self._item_for(child))
+
+    def _item_for(self, child: etree._Element) -> _Item:
+        return ("shell", child) if child in self._shells else ("element", child)
+
+    def _start_body(self, body: etree._Element) -> None:
+        self._body = body
+        self._stack = [body]
+        root = body.getparent()
+        if root is None:
+            raise _NoBodyError
+        head_doc = html.Element(root.tag, dict(root.attrib))
+        for child in list(root):
+            if child is body:
+                break
+            head_doc.append(child)
+        head_doc.append(html.Element("body", dict(body.attrib)))
+
+        _sanitize_base_url(head_doc)
+        _ensure_utf8_charset(head_doc)
+        self._process_assets_and_freeze(head_doc)
+
+        prefix = html.tostring(head_doc, encoding="unicode", method="html")
+        closing = f"</body></{head_doc.tag}>"
+        if prefix.endswith(closing):
+            prefix = prefix[: -len(closing)]
+        self._open_output()
+        self._write(prefix)
+
+    def _open_output(self) -> None:
+        config = self._config
+        final_url = self._online.final_url
+        slug = ensure_unique_slug(config.output_root, slugify_url(final_url), final_url)
+        self.output_dir = config.output_root / slug
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.output_dir / "index.html"
+        self._out = self.index_path.open("w", encoding="utf-8")
+
+    def _write(self, text: str) -> None:
+        if self._out is not None:
+            self._out.write(text)
+
+    def _emit(self, items: list[_Item]) -> None:
+        if not items:
+            return
+        chunk_root = html.Element("html")
+        chunk_body = html.Element("body")
+        chunk_root.append(chunk_body)
+        markers: dict[etree._Element, str] = {}
+        copies: set[etree._Element] = set()
+        for kind, payload in items:
+            if kind == "element":
+                chunk_body.append(payload)
+                continue
+            if kind == "start":
+                copy = html.Element(payload.tag, dict(payload.attrib))
+                copy.text = payload.text
+                chunk_body.append(copy)
+                copies.add(copy)
+                continue
+            marker = etree.ProcessingInstruction(_MARKER_TARGET)
+            if kind == "text":
+                markers[marker] = ""
+                marker.tail = payload
+            elif kind == "end":
+                markers[marker] = f"</{payload.tag}>"
+            else:
+                markers[marker] = ""
+                marker.tail = payload.tail
+                parent = payload.getparent()
+                if parent is not None:
+                    parent.remove(payload)
+            chunk_body.append(marker)
+
+        self._translate_chunk(chunk_root, chunk_body)
+        self._process_assets_and_freeze(chunk_root)
+
+        out: list[str] = []
+        if chunk_body.text:
+            out.append(escape(chunk_body.text))
+        for child in chunk_body:
+            if child in markers:
+                out.append(markers[child])
+                if child.tail:
+                    out.append(escape(child.tail))
+                continue
+            rendered = html.tostring(child, encoding="unicode", method="html")
+            if child in copies:
+                end_tag = f"</{child.tag}>"
+                if rendered.endswith(end_tag):
+                    rendered = rendered[: -len(end_tag)]
+            out.append(rendered)
+        self._write("".join(out))
+        self.totals.chunks += 1
+
+    def _translate_chunk(self, chunk_root: etree._Element, chunk_body: etree._Element) -> None:
+        config = self._config
+        blocks, rules = extract_blocks(
+            chunk_body,
+            scope_mode=config.scope,
+            translation_unit=config.translation_unit,
+            exclude_selectors=config.exclude_selectors,
+        )
+        attrs = extract_attribute_items(
+            chunk_body,
+            translate_attrs=config.translate_attrs,
+            translate_alt=config.translate_alt,
+            rules=rules,
+        )
+        if self._translator is not None:
+            self._translator.translate_blocks_and_attrs(blocks=blocks, attrs=attrs)
+        totals = self.totals
+        totals.blocks += len(blocks)
+        totals.parts += sum(len(block.parts) for block in blocks)
+        totals.attrs += len(attrs)
+        totals.applied_parts += apply_blocks(chunk_root, blocks)
+        totals.applied_attrs += apply_attributes(chunk_root, attrs)
+        totals.rule_match_ms += rules.match_ms
+        totals.excluded_elements += rules.excluded_total
+        for selector in rules.invalid_selectors:
+            if selector not in totals.invalid_selectors:
+                totals.invalid_selectors.append(selector)
+
+    def _process_assets_and_freeze(self, doc_root: etree._Element) -> None:
+        config = self._config
+        final_url = self._online.final_url
+        if config.font_subset:
+            self.totals.codepoints |= _page_codepoints(doc_root, {})
+        url_sites = collect_url_sites(
+            doc_root,
+            final_url,
+            srcset_policy=self._srcset_policy,
+            srcset_stats=self.totals.srcset,
+        )
+        if config.asset_scan:
+            # The shared graph skips URLs and stylesheets that earlier chunks already resolved.
+            self.totals.missing.extend(
+                resolve_asset_graph(
+                    seed_urls=url_sites.needed,
+                    css_by_url=self._css_by_url,
+                    asset_cache=self._asset_cache,
+                    graph=self.totals.asset_graph,
+                    final_url=final_url,
+                    user_agent=self._user_agent,
+                    max_asset_mb=config.max_asset_mb,
+                    enabled=config.fetch_missing_assets,
+                    max_depth=config.asset_graph_depth,
+                    max_urls=config.asset_graph_max_urls,
+                )
+            )
+        # New records only: the shared stats remember what earlier chunks transcoded.
+        transcode_images(self._asset_cache, options=self._image_options, stats=self.totals.images)
+        patch_url_sites(
+            url_sites.sites,
+            final_url=final_url,
+            map_url=self._asset_cache.ensure_local_mapping,
+            map_anchor_href=self._map_anchor_href,
+        )
+        counts = freeze_html(
+            doc_root,
+            freeze_js_enabled=config.freeze_js_enabled,
+            drop_noscript_mode=config.drop_noscript,
+            block_iframe_enabled=config.block_iframe_enabled,
+        )
+        for key, value in counts.items():
+            self.totals.freeze_counts[key] = self.totals.freeze_counts.get(key, 0) + value
+
+
+def run_offline_process_streaming(
+    *,
+    config: RunConfig,
+    online: OnlineRenderResult,
+    asset_cache: AssetCache,
+    user_agent: str,
+    map_anchor_href: Callable[[str], str | None] | None = None,
+) -> OfflineResult:
+    """Bounded-memory variant of ``run_offline_process`` for very large HTML dumps.
+
+    Scope selection needs the whole tree, so streaming translates everything under ``<body>``;
+    exclude selectors only match within a single chunk.
+    """
+    report = build_base_report(
+        source_url=config.url,
+        final_url=online.final_url,
+        run_params=_run_params_for_report(config),
+    )
+    css_by_url = _extract_css_from_cache(asset_cache)
+    translator = _build_translator(config)
+    processor = _StreamProcessor(
+        config=config,
+        online=online,
+        asset_cache=asset_cache,
+        user_agent=user_agent,
+        map_anchor_href=map_anchor_href,
+        translator=translator,
+        css_by_url=css_by_url,
+    )
+    translator_stats: dict[str, Any] = {}
+    try:
+        processor.run()
+        if translator is not None:
+            translator_stats = asdict(translator.stats)
+    except _NoBodyError:
+        return run_offline_process(
+            config=replace(config, stream_html="off"),
+            online=online,
+            asset_cache=asset_cache,
+            user_agent=user_agent,
+            map_anchor_href=map_anchor_href,
+        )
+    finally:
+        if translator is not None:
+            translator.close()
+
+    output_dir = processor.output_dir
+    index_path = processor.index_path
+    if output_dir is None or index_path is None:
+        raise RuntimeError("streaming HTML processing produced no output")
+
+    if translator is None:
+        report["warnings"].append("OPENAI_API_KEY is missing. Original text kept.")
+    report["warnings"].append(
+        "Streaming HTML mode: scope selection skipped, the whole body was processed in chunks."
+    )
+    if config.incremental:
+        report["warnings"].append(
+            "Incremental reuse is not available in streaming HTML mode; all blocks were sent."
+        )
+
+    totals = processor.totals
+    subset_fonts(
+        asset_cache,
+        codepoints=totals.codepoints | css_content_codepoints(css_by_url.values()),
+        options=FontSubsetOptions(enabled=config.font_subset, workers=config.font_workers),
+        stats=totals.fonts,
+    )
+    font_warning = cyrillic_warning(totals.fonts)
+    if font_warning:
+        report["warnings"].append(font_warning)
+
+    rewritten_css = rewrite_css_asset_records(
+        css_text_by_url=css_by_url,
+        map_url_from=_relative_mapper(asset_cache),
+        cache=asset_cache.css_rewrites,
+    )
+    _update_css_records(asset_cache, rewritten_css, css_by_url)
+    _update_svg_records(asset_cache, totals.asset_graph.svg_sources)
+    totals.srcset.records_dropped = asset_cache.drop_unreferenced(totals.srcset.pruned_urls)
+    bundle_stats = BundleStats()
+    index_path = write_output_bundle(
+        output_dir, asset_cache, output_format=config.output_format, stats=bundle_stats
+    )
+
+    _fill_report(
+        report,
+        config=config,
+        online=online,
+        asset_cache=asset_cache,
+        translator_stats=translator_stats,
+        blocks_total=totals.blocks,
+        parts_total=totals.parts,
+        attrs_total=totals.attrs,
+        asset_graph=totals.asset_graph,
+        srcset_stats=totals.srcset,
+        image_stats=totals.images,
+        font_stats=totals.fonts,
+        bundle_stats=bundle_stats,
+        missing=totals.missing,
+        freeze_counts=totals.freeze_counts,
+        applied_parts=totals.applied_parts,
+        applied_attrs=totals.applied_attrs,
+        rules_report={
+            "rule_match_ms": round(totals.rule_match_ms, 3),
+            "excluded_elements": totals.excluded_elements,
+            "invalid_selectors": totals.invalid_selectors,
+        },
+    )
+    report["stream"] = {
+        "enabled": True,
+        "chunk_kb": config.stream_chunk_kb,
+        "chunks": totals.chunks,
+        "input_chars": len(online.html_dump),
+    }
+
+    report_path = output_dir / "report.json"
+    write_report(report, report_path)
+    return OfflineResult(
+        output_dir=output_dir,
+        index_path=index_path,
+        report_path=report_path,
+        report=report,
+    )
@@ -2,16 +2,19 @@ from __future__ import annotations
 
 import asyncio
 import time
+from functools import partial
 from typing import Any, cast
 from urllib.parse import urlparse, urlsplit
 
-from playwright.sync_api import Browser, BrowserContext, Page, Playwright, sync_playwright
+from playwright.sync_api import BrowserContext, Page
 
 from web2ru.assets.cache import AssetCache
 from web2ru.config import RunConfig
-from web2ru.models import OnlineRenderResult, ShadowDomStats
+from web2ru.models import OnlineRenderResult, ResourcePolicyStats, ShadowDomStats
+from web2ru.pipeline.asset_routing import AssetRouter
+from web2ru.pipeline.browser_pool import BrowserPool, BrowserSlot
 from web2ru.pipeline.interstitial import looks_like_access_interstitial
-from web2ru.pipeline.persistent_context import launch_persistent_context_with_lock_recovery
+from web2ru.pipeline.resource_policy import build_resource_policy, declared_size
 from web2ru.pipeline.session_policy import (
     SessionPolicy,
     build_session_policy,
@@ -25,47 +28,60 @@ _INTERSTITIAL_ERROR = "Access interstitial detected during online render; target
 _MEDIUM_AUTH_PREFIX = "Medium authentication required."
 
 
-def run_online_render(config: RunConfig, asset_cache: AssetCache) -> tuple[OnlineRenderResult, str]:
+def run_online_render(
+    config: RunConfig,
+    asset_cache: AssetCache,
+    *,
+    browser_pool: BrowserPool | None = None,
+) -> tuple[OnlineRenderResult, str]:
+    """Render ``config.url`` in a browser from ``browser_pool`` (a one-off browser without one)."""
     policy = build_session_policy(
         url=config.url,
         cache_dir=config.cache_dir,
         openai_min_interval_ms=config.openai_min_interval_ms,
     )
+    if browser_pool is None:
+        with BrowserPool(headful=config.headful) as pool:
+            return run_online_render(config, asset_cache, browser_pool=pool)
+
+    profile_dir = policy.profile_dir if policy.use_persistent_profile else None
+    if policy.use_persistent_profile and profile_dir is None:
+        raise RuntimeError("persistent profile is not configured")
+    return browser_pool.run(
+        partial(_render_on_slot, config=config, asset_cache=asset_cache, policy=policy),
+        profile_dir=profile_dir,
+    )
+
 
-    with sync_playwright() as p:
-        if policy.use_persistent_profile:
-            return _run_with_persistent_context(
-                playwright=p,
-                config=config,
-                asset_cache=asset_cache,
-                policy=policy,
-            )
-
-        browser = p.chromium.launch(
-            headless=not config.headful,
-            args=["--disable-blink-features=AutomationControlled"],
+def _render_on_slot(
+    slot: BrowserSlot,
+    *,
+    config: RunConfig,
+    asset_cache: AssetCache,
+    policy: SessionPolicy,
+) -> tuple[OnlineRenderResult, str]:
+    if policy.use_persistent_profile:
+        result, user_agent = _run_with_persistent_context(
+            slot=slot, config=config, asset_cache=asset_cache, policy=policy
         )
-        try:
-            return _run_with_ephemeral_contexts(
-                browser=browser,
-                config=config,
-                asset_cache=asset_cache,
-                policy=policy,
-            )
-        finally:
-            browser.close()
+    else:
+        result, user_agent = _run_with_ephemeral_contexts(
+            slot=slot, config=config, asset_cache=asset_cache, policy=policy
+        )
+    result.browser = slot.render_stats
+    return result, user_agent
 
 
 def _run_with_ephemeral_contexts(
     *,
-    browser: Browser,
+    slot: BrowserSlot,
     config: RunConfig,
     asset_cache: AssetCache,
     policy: SessionPolicy,
 ) -> tuple[OnlineRenderResult, str]:
     max_attempts = 3
     for attempt in range(1, max_attempts + 1):
-        context = _new_ephemeral_context(browser=browser, policy=policy)
+        context = slot.new_context(resolve_storage_state_input(policy))
         try:
             _restore_context_storage_state(context=context, policy=policy)
             enforce_domain_rate_limit(policy=policy, cache_dir=config.cache_dir)
@@ -83,14 +99,17 @@ def _run_with_ephemeral_contexts(
 
 def _run_with_persistent_context(
     *,
-    playwright: Playwright,
+    slot: BrowserSlot,
     config: RunConfig,
     asset_cache: AssetCache,
     policy: SessionPolicy,
 ) -> tuple[OnlineRenderResult, str]:
+    if policy.profile_dir is None:
+        raise RuntimeError("persistent profile is not configured")
     max_attempts = 3
     for attempt in range(1, max_attempts + 1):
-        context = _new_persistent_context(playwright=playwright, config=config, policy=policy)
+        # The profile's browser stays open in the slot; only the page is closed per render.
+        context = slot.persistent_context(policy.profile_dir)
         try:
             _restore_context_storage_state(context=context, policy=policy)
             enforce_domain_rate_limit(policy=policy, cache_dir=config.cache_dir)
@@ -102,36 +121,9 @@ def _run_with_persistent_context(
                 time.sleep(1.0 * attempt)
         finally:
             _persist_context_storage_state(context=context, policy=policy)
-            context.close()
     raise RuntimeError(f"{_INTERSTITIAL_ERROR} (attempts={max_attempts})")
 
 
-def _new_ephemeral_context(*, browser: Browser, policy: SessionPolicy) -> BrowserContext:
-    storage_state_input = resolve_storage_state_input(policy)
-    if storage_state_input is not None:
-        return browser.new_context(storage_state=storage_state_input)
-    return browser.new_context()
-
-
-def _new_persistent_context(
-    *, playwright: Playwright, config: RunConfig, policy: SessionPolicy
-) -> BrowserContext:
-    if policy.profile_dir is None:
-        raise RuntimeError("persistent profile is not configured")
-
-    policy.profile_dir.mkdir(parents=True, exist_ok=True)
-    return launch_persistent_context_with_lock_recovery(
-        playwright=playwright,
-        profile_dir=policy.profile_dir,
-        headless=not config.headful,
-        args=[
-            "--disable-blink-features=AutomationControlled",
-            "--disable-session-crashed-bubble",
-            "--no-first-run",
-        ],
-    )
-
-
 def _restore_context_storage_state(*, context: BrowserContext, policy: SessionPolicy) -> None:
     payload = load_storage_state(policy)
     if payload is None:
@@ -158,6 +150,15 @@ def _render_with_context(
     *, context: BrowserContext, config: RunConfig, asset_cache: AssetCache
 ) -> tuple[OnlineRenderResult, str]:
     page = context.new_page()
+    try:
+        return _render_page(page, config=config, asset_cache=asset_cache)
+    finally:
+        page.close()
+
+
+def _render_page(
+    page: Page, *, config: RunConfig, asset_cache: AssetCache
+) -> tuple[OnlineRenderResult, str]:
     page.add_init_script(
         """
         Object.defineProperty(navigator, 'webdriver', {
@@ -166,8 +167,23 @@ def _render_with_context(
         """
     )
 
+    router = AssetRouter(
+        asset_cache,
+        max_asset_mb=config.max_asset_mb,
+        policy=build_resource_policy(
+            config.resource_policy, url_patterns=config.block_url_patterns
+        ),
+    )
+    if router.active:
+        page.route("**/*", router.handle)
+
     def on_response(response: object) -> None:
-        _capture_response_asset(response, asset_cache, config.max_asset_mb)
+        if getattr(response, "url", None) in router.served_urls:
+            # Fulfilled from the store; already recorded by the router.
+            return
+        _capture_response_asset(
+            response, asset_cache, config.max_asset_mb, policy_stats=router.policy_stats
+        )
 
     page.on("response", on_response)
 
@@ -211,6 +227,8 @@ def _render_with_context(
         scroll_steps=scroll_steps,
         height_before=height_before,
         height_after=height_after,
+        asset_routes=router.stats,
+        resource_policy=router.policy_stats,
     )
     return result, user_agent
 
@@ -244,7 +262,13 @@ def _ensure_not_interstitial(
     raise RuntimeError(_INTERSTITIAL_ERROR)
 
 
-def _capture_response_asset(response: object, asset_cache: AssetCache, max_asset_mb: int) -> None:
+def _capture_response_asset(
+    response: object,
+    asset_cache: AssetCache,
+    max_asset_mb: int,
+    *,
+    policy_stats: ResourcePolicyStats | None = None,
+) -> None:
     # Playwright response object in runtime; typed as object here to avoid strict dependency on Protocols.
     try:
         url = response.url  # type: ignore[attr-defined]
@@ -253,8 +277,14 @@ def _capture_response_asset(response: object, asset_cache: AssetCache, max_asset
             return
         headers = response.headers  # type: ignore[attr-defined]
         content_type = headers.get("content-type") if isinstance(headers, dict) else None
+        if declared_size(headers) > max_asset_mb * 1024 * 1024:
+            # put() would reject it anyway; do not pull the body into memory first.
+            if policy_stats is not None:
+                policy_stats.skipped_large_bodies += 1
+            return
         data = response.body()  # type: ignore[attr-defined]
         final_url = response.url  # type: ignore[attr-defined]
+        status = response.status  # type: ignore[attr-defined]
         asset_cache.put(
             url=url,
             final_url=final_url,
@@ -262,6 +292,8 @@ def _capture_response_asset(response: object, asset_cache: AssetCache, max_asset
             data=data,
             source="network_capture",
             max_asset_mb=max_asset_mb,
+            # Only complete 200 responses are worth keeping across runs.
+            http_headers=headers if status == 200 and isinstance(headers, dict) else None,
         )
     except asyncio.CancelledError:
         return
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
+from urllib.parse import urlsplit
+
+from web2ru.models import ResourcePolicyStats
+
+RESOURCE_POLICY_PRESETS = ("default", "text-only", "off")
+
+# Analytics, ad and session-recording hosts; matched on the host and every parent domain.
+TRACKER_HOSTS = frozenset(
+    {
+        "adnxs.com",
+        "adservice.google.com",
+        "ads-twitter.com",
+        "amazon-adsystem.com",
+        "amplitude.com",
+        "analytics.twitter.com",
+        "bat.bing.com",
+        "chartbeat.com",
+        "clarity.ms",
+        "criteo.com",
+        "criteo.net",
+        "doubleclick.net",
+        "facebook.net",
+        "fullstory.com",
+        "google-analytics.com",
+        "googleadservices.com",
+        "googlesyndication.com",
+        "googletagmanager.com",
+        "googletagservices.com",
+        "hotjar.com",
+        "mc.yandex.com",
+        "mc.yandex.ru",
+        "mixpanel.com",
+        "moatads.com",
+        "mouseflow.com",
+        "nr-data.net",
+        "outbrain.com",
+        "quantserve.com",
+        "scorecardresearch.com",
+        "segment.com",
+        "segment.io",
+        "taboola.com",
+    }
+)
+# Never useful in a static snapshot: beacons and live channels.
+_ALWAYS_BLOCKED_TYPES = frozenset({"ping", "eventsource", "websocket"})
+_TEXT_ONLY_BLOCKED_TYPES = frozenset({"image", "media", "font", "texttrack"})
+# Requests whose size is checked with a HEAD first: audio and video are the ones that run to
+# hundreds of megabytes, and one extra round trip per image or font would slow every render.
+_SIZE_CHECKED_TYPES = frozenset({"media"})
+
+
+@dataclass(slots=True)
+class ResourcePolicy:
+    preset: str
+    blocked_types: frozenset[str]
+    block_trackers: bool
+    url_patterns: list[str] = field(default_factory=list)
+    size_checked_types: frozenset[str] = frozenset()
+    _host_verdicts: dict[str, bool] = field(default_factory=dict)
+
+    def block_reason(self, url: str, resource_type: str) -> str | None:
+        """Why the request should be aborted (``type:<t>``, ``tracker``, ``pattern``), or None."""
+        if resource_type in self.blocked_types:
+            return f"type:{resource_type}"
+        if self.block_trackers and self._is_tracker(url):
+            return "tracker"
+        if any(fnmatchcase(url, pattern) for pattern in self.url_patterns):
+            return "pattern"
+        return None
+
+    def checks_size(self, resource_type: str) -> bool:
+        """Whether a request of this type is aborted when it declares more than the asset cap."""
+        return resource_type in self.size_checked_types
+
+    @property
+    def active(self) -> bool:
+        return bool(
+            self.blocked_types
+            or self.block_trackers
+            or self.url_patterns
+            or self.size_checked_types
+        )
+
+    def _is_tracker(self, url: str) -> bool:
+        host = (urlsplit(url).hostname or "").lower()
+        verdict = self._host_verdicts.get(host)
+        if verdict is None:
+            labels = host.split(".")
+            verdict = any(".".join(labels[i:]) in TRACKER_HOSTS for i in range(len(labels) - 1))
+            self._host_verdicts[host] = verdict
+        return verdict
+
+
+def build_resource_policy(preset: str, *, url_patterns: list[str]) -> ResourcePolicy:
+    if preset == "off":
+        return ResourcePolicy(
+            preset=preset,
+            blocked_types=frozenset(),
+            block_trackers=False,
+            url_patterns=list(url_patterns),
+        )
+    blocked_types = set(_ALWAYS_BLOCKED_TYPES)
+    if preset == "text-only":
+        blocked_types |= _TEXT_ONLY_BLOCKED_TYPES
+    return ResourcePolicy(
+        preset=preset,
+        blocked_types=frozenset(blocked_types),
+        block_trackers=True,
+        url_patterns=list(url_patterns),
+        size_checked_types=_SIZE_CHECKED_TYPES,
+    )
+
+
+def record_block(stats: ResourcePolicyStats, reason: str) -> None:
+    stats.blocked_total += 1
+    stats.blocked_by_reason[reason] = stats.blocked_by_reason.get(reason, 0) + 1
+
+
+def declared_size(headers: object) -> int:
+    """``Content-Length`` of lowercase response headers; 0 when absent or malformed."""
+    if not isinstance(headers, dict):
+        return 0
+    try:
+        return int(headers.get("content-length") or 0)
+    except ValueError:
+        return 0
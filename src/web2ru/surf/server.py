@@ -9,6 +9,7 @@ from pathlib import Path
 from typing import cast
 from urllib.parse import urlsplit
 
+from web2ru.pipeline.bundle import ZIP_BUNDLE_NAME, open_bundle, send_bundle_entry
 from web2ru.surf.router import SURF_GO_PATH, SURF_PAGE_PREFIX, build_page_route, parse_go_query
 from web2ru.surf.session import SurfSession
 
@@ -91,6 +92,13 @@ class SurfRequestHandler(BaseHTTPRequestHandler):
         self._serve_file(root=page_dir, rel_path=rel_path)
 
     def _serve_file(self, *, root: Path, rel_path: str) -> None:
+        bundle = root / ZIP_BUNDLE_NAME
+        if bundle.is_file():
+            with open_bundle(bundle) as reader:
+                found = send_bundle_entry(self, reader, rel_path)
+            if not found:
+                self._send_html(404, "Not Found", "File not found.")
+            return
         candidate = (root / rel_path).resolve()
         root_resolved = root.resolve()
         if root_resolved not in candidate.parents and candidate != root_resolved:
@@ -157,8 +165,11 @@ def serve_surf_session(*, session: SurfSession, port: int, open_in_browser: bool
         if open_in_browser:
             webbrowser.open(url)
         print("Press Ctrl+C to stop server.")
-        with suppress(KeyboardInterrupt):
-            httpd.serve_forever()
+        try:
+            with suppress(KeyboardInterrupt):
+                httpd.serve_forever()
+        finally:
+            session.close()
 
 
 def _extract_server_port(httpd: ThreadingHTTPServer) -> int:
@@ -6,7 +6,11 @@ from pathlib import Path
 from urllib.parse import urljoin
 
 from web2ru.assets.cache import AssetCache
+from web2ru.assets.css_cache import open_css_rewrite_cache
+from web2ru.assets.store import open_asset_store
 from web2ru.config import RunConfig
+from web2ru.pipeline.browser_pool import BrowserPool
+from web2ru.pipeline.bundle import has_index, read_index_html
 from web2ru.pipeline.interstitial import looks_like_access_interstitial
 from web2ru.pipeline.offline_process import run_offline_process
 from web2ru.pipeline.online_render import run_online_render
@@ -54,6 +58,16 @@ class SurfSession:
 
         self._lock = threading.Lock()
         self._inflight: dict[str, threading.Event] = {}
+        # Browsers stay running between pages; each click would otherwise cold-start Chromium.
+        self.browser_pool = BrowserPool(
+            headful=config_template.headful,
+            size=config_template.browser_pool_size,
+            recycle_pages=config_template.browser_recycle_pages,
+            recycle_mb=config_template.browser_recycle_mb,
+        )
+
+    def close(self) -> None:
+        self.browser_pool.close()
 
     def map_anchor_href(self, absolute_href: str) -> str | None:
         try:
@@ -91,10 +105,9 @@ class SurfSession:
             if page is None or page.status != "ready" or page.output_dir is None:
                 return None
             output_dir = self.session_root / page.output_dir
-        index_path = output_dir / "index.html"
-        if not index_path.exists():
+        if not has_index(output_dir):
             return None
-        if _index_contains_interstitial(index_path):
+        if _index_contains_interstitial(output_dir):
             with self._lock:
                 current = self.manifest.get_by_page_key(page_key)
                 if current is not None and current.status == "ready":
@@ -126,8 +139,7 @@ class SurfSession:
                     and existing.output_dir is not None
                 ):
                     output_dir = self.session_root / existing.output_dir
-                    index_path = output_dir / "index.html"
-                    if index_path.exists() and not _index_contains_interstitial(index_path):
+                    if has_index(output_dir) and not _index_contains_interstitial(output_dir):
                         return existing
                     self.manifest.mark_failed(
                         source_url=existing.source_url,
@@ -168,9 +180,19 @@ class SurfSession:
             serve=False,
             output_root=self.pages_root,
         )
-        asset_cache = AssetCache()
+        # One store connection per build: pages are built on server threads.
+        asset_cache = AssetCache(
+            store=open_asset_store(
+                cache_dir=cfg.cache_dir, enabled=cfg.use_asset_cache, max_mb=cfg.asset_cache_max_mb
+            ),
+            css_rewrites=open_css_rewrite_cache(
+                cache_dir=cfg.cache_dir, enabled=cfg.use_asset_cache
+            ),
+            blob_dir=self.session_root / "blobs",
+            write_workers=cfg.asset_write_workers,
+        )
         try:
-            online, user_agent = run_online_render(cfg, asset_cache)
+            online, user_agent = run_online_render(cfg, asset_cache, browser_pool=self.browser_pool)
             offline = run_offline_process(
                 config=cfg,
                 online=online,
@@ -185,6 +207,8 @@ class SurfSession:
                     page_key=page_key,
                     error=f"{type(exc).__name__}: {exc}",
                 )
+        finally:
+            asset_cache.close()
 
         relative_output = str(offline.output_dir.relative_to(self.session_root))
         with self._lock:
@@ -199,7 +223,7 @@ class SurfSession:
             message = page.error or "page is not ready"
             raise RuntimeError(message)
         output_dir = self.session_root / page.output_dir
-        if not (output_dir / "index.html").exists():
+        if not has_index(output_dir):
             raise RuntimeError("ready page output is missing index.html")
         return output_dir
 
@@ -211,9 +235,9 @@ def _session_slug(origin_url: str, *, same_origin_only: bool) -> str:
     return f"surf-{host}-{page_key[:8]}-{mode_suffix}"
 
 
-def _index_contains_interstitial(index_path: Path) -> bool:
+def _index_contains_interstitial(output_dir: Path) -> bool:
     try:
-        html_text = index_path.read_text(encoding="utf-8", errors="ignore")
+        html_text = read_index_html(output_dir)
     except OSError:
         return False
-    return looks_like_access_interstitial(html_text)
+    return html_text is not None and looks_like_access_interstitial(html_text)
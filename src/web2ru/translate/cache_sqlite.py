@@ -6,6 +6,9 @@ from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
 
+# Stays under SQLite's default bound-parameter limit on older builds.
+_LOOKUP_CHUNK = 500
+
 
 @dataclass(slots=True)
 class CacheEntry:
@@ -45,6 +48,38 @@ class TranslationCache:
             created_at=created_at,
         )
 
+    def get_many(self, cache_keys: list[str]) -> dict[str, CacheEntry]:
+        found: dict[str, CacheEntry] = {}
+        for start in range(0, len(cache_keys), _LOOKUP_CHUNK):
+            chunk = cache_keys[start : start + _LOOKUP_CHUNK]
+            placeholders = ",".join("?" for _ in chunk)
+            rows = self._conn.execute(
+                "SELECT cache_key, payload, status, created_at FROM translation_cache "
+                f"WHERE cache_key IN ({placeholders})",
+                chunk,
+            ).fetchall()
+            for cache_key, payload, status, created_at in rows:
+                found[cache_key] = CacheEntry(
+                    translations=json.loads(payload),
+                    status=status,
+                    created_at=created_at,
+                )
+        return found
+
+    def put_many(self, entries: dict[str, dict[str, str]], status: str = "ok") -> None:
+        created_at = datetime.now(timezone.utc).isoformat()
+        self._conn.executemany(
+            """
+            INSERT OR REPLACE INTO translation_cache (cache_key, payload, status, created_at)
+            VALUES (?, ?, ?, ?)
+            """,
+            [
+                (cache_key, json.dumps(translations, ensure_ascii=False), status, created_at)
+                for cache_key, translations in entries.items()
+            ],
+        )
+        self._conn.commit()
+
     def put(self, cache_key: str, translations: dict[str, str], status: str = "ok") -> None:
         self._conn.execute(
             """
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import json
+import re
+from collections.abc import Collection
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from web2ru.extract.fingerprint import attr_fingerprint, block_fingerprint
+from web2ru.models import AttributeItem, Block
+
+PLAN_FILENAME = "translation_plan.json"
+PLAN_VERSION = 2
+
+
+@dataclass(slots=True)
+class PlannedBlock:
+    path: str
+    digest: str
+    translations: list[str]
+
+
+@dataclass(slots=True)
+class TranslationPlan:
+    source_dir: Path
+    blocks: list[PlannedBlock]
+    attrs: dict[str, str]
+
+
+@dataclass(slots=True)
+class IncrementalStats:
+    previous_dir: str | None = None
+    blocks_reused: int = 0
+    blocks_modified: int = 0
+    blocks_new: int = 0
+    attrs_reused: int = 0
+    attrs_new: int = 0
+
+    def as_report(self) -> dict[str, Any]:
+        blocks_total = self.blocks_reused + self.blocks_modified + self.blocks_new
+        return {
+            "previous_dir": self.previous_dir,
+            "blocks_reused": self.blocks_reused,
+            "blocks_modified": self.blocks_modified,
+            "blocks_new": self.blocks_new,
+            "attrs_reused": self.attrs_reused,
+            "attrs_new": self.attrs_new,
+            "reuse_ratio": round(self.blocks_reused / blocks_total, 4) if blocks_total else 0.0,
+        }
+
+
+def block_path(block: Block) -> str:
+    return block.parts[0].node_ref.xpath if block.parts else ""
+
+
+def write_translation_plan(
+    output_dir: Path,
+    *,
+    final_url: str,
+    blocks: list[Block],
+    attrs: list[AttributeItem],
+    untranslated: Collection[str] = frozenset(),
+) -> Path:
+    """Persist what was translated so the next run of the same page can reuse it.
+
+    Blocks with a part in ``untranslated`` (ids that kept their original text after the
+    translator gave up) and such attributes are left out, so the next run retries them.
+    """
+    planned_blocks: list[dict[str, Any]] = []
+    for block in blocks:
+        translations = [part.translated_core for part in block.parts]
+        if any(text is None for text in translations) or any(
+            part.id in untranslated for part in block.parts
+        ):
+            continue
+        planned_blocks.append(
+            {
+                "path": block_path(block),
+                "digest": block_fingerprint(block),
+                "translations": translations,
+            }
+        )
+    planned_attrs = {
+        attr_fingerprint(attr): attr.translated_text
+        for attr in attrs
+        if attr.translated_text is not None and attr.id not in untranslated
+    }
+    plan_path = output_dir / PLAN_FILENAME
+    plan_path.write_text(
+        json.dumps(
+            {
+                "version": PLAN_VERSION,
+                "final_url": final_url,
+                "blocks": planned_blocks,
+                "attrs": planned_attrs,
+            },
+            ensure_ascii=False,
+        ),
+        encoding="utf-8",
+    )
+    return plan_path
+
+
+def load_previous_plan(output_root: Path, slug: str, *, final_url: str) -> TranslationPlan | None:
+    """Load the newest plan written for ``final_url`` under ``output_root``.
+
+    Earlier runs of the same page live in ``<slug>`` or the ``<slug>-<digest>[-N]`` directories
+    that `ensure_unique_slug` creates once the plain slug is taken.
+    """
+    if not output_root.is_dir():
+        return None
+    pattern = re.compile(rf"^{re.escape(slug)}(?:-[0-9a-f]{{8}}(?:-\d+)?)?$")
+    candidates = [
+        path / PLAN_FILENAME
+        for path in output_root.iterdir()
+        if pattern.match(path.name) and (path / PLAN_FILENAME).is_file()
+    ]
+    for plan_path in sorted(candidates, key=lambda path: path.stat().st_mtime, reverse=True):
+        try:
+            payload = json.loads(plan_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        if payload.get("version") != PLAN_VERSION or payload.get("final_url") != final_url:
+            continue
+        return TranslationPlan(
+            source_dir=plan_path.parent,
+            blocks=[
+                PlannedBlock(
+                    path=str(entry["path"]),
+                    digest=str(entry["digest"]),
+                    translations=[str(text) for text in entry["translations"]],
+                )
+                for entry in payload.get("blocks", [])
+            ],
+            attrs={str(key): str(value) for key, value in payload.get("attrs", {}).items()},
+        )
+    return None
+
+
+def reuse_translations(
+    plan: TranslationPlan,
+    *,
+    blocks: list[Block],
+    attrs: list[AttributeItem],
+) -> tuple[list[Block], list[AttributeItem], IncrementalStats]:
+    """Fill translations of unchanged blocks and attributes from ``plan``.
+
+    Blocks are aligned by `block_fingerprint`; among equal digests (repeated "Read more" links) the
+    one at the same structural path wins, otherwise the earliest unused one. Returns the blocks
+    and attributes that still need the LLM.
+    """
+    stats = IncrementalStats(previous_dir=str(plan.source_dir))
+    by_digest: dict[str, list[PlannedBlock]] = {}
+    for planned in plan.blocks:
+        by_digest.setdefault(planned.digest, []).append(planned)
+    old_paths = {planned.path for planned in plan.blocks}
+
+    pending_blocks: list[Block] = []
+    for block in blocks:
+        path = block_path(block)
+        candidates = by_digest.get(block_fingerprint(block))
+        match: PlannedBlock | None = None
+        if candidates:
+            match = next((item for item in candidates if item.path == path), candidates[0])
+            candidates.remove(match)
+        if match is None or len(match.translations) != len(block.parts):
+            pending_blocks.append(block)
+            if path in old_paths:
+                stats.blocks_modified += 1
+            else:
+                stats.blocks_new += 1
+            continue
+        for part, translated in zip(block.parts, match.translations, strict=True):
+            part.translated_core = translated
+        stats.blocks_reused += 1
+
+    pending_attrs: list[AttributeItem] = []
+    for attr in attrs:
+        translated_attr = plan.attrs.get(attr_fingerprint(attr))
+        if translated_attr is None:
+            pending_attrs.append(attr)
+            stats.attrs_new += 1
+            continue
+        attr.translated_text = translated_attr
+        stats.attrs_reused += 1
+    return pending_blocks, pending_attrs, stats
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import re
+from collections.abc import Mapping
 from dataclasses import dataclass
 
 TOKEN_PROTECTOR_VERSION = "1.1"
@@ -49,7 +50,7 @@ def protect_text(value: str) -> ProtectedText:
     return ProtectedText(text=protected, mapping=mapping)
 
 
-def restore_text(value: str, mapping: dict[str, str]) -> str:
+def restore_text(value: str, mapping: Mapping[str, str]) -> str:
     restored = value
     for placeholder, token in mapping.items():
         restored = restored.replace(placeholder, token)
@@ -3,10 +3,12 @@ from __future__ import annotations
 import hashlib
 import json
 import re
+from collections.abc import Iterable, Mapping
 from dataclasses import dataclass
 from pathlib import Path
 
-from web2ru.models import AttributeItem, Block, Part, TranslationItem
+from web2ru.extract.fingerprint import attr_fingerprint, part_fingerprint
+from web2ru.models import EMPTY_TOKEN_MAP, AttributeItem, Block, Part, TranslationItem
 from web2ru.translate.batcher import build_batches
 from web2ru.translate.cache_sqlite import TranslationCache
 from web2ru.translate.client_openai import OpenAIClient
@@ -15,6 +17,8 @@ from web2ru.translate.validate import ValidationOutcome, validate_translation_re
 
 PROMPT_VERSION = "1.1"
 GLOSSARY_VERSION = "1.1"
+# Failure reason of items whose original text was kept after every retry failed.
+FALLBACK_ORIGINAL_REASON = "fallback_original_after_retries"
 _MAX_CONTEXT_CHARS = 220
 _MAX_GLOSSARY_TERMS = 40
 _GLOSSARY_TOKEN_RE = re.compile(r"\b[A-Za-z][A-Za-z0-9.+/#-]{2,}\b")
@@ -74,6 +78,14 @@ class TranslateStats:
         if self.failures is None:
             self.failures = []
 
+    def fallback_ids(self) -> set[str]:
+        """Ids of parts and attributes that kept their original text after all retries."""
+        return {
+            failure["id"]
+            for failure in self.failures
+            if failure["reason"] == FALLBACK_ORIGINAL_REASON
+        }
+
 
 class Translator:
     def __init__(
@@ -120,22 +132,21 @@ class Translator:
         attrs: list[AttributeItem],
     ) -> None:
         items: list[TranslationItem] = []
-        source_texts: list[str] = []
-        protected_inputs: dict[str, str] = {}
-        token_maps: dict[str, dict[str, str]] = {}
-        id_to_part: dict[str, Part] = {}
-        id_to_attr: dict[str, AttributeItem] = {}
+        # One owner per item id; protected inputs and token maps are read back from the owners
+        # and items instead of being copied into per-id dicts.
+        owners: dict[str, Part | AttributeItem] = {}
 
         for block in blocks:
             for part in block.parts:
-                protected, mapping = self._protect_if_needed(part.core)
+                if self._token_protect and part.protected_core is not None:
+                    # Parallel extraction already protected this part in a worker process.
+                    protected, mapping = part.protected_core, part.token_map
+                else:
+                    protected, mapping = self._protect_if_needed(part.core)
                 part.protected_core = protected
                 part.token_map = mapping
                 self.stats.token_protected_count += len(mapping)
-                source_texts.append(part.core)
-                protected_inputs[part.id] = protected
-                token_maps[part.id] = mapping
-                id_to_part[part.id] = part
+                owners[part.id] = part
                 items.append(
                     TranslationItem(
                         id=part.id,
@@ -143,6 +154,7 @@ class Translator:
                         block_id=part.block_id,
                         source_text=part.core,
                         section_hint=part.block_id,
+                        fingerprint=part_fingerprint(part),
                     )
                 )
 
@@ -151,10 +163,7 @@ class Translator:
             attr.protected_text = protected
             attr.token_map = mapping
             self.stats.token_protected_count += len(mapping)
-            source_texts.append(attr.text)
-            protected_inputs[attr.id] = protected
-            token_maps[attr.id] = mapping
-            id_to_attr[attr.id] = attr
+            owners[attr.id] = attr
             items.append(
                 TranslationItem(
                     id=attr.id,
@@ -163,6 +172,7 @@ class Translator:
                     allow_empty=False,
                     source_text=attr.text,
                     section_hint=f"attr:{attr.id}",
+                    fingerprint=attr_fingerprint(attr),
                 )
             )
 
@@ -170,35 +180,39 @@ class Translator:
             return
 
         self._attach_local_context(items)
-        document_glossary = self._build_document_glossary(source_texts)
+        document_glossary = self._build_document_glossary(item.source_text or "" for item in items)
         self.stats.glossary_terms = len(document_glossary)
-        translated = self._translate_items_recursive(
-            items=items,
-            protected_inputs=protected_inputs,
-            glossary=document_glossary,
-            depth=0,
-        )
+        translated = self._lookup_cached_items(items, document_glossary)
+        pending = [item for item in items if item.id not in translated]
+        if pending:
+            translated.update(
+                self._translate_items_recursive(
+                    items=pending,
+                    glossary=document_glossary,
+                    depth=0,
+                )
+            )
 
         for item_id, translated_text in translated.items():
-            restored = restore_text(translated_text, token_maps[item_id])
-            if item_id in id_to_part:
-                id_to_part[item_id].translated_core = restored
+            owner = owners[item_id]
+            restored = restore_text(translated_text, owner.token_map)
+            if isinstance(owner, Part):
+                owner.translated_core = restored
                 self.stats.translated_parts += 1
-            elif item_id in id_to_attr:
-                id_to_attr[item_id].translated_text = restored
+            else:
+                owner.translated_text = restored
                 self.stats.translated_attrs += 1
 
-    def _protect_if_needed(self, text: str) -> tuple[str, dict[str, str]]:
+    def _protect_if_needed(self, text: str) -> tuple[str, Mapping[str, str]]:
         if not self._token_protect:
-            return text, {}
+            return text, EMPTY_TOKEN_MAP
         protected = protect_text(text)
-        return protected.text, protected.mapping
+        return protected.text, protected.mapping or EMPTY_TOKEN_MAP
 
     def _translate_items_recursive(
         self,
         *,
         items: list[TranslationItem],
-        protected_inputs: dict[str, str],
         glossary: dict[str, str],
         depth: int,
     ) -> dict[str, str]:
@@ -214,7 +228,6 @@ class Translator:
             self.stats.batch_chars_total += batch.chars
             translated = self._translate_batch_with_retry(
                 batch_items=batch.items,
-                protected_inputs=protected_inputs,
                 glossary=glossary,
             )
             if translated is None:
@@ -222,20 +235,16 @@ class Translator:
                     item = batch.items[0]
                     result[item.id] = item.text
                     self.stats.fallback_parts += 1
-                    self.stats.failures.append(
-                        {"id": item.id, "reason": "fallback_original_after_retries"}
-                    )
+                    self.stats.failures.append({"id": item.id, "reason": FALLBACK_ORIGINAL_REASON})
                     continue
                 mid = len(batch.items) // 2
                 left = self._translate_items_recursive(
                     items=batch.items[:mid],
-                    protected_inputs=protected_inputs,
                     glossary=glossary,
                     depth=depth + 1,
                 )
                 right = self._translate_items_recursive(
                     items=batch.items[mid:],
-                    protected_inputs=protected_inputs,
                     glossary=glossary,
                     depth=depth + 1,
                 )
@@ -249,17 +258,9 @@ class Translator:
         self,
         *,
         batch_items: list[TranslationItem],
-        protected_inputs: dict[str, str],
         glossary: dict[str, str],
     ) -> dict[str, str] | None:
         expected_ids = [item.id for item in batch_items]
-        cache_key = self._make_cache_key(batch_items, glossary)
-        if self._cache is not None:
-            cached = self._cache.get(cache_key)
-            if cached is not None:
-                self.stats.cache_hits += 1
-                return cached.translations
-
         payload = {
             "task": "translate_items",
             "target_language": "ru",
@@ -302,13 +303,12 @@ class Translator:
             outcome: ValidationOutcome = validate_translation_result(
                 raw_text=response.raw_text,
                 expected_ids=expected_ids,
-                protected_inputs={k: protected_inputs[k] for k in expected_ids},
+                protected_inputs={item.id: item.text for item in batch_items},
                 strict_placeholders=self._token_protect_strict,
                 allow_empty_parts=self._allow_empty_parts,
             )
             if outcome.ok and outcome.translations is not None:
-                if self._cache is not None:
-                    self._cache.put(cache_key, outcome.translations)
+                self._store_cached_items(batch_items, outcome.translations, glossary)
                 return outcome.translations
 
             self.stats.retries += 1
@@ -319,34 +319,55 @@ class Translator:
         )
         return None
 
-    def _make_cache_key(self, items: list[TranslationItem], glossary: dict[str, str]) -> str:
-        payload = json.dumps(
-            [
-                {
-                    "id": item.id,
-                    "text": item.text,
-                    "hint": item.hint,
-                    "context_prev": item.context_prev,
-                    "context_next": item.context_next,
-                    "section_hint": item.section_hint,
-                }
+    def _lookup_cached_items(
+        self, items: list[TranslationItem], glossary: dict[str, str]
+    ) -> dict[str, str]:
+        if self._cache is None:
+            return {}
+        keys = {item.id: self._make_item_cache_key(item, glossary) for item in items}
+        entries = self._cache.get_many(list(set(keys.values())))
+        found: dict[str, str] = {}
+        for item in items:
+            entry = entries.get(keys[item.id])
+            if entry is None or item.fingerprint not in entry.translations:
+                continue
+            found[item.id] = entry.translations[item.fingerprint]
+        self.stats.cache_hits += len(found)
+        return found
+
+    def _store_cached_items(
+        self,
+        items: list[TranslationItem],
+        translations: dict[str, str],
+        glossary: dict[str, str],
+    ) -> None:
+        if self._cache is None:
+            return
+        self._cache.put_many(
+            {
+                self._make_item_cache_key(item, glossary): {item.fingerprint: translations[item.id]}
                 for item in items
-            ],
-            ensure_ascii=False,
-            sort_keys=True,
+                if item.id in translations
+            }
         )
-        payload_hash = hashlib.sha256(payload.encode("utf-8")).hexdigest()
-        glossary_payload = json.dumps(glossary, ensure_ascii=False, sort_keys=True)
-        glossary_hash = hashlib.sha256(glossary_payload.encode("utf-8")).hexdigest()
-        raw = "|".join(
+
+    def _make_item_cache_key(self, item: TranslationItem, glossary: dict[str, str]) -> str:
+        # Sequential ids and block ids only exist in the LLM payload; the cache is keyed by content
+        # so an inserted paragraph does not invalidate every item below it. For the same reason
+        # only the glossary terms that occur in this item count, not the whole document's.
+        raw = "\x1f".join(
             [
                 self._model,
                 self._reasoning_effort,
                 PROMPT_VERSION,
                 GLOSSARY_VERSION,
                 TOKEN_PROTECTOR_VERSION,
-                payload_hash,
-                glossary_hash,
+                _glossary_hash(_item_glossary(item, glossary)),
+                item.fingerprint,
+                item.text,
+                item.hint or "",
+                item.context_prev,
+                item.context_next,
             ]
         )
         return hashlib.sha256(raw.encode("utf-8")).hexdigest()
@@ -398,7 +419,7 @@ class Translator:
         # Mid-sentence fragments often start lowercase and benefit from neighboring context.
         return compact[0].islower()
 
-    def _build_document_glossary(self, source_texts: list[str]) -> dict[str, str]:
+    def _build_document_glossary(self, source_texts: Iterable[str]) -> dict[str, str]:
         glossary = dict(_STATIC_GLOSSARY)
         counts: dict[str, int] = {}
         for text in source_texts:
@@ -429,3 +450,13 @@ class Translator:
             return compact
         clipped = compact[: _MAX_CONTEXT_CHARS - 3].rstrip()
         return f"{clipped}..."
+
+
+def _item_glossary(item: TranslationItem, glossary: dict[str, str]) -> dict[str, str]:
+    text = item.source_text or item.text
+    return {term: value for term, value in glossary.items() if term in text}
+
+
+def _glossary_hash(glossary: dict[str, str]) -> str:
+    glossary_payload = json.dumps(glossary, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(glossary_payload.encode("utf-8")).hexdigest()
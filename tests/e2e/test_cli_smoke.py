@@ -11,7 +11,7 @@ runner = CliRunner()
 
 
 def test_cli_smoke_without_network(monkeypatch, tmp_path: Path) -> None:  # type: ignore[no-untyped-def]
-    def fake_online(config, asset_cache):  # type: ignore[no-untyped-def]
+    def fake_online(config, asset_cache, browser_pool=None):  # type: ignore[no-untyped-def]
         return (
             OnlineRenderResult(
                 final_url=config.url,
@@ -44,7 +44,7 @@ def test_cli_smoke_without_network(monkeypatch, tmp_path: Path) -> None:  # type
 def test_cli_fast_preset_applies_speed_defaults(monkeypatch, tmp_path: Path) -> None:  # type: ignore[no-untyped-def]
     captured = {}
 
-    def fake_online(config, asset_cache):  # type: ignore[no-untyped-def]
+    def fake_online(config, asset_cache, browser_pool=None):  # type: ignore[no-untyped-def]
         captured["config"] = config
         return (
             OnlineRenderResult(
@@ -86,7 +86,7 @@ def test_cli_fast_preset_applies_speed_defaults(monkeypatch, tmp_path: Path) ->
 def test_cli_defaults_unchanged_without_fast(monkeypatch, tmp_path: Path) -> None:  # type: ignore[no-untyped-def]
     captured = {}
 
-    def fake_online(config, asset_cache):  # type: ignore[no-untyped-def]
+    def fake_online(config, asset_cache, browser_pool=None):  # type: ignore[no-untyped-def]
         captured["config"] = config
         return (
             OnlineRenderResult(
@@ -128,7 +128,7 @@ def test_cli_defaults_unchanged_without_fast(monkeypatch, tmp_path: Path) -> Non
 def test_cli_fast_preset_respects_explicit_overrides(monkeypatch, tmp_path: Path) -> None:  # type: ignore[no-untyped-def]
     captured = {}
 
-    def fake_online(config, asset_cache):  # type: ignore[no-untyped-def]
+    def fake_online(config, asset_cache, browser_pool=None):  # type: ignore[no-untyped-def]
         captured["config"] = config
         return (
             OnlineRenderResult(
@@ -1,11 +1,16 @@
 from __future__ import annotations
 
+import re
 from pathlib import Path
 
+import pytest
+from lxml import html
+
 from web2ru.assets.cache import AssetCache
 from web2ru.config import RunConfig
-from web2ru.models import OnlineRenderResult, ShadowDomStats
+from web2ru.models import AttributeItem, Block, OnlineRenderResult, ShadowDomStats
 from web2ru.pipeline.offline_process import run_offline_process
+from web2ru.translate.translator import FALLBACK_ORIGINAL_REASON, TranslateStats
 
 
 def test_offline_pipeline_writes_snapshot(tmp_path: Path) -> None:
@@ -59,3 +64,160 @@ def test_offline_pipeline_writes_snapshot(tmp_path: Path) -> None:
     assert 'name="author" content="Simon Willison"' in html_text
     assert "quality" in result.report
     assert "context_coverage_ratio" in result.report["quality"]
+    assert "rule_match_ms" in result.report["extract"]
+
+
+class _UpperTranslator:
+    def __init__(self) -> None:
+        self.sent_parts: list[str] = []
+        self.failing: set[str] = set()
+        self.stats = TranslateStats()
+
+    def translate_blocks_and_attrs(
+        self, *, blocks: list[Block], attrs: list[AttributeItem]
+    ) -> None:
+        self.stats = TranslateStats()
+        for block in blocks:
+            for part in block.parts:
+                self.sent_parts.append(part.core)
+                if part.core in self.failing:
+                    # What Translator does once a batch failed every retry.
+                    part.translated_core = part.core
+                    self.stats.fallback_parts += 1
+                    self.stats.failures.append({"id": part.id, "reason": FALLBACK_ORIGINAL_REASON})
+                    continue
+                part.translated_core = part.core.upper()
+        for attr in attrs:
+            attr.translated_text = attr.text.upper()
+
+    def close(self) -> None:
+        return None
+
+
+def test_offline_pipeline_incremental_reuses_unchanged_blocks(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    translator = _UpperTranslator()
+    monkeypatch.setattr(
+        "web2ru.pipeline.offline_process._build_translator", lambda config: translator
+    )
+    cfg = RunConfig(
+        url="https://example.com/page",
+        output_root=tmp_path,
+        fetch_missing_assets=False,
+        incremental=True,
+    )
+
+    def run(body: str) -> dict[str, object]:
+        online = OnlineRenderResult(
+            final_url="https://example.com/page",
+            html_dump=f"<html><body><main>{body}</main></body></html>",
+            shadow_dom=ShadowDomStats(enabled=False),
+            scroll_steps=0,
+            height_before=0,
+            height_after=0,
+        )
+        result = run_offline_process(
+            config=cfg, online=online, asset_cache=AssetCache(), user_agent="pytest-agent"
+        )
+        return result.report
+
+    first = run("<p>Hello world</p><p>Second paragraph</p>")
+    assert first["incremental"]["previous_dir"] is None
+    translator.sent_parts.clear()
+
+    second = run("<p>Inserted at the top</p><p>Hello world</p><p>Second paragraph, edited</p>")
+    assert translator.sent_parts == ["Inserted at the top", "Second paragraph, edited"]
+    incremental = second["incremental"]
+    assert incremental["blocks_reused"] == 1
+    assert incremental["blocks_new"] + incremental["blocks_modified"] == 2
+    assert incremental["reuse_ratio"] == round(1 / 3, 4)
+    index_paths = sorted(tmp_path.glob("*/index.html"))
+    assert len(index_paths) == 2
+    assert any("HELLO WORLD" in path.read_text(encoding="utf-8") for path in index_paths)
+
+
+def test_offline_pipeline_incremental_retries_fallback_parts(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    translator = _UpperTranslator()
+    monkeypatch.setattr(
+        "web2ru.pipeline.offline_process._build_translator", lambda config: translator
+    )
+    cfg = RunConfig(
+        url="https://example.com/page",
+        output_root=tmp_path,
+        fetch_missing_assets=False,
+        incremental=True,
+    )
+    online = OnlineRenderResult(
+        final_url="https://example.com/page",
+        html_dump="<html><body><main><p>Hello world</p><p>Flaky batch</p></main></body></html>",
+        shadow_dom=ShadowDomStats(enabled=False),
+        scroll_steps=0,
+        height_before=0,
+        height_after=0,
+    )
+
+    def run() -> dict[str, object]:
+        return run_offline_process(
+            config=cfg, online=online, asset_cache=AssetCache(), user_agent="pytest-agent"
+        ).report
+
+    translator.failing = {"Flaky batch"}
+    run()
+    translator.failing.clear()
+    translator.sent_parts.clear()
+
+    second = run()
+    assert translator.sent_parts == ["Flaky batch"]
+    assert second["incremental"]["blocks_reused"] == 1
+
+
+def test_offline_pipeline_keeps_identical_stylesheets_with_different_bases_apart(
+    tmp_path: Path,
+) -> None:
+    cache = AssetCache()
+    hosts = {"a": "https://a.example.com/x/", "b": "https://b.example.com/y/"}
+    for name, base in hosts.items():
+        for url, content_type, data in (
+            (f"{base}theme.css", "text/css", b"body { background: url(bg.png); }"),
+            (f"{base}bg.png", "image/png", f"png-{name}".encode()),
+        ):
+            cache.put(
+                url=url,
+                final_url=url,
+                content_type=content_type,
+                data=data,
+                source="network_capture",
+                max_asset_mb=15,
+            )
+    links = "".join(f'<link rel="stylesheet" href="{base}theme.css">' for base in hosts.values())
+    online = OnlineRenderResult(
+        final_url="https://example.com/page",
+        html_dump=f"<html><head>{links}</head><body><main><p>Hi</p></main></body></html>",
+        shadow_dom=ShadowDomStats(enabled=False),
+        scroll_steps=0,
+        height_before=0,
+        height_after=0,
+    )
+    cfg = RunConfig(
+        url="https://example.com/page",
+        output_root=tmp_path,
+        asset_scan=True,
+        fetch_missing_assets=False,
+        api_key=None,
+    )
+
+    result = run_offline_process(
+        config=cfg, online=online, asset_cache=cache, user_agent="pytest-agent"
+    )
+
+    output_dir = result.index_path.parent
+    hrefs = html.fromstring(result.index_path.read_bytes()).xpath("//link/@href")
+    assert len(set(hrefs)) == 2
+    for href, name in zip(hrefs, hosts, strict=True):
+        css_path = output_dir / href
+        background = re.search(r"url\(['\"]?([^'\")]+)", css_path.read_text(encoding="utf-8"))
+        assert background is not None
+        assert (css_path.parent / background.group(1)).read_bytes() == f"png-{name}".encode()
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from web2ru.assets.cache import AssetCache
+from web2ru.config import RunConfig
+from web2ru.models import AttributeItem, Block, OnlineRenderResult, ShadowDomStats
+from web2ru.pipeline.offline_process import run_offline_process
+from web2ru.translate.translator import TranslateStats
+
+SECTION = """<section id="s{i}"><h2>Heading {i}</h2>
+<p>Para {i} with <b>bold</b> &amp; <img src="/img/{i}.png" alt="Pic {i}"> tail.</p>
+<pre><code class="language-python"># comment {i}
+x = {i}</code></pre> between {i}
+<ul><li>One</li><li>Two <span style="background:url('/bg.png')">s</span></li></ul><!-- c{i} -->
+</section>
+"""
+
+HTML_DUMP = (
+    '<!DOCTYPE html><html lang="en"><head><title>T &amp; t</title>'
+    '<link rel="stylesheet" href="https://example.com/app.css"></head>'
+    '<body class="page" onload="init()">Body text &lt;here&gt;'
+    '<div id="app"><header><nav><a href="/x">X</a></nav></header><main>'
+    + "".join(SECTION.format(i=i) for i in range(30))
+    + "</main><footer>Foot</footer></div> trailing text"
+    '<script>var a = 1;</script><noscript><img src="/ns.png"></noscript>'
+    "</body></html>"
+)
+
+
+def _run(
+    tmp_path: Path, stream_html: str, *, scope: str = "page", exclude: list[str] | None = None
+) -> tuple[str, dict[str, Any]]:
+    cfg = RunConfig(
+        url="https://example.com/page",
+        output_root=tmp_path / f"{stream_html}-{scope}",
+        scope=scope,
+        exclude_selectors=exclude,
+        stream_threshold_mb=0,
+        fetch_missing_assets=False,
+        freeze_js="on",
+        api_key=None,
+        stream_html=stream_html,
+        stream_chunk_kb=1,
+    )
+    cache = AssetCache()
+    cache.put(
+        url="https://example.com/app.css",
+        final_url="https://example.com/app.css",
+        content_type="text/css",
+        data=b"body { background:url('bg.png'); }",
+        source="network_capture",
+        max_asset_mb=15,
+    )
+    online = OnlineRenderResult(
+        final_url="https://example.com/page",
+        html_dump=HTML_DUMP,
+        shadow_dom=ShadowDomStats(enabled=False),
+        scroll_steps=0,
+        height_before=1000,
+        height_after=1000,
+    )
+    result = run_offline_process(
+        config=cfg, online=online, asset_cache=cache, user_agent="pytest-agent"
+    )
+    return result.index_path.read_text(encoding="utf-8"), result.report
+
+
+def test_streaming_mode_matches_in_memory_output(tmp_path: Path) -> None:
+    in_memory_html, in_memory_report = _run(tmp_path, "off")
+    streamed_html, streamed_report = _run(tmp_path, "on")
+
+    assert streamed_html == in_memory_html
+    assert streamed_report["stream"]["chunks"] > 1
+    assert streamed_report["stats"]["parts_total"] == in_memory_report["stats"]["parts_total"]
+    assert streamed_report["stats"]["attrs_total"] == in_memory_report["stats"]["attrs_total"]
+    assert (
+        streamed_report["assets"]["scan_found_total"]
+        == (in_memory_report["assets"]["scan_found_total"])
+    )
+
+
+class _UpperTranslator:
+    def __init__(self) -> None:
+        self.stats = TranslateStats()
+
+    def translate_blocks_and_attrs(
+        self, *, blocks: list[Block], attrs: list[AttributeItem]
+    ) -> None:
+        for block in blocks:
+            for part in block.parts:
+                part.translated_core = part.core.upper()
+        for attr in attrs:
+            attr.translated_text = attr.text.upper()
+
+    def close(self) -> None:
+        return None
+
+
+@pytest.fixture
+def upper_translator(monkeypatch: pytest.MonkeyPatch) -> None:
+    for module in ("offline_process", "offline_stream"):
+        monkeypatch.setattr(
+            f"web2ru.pipeline.{module}._build_translator", lambda config: _UpperTranslator()
+        )
+
+
+@pytest.mark.usefixtures("upper_translator")
+@pytest.mark.parametrize(
+    ("scope", "exclude"), [("main", None), ("auto", None), ("page", ["section"])]
+)
+def test_auto_streaming_keeps_scope_and_exclude_selectors(
+    tmp_path: Path, scope: str, exclude: list[str] | None
+) -> None:
+    in_memory_html, _ = _run(tmp_path / "tree", "off", scope=scope, exclude=exclude)
+    auto_html, auto_report = _run(tmp_path / "auto", "auto", scope=scope, exclude=exclude)
+
+    assert auto_html == in_memory_html
+    assert "stream" not in auto_report
+
+
+@pytest.mark.usefixtures("upper_translator")
+def test_auto_streaming_applies_to_whole_page_scope(tmp_path: Path) -> None:
+    in_memory_html, _ = _run(tmp_path, "off")
+    auto_html, auto_report = _run(tmp_path, "auto")
+
+    assert auto_html == in_memory_html
+    assert auto_report["stream"]["chunks"] > 1
@@ -3,6 +3,7 @@ from __future__ import annotations
 from lxml import html
 
 from web2ru.apply.apply_blocks import apply_blocks
+from web2ru.extract.block_extractor import extract_blocks
 from web2ru.models import Block, NodeRef, Part
 
 
@@ -13,7 +14,6 @@ def test_apply_blocks_replaces_text_without_structure_change() -> None:
     xpath = root.getroottree().getpath(strong)
     part = Part(
         id="t_000001",
-        raw="world",
         lead_ws="",
         core="world",
         trail_ws="",
@@ -43,7 +43,6 @@ def test_apply_blocks_replaces_code_comment_ranges_only() -> None:
     parts = [
         Part(
             id="t_000001",
-            raw="init",
             lead_ws="",
             core="init",
             trail_ws="",
@@ -58,7 +57,6 @@ def test_apply_blocks_replaces_code_comment_ranges_only() -> None:
         ),
         Part(
             id="t_000002",
-            raw="done",
             lead_ws="",
             core="done",
             trail_ws="",
@@ -85,7 +83,6 @@ def test_apply_blocks_strips_invalid_xml_control_chars() -> None:
     xpath = root.getroottree().getpath(p)
     part = Part(
         id="t_000999",
-        raw="Date",
         lead_ws="",
         core="Date",
         trail_ws="",
@@ -97,3 +94,81 @@ def test_apply_blocks_strips_invalid_xml_control_chars() -> None:
     applied = apply_blocks(root, [block])
     assert applied == 1
     assert root.xpath("string(//p)") == "12 фев. 2026a0г."
+
+
+def test_apply_blocks_splices_many_ranges_and_skips_overlaps() -> None:
+    lines = [f"# note {index}\nx{index} = {index}" for index in range(50)]
+    root = html.fromstring(
+        f"<html><body><pre><code>{chr(10).join(lines)}</code></pre></body></html>"
+    )
+    code = root.xpath("//code")[0]
+    original = code.text or ""
+    xpath = root.getroottree().getpath(code)
+
+    parts: list[Part] = []
+    for index in reversed(range(50)):
+        start = original.find(f"note {index}\n")
+        end = start + len(f"note {index}")
+        parts.append(
+            Part(
+                id=f"t_{index:06d}",
+                lead_ws="",
+                core=f"note {index}",
+                trail_ws="",
+                node_ref=NodeRef(xpath=xpath, field="text", start_offset=start, end_offset=end),
+                block_id="b_000001",
+                translated_core=f"заметка {index}\x0b",
+            )
+        )
+    overlap_start = original.find("note 3\n")
+    parts.append(
+        Part(
+            id="t_000999",
+            lead_ws="",
+            core="ote 3",
+            trail_ws="",
+            node_ref=NodeRef(
+                xpath=xpath,
+                field="text",
+                start_offset=overlap_start + 1,
+                end_offset=overlap_start + 6,
+            ),
+            block_id="b_000001",
+            translated_core="overlap",
+        )
+    )
+
+    applied = apply_blocks(root, [Block(block_id="b_000001", context="", parts=parts)])
+    assert applied == 50
+    expected = "\n".join(f"# заметка {index}\nx{index} = {index}" for index in range(50))
+    assert root.xpath("string(//code)") == expected
+
+
+def test_path_resolver_matches_lxml_xpath() -> None:
+    from web2ru.apply.edit_list import PathResolver
+
+    root = html.fromstring(
+        "<html><body><div><p>a</p><p>b<span>c</span></p></div><div><p>d</p></div></body></html>"
+    )
+    tree = root.getroottree()
+    resolver = PathResolver(root)
+    for element in root.iter():
+        assert resolver.resolve(tree.getpath(element)) is element
+    assert resolver.resolve("/html/body/div[3]/p") is None
+
+
+def test_apply_blocks_sanitizes_unchanged_code_text_around_comments() -> None:
+    root = html.fromstring(
+        '<html><body><main><pre><code class="language-c">int x; // set x\n\x0c\n'
+        "int y; /* note here */</code></pre></main></body></html>"
+    )
+    blocks, _ = extract_blocks(
+        root, scope_mode="main", translation_unit="block", exclude_selectors=[]
+    )
+    parts = [part for block in blocks for part in block.parts]
+    for part in parts:
+        part.translated_core = part.core.upper()
+
+    assert apply_blocks(root, blocks) == len(parts) == 2
+    code = root.xpath("string(//code)")
+    assert "SET X" in code and "NOTE HERE" in code and "\x0c" not in code
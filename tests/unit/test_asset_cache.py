@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from web2ru.assets.cache import AssetCache
+from web2ru.assets.store import AssetStore, open_asset_store
+
+
+def test_asset_cache_spills_large_bodies_and_links_them_into_output(tmp_path: Path) -> None:
+    cache = AssetCache(spill_threshold=16)
+    cache.put(
+        url="https://example.com/big.png",
+        final_url="https://example.com/big.png",
+        content_type="image/png",
+        data=b"x" * 64,
+        source="network_capture",
+        max_asset_mb=1,
+    )
+    cache.put(
+        url="https://example.com/small.css",
+        final_url="https://example.com/small.css",
+        content_type="text/css",
+        data=b"a{}",
+        source="network_capture",
+        max_asset_mb=1,
+    )
+    big = cache.records["https://example.com/big.png"]
+    small = cache.records["https://example.com/small.css"]
+    assert big.inline is None and big.path is not None and big.path.is_file()
+    assert big.data == b"x" * 64
+    assert small.inline == b"a{}" and small.path is None
+
+    out = tmp_path / "out"
+    cache.write_to_output(out)
+    written = out / cache.ensure_local_mapping("https://example.com/big.png").lstrip("./")
+    assert written.read_bytes() == b"x" * 64
+    assert written.stat().st_nlink == 2
+
+    spill_path = big.path
+    cache.close()
+    assert not spill_path.exists()
+    assert written.read_bytes() == b"x" * 64
+
+
+def test_asset_cache_links_store_blobs_without_copying_into_memory(tmp_path: Path) -> None:
+    store = AssetStore(tmp_path / "assets", max_bytes=1024 * 1024)
+    cache = AssetCache(store=store, spill_threshold=16)
+    cache.put(
+        url="https://cdn.example.com/video.mp4",
+        final_url="https://cdn.example.com/video.mp4",
+        content_type="video/mp4",
+        data=b"v" * 64,
+        source="network_capture",
+        max_asset_mb=1,
+        http_headers={"cache-control": "max-age=60"},
+    )
+    record = cache.records["https://cdn.example.com/video.mp4"]
+    stored = store.lookup("https://cdn.example.com/video.mp4")
+    assert stored is not None
+    assert record.inline is None and record.path is not None
+    assert record.path.samefile(stored.blob_path)
+
+    out = tmp_path / "out"
+    cache.write_to_output(out)
+    written = out / cache.ensure_local_mapping("https://cdn.example.com/video.mp4").lstrip("./")
+    assert written.read_bytes() == b"v" * 64
+    assert written.stat().st_nlink == 1  # copied, so editing the output cannot touch the store
+    cache.close()
+
+
+def test_asset_cache_records_survive_store_eviction(tmp_path: Path) -> None:
+    store = open_asset_store(cache_dir=tmp_path / "cache", enabled=True, max_mb=1)
+    assert store is not None
+    cache = AssetCache(store=store)
+    bodies = {f"https://cdn.example.com/{name}.mp4": name.encode() * 700 * 1024 for name in "ab"}
+    for url, data in bodies.items():
+        cache.put(
+            url=url,
+            final_url=url,
+            content_type="video/mp4",
+            data=data,
+            source="network_capture",
+            max_asset_mb=1,
+            http_headers={"cache-control": "max-age=60"},
+        )
+    # The second put pushed the store over 1 MB and evicted the first blob while its record
+    # is still part of this run.
+    assert store.stats.evicted_blobs == 1
+    assert store.lookup("https://cdn.example.com/a.mp4") is None
+    later = store.lookup("https://cdn.example.com/b.mp4")
+    assert later is not None
+    assert cache.put_stored(url="https://cdn.example.com/c.mp4", stored=later, max_asset_mb=1)
+    later.blob_path.unlink()
+
+    out = tmp_path / "out"
+    cache.write_to_output(out)
+    for url, data in {**bodies, "https://cdn.example.com/c.mp4": bodies[later.url]}.items():
+        assert (out / cache.ensure_local_mapping(url).lstrip("./")).read_bytes() == data
+    cache.close()
+
+
+def test_asset_cache_writes_identical_bodies_once(tmp_path: Path) -> None:
+    cache = AssetCache()
+    for url in (
+        "https://example.com/font.woff2?v=1",
+        "https://example.com/font.woff2?v=2",
+        "https://mirror.example.net/fonts/font.woff2",
+    ):
+        cache.put(
+            url=url,
+            final_url=url,
+            content_type="font/woff2",
+            data=b"same-font",
+            source="network_capture",
+            max_asset_mb=1,
+        )
+
+    mapped = {cache.ensure_local_mapping(url) for url in cache.records}
+    assert len(mapped) == 1
+    cache.write_to_output(tmp_path)
+    assert len([path for path in tmp_path.rglob("*") if path.is_file()]) == 1
+    assert (cache.write_stats.files, cache.write_stats.deduplicated) == (1, 2)
+
+
+def test_asset_caches_share_a_blob_directory_across_pages(tmp_path: Path) -> None:
+    blob_dir = tmp_path / "blobs"
+    written: list[Path] = []
+    for page in ("a", "b"):
+        cache = AssetCache(blob_dir=blob_dir)
+        cache.put(
+            url="https://example.com/logo.svg",
+            final_url="https://example.com/logo.svg",
+            content_type="image/svg+xml",
+            data=b"<svg/>",
+            source="network_capture",
+            max_asset_mb=1,
+        )
+        out = tmp_path / page
+        cache.write_to_output(out)
+        written.append(
+            out / cache.ensure_local_mapping("https://example.com/logo.svg").lstrip("./")
+        )
+        cache.close()
+
+    assert written[0].read_bytes() == b"<svg/>"
+    assert written[0].stat().st_ino == written[1].stat().st_ino
+    assert len([path for path in blob_dir.rglob("*") if path.is_file()]) == 1
+
+
+def test_asset_cache_writes_in_parallel_and_skips_matching_files(tmp_path: Path) -> None:
+    cache = AssetCache(spill_threshold=64, write_workers=4)
+    for index in range(40):
+        cache.put(
+            url=f"https://example.com/dir{index % 5}/file{index}.js",
+            final_url=f"https://example.com/dir{index % 5}/file{index}.js",
+            content_type="text/javascript",
+            data=f"var a = {index};".encode() * (index + 1),
+            source="network_capture",
+            max_asset_mb=1,
+        )
+    cache.write_to_output(tmp_path)
+    assert (cache.write_stats.files, cache.write_stats.workers) == (40, 4)
+    for url, record in cache.records.items():
+        assert (tmp_path / cache.ensure_local_mapping(url).lstrip("./")).read_bytes() == record.data
+
+    damaged_url = "https://example.com/dir1/file1.js"
+    damaged = tmp_path / cache.ensure_local_mapping(damaged_url).lstrip("./")
+    damaged.write_bytes(b"truncated")
+    rerun = AssetCache(records=cache.records, url_to_local=cache.url_to_local, write_workers=4)
+    rerun.write_to_output(tmp_path)
+    assert (rerun.write_stats.existing, rerun.write_stats.files) == (39, 1)
+    assert damaged.read_bytes() == cache.records[damaged_url].data
+    cache.close()
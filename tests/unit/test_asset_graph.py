@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+from functools import partial
+
+import httpx
+
+from web2ru.assets.cache import AssetCache
+from web2ru.assets.fetch_missing import fetch_missing_assets
+from web2ru.assets.graph import AssetGraph, resolve_asset_graph
+from web2ru.assets.rewrite_svg import rewrite_svg_urls
+
+_SVG = (
+    b'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink">'
+    b'<use href="sprite.svg#menu"/><use href="#local"/>'
+    b'<image xlink:href="photo.png"/></svg>'
+)
+_BODIES: dict[str, tuple[str, bytes]] = {
+    "/css/main.css": ("text/css", b'@import "theme.css"; .x{background:url(../img/bg.png)}'),
+    "/css/theme.css": (
+        "text/css",
+        b"@font-face{src:url(../fonts/f.woff2)} .i{background:url(/icons/set.svg)}",
+    ),
+    "/icons/set.svg": ("image/svg+xml", _SVG),
+    "/icons/sprite.svg": ("image/svg+xml", b'<svg xmlns="http://www.w3.org/2000/svg"/>'),
+}
+
+
+def _serve(requested: list[str], request: httpx.Request) -> httpx.Response:
+    requested.append(request.url.path)
+    content_type, body = _BODIES.get(request.url.path, ("image/png", b"png"))
+    return httpx.Response(200, content=body, headers={"content-type": content_type})
+
+
+def _resolve(monkeypatch, cache: AssetCache, graph: AssetGraph, *, max_depth: int) -> list[str]:  # type: ignore[no-untyped-def]
+    requested: list[str] = []
+    monkeypatch.setattr(
+        "web2ru.assets.graph.fetch_missing_assets",
+        partial(fetch_missing_assets, transport=httpx.MockTransport(partial(_serve, requested))),
+    )
+    css_by_url: dict[str, str] = {}
+    missing = resolve_asset_graph(
+        seed_urls={"https://example.com/css/main.css"},
+        css_by_url=css_by_url,
+        asset_cache=cache,
+        graph=graph,
+        final_url="https://example.com/",
+        user_agent="pytest-agent",
+        max_asset_mb=15,
+        enabled=True,
+        max_depth=max_depth,
+        max_urls=100,
+    )
+    assert missing == []
+    assert set(css_by_url) <= {
+        "https://example.com/css/main.css",
+        "https://example.com/css/theme.css",
+    }
+    return requested
+
+
+def test_resolve_asset_graph_follows_imports_fonts_and_svg_references(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    cache = AssetCache()
+    graph = AssetGraph()
+    requested = _resolve(monkeypatch, cache, graph, max_depth=4)
+
+    assert sorted(requested) == [
+        "/css/main.css",
+        "/css/theme.css",
+        "/fonts/f.woff2",
+        "/icons/photo.png",
+        "/icons/set.svg",
+        "/icons/sprite.svg",
+        "/img/bg.png",
+    ]
+    assert graph.depth["https://example.com/icons/photo.png"] == 3
+    assert graph.edges["https://example.com/css/main.css"] == [
+        "https://example.com/css/theme.css",
+        "https://example.com/img/bg.png",
+    ]
+    assert graph.svg_sources == {
+        "https://example.com/icons/set.svg",
+        "https://example.com/icons/sprite.svg",
+    }
+    report = graph.as_report()
+    assert (report["rounds"], report["css_scanned"], report["svg_scanned"]) == (4, 2, 2)
+    assert report["max_depth_reached"] == 3
+
+    # A second call sharing the graph (next streaming chunk) fetches nothing again.
+    assert _resolve(monkeypatch, cache, graph, max_depth=4) == []
+
+
+def test_resolve_asset_graph_stops_at_depth_limit(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    graph = AssetGraph()
+    requested = _resolve(monkeypatch, AssetCache(), graph, max_depth=1)
+
+    assert sorted(requested) == ["/css/main.css", "/css/theme.css", "/img/bg.png"]
+    assert graph.depth_limited == 2
+
+
+def test_rewrite_svg_urls_maps_references_relative_to_the_svg() -> None:
+    cache = AssetCache()
+    for path, (content_type, body) in _BODIES.items():
+        url = f"https://example.com{path}"
+        cache.put(
+            url=url,
+            final_url=url,
+            content_type=content_type,
+            data=body,
+            source="fetch_missing",
+            max_asset_mb=15,
+        )
+    svg_url = "https://example.com/icons/set.svg"
+
+    out = rewrite_svg_urls(
+        _SVG,
+        svg_base_url=svg_url,
+        map_url=partial(cache.ensure_relative_mapping, from_url=svg_url),
+    )
+
+    assert out is not None
+    sprite = cache.ensure_local_mapping("https://example.com/icons/sprite.svg")
+    assert f'href="{sprite.rsplit("/", 1)[1]}#menu"' in out.decode()
+    assert 'href="#local"' in out.decode()
+    assert cache.ensure_relative_mapping(
+        "https://example.com/img/bg.png", from_url="https://example.com/css/main.css"
+    ).startswith("../img/bg__")
+    assert rewrite_svg_urls(b"<svg/>", svg_base_url=svg_url, map_url=str) is None
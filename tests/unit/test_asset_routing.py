@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import sqlite3
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from web2ru.assets.cache import AssetCache
+from web2ru.assets.store import AssetStore
+from web2ru.pipeline.asset_routing import AssetRouter
+
+
+@dataclass
+class _FakeRequest:
+    url: str
+    resource_type: str
+    method: str = "GET"
+    headers: dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class _FakeRoute:
+    request: _FakeRequest
+    fulfilled: dict[str, Any] | None = None
+    continued: bool = False
+
+    def fulfill(self, **kwargs: Any) -> None:
+        self.fulfilled = kwargs
+
+    def continue_(self) -> None:
+        self.continued = True
+
+
+def test_asset_router_fulfills_fresh_assets_and_passes_through_the_rest(tmp_path: Path) -> None:
+    store = AssetStore(tmp_path / "assets", max_bytes=1024 * 1024)
+    store.put(
+        url="https://cdn.example.com/font.woff2",
+        final_url="https://cdn.example.com/font.woff2",
+        content_type="font/woff2",
+        data=b"font",
+        headers={"cache-control": "max-age=600", "etag": '"f1"'},
+    )
+    store.put(
+        url="https://cdn.example.com/stale.css",
+        final_url="https://cdn.example.com/stale.css",
+        content_type="text/css",
+        data=b"a{}",
+        headers={"cache-control": "no-cache"},
+    )
+    cache = AssetCache(store=store)
+    router = AssetRouter(cache, max_asset_mb=15)
+
+    font = _FakeRoute(
+        _FakeRequest(
+            url="https://cdn.example.com/font.woff2",
+            resource_type="font",
+            headers={"origin": "https://example.com"},
+        )
+    )
+    stale = _FakeRoute(
+        _FakeRequest(url="https://cdn.example.com/stale.css", resource_type="stylesheet")
+    )
+    document = _FakeRoute(_FakeRequest(url="https://example.com/", resource_type="document"))
+    unknown = _FakeRoute(_FakeRequest(url="https://cdn.example.com/new.png", resource_type="image"))
+    for route in (font, stale, document, unknown):
+        router.handle(route)
+
+    assert font.fulfilled is not None
+    assert font.fulfilled["path"].read_bytes() == b"font"
+    assert font.fulfilled["headers"]["content-type"] == "font/woff2"
+    assert font.fulfilled["headers"]["access-control-allow-origin"] == "https://example.com"
+    assert stale.continued and document.continued and unknown.continued
+    assert router.served_urls == {"https://cdn.example.com/font.woff2"}
+    assert cache.records["https://cdn.example.com/font.woff2"].source == "asset_store"
+    assert (router.stats.hits, router.stats.misses, router.stats.passthrough) == (1, 2, 1)
+    assert router.stats.bytes_served == 4
+    cache.close()
+
+
+def test_asset_router_without_store_passes_everything_through() -> None:
+    router = AssetRouter(AssetCache(), max_asset_mb=15)
+    route = _FakeRoute(
+        _FakeRequest(url="https://cdn.example.com/a.css", resource_type="stylesheet")
+    )
+    router.handle(route)
+    assert route.continued
+    assert router.stats.enabled is False
+    assert router.stats.passthrough == 1
+
+
+@dataclass
+class _FailingRoute(_FakeRoute):
+    def fulfill(self, **kwargs: Any) -> None:
+        raise FileNotFoundError(kwargs["path"])
+
+
+def test_asset_router_continues_routes_after_internal_errors(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    store = AssetStore(tmp_path / "assets", max_bytes=1024 * 1024)
+    store.put(
+        url="https://cdn.example.com/a.css",
+        final_url="https://cdn.example.com/a.css",
+        content_type="text/css",
+        data=b"a{}",
+        headers={"cache-control": "max-age=600"},
+    )
+    cache = AssetCache(store=store)
+    router = AssetRouter(cache, max_asset_mb=15)
+
+    unfulfillable = _FailingRoute(
+        _FakeRequest(url="https://cdn.example.com/a.css", resource_type="stylesheet")
+    )
+    router.handle(unfulfillable)
+
+    def locked(_url: str) -> None:
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(store, "lookup", locked)
+    unreadable = _FakeRoute(
+        _FakeRequest(url="https://cdn.example.com/b.css", resource_type="stylesheet")
+    )
+    router.handle(unreadable)
+
+    assert unfulfillable.continued and unreadable.continued
+    assert (router.stats.hits, router.stats.misses) == (0, 2)
+    cache.close()
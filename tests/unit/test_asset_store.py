@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+
+import httpx
+
+from web2ru.assets.cache import AssetCache
+from web2ru.assets.fetch_missing import fetch_missing_assets
+from web2ru.assets.store import AssetStore, freshness_deadline, normalize_store_url
+
+
+def test_asset_store_round_trip_shares_blobs_by_content(tmp_path: Path) -> None:
+    store = AssetStore(tmp_path / "assets", max_bytes=1024 * 1024)
+    headers = {"Cache-Control": "max-age=3600", "ETag": '"v1"'}
+    store.put(
+        url="HTTPS://CDN.example.com:443/font.woff2#x",
+        final_url="https://cdn.example.com/font.woff2",
+        content_type="font/woff2",
+        data=b"font-bytes",
+        headers=headers,
+    )
+    store.put(
+        url="https://mirror.example.com/font.woff2",
+        final_url="https://mirror.example.com/font.woff2",
+        content_type="font/woff2",
+        data=b"font-bytes",
+        headers=headers,
+    )
+
+    stored = store.lookup("https://cdn.example.com/font.woff2")
+    assert stored is not None
+    assert stored.is_fresh()
+    assert stored.read_bytes() == b"font-bytes"
+    assert stored.validator_headers() == {"If-None-Match": '"v1"'}
+    assert store.total_bytes() == len(b"font-bytes")
+    assert len(list((tmp_path / "assets" / "blobs").rglob("*"))) == 2  # one shard dir, one blob
+    assert store.lookup("https://cdn.example.com/other.woff2") is None
+    assert store.stats.hits == 1
+    assert store.stats.misses == 1
+    store.close()
+
+
+def test_asset_store_skips_documents_and_no_store(tmp_path: Path) -> None:
+    store = AssetStore(tmp_path / "assets", max_bytes=1024)
+    assert (
+        store.put(
+            url="https://example.com/",
+            final_url="https://example.com/",
+            content_type="text/html; charset=utf-8",
+            data=b"<html></html>",
+            headers={},
+        )
+        is None
+    )
+    assert (
+        store.put(
+            url="https://example.com/private.js",
+            final_url="https://example.com/private.js",
+            content_type="text/javascript",
+            data=b"x",
+            headers={"cache-control": "private, no-store"},
+        )
+        is None
+    )
+    store.close()
+
+
+def test_asset_store_evicts_least_recently_used(tmp_path: Path) -> None:
+    store = AssetStore(tmp_path / "assets", max_bytes=25)
+    for name in ("a", "b"):
+        store.put(
+            url=f"https://example.com/{name}.png",
+            final_url=f"https://example.com/{name}.png",
+            content_type="image/png",
+            data=name.encode() * 10,
+            headers={},
+        )
+        time.sleep(0.01)
+    assert store.lookup("https://example.com/a.png") is not None  # a is now the most recent
+    time.sleep(0.01)
+    store.put(
+        url="https://example.com/c.png",
+        final_url="https://example.com/c.png",
+        content_type="image/png",
+        data=b"c" * 10,
+        headers={},
+    )
+
+    assert store.lookup("https://example.com/b.png") is None
+    assert store.lookup("https://example.com/a.png") is not None
+    assert store.lookup("https://example.com/c.png") is not None
+    assert store.total_bytes() == 20
+    assert store.stats.evicted_blobs == 1
+    store.close()
+
+
+def test_freshness_deadline_rules() -> None:
+    now = 1_700_000_000.0
+    assert freshness_deadline({"cache-control": "public, max-age=60"}, now=now) == now + 60
+    assert freshness_deadline({"cache-control": "no-cache, max-age=60"}, now=now) == now
+    assert freshness_deadline({"expires": "Tue, 14 Nov 2023 22:13:20 GMT"}, now=now) == now
+    heuristic = freshness_deadline({"last-modified": "Mon, 13 Nov 2023 22:13:20 GMT"}, now=now)
+    assert heuristic == now + 8640
+    assert freshness_deadline({}, now=now) == now
+    assert normalize_store_url("HTTP://Example.com:80?q=1#top") == "http://example.com/?q=1"
+
+
+def test_fetch_missing_serves_fresh_and_revalidates_stale(tmp_path: Path) -> None:
+    requests: dict[str, str | None] = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests[str(request.url)] = request.headers.get("if-none-match")
+        headers = {"content-type": "text/css", "etag": '"v2"'}
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304, headers=headers)
+        return httpx.Response(200, content=b"body{}", headers=headers)
+
+    store = AssetStore(tmp_path / "assets", max_bytes=1024 * 1024)
+    store.put(
+        url="https://example.com/fresh.css",
+        final_url="https://example.com/fresh.css",
+        content_type="text/css",
+        data=b"a{}",
+        headers={"cache-control": "max-age=600"},
+    )
+    store.put(
+        url="https://example.com/stale.css",
+        final_url="https://example.com/stale.css",
+        content_type="text/css",
+        data=b"b{}",
+        headers={"cache-control": "no-cache", "etag": '"v1"'},
+    )
+    cache = AssetCache(store=store)
+    missing = fetch_missing_assets(
+        needed_urls={
+            "https://example.com/fresh.css",
+            "https://example.com/stale.css",
+            "https://example.com/new.css",
+        },
+        asset_cache=cache,
+        final_url="https://example.com/page",
+        user_agent="pytest-agent",
+        max_asset_mb=15,
+        enabled=True,
+        transport=httpx.MockTransport(handler),
+    )
+
+    assert missing == []
+    assert "https://example.com/fresh.css" not in requests
+    assert requests["https://example.com/stale.css"] == '"v1"'
+    assert requests["https://example.com/new.css"] is None
+    assert cache.records["https://example.com/fresh.css"].source == "asset_store"
+    assert cache.records["https://example.com/stale.css"].data == b"b{}"
+    assert cache.records["https://example.com/new.css"].source == "fetch_missing"
+    assert store.stats.revalidated == 1
+    assert store.lookup("https://example.com/new.css") is not None
+    assert os.path.isfile(store.lookup("https://example.com/stale.css").blob_path)  # type: ignore[union-attr]
+    cache.close()
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from web2ru.pipeline.browser_pool import BrowserPool, BrowserSlot, descendant_rss_bytes
+
+
+class _FakeContext:
+    def __init__(self, owner: _FakeBrowser | None = None) -> None:
+        self.owner = owner
+        self.closed = False
+
+    def on(self, _event: str, _callback: object) -> None:
+        return
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class _FakeBrowser:
+    def __init__(self, launches: list[_FakeBrowser]) -> None:
+        launches.append(self)
+        self.connected = True
+
+    def new_context(self, **_kwargs: Any) -> _FakeContext:
+        return _FakeContext(self)
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+    def close(self) -> None:
+        self.connected = False
+
+
+@pytest.fixture
+def launches(monkeypatch: pytest.MonkeyPatch) -> list[_FakeBrowser]:
+    launched: list[_FakeBrowser] = []
+
+    class _Chromium:
+        def launch(self, **_kwargs: Any) -> _FakeBrowser:
+            return _FakeBrowser(launched)
+
+    class _Playwright:
+        chromium = _Chromium()
+
+        def start(self) -> _Playwright:
+            return self
+
+        def stop(self) -> None:
+            return
+
+    def fake_persistent(**_kwargs: Any) -> _FakeContext:
+        return _FakeContext()
+
+    monkeypatch.setattr("web2ru.pipeline.browser_pool.sync_playwright", _Playwright)
+    monkeypatch.setattr(
+        "web2ru.pipeline.browser_pool.launch_persistent_context_with_lock_recovery",
+        fake_persistent,
+    )
+    monkeypatch.setattr("web2ru.pipeline.browser_pool.descendant_rss_bytes", lambda: 0)
+    return launched
+
+
+def _render(slot: BrowserSlot) -> tuple[_FakeContext, int, bool]:
+    context = slot.new_context()
+    context.close()
+    return context, threading.get_ident(), slot.render_stats.warm_context
+
+
+def test_pool_reuses_one_browser_and_hands_out_warm_contexts(
+    launches: list[_FakeBrowser],
+) -> None:
+    with BrowserPool(size=1, recycle_pages=0) as pool:
+        with ThreadPoolExecutor(max_workers=4) as callers:
+            results = list(callers.map(lambda _: pool.run(_render), range(6)))
+        assert len(launches) == 1
+        assert len({thread for _, thread, _ in results}) == 1
+        assert [warm for _, _, warm in results].count(False) == 1
+        assert pool.renders == 6
+    assert not launches[0].connected
+
+
+def test_pool_recycles_browsers_after_n_pages(launches: list[_FakeBrowser]) -> None:
+    with BrowserPool(recycle_pages=2) as pool:
+        for _ in range(5):
+            pool.run(_render)
+        assert (len(launches), pool.recycles["pages"]) == (3, 2)
+        assert not launches[0].connected and launches[-1].connected
+
+
+def test_pool_keeps_a_profile_on_one_slot(launches: list[_FakeBrowser], tmp_path: Path) -> None:
+    profile = tmp_path / "profile"
+    started = threading.Event()
+    release = threading.Event()
+
+    def hold(slot: BrowserSlot) -> int:
+        slot.persistent_context(profile)
+        started.set()
+        release.wait(5)
+        return id(slot)
+
+    def again(slot: BrowserSlot) -> tuple[int, bool]:
+        slot.persistent_context(profile)
+        return id(slot), slot.render_stats.browser_reused
+
+    with BrowserPool(size=2) as pool, ThreadPoolExecutor(max_workers=2) as callers:
+        first = callers.submit(pool.run, hold, profile_dir=profile)
+        assert started.wait(5)
+        second = callers.submit(pool.run, again, profile_dir=profile)
+        other = pool.run(_render)  # an unrelated render takes the second slot meanwhile
+        release.set()
+        assert second.result(5) == (first.result(5), True)
+        assert other[0].owner is launches[0]
+
+
+def test_descendant_rss_counts_child_processes() -> None:
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(5)"])
+    try:
+        rss = descendant_rss_bytes()
+    finally:
+        child.kill()
+        child.wait()
+    if rss is None:
+        pytest.skip("no /proc on this platform")
+    assert rss > 0
+
+
+def test_memory_recycling_measures_each_slot_browser_only(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    launched: list[_FakeBrowser] = []
+    drivers: list[subprocess.Popen[bytes]] = []
+
+    class _Chromium:
+        def launch(self, **_kwargs: Any) -> _FakeBrowser:
+            return _FakeBrowser(launched)
+
+    class _Playwright:
+        chromium = _Chromium()
+
+        def start(self) -> _Playwright:
+            # Stands in for the Node driver process each slot starts.
+            self.driver = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+            drivers.append(self.driver)
+            return self
+
+        def stop(self) -> None:
+            self.driver.kill()
+            self.driver.wait()
+
+    heavy: list[int] = []
+    monkeypatch.setattr("web2ru.pipeline.browser_pool.sync_playwright", _Playwright)
+    # Every child process together is over the limit; only the first slot's tree is.
+    monkeypatch.setattr("web2ru.pipeline.browser_pool.descendant_rss_bytes", lambda: 1 << 40)
+    monkeypatch.setattr(
+        "web2ru.pipeline.browser_pool.process_tree_rss_bytes",
+        lambda pid: (2 << 20) if pid in heavy else 0,
+    )
+    started = threading.Event()
+    release = threading.Event()
+
+    def hold(slot: BrowserSlot) -> None:
+        slot.new_context()
+        heavy.append(drivers[0].pid)
+        started.set()
+        release.wait(5)
+
+    try:
+        with BrowserPool(size=2, recycle_pages=0, recycle_mb=1) as pool:
+            with ThreadPoolExecutor(max_workers=1) as callers:
+                first = callers.submit(pool.run, hold)
+                assert started.wait(5)
+                pool.run(_render)  # the second slot, next to a busy first one
+                release.set()
+                first.result(5)
+            assert len(launched) == 2
+        assert pool.recycles["memory"] == 1
+    finally:
+        for driver in drivers:
+            driver.kill()
+            driver.wait()
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import email
+import threading
+import urllib.error
+import urllib.request
+import zipfile
+from collections import OrderedDict
+from functools import partial
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from web2ru.assets.cache import AssetCache
+from web2ru.pipeline import bundle
+from web2ru.pipeline.bundle import (
+    MHTML_BASE_URL,
+    BundleReader,
+    BundleRequestHandler,
+    BundleStats,
+    open_bundle,
+    read_index_html,
+    write_output_bundle,
+)
+
+_INDEX = "<html><body><p>Привет</p><img src='./assets/example.com/a.png'></body></html>\n"
+
+
+def _snapshot(tmp_path: Path) -> tuple[Path, AssetCache, dict[str, bytes]]:
+    cache = AssetCache(spill_threshold=1024)
+    bodies = {
+        "https://example.com/a.png": b"\x89PNG" + bytes(range(256)) * 8,  # spilled to disk
+        "https://example.com/site.css": b"body{color:red}",
+        "https://example.com/site.css?v=2": b"body{color:red}",  # same bytes, one entry
+    }
+    for url, data in bodies.items():
+        cache.put(
+            url=url,
+            final_url=url,
+            content_type="image/png" if url.endswith(".png") else "text/css",
+            data=data,
+            source="network_capture",
+            max_asset_mb=15,
+        )
+    (tmp_path / "index.html").write_text(_INDEX, encoding="utf-8")
+    names = {
+        cache.ensure_local_mapping(url).removeprefix("./"): data for url, data in bodies.items()
+    }
+    return tmp_path, cache, names
+
+
+def test_zip_bundle_is_stored_and_read_through_the_map(tmp_path: Path) -> None:
+    output_dir, cache, names = _snapshot(tmp_path)
+    stats = BundleStats()
+
+    index_path = write_output_bundle(output_dir, cache, output_format="zip", stats=stats)
+
+    assert index_path == output_dir / "snapshot.zip"
+    assert not (output_dir / "index.html").exists()
+    assert not (output_dir / "assets").exists()
+    assert (stats.entries, cache.write_stats.files, cache.write_stats.deduplicated) == (3, 2, 1)
+    with zipfile.ZipFile(index_path) as archive:
+        assert {info.compress_type for info in archive.infolist()} == {zipfile.ZIP_STORED}
+        assert archive.testzip() is None
+    reader = BundleReader(index_path)
+    for name, data in names.items():
+        assert bytes(reader.get(name) or b"") == data
+    assert reader.get("missing.png") is None
+    assert read_index_html(output_dir) == _INDEX
+    cache.close()
+
+
+def test_bundle_request_handler_serves_entries(tmp_path: Path) -> None:
+    output_dir, cache, names = _snapshot(tmp_path)
+    index_path = write_output_bundle(output_dir, cache, output_format="zip", stats=BundleStats())
+    handler = partial(BundleRequestHandler, bundle=BundleReader(index_path))
+    with ThreadingHTTPServer(("127.0.0.1", 0), handler) as httpd:
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{httpd.server_address[1]}"
+        try:
+            name = next(name for name in names if name.endswith(".png"))
+            with urllib.request.urlopen(f"{base}/{name}") as response:
+                assert response.headers["Content-Type"] == "image/png"
+                assert response.read() == names[name]
+            with urllib.request.urlopen(f"{base}/") as response:
+                assert response.read().decode("utf-8") == _INDEX
+            with pytest.raises(urllib.error.HTTPError) as excinfo:
+                urllib.request.urlopen(f"{base}/../../etc/passwd")
+            assert excinfo.value.code == 404
+        finally:
+            httpd.shutdown()
+    cache.close()
+
+
+def test_mhtml_bundle_has_one_part_per_file(tmp_path: Path) -> None:
+    output_dir, cache, names = _snapshot(tmp_path)
+    stats = BundleStats()
+
+    index_path = write_output_bundle(output_dir, cache, output_format="mhtml", stats=stats)
+
+    assert index_path.suffix == ".mhtml"
+    assert stats.bytes == index_path.stat().st_size
+    message = email.message_from_bytes(index_path.read_bytes())
+    assert message.get_content_type() == "multipart/related"
+    parts = {
+        part["Content-Location"]: part.get_payload(decode=True)
+        for part in message.get_payload()  # type: ignore[union-attr]
+    }
+    assert parts.pop(f"{MHTML_BASE_URL}index.html").decode("utf-8").strip() == _INDEX.strip()
+    assert parts == {f"{MHTML_BASE_URL}{name}": data for name, data in names.items()}
+    cache.close()
+
+
+def _stored_zip(path: Path, body: bytes) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_STORED) as archive:
+        archive.writestr("index.html", body)
+    tmp.replace(path)  # like write_output_bundle, so open maps keep the old file
+    return path
+
+
+def test_open_bundle_closes_evicted_and_replaced_readers(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(bundle, "_READERS", OrderedDict())
+    monkeypatch.setattr(bundle, "MAX_OPEN_BUNDLES", 2)
+    paths = [_stored_zip(tmp_path / str(index) / "snapshot.zip", b"page") for index in range(3)]
+
+    readers = []
+    for path in paths:
+        with open_bundle(path) as reader:
+            readers.append(reader)
+    assert [reader.closed for reader in readers] == [True, False, False]
+
+    # A response still reading the old archive keeps its map until it is done.
+    lease = open_bundle(paths[2])
+    view = lease.get("index.html")
+    _stored_zip(paths[2], b"rebuilt page")
+    with open_bundle(paths[2]) as fresh:
+        assert fresh is not lease
+        assert bytes(fresh.get("index.html") or b"") == b"rebuilt page"
+    assert not lease.closed and bytes(view or b"") == b"page"
+    assert view is not None
+    view.release()
+    lease.close()
+    assert lease.closed
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from web2ru.extract.code_comments import looks_like_prose, scan_code_text
+
+
+def _comments(text: str, lang: str | None) -> list[str]:
+    return [text[start:end] for start, end in scan_code_text(text, lang=lang).spans]
+
+
+def test_python_scan_ignores_c_style_markers() -> None:
+    text = "url = 'a//b'  # fetch url\nx = a -- b\n/* not a comment */"
+    assert _comments(text, "python") == [" fetch url"]
+
+
+def test_c_like_scan_handles_multiline_block_and_trailing_line_comment() -> None:
+    text = "/* first line\n   second line */\nint x = 1; // counter\n# not a comment"
+    assert _comments(text, "c") == [" first line\n   second line ", " counter"]
+
+
+def test_sql_and_html_scans_use_their_own_markers() -> None:
+    assert _comments("SELECT 1 -- pick one\n# no", "sql") == [" pick one"]
+    assert _comments("<div><!-- wrapper --></div>\n// no", "html") == [" wrapper "]
+
+
+def test_unknown_language_uses_every_marker_and_classifies_lines() -> None:
+    text = "x = 1; // set x\nif (x) { y(); }\n# shell note"
+    scan = scan_code_text(text, lang=None)
+    assert [text[start:end] for start, end in scan.spans] == [" set x", "shell note"]
+    assert scan.non_empty_lines == 3
+    assert not looks_like_prose([scan])
+
+
+def test_scan_results_are_cached_by_content() -> None:
+    text = "value = 1  # cached comment"
+    assert scan_code_text(text, lang="python") is scan_code_text("".join(list(text)), lang="python")
+
+
+def test_block_openers_inside_line_comments_are_ignored() -> None:
+    text = "int x; // a /* b\nint y; // second comment"
+    assert _comments(text, "c") == [" a /* b", " second comment"]
+
+
+def test_unterminated_block_opener_keeps_later_line_comments() -> None:
+    text = "cp src/* dst/\n# copy the files"
+    assert _comments(text, None) == ["copy the files"]
+    assert _comments("/* open\nx = 1; // set x\n<!-- note -->", None) == [" set x", " note "]
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from web2ru.assets.css_cache import CssRewriteCache, clear_memory_layers
+from web2ru.assets.rewrite_css import rewrite_css_urls
+
+_CSS = '@import "theme.css";\n.a{background:url(../img/a.png)} .b{mask:url(#m)}\n'
+_BASE = "https://example.com/static/css/site.css"
+
+
+def _local(url: str) -> str:
+    return "L/" + url.rsplit("/", 1)[-1]
+
+
+def test_css_rewrite_cache_serves_identical_rewrites_from_memory() -> None:
+    clear_memory_layers()
+    first = CssRewriteCache()
+    second = CssRewriteCache()
+
+    out = first.rewrite(_CSS, css_base_url=_BASE, map_url=_local)
+    again = second.rewrite(_CSS, css_base_url=_BASE, map_url=_local)
+    remapped = second.rewrite(_CSS, css_base_url=_BASE, map_url=lambda url: "other/" + url[-5:])
+
+    assert out == again == rewrite_css_urls(_CSS, css_base_url=_BASE, map_url=_local)
+    assert remapped != out
+    assert (first.stats.misses, second.stats.memory_hits, second.stats.misses) == (1, 1, 1)
+
+
+def test_css_rewrite_cache_persists_rewrites_and_offsets_across_runs(
+    tmp_path: Path, monkeypatch
+) -> None:  # type: ignore[no-untyped-def]
+    clear_memory_layers()
+    db_path = tmp_path / "css_rewrites.sqlite3"
+    run1 = CssRewriteCache(db_path)
+    out = run1.rewrite(_CSS, css_base_url=_BASE, map_url=_local)
+    run1.close()
+
+    # A new process starts with empty memory layers; tinycss2 must not be needed.
+    clear_memory_layers()
+
+    def fail(_: str) -> None:
+        raise AssertionError("stylesheet parsed again")
+
+    monkeypatch.setattr("web2ru.assets.css_parse._find_refs", fail)
+    run2 = CssRewriteCache(db_path)
+    assert run2.rewrite(_CSS, css_base_url=_BASE, map_url=_local) == out
+    assert (run2.stats.refs_from_disk, run2.stats.disk_hits, run2.stats.misses) == (1, 1, 0)
+    run2.close()
+
+
+def test_css_rewrite_cache_drops_least_recently_used_rows(tmp_path: Path) -> None:
+    clear_memory_layers()
+    cache = CssRewriteCache(tmp_path / "css_rewrites.sqlite3", max_rows=1)
+    cache.rewrite(_CSS, css_base_url=_BASE, map_url=_local)
+    cache.rewrite(_CSS, css_base_url=_BASE, map_url=str)
+    clear_memory_layers()
+
+    cache.rewrite(_CSS, css_base_url=_BASE, map_url=_local)
+    assert (cache.stats.disk_hits, cache.stats.misses) == (0, 3)
+    cache.close()
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from lxml import html
+
+from web2ru.extract.exclude_rules import RuleMatcher, compile_selector, should_skip_element
+
+
+def test_rule_matcher_excludes_matched_subtrees_and_reports_invalid_selectors() -> None:
+    root = html.fromstring(
+        """
+        <html><body><main>
+          <div class="promo"><p>Buy <b>now</b></p></div>
+          <p id="keep">Keep me</p>
+        </main></body></html>
+        """
+    )
+    scope = root.xpath("//main")[0]
+    rules = RuleMatcher(scope, [".promo", "p[", "#missing"])
+
+    assert rules.is_excluded(root.xpath("//div[@class='promo']")[0])
+    assert rules.is_excluded(root.xpath("//b")[0])
+    assert not rules.is_excluded(root.xpath("//p[@id='keep']")[0])
+    assert rules.invalid_selectors == ["p["]
+    assert rules.excluded_total == 3
+    assert rules.match_ms >= 0
+
+
+def test_rule_matcher_skip_verdicts_match_should_skip_element() -> None:
+    root = html.fromstring(
+        """
+        <html><body>
+          <p class="NoTranslate">a</p><p aria-hidden="true">b</p><p hidden>c</p>
+          <p translate="no">d</p><p data-no-translate>e</p><pre>f</pre><code hidden>g</code>
+          <template shadowrootmode="open"><p>h</p></template><template>i</template>
+          <script>j</script><!-- k --><p>l</p>
+        </body></html>
+        """
+    )
+    rules = RuleMatcher(root, [])
+    for element in root.iter():
+        for allow_code_blocks in (False, True):
+            assert rules.should_skip(
+                element, allow_code_blocks=allow_code_blocks
+            ) == should_skip_element(element, allow_code_blocks=allow_code_blocks)
+
+
+def test_compile_selector_is_cached_across_calls() -> None:
+    assert compile_selector("nav .menu") is compile_selector("nav .menu")
@@ -94,3 +94,86 @@ When writing complex features, use an ExecPlan.</code></pre>
     merged = " ".join(part.core for block in blocks for part in block.parts)
     assert "ExecPlans" in merged
     assert "When writing complex features" in merged
+
+
+def test_extract_blocks_falls_back_to_text_heavy_divs() -> None:
+    long_text = "This sentence is repeated to make a long enough div. " * 4
+    root = html.fromstring(
+        f"""
+        <html><body><main>
+          <div id="outer"><div id="leaf">{long_text}</div></div>
+          <div id="short">Too short</div>
+        </main></body></html>
+        """
+    )
+    scope = root.xpath("//main")[0]
+    blocks, _ = extract_blocks(
+        scope,
+        scope_mode="main",
+        translation_unit="block",
+        exclude_selectors=[],
+    )
+    merged = " ".join(part.core for block in blocks for part in block.parts)
+    assert "long enough div" in merged
+    assert "Too short" not in merged
+
+
+def test_extract_blocks_uses_language_comment_markers_in_code_block() -> None:
+    root = html.fromstring(
+        """
+        <html><body><main>
+          <pre><code class="language-sql">-- load active users
+SELECT id FROM users WHERE state = 'a#b';</code></pre>
+        </main></body></html>
+        """
+    )
+    scope = root.xpath("//main")[0]
+    blocks, _ = extract_blocks(
+        scope,
+        scope_mode="main",
+        translation_unit="block",
+        exclude_selectors=[],
+    )
+    cores = [part.core for block in blocks for part in block.parts]
+    assert cores == ["load active users"]
+
+
+def test_extract_blocks_shares_pooled_strings_between_parts() -> None:
+    root = html.fromstring(
+        """
+        <html><body><main>
+          <pre><code class="language-python"># first note
+x = 1  # second note</code></pre>
+        </main></body></html>
+        """
+    )
+    scope = root.xpath("//main")[0]
+    blocks, _ = extract_blocks(
+        scope,
+        scope_mode="main",
+        translation_unit="block",
+        exclude_selectors=[],
+    )
+    first, second = blocks[0].parts
+    assert first.node_ref.xpath is second.node_ref.xpath
+    assert first.token_map is second.token_map
+    assert second.raw == f"{second.lead_ws}{second.core}{second.trail_ws}"
+
+
+def test_block_fingerprints_survive_sibling_insert() -> None:
+    from web2ru.extract.fingerprint import block_fingerprint
+
+    def fingerprints(markup: str) -> dict[str, str]:
+        scope = html.fromstring(markup).xpath("//main")[0]
+        blocks, _ = extract_blocks(
+            scope, scope_mode="main", translation_unit="block", exclude_selectors=[]
+        )
+        return {block.parts[0].core: block_fingerprint(block) for block in blocks}
+
+    before = fingerprints("<html><body><main><p>Alpha.</p><p>Beta.</p></main></body></html>")
+    after = fingerprints(
+        "<html><body><main><p>New.</p><p>Alpha.</p><p>Beta.</p></main></body></html>"
+    )
+    assert after["Alpha."] == before["Alpha."]
+    assert after["Beta."] == before["Beta."]
+    assert after["New."] not in before.values()
@@ -1,9 +1,13 @@
 from __future__ import annotations
 
-import threading
+from collections.abc import AsyncIterator
+from typing import Any
+
+import httpx
 
 from web2ru.assets.cache import AssetCache
 from web2ru.assets.fetch_missing import fetch_missing_assets
+from web2ru.utils import sha256_bytes
 
 
 def test_fetch_missing_assets_disabled_marks_all_missing() -> None:
@@ -21,35 +25,23 @@ def test_fetch_missing_assets_disabled_marks_all_missing() -> None:
 
 
 def test_fetch_missing_assets_reuses_single_client_and_fetches_all(monkeypatch) -> None:  # type: ignore[no-untyped-def]
-    class FakeResponse:
-        def __init__(self, *, url: str, status_code: int, content: bytes) -> None:
-            self.url = url
-            self.status_code = status_code
-            self.content = content
-            self.headers = {"content-type": "text/plain"}
-
-    class FakeClient:
-        init_count = 0
-        calls: list[str] = []
-        lock = threading.Lock()
+    calls: list[str] = []
 
-        def __init__(self, **kwargs) -> None:  # noqa: ANN003
-            FakeClient.init_count += 1
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(str(request.url))
+        assert request.headers["user-agent"] == "pytest-agent"
+        if request.url.path.endswith("bad"):
+            return httpx.Response(404)
+        return httpx.Response(200, content=b"ok", headers={"content-type": "text/plain"})
 
-        def __enter__(self) -> FakeClient:
-            return self
-
-        def __exit__(self, exc_type, exc, tb) -> None:  # noqa: ANN001, ANN002, ANN003
-            return None
+    class CountingClient(httpx.AsyncClient):
+        init_count = 0
 
-        def get(self, url: str) -> FakeResponse:
-            with FakeClient.lock:
-                FakeClient.calls.append(url)
-            if url.endswith("bad"):
-                return FakeResponse(url=url, status_code=404, content=b"")
-            return FakeResponse(url=f"{url}?final=1", status_code=200, content=b"ok")
+        def __init__(self, **kwargs: Any) -> None:
+            CountingClient.init_count += 1
+            super().__init__(**kwargs)
 
-    monkeypatch.setattr("web2ru.assets.fetch_missing.httpx.Client", FakeClient)
+    monkeypatch.setattr("web2ru.assets.fetch_missing.httpx.AsyncClient", CountingClient)
 
     cache = AssetCache()
     urls = {
@@ -64,12 +56,82 @@ def test_fetch_missing_assets_reuses_single_client_and_fetches_all(monkeypatch)
         user_agent="pytest-agent",
         max_asset_mb=15,
         enabled=True,
+        transport=httpx.MockTransport(handler),
     )
 
-    assert FakeClient.init_count == 1
-    assert set(FakeClient.calls) == urls
+    assert CountingClient.init_count == 1
+    assert set(calls) == urls
     assert cache.has("https://example.com/a")
     assert cache.has("https://example.com/b")
+    assert cache.get("https://example.com/a").sha256 == sha256_bytes(b"ok")  # type: ignore[union-attr]
     assert not cache.has("https://example.com/bad")
     assert len(missing) == 1
     assert missing[0].reason == "http_404"
+
+
+def test_fetch_missing_assets_aborts_oversized_bodies() -> None:
+    big = b"x" * (1024 * 1024 + 1)
+
+    async def stream_body() -> AsyncIterator[bytes]:
+        for offset in range(0, len(big), 64 * 1024):
+            yield big[offset : offset + 64 * 1024]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/declared":
+            return httpx.Response(200, content=big)
+        # No Content-Length: the limit is enforced while streaming.
+        return httpx.Response(200, content=stream_body())
+
+    cache = AssetCache()
+    missing = fetch_missing_assets(
+        needed_urls={"https://example.com/declared", "https://example.com/streamed"},
+        asset_cache=cache,
+        final_url="https://example.com/page",
+        user_agent="pytest-agent",
+        max_asset_mb=1,
+        enabled=True,
+        transport=httpx.MockTransport(handler),
+    )
+
+    assert {entry.reason for entry in missing} == {"size_limit"}
+    assert len(missing) == 2
+    assert cache.records == {}
+
+
+def test_fetch_missing_assets_retries_transient_failures(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    monkeypatch.setattr("web2ru.assets.fetch_missing._RETRY_BASE_SECONDS", 0.0)
+    attempts: dict[str, int] = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        attempts[path] = attempts.get(path, 0) + 1
+        if path == "/flaky" and attempts[path] == 1:
+            raise httpx.ConnectError("reset", request=request)
+        if path == "/busy" and attempts[path] == 1:
+            return httpx.Response(503, headers={"retry-after": "0"})
+        if path == "/down":
+            return httpx.Response(502)
+        return httpx.Response(200, content=b"ok")
+
+    cache = AssetCache()
+    missing = fetch_missing_assets(
+        needed_urls={
+            "https://example.com/flaky",
+            "https://example.com/busy",
+            "https://example.com/down",
+        },
+        asset_cache=cache,
+        final_url="https://example.com/page",
+        user_agent="pytest-agent",
+        max_asset_mb=15,
+        enabled=True,
+        max_retries=2,
+        transport=httpx.MockTransport(handler),
+    )
+
+    assert cache.has("https://example.com/flaky")
+    assert cache.has("https://example.com/busy")
+    assert [(entry.url, entry.reason) for entry in missing] == [
+        ("https://example.com/down", "http_502")
+    ]
+    assert attempts == {"/flaky": 2, "/busy": 2, "/down": 3}
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import io
+
+import pytest
+
+from web2ru.assets.cache import AssetCache
+from web2ru.assets.fonts import (
+    FontSubsetOptions,
+    FontSubsetStats,
+    css_content_codepoints,
+    cyrillic_warning,
+    document_codepoints,
+    subset_fonts,
+)
+from web2ru.assets.scan import parse_html
+
+pytest.importorskip("fontTools")
+from fontTools.fontBuilder import FontBuilder  # noqa: E402
+from fontTools.pens.ttGlyphPen import TTGlyphPen  # noqa: E402
+from fontTools.ttLib import TTFont  # noqa: E402
+
+_LATIN = [*range(0x20, 0x7F)]
+_CYRILLIC = [*range(0x0410, 0x0450), 0x0401, 0x0451]
+
+
+def _font(codepoints: list[int], *, flavor: str | None = None) -> bytes:
+    names = [".notdef", *(f"uni{cp:04X}" for cp in codepoints)]
+    pen = TTGlyphPen(None)
+    pen.moveTo((0, 0))
+    pen.lineTo((0, 500))
+    pen.lineTo((400, 500))
+    pen.lineTo((400, 0))
+    pen.closePath()
+    box = pen.glyph()
+    builder = FontBuilder(1000, isTTF=True)
+    builder.setupGlyphOrder(names)
+    builder.setupCharacterMap({cp: f"uni{cp:04X}" for cp in codepoints})
+    builder.setupGlyf({name: box for name in names})
+    builder.setupHorizontalMetrics({name: (500, 0) for name in names})
+    builder.setupHorizontalHeader(ascent=800, descent=-200)
+    builder.setupNameTable({"familyName": "Test", "styleName": "Regular"})
+    builder.setupOS2()
+    builder.setupPost()
+    out = io.BytesIO()
+    builder.font.flavor = flavor
+    builder.save(out)
+    return out.getvalue()
+
+
+def _cmap(data: bytes) -> set[int]:
+    return set(TTFont(io.BytesIO(data)).getBestCmap())
+
+
+def _put(cache: AssetCache, url: str, data: bytes) -> None:
+    cache.put(
+        url=url,
+        final_url=url,
+        content_type="font/woff2" if url.endswith(".woff2") else "font/ttf",
+        data=data,
+        source="network_capture",
+        max_asset_mb=15,
+    )
+
+
+def test_page_codepoints_cover_text_attributes_and_css_content() -> None:
+    root = parse_html(
+        '<html><body><p title="Ёж">Привет <b>мир</b>!</p><script>var z = "ЖЩ";</script>'
+        "</body></html>"
+    )
+    codepoints = document_codepoints(root)
+    assert {ord(char) for char in "ПриветмЁж!"} <= codepoints
+    assert ord("Щ") not in codepoints
+
+    css = ".a::before{content:\"\\2192 \"} .b::after{content: '»'}"
+    assert css_content_codepoints([css]) == {0x2192, ord("»")}
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_subset_fonts_keeps_used_glyphs_and_warns_without_cyrillic(workers: int) -> None:
+    cache = AssetCache()
+    _put(cache, "https://example.com/fonts/text.woff2", _font(_LATIN + _CYRILLIC, flavor="woff2"))
+    _put(cache, "https://example.com/fonts/latin.ttf", _font(_LATIN))
+    _put(cache, "https://example.com/fonts/icons.ttf", _font([*range(0xE000, 0xE040)]))
+    stats = FontSubsetStats()
+
+    subset_fonts(
+        cache,
+        codepoints={ord(char) for char in "Привет"},
+        options=FontSubsetOptions(enabled=True, workers=workers),
+        stats=stats,
+    )
+
+    text = cache.get("https://example.com/fonts/text.woff2")
+    assert text is not None
+    assert TTFont(io.BytesIO(text.data)).flavor == "woff2"
+    assert _cmap(text.data) == set(_LATIN) | {ord(char) for char in "Привет"}
+    icons = cache.get("https://example.com/fonts/icons.ttf")
+    assert icons is not None and len(_cmap(icons.data)) == 0x40
+    assert (stats.fonts, stats.subset, stats.icon_fonts) == (3, 2, 1)
+    assert stats.bytes_before > stats.bytes_after
+    assert stats.without_cyrillic == ["https://example.com/fonts/latin.ttf"]
+    warning = cyrillic_warning(stats)
+    assert warning is not None and "latin.ttf" in warning
+
+
+def test_page_codepoints_keep_other_case_glyphs_for_css_text_transform() -> None:
+    root = parse_html(
+        '<html><body><nav style="text-transform:uppercase">главная</nav></body></html>'
+    )
+    codepoints = document_codepoints(root)
+    assert {ord(char) for char in "главнаяГЛАВНАЯ"} <= codepoints
+    assert ord("Б") not in codepoints
+
+    cache = AssetCache()
+    _put(cache, "https://example.com/fonts/text.ttf", _font(_LATIN + _CYRILLIC))
+    subset_fonts(
+        cache,
+        codepoints=codepoints,
+        options=FontSubsetOptions(enabled=True, workers=1),
+        stats=FontSubsetStats(),
+    )
+    text = cache.get("https://example.com/fonts/text.ttf")
+    assert text is not None
+    assert {ord(char) for char in "ГЛАВНАЯ"} <= _cmap(text.data)
+
+
+def test_subset_fonts_leaves_mapped_fonts_whole() -> None:
+    cache = AssetCache()
+    url = "https://example.com/fonts/text.ttf"
+    original = _font(_LATIN + _CYRILLIC)
+    _put(cache, url, original)
+    mapped = cache.ensure_local_mapping(url)
+    stats = FontSubsetStats()
+
+    subset_fonts(cache, codepoints=set(), options=FontSubsetOptions(enabled=True), stats=stats)
+
+    assert cache.get(url).data == original  # type: ignore[union-attr]
+    assert cache.ensure_local_mapping(url) == mapped
+    assert stats.without_cyrillic == []
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import pytest
+from lxml import html
+
+from web2ru.extract.block_extractor import extract_blocks
+from web2ru.extract.parallel import extract_blocks_parallel
+from web2ru.models import Block
+
+PAGE = """
+<html><body><div id="app"><main>
+  <section><h2>Intro</h2><p>Hello <b>world</b>, see https://example.com.</p></section>
+  <aside class="ads"><p>Buy now</p></aside>
+  <section>
+    <ul><li>One</li><li>Two <a href="#">link</a></li></ul>
+    <pre><code class="language-python"># explain the value
+x = 1</code></pre>
+  </section>
+  <div><svg><use xlink:href="#icon"></use></svg><p>After the icon</p></div>
+  <p>Closing paragraph</p>
+</main></div></body></html>
+"""
+
+
+def _snapshot(blocks: list[Block]) -> list[tuple[object, ...]]:
+    return [
+        (
+            block.block_id,
+            block.context,
+            [
+                (
+                    part.id,
+                    part.raw,
+                    part.node_ref.xpath,
+                    part.node_ref.field,
+                    part.node_ref.start_offset,
+                    part.node_ref.end_offset,
+                )
+                for part in block.parts
+            ],
+        )
+        for block in blocks
+    ]
+
+
+@pytest.mark.parametrize(
+    ("translation_unit", "scope_xpath"), [("block", "//body"), ("textnode", "//main")]
+)
+def test_parallel_extract_matches_serial(translation_unit: str, scope_xpath: str) -> None:
+    serial_root = html.fromstring(PAGE)
+    serial_blocks, _ = extract_blocks(
+        serial_root.xpath(scope_xpath)[0],
+        scope_mode="main",
+        translation_unit=translation_unit,
+        exclude_selectors=["main > aside.ads"],
+    )
+
+    parallel_root = html.fromstring(PAGE)
+    parallel_blocks, _, stats = extract_blocks_parallel(
+        parallel_root.xpath(scope_xpath)[0],
+        scope_mode="main",
+        translation_unit=translation_unit,
+        exclude_selectors=["main > aside.ads"],
+        workers=2,
+        min_nodes=0,
+        token_protect=True,
+    )
+
+    assert _snapshot(parallel_blocks) == _snapshot(serial_blocks)
+    assert stats.workers == 2
+    assert stats.subtrees == 5
+    # The svg subtree uses an unbound XML prefix and is extracted in-process.
+    assert stats.serial_subtrees == 1
+    assert html.tostring(parallel_root) == html.tostring(serial_root)
+    protected = [part.protected_core for block in parallel_blocks for part in block.parts]
+    assert any(text and "WEB2RU_TP_" in text for text in protected)
+
+
+def test_parallel_extract_falls_back_to_serial_below_threshold() -> None:
+    root = html.fromstring(PAGE)
+    blocks, _, stats = extract_blocks_parallel(
+        root.xpath("//body")[0],
+        scope_mode="main",
+        translation_unit="block",
+        exclude_selectors=[],
+        workers=2,
+        min_nodes=10_000,
+        token_protect=True,
+    )
+
+    assert stats.workers == 1
+    assert stats.subtrees == 0
+    assert blocks
+    assert all(part.protected_core is None for block in blocks for part in block.parts)
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any
+
+from web2ru.assets.cache import AssetCache
+from web2ru.pipeline.asset_routing import AssetRouter
+from web2ru.pipeline.resource_policy import build_resource_policy
+
+
+def test_default_policy_blocks_trackers_and_beacons_only() -> None:
+    policy = build_resource_policy("default", url_patterns=[])
+    assert policy.block_reason("https://www.google-analytics.com/g/collect", "xhr") == "tracker"
+    assert policy.block_reason("https://static.hotjar.com/c/hotjar.js", "script") == "tracker"
+    assert policy.block_reason("https://example.com/ping", "ping") == "type:ping"
+    assert policy.block_reason("https://example.com/hero.png", "image") is None
+    assert policy.block_reason("https://notdoubleclick.net/a.js", "script") is None
+
+
+def test_text_only_policy_skips_media_and_patterns_apply_everywhere() -> None:
+    policy = build_resource_policy("text-only", url_patterns=["*://cdn.example.com/ads/*"])
+    assert policy.block_reason("https://example.com/hero.png", "image") == "type:image"
+    assert policy.block_reason("https://example.com/clip.mp4", "media") == "type:media"
+    assert policy.block_reason("https://example.com/site.css", "stylesheet") is None
+    assert policy.block_reason("https://cdn.example.com/ads/banner.js", "script") == "pattern"
+
+    off = build_resource_policy("off", url_patterns=[])
+    assert not off.active
+    assert off.block_reason("https://www.googletagmanager.com/gtm.js", "script") is None
+
+
+@dataclass
+class _FakeRequest:
+    url: str
+    resource_type: str
+    method: str = "GET"
+    headers: dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class _FakeRoute:
+    request: _FakeRequest
+    aborted: str | None = None
+    continued: bool = False
+
+    def abort(self, error_code: str) -> None:
+        self.aborted = error_code
+
+    def continue_(self) -> None:
+        self.continued = True
+
+    def fulfill(self, **kwargs: Any) -> None:
+        raise AssertionError("nothing is stored")
+
+
+def test_asset_router_aborts_blocked_requests_and_counts_reasons() -> None:
+    router = AssetRouter(
+        AssetCache(),
+        max_asset_mb=15,
+        policy=build_resource_policy("text-only", url_patterns=[]),
+    )
+    routes = [
+        _FakeRoute(_FakeRequest("https://example.com/", "document")),
+        _FakeRoute(_FakeRequest("https://example.com/a.png", "image")),
+        _FakeRoute(_FakeRequest("https://example.com/b.png", "image")),
+        _FakeRoute(_FakeRequest("https://connect.facebook.net/sdk.js", "script")),
+        _FakeRoute(_FakeRequest("https://example.com/site.css", "stylesheet")),
+    ]
+    for route in routes:
+        router.handle(route)
+
+    assert router.active
+    assert [route.aborted for route in routes] == [
+        None,
+        "blockedbyclient",
+        "blockedbyclient",
+        "blockedbyclient",
+        None,
+    ]
+    assert routes[0].continued and routes[4].continued
+    assert router.policy_stats.preset == "text-only"
+    assert router.policy_stats.blocked_total == 3
+    assert router.policy_stats.blocked_by_reason == {"type:image": 2, "tracker": 1}
+
+
+def test_capture_skips_bodies_declared_larger_than_the_asset_cap() -> None:
+    from web2ru.models import ResourcePolicyStats
+    from web2ru.pipeline.online_render import _capture_response_asset
+
+    class _LargeResponse:
+        url = "https://example.com/video.mp4"
+        status = 200
+        headers = {"content-type": "video/mp4", "content-length": str(300 * 1024 * 1024)}
+
+        def body(self) -> bytes:
+            raise AssertionError("body must not be read")
+
+    cache = AssetCache()
+    stats = ResourcePolicyStats()
+    _capture_response_asset(_LargeResponse(), cache, 15, policy_stats=stats)
+    assert stats.skipped_large_bodies == 1
+    assert not cache.records
+
+
+def test_asset_router_aborts_media_declared_larger_than_the_asset_cap() -> None:
+    @dataclass
+    class _HeadResponse:
+        headers: dict[str, str]
+        disposed: bool = False
+
+        def dispose(self) -> None:
+            self.disposed = True
+
+    @dataclass
+    class _SizedRoute(_FakeRoute):
+        size: int = 0
+        probes: list[dict[str, Any]] = field(default_factory=list)
+
+        def fetch(self, **kwargs: Any) -> _HeadResponse:
+            self.probes.append(kwargs)
+            return _HeadResponse(headers={"Content-Length": str(self.size)})
+
+    router = AssetRouter(
+        AssetCache(), max_asset_mb=15, policy=build_resource_policy("default", url_patterns=[])
+    )
+    large = _SizedRoute(
+        _FakeRequest("https://example.com/clip.mp4", "media", headers={"range": "bytes=0-"}),
+        size=300 * 1024 * 1024,
+    )
+    small = _SizedRoute(_FakeRequest("https://example.com/intro.mp4", "media"), size=1024)
+    image = _SizedRoute(_FakeRequest("https://example.com/hero.png", "image"), size=300 * 1024**2)
+    for route in (large, small, image):
+        router.handle(route)
+
+    assert large.aborted == "blockedbyclient"
+    assert large.probes == [{"method": "HEAD", "headers": {}}]
+    assert small.continued and small.aborted is None
+    assert image.continued and not image.probes
+    assert router.policy_stats.blocked_by_reason == {"size": 1}
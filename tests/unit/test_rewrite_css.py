@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from web2ru.assets.css_parse import CssParseCache
 from web2ru.assets.rewrite_css import rewrite_css_urls
 
 
@@ -15,3 +16,39 @@ def test_rewrite_css_urls_and_imports() -> None:
     )
     assert "./assets/mapped/base.css" in out
     assert "./assets/mapped/bg.png" in out
+
+
+def test_rewrite_css_urls_splices_and_keeps_other_bytes() -> None:
+    css = (
+        "/* url(keep.png) */\r\n"
+        "@media  (min-width:1px){ .a{ background : URL( '../img/a.png' ) !important } }\r\n"
+        '.b::after{content:"url(not-a-url.png)";mask:url(b.svg#m)}\r\n'
+        "@import url(x.css) screen;\n"
+        ".c{background:url(data:image/png;base64,AAAA)}"
+    )
+    out = rewrite_css_urls(
+        css,
+        css_base_url="https://example.com/static/css/main.css",
+        map_url=lambda u: f"L/{u.rsplit('/', 1)[-1]}",
+    )
+    assert out == (
+        "/* url(keep.png) */\r\n"
+        '@media  (min-width:1px){ .a{ background : url("L/a.png") !important } }\r\n'
+        '.b::after{content:"url(not-a-url.png)";mask:url("L/b.svg")}\r\n'
+        '@import url("L/x.css") screen;\n'
+        ".c{background:url(data:image/png;base64,AAAA)}"
+    )
+    unchanged = "a {  color : red }\r\n/* no urls */"
+    assert (
+        rewrite_css_urls(unchanged, css_base_url="https://example.com/", map_url=str) is unchanged
+    )
+
+
+def test_parse_css_caches_by_content() -> None:
+    cache = CssParseCache(max_entries=1)
+    first = cache.parse('@import "a.css"; b{background:url(b.png)}')
+    assert [(ref.kind, ref.value) for ref in first.refs] == [("import", "a.css"), ("url", "b.png")]
+    assert cache.parse('@import "a.css"; b{background:url(b.png)}') is first
+    cache.parse("c{}")
+    assert cache.parse('@import "a.css"; b{background:url(b.png)}') is not first
+    assert (cache.hits, cache.misses) == (1, 3)
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
-from web2ru.assets.rewrite_html import rewrite_html_urls
-from web2ru.assets.scan import parse_html
+from web2ru.assets.rewrite_html import patch_url_sites, rewrite_html_urls
+from web2ru.assets.scan import collect_url_sites, parse_html
 
 
 def test_rewrite_html_urls_preserves_non_url_meta_content() -> None:
@@ -60,3 +60,52 @@ def test_rewrite_html_urls_rewrites_anchor_links_with_mapper() -> None:
     assert same_origin.get("href") == "/__web2ru__/go?url=https://example.com/docs/page-two"
     assert fragment_only.get("href") == "#section-1"
     assert external.get("href") == "https://example.org/page"
+
+
+def test_collect_url_sites_scans_and_patches_in_one_traversal() -> None:
+    root = parse_html(
+        """
+        <html>
+          <head>
+            <link rel="canonical" href="/canonical">
+            <link rel="stylesheet" href="/site.css">
+            <style>.a{background:url(/bg.png)}</style>
+          </head>
+          <body>
+            <img id="photo" src="/p.jpg" srcset="/p@2x.jpg 2x" alt="/not-a-url.png">
+            <script src="/app.js"></script>
+            <div id="styled" style="background:url(/tile.png)"></div>
+          </body>
+        </html>
+        """
+    )
+    final_url = "https://example.com/page"
+
+    sites = collect_url_sites(root, final_url)
+    assert sites.needed == {
+        "https://example.com/canonical",
+        "https://example.com/site.css",
+        "https://example.com/bg.png",
+        "https://example.com/p.jpg",
+        "https://example.com/p@2x.jpg",
+        "https://example.com/app.js",
+        "https://example.com/tile.png",
+    }
+
+    # Translation may change a collected value before the patch; it is classified again.
+    root.xpath("//img")[0].set("src", "/translated.jpg")
+    patch_url_sites(
+        sites.sites,
+        final_url=final_url,
+        map_url=lambda url: f"./assets/{url.rsplit('/', 1)[-1]}",
+    )
+
+    img = root.xpath("//img")[0]
+    assert img.get("src") == "./assets/translated.jpg"
+    assert img.get("srcset") == "./assets/p@2x.jpg 2x"
+    assert img.get("alt") == "/not-a-url.png"
+    assert root.xpath("//link[@rel='canonical']")[0].get("href") == "/canonical"
+    assert root.xpath("//link[@rel='stylesheet']")[0].get("href") == "./assets/site.css"
+    assert root.xpath("//script")[0].get("src") == "/app.js"
+    assert "./assets/bg.png" in root.xpath("//style")[0].text
+    assert "./assets/tile.png" in root.xpath("//div[@id='styled']")[0].get("style")
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from lxml import html
+
+from web2ru.extract.exclude_rules import should_skip_element
+from web2ru.extract.scope import select_scope, visible_text_lengths
+
+
+def _naive_visible_text_len(el) -> int:  # type: ignore[no-untyped-def]
+    total = 0
+    for descendant in el.iter():
+        if should_skip_element(descendant):
+            continue
+        if descendant.text:
+            total += len(descendant.text.strip())
+        if descendant.tail:
+            total += len(descendant.tail.strip())
+    return total
+
+
+def test_select_scope_prefers_semantic_main_over_scoring() -> None:
+    root = html.fromstring(
+        """
+        <html><body>
+          <div id="nav"><a href="/">Home</a> <a href="/about">About</a></div>
+          <article id="post"><p>Article body.</p></article>
+        </body></html>
+        """
+    )
+    assert select_scope(root, "auto").get("id") == "post"
+    assert select_scope(root, "page").tag == "body"
+
+
+def test_select_scope_falls_back_to_text_scoring() -> None:
+    root = html.fromstring(
+        """
+        <html><body>
+          <div id="wrapper">
+            <section id="content"><p>First paragraph with a reasonable amount of text.</p></section>
+            <div id="aside">Short aside</div>
+          </div>
+        </body></html>
+        """
+    )
+    # The body always contains every candidate, so it wins ties on visible text length.
+    assert select_scope(root, "auto").tag == "body"
+
+
+def test_visible_text_lengths_match_per_subtree_scan() -> None:
+    root = html.fromstring(
+        """
+        <html><body>
+          <div id="a">Alpha <span>beta</span> tail<script>var x = 1;</script> after
+            <div hidden>hidden <b>bold</b></div><!-- note --> end
+          </div>
+          <section><div><p>Deep text</p></div> trailing</section>
+        </body></html>
+        """
+    )
+    table = visible_text_lengths(root)
+    for node in root.iter():
+        assert table[node] == _naive_visible_text_len(node)
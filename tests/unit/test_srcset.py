@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import pytest
+
+from web2ru.assets.cache import AssetCache
+from web2ru.assets.rewrite_html import patch_url_sites
+from web2ru.assets.scan import collect_url_sites, parse_html
+from web2ru.assets.srcset import (
+    SrcsetPolicy,
+    SrcsetStats,
+    parse_srcset,
+    parse_srcset_policy,
+    select_srcset_candidates,
+)
+
+_WIDE = "a.jpg 320w, b.jpg 640w, c.jpg 1280w"
+
+
+def _kept(srcset: str, policy: str, *, display_width: int | None = None) -> list[str]:
+    selected = select_srcset_candidates(
+        parse_srcset(srcset), parse_srcset_policy(policy), display_width=display_width
+    )
+    return [item.url for item in selected]
+
+
+def test_parse_srcset_policy_accepts_modes_and_rejects_others() -> None:
+    assert parse_srcset_policy("keep-all") == SrcsetPolicy()
+    assert parse_srcset_policy(" Largest ") == SrcsetPolicy("largest")
+    assert str(parse_srcset_policy("closest:800")) == "closest:800"
+    for bad in ("closest", "closest:0", "closest:wide", "largest:10", "smallest"):
+        with pytest.raises(ValueError):
+            parse_srcset_policy(bad)
+
+
+def test_select_srcset_candidates_by_width_and_density() -> None:
+    assert _kept(_WIDE, "keep-all") == ["a.jpg", "b.jpg", "c.jpg"]
+    assert _kept(_WIDE, "largest") == ["c.jpg"]
+    assert _kept(_WIDE, "closest:500") == ["b.jpg"]
+    assert _kept(_WIDE, "closest:4000") == ["c.jpg"]
+    # Density descriptors: the target width is turned into a density with the element width.
+    assert _kept("s.jpg, m.jpg 2x, l.jpg 3x", "closest:600", display_width=300) == ["m.jpg"]
+    assert _kept("s.jpg, m.jpg 2x, l.jpg 3x", "closest:600") == ["s.jpg"]
+    # Mixed or unknown descriptors are kept as they are.
+    assert _kept("a.jpg 320w, b.jpg 2x", "largest") == ["a.jpg", "b.jpg"]
+
+
+def test_srcset_policy_prunes_fetch_rewrite_and_output() -> None:
+    root = parse_html(
+        """
+        <html><body>
+          <img src="/a.jpg" srcset="/a.jpg 320w, /b.jpg 640w, /c.jpg 1280w">
+          <picture><source srcset="/d.webp 1x, /e.webp 2x"><img src="/f.jpg"></picture>
+        </body></html>
+        """
+    )
+    final_url = "https://example.com/post"
+    stats = SrcsetStats(policy="largest")
+
+    sites = collect_url_sites(
+        root, final_url, srcset_policy=SrcsetPolicy("largest"), srcset_stats=stats
+    )
+
+    assert sites.needed == {
+        "https://example.com/a.jpg",
+        "https://example.com/c.jpg",
+        "https://example.com/e.webp",
+        "https://example.com/f.jpg",
+    }
+    assert stats.pruned_urls == {
+        "https://example.com/a.jpg",
+        "https://example.com/b.jpg",
+        "https://example.com/d.webp",
+    }
+
+    cache = AssetCache()
+    for url in [*sites.needed, *stats.pruned_urls]:
+        cache.put(
+            url=url,
+            final_url=url,
+            content_type="image/jpeg",
+            data=url.encode(),
+            source="network_capture",
+            max_asset_mb=15,
+        )
+    patch_url_sites(
+        sites.sites, final_url=final_url, map_url=lambda url: f"./assets/{url.rsplit('/', 1)[1]}"
+    )
+    assert root.xpath("//img")[0].get("srcset") == "./assets/c.jpg 1280w"
+    assert root.xpath("//source")[0].get("srcset") == "./assets/e.webp 2x"
+
+    for url in sites.needed:
+        cache.ensure_local_mapping(url)
+    # /a.jpg is still the img src, so only the two unreferenced candidates are dropped.
+    assert cache.drop_unreferenced(stats.pruned_urls) == 2
+    assert sorted(cache.records) == sorted(sites.needed)
+    assert stats.as_report() == {
+        "policy": "largest",
+        "candidates": 5,
+        "kept": 2,
+        "pruned": 3,
+        "records_dropped": 0,
+    }
@@ -13,7 +13,7 @@ from web2ru.surf.session import SurfSession
 def test_surf_session_builds_and_reuses_ready_page(monkeypatch, tmp_path: Path) -> None:  # type: ignore[no-untyped-def]
     calls = {"online": 0, "offline": 0}
 
-    def fake_online(config, asset_cache):  # type: ignore[no-untyped-def]
+    def fake_online(config, asset_cache, browser_pool=None):  # type: ignore[no-untyped-def]
         calls["online"] += 1
         return (
             OnlineRenderResult(
@@ -47,6 +47,7 @@ def test_surf_session_builds_and_reuses_ready_page(monkeypatch, tmp_path: Path)
     cfg = RunConfig(
         url="https://example.com/start",
         output_root=tmp_path,
+        cache_dir=tmp_path / "cache",
         mode="surf",
         freeze_js="on",
     )
@@ -65,7 +66,7 @@ def test_surf_session_builds_and_reuses_ready_page(monkeypatch, tmp_path: Path)
 
 
 def test_surf_session_rejects_cross_origin_when_disabled(monkeypatch, tmp_path: Path) -> None:  # type: ignore[no-untyped-def]
-    def fake_online(config, asset_cache):  # type: ignore[no-untyped-def]
+    def fake_online(config, asset_cache, browser_pool=None):  # type: ignore[no-untyped-def]
         return (
             OnlineRenderResult(
                 final_url=config.url,
@@ -93,6 +94,7 @@ def test_surf_session_rejects_cross_origin_when_disabled(monkeypatch, tmp_path:
     cfg = RunConfig(
         url="https://example.com/start",
         output_root=tmp_path,
+        cache_dir=tmp_path / "cache",
         mode="surf",
         freeze_js="on",
     )
@@ -106,7 +108,7 @@ def test_surf_session_rejects_cross_origin_when_disabled(monkeypatch, tmp_path:
 def test_surf_session_rebuilds_stale_interstitial_ready_page(monkeypatch, tmp_path: Path) -> None:  # type: ignore[no-untyped-def]
     calls = {"online": 0, "offline": 0}
 
-    def fake_online(config, asset_cache):  # type: ignore[no-untyped-def]
+    def fake_online(config, asset_cache, browser_pool=None):  # type: ignore[no-untyped-def]
         calls["online"] += 1
         return (
             OnlineRenderResult(
@@ -137,6 +139,7 @@ def test_surf_session_rebuilds_stale_interstitial_ready_page(monkeypatch, tmp_pa
     cfg = RunConfig(
         url=source_url,
         output_root=tmp_path,
+        cache_dir=tmp_path / "cache",
         mode="surf",
         freeze_js="on",
     )
@@ -165,6 +168,7 @@ def test_surf_session_maps_cross_origin_links_when_allowed(tmp_path: Path) -> No
     cfg = RunConfig(
         url="https://example.com/start",
         output_root=tmp_path,
+        cache_dir=tmp_path / "cache",
         mode="surf",
         freeze_js="on",
     )
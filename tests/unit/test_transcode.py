@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import io
+import random
+
+import pytest
+
+from web2ru.assets.cache import AssetCache
+from web2ru.assets.transcode import ImageTranscodeOptions, ImageTranscodeStats, transcode_images
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _png(width: int, height: int) -> bytes:
+    # Noise compresses badly as PNG, like photos and screenshots do.
+    noise = random.Random(width * height).randbytes(width * height * 3)
+    image = Image.frombytes("RGB", (width, height), noise)
+    out = io.BytesIO()
+    image.save(out, format="PNG")
+    return out.getvalue()
+
+
+def _put(cache: AssetCache, url: str, data: bytes, content_type: str = "image/png") -> None:
+    cache.put(
+        url=url,
+        final_url=url,
+        content_type=content_type,
+        data=data,
+        source="network_capture",
+        max_asset_mb=15,
+    )
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_transcode_images_reencodes_downscales_and_renames(workers: int) -> None:
+    cache = AssetCache()
+    big = _png(600, 300)
+    _put(cache, "https://example.com/img/shot.png", big)
+    _put(cache, "https://example.com/img/other.png", _png(400, 200))
+    _put(cache, "https://example.com/img/tiny.png", _png(8, 8))
+    _put(cache, "https://example.com/img/broken.png", b"\x89PNG" + b"\0" * 40000)
+    _put(cache, "https://example.com/site.css", b"body{}" * 5000, "text/css")
+    stats = ImageTranscodeStats()
+
+    transcode_images(
+        cache,
+        options=ImageTranscodeOptions(mode="webp", max_dim=200, workers=workers, min_bytes=1024),
+        stats=stats,
+    )
+
+    record = cache.get("https://example.com/img/shot.png")
+    assert record is not None
+    assert (record.content_type, record.transcoded_from) == ("image/webp", "image/png")
+    assert record.size < len(big)
+    with Image.open(io.BytesIO(record.data)) as decoded:
+        assert decoded.format == "WEBP"
+        assert decoded.size == (200, 100)
+    assert cache.ensure_local_mapping("https://example.com/img/shot.png").endswith(".webp")
+    assert cache.get("https://example.com/img/tiny.png").transcoded_from is None  # type: ignore[union-attr]
+    report = stats.as_report()
+    assert (report["candidates"], report["transcoded"], report["resized"]) == (3, 2, 2)
+    assert report["failed"] == 1
+    assert report["bytes_saved"] > 0
+
+    # A second pass (next streaming chunk) only looks at new records.
+    transcode_images(cache, options=ImageTranscodeOptions(mode="webp", min_bytes=1024), stats=stats)
+    assert stats.candidates == 3
+
+
+def test_transcode_images_leaves_mapped_records_and_off_mode_alone() -> None:
+    cache = AssetCache()
+    url = "https://example.com/img/shot.png"
+    _put(cache, url, _png(300, 300))
+    mapped = cache.ensure_local_mapping(url)
+    stats = ImageTranscodeStats()
+
+    transcode_images(cache, options=ImageTranscodeOptions(mode="off"), stats=stats)
+    transcode_images(
+        cache, options=ImageTranscodeOptions(mode="original", min_bytes=1024), stats=stats
+    )
+
+    assert stats.candidates == 0
+    assert cache.ensure_local_mapping(url) == mapped
+    assert cache.get(url).content_type == "image/png"  # type: ignore[union-attr]
@@ -28,7 +28,6 @@ class _FakeClient:
 def _part(part_id: str, text: str, block_id: str) -> Part:
     return Part(
         id=part_id,
-        raw=text,
         lead_ws="",
         core=text,
         trail_ws="",
@@ -133,3 +132,89 @@ def test_translator_skips_context_for_long_complete_sentences(tmp_path: Path) ->
     assert second["context_prev"] == ""
     assert second["context_next"] == ""
     assert translator.stats.items_with_context == 0
+
+
+def test_translator_cache_hits_survive_renumbered_ids(tmp_path: Path) -> None:
+    def run(blocks: list[Block]) -> tuple[Translator, _FakeClient]:
+        translator = Translator(
+            api_key="test-key",
+            model="gpt-5.1",
+            reasoning_effort="none",
+            max_output_tokens=2048,
+            batch_chars=4000,
+            max_items_per_batch=40,
+            max_retries=1,
+            allow_empty_parts=True,
+            token_protect=False,
+            token_protect_strict=False,
+            use_cache=True,
+            cache_db_path=str(tmp_path / "translation_cache.sqlite3"),
+        )
+        fake_client = _FakeClient()
+        translator._client = fake_client  # type: ignore[assignment]
+        translator.translate_blocks_and_attrs(blocks=blocks, attrs=[])
+        translator.close()
+        return translator, fake_client
+
+    sentence = (
+        "This sentence is intentionally long and complete so that it is cached on its own "
+        "without any neighbor context attached."
+    )
+    first = Block(block_id="b_000001", context="", parts=[_part("t_000001", sentence, "b_000001")])
+    run([first])
+
+    inserted = Block(
+        block_id="b_000001",
+        context="",
+        parts=[_part("t_000001", "A freshly inserted paragraph about caching.", "b_000001")],
+    )
+    moved = Block(block_id="b_000002", context="", parts=[_part("t_000002", sentence, "b_000002")])
+    translator, fake_client = run([inserted, moved])
+
+    assert translator.stats.cache_hits == 1
+    assert moved.parts[0].translated_core == sentence
+    sent = [item["text"] for payload in fake_client.payloads for item in payload["items"]]  # type: ignore[attr-defined]
+    assert sent == ["A freshly inserted paragraph about caching."]
+
+
+def test_translator_cache_ignores_glossary_terms_of_other_items(tmp_path: Path) -> None:
+    def run(blocks: list[Block]) -> tuple[Translator, _FakeClient]:
+        translator = Translator(
+            api_key="test-key",
+            model="gpt-5.1",
+            reasoning_effort="none",
+            max_output_tokens=2048,
+            batch_chars=4000,
+            max_items_per_batch=40,
+            max_retries=1,
+            allow_empty_parts=True,
+            token_protect=False,
+            token_protect_strict=False,
+            use_cache=True,
+            cache_db_path=str(tmp_path / "translation_cache.sqlite3"),
+        )
+        fake_client = _FakeClient()
+        translator._client = fake_client  # type: ignore[assignment]
+        translator.translate_blocks_and_attrs(blocks=blocks, attrs=[])
+        translator.close()
+        return translator, fake_client
+
+    sentence = (
+        "This sentence is intentionally long and complete so that it is cached on its own "
+        "without any neighbor context attached."
+    )
+    run([Block(block_id="b_000001", context="", parts=[_part("t_000001", sentence, "b_000001")])])
+
+    # The new paragraph repeats a term, which adds it to the document glossary.
+    added = "Kubernetes schedules pods, and Kubernetes restarts them."
+    translator, fake_client = run(
+        [
+            Block(block_id="b_000001", context="", parts=[_part("t_000001", added, "b_000001")]),
+            Block(block_id="b_000002", context="", parts=[_part("t_000002", sentence, "b_000002")]),
+        ]
+    )
+
+    assert fake_client.payloads[0]["glossary"]["Kubernetes"] == "Kubernetes"  # type: ignore[index]
+    assert translator.stats.cache_hits == 1
+    sent = [item["text"] for payload in fake_client.payloads for item in payload["items"]]  # type: ignore[attr-defined]
+    assert sent == [added]